@@ -25,10 +25,18 @@ export function DashboardPage() {
   const apiService = new ApiService(config!);
   const queryClient = useQueryClient();
 
+  // Bajo la clave 'accounts' para que invalidar las cuentas también refresque el dashboard
   const { data: accountsData, isLoading: accountsLoading, error: accountsError } = useQuery({
-    queryKey: ['accounts'],
+    queryKey: ['accounts', 'dashboard'],
     queryFn: async () => {
-      const response = await apiService.getAccounts();
+      const response: any = await apiService.getDashboard();
+      // El perfil llega en el mismo payload: se precarga la query de perfil
+      if (response.profile) {
+        queryClient.setQueryData(['profile'], {
+          profile: response.profile,
+          correlationId: response.correlationId,
+        });
+      }
       return AccountMapper.toAccountResponse(response);
     },
   })
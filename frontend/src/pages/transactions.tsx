@@ -46,24 +46,22 @@ export function TransactionsPage() {
     error: transactionsError,
     refetch: refetchTransactions 
   } = useQuery({
-    queryKey: ['transactions', selectedAccountId, dateFrom, dateTo],
+    queryKey: ['transactions', selectedAccountId, dateFrom, dateTo, transactionType],
     queryFn: async () => {
       if (!selectedAccountId) return Promise.resolve({ transactions: [], count: 0, accountId: selectedAccountId, hasMore: false })
       const response = await apiService.getTransactions(selectedAccountId, {
         from: dateFrom || undefined,
         to: dateTo || undefined,
         limit: 50,
+        type: transactionType === 'all' ? undefined : transactionType === 'debit' ? 'DEBIT' : 'CREDIT',
       });
       return TransactionMapper.toTransactionResponse(response);
     },
     enabled: !!selectedAccountId,
   })
 
-  const transactions = transactionsData?.transactions || []
-  const filteredTransactions = transactions.filter(transaction => {
-    if (transactionType === 'all') return true
-    return transaction.type.toLowerCase() === transactionType.toLowerCase()
-  })
+  // El tipo se filtra en el servidor: cada página trae solo las transacciones pedidas
+  const filteredTransactions = transactionsData?.transactions || []
 
   const handleAccountChange = (accountId: string) => {
     setSelectedAccountId(accountId)
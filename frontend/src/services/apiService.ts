@@ -69,6 +69,11 @@ export class ApiService {
     return this.request('/v1/accounts');
   }
 
+  // Perfil, cuentas y movimientos recientes en una sola llamada
+  async getDashboard() {
+    return this.request('/v1/dashboard');
+  }
+
   async getAccountDetails(accountId: string) {
     return this.request(`/v1/accounts/${accountId}`);
   }
@@ -78,11 +83,24 @@ export class ApiService {
     from?: string;
     to?: string;
     limit?: number;
+    cursor?: string;
+    type?: 'DEBIT' | 'CREDIT';
+    status?: 'COMPLETED' | 'FAILED' | 'PENDING';
+    counterparty?: string;
+    minAmount?: number;
+    maxAmount?: number;
   }) {
     const queryParams = new URLSearchParams();
     if (params?.from) queryParams.append('from', params.from);
     if (params?.to) queryParams.append('to', params.to);
     if (params?.limit) queryParams.append('limit', params.limit.toString());
+    if (params?.cursor) queryParams.append('cursor', params.cursor);
+    // Filtros resueltos en el servidor (GSI o FilterExpression)
+    if (params?.type) queryParams.append('type', params.type);
+    if (params?.status) queryParams.append('status', params.status);
+    if (params?.counterparty) queryParams.append('counterparty', params.counterparty);
+    if (params?.minAmount !== undefined) queryParams.append('minAmount', params.minAmount.toString());
+    if (params?.maxAmount !== undefined) queryParams.append('maxAmount', params.maxAmount.toString());
 
     const queryString = queryParams.toString();
     const endpoint = `/v1/accounts/${accountId}/transactions${queryString ? `?${queryString}` : ''}`;
@@ -90,6 +108,34 @@ export class ApiService {
     return this.request(endpoint);
   }
 
+  // Movimientos de todas las cuentas del cliente, más recientes primero
+  async getTransactionFeed(params?: {
+    from?: string;
+    to?: string;
+    limit?: number;
+    cursor?: string;
+    type?: 'DEBIT' | 'CREDIT';
+    status?: 'COMPLETED' | 'FAILED' | 'PENDING';
+    counterparty?: string;
+    minAmount?: number;
+    maxAmount?: number;
+  }) {
+    const queryParams = new URLSearchParams();
+    if (params?.from) queryParams.append('from', params.from);
+    if (params?.to) queryParams.append('to', params.to);
+    if (params?.limit) queryParams.append('limit', params.limit.toString());
+    if (params?.cursor) queryParams.append('cursor', params.cursor);
+    // Filtros resueltos en el servidor (GSI o FilterExpression)
+    if (params?.type) queryParams.append('type', params.type);
+    if (params?.status) queryParams.append('status', params.status);
+    if (params?.counterparty) queryParams.append('counterparty', params.counterparty);
+    if (params?.minAmount !== undefined) queryParams.append('minAmount', params.minAmount.toString());
+    if (params?.maxAmount !== undefined) queryParams.append('maxAmount', params.maxAmount.toString());
+
+    const queryString = queryParams.toString();
+    return this.request(`/v1/transactions${queryString ? `?${queryString}` : ''}`);
+  }
+
   // Métodos de transferencias
   async createTransfer(data: {
     sourceAccountId: string;
@@ -0,0 +1,208 @@
+"""
+Benchmark: archivo de transacciones viejas en S3 (src/jobs/archive_transactions)
+con lecturas transparentes desde get_transactions.
+
+Siembra cuentas con varios años de movimientos y ejecuta transferencias.
+Antes de archivar guarda las respuestas de get_transactions: páginas
+completas con y sin rango de fechas (incluido uno que cruza el corte), con
+filtros, exportación NDJSON/CSV y el feed del cliente. Después archiva con
+el stand-in de S3 sobre un directorio temporal: una primera corrida se corta
+a la mitad de los borrados y la siguiente la completa. Verifica que cada
+respuesta sigue siendo la misma, que la conciliación no encuentra
+diferencias y compara tamaño de la tabla, bytes archivados, latencia y
+llamadas a DynamoDB/S3.
+
+Uso:
+    python infra/benchmarks/bench_archive.py --customers 20 --transactions 150 --after-days 90
+"""
+import argparse
+import json
+import os
+import random
+import tempfile
+import uuid
+from contextlib import redirect_stdout
+
+from harness import (
+    TRANSACTIONS_TABLE, SerializedClient, api_event, create_tables, drive, dynamo, load_handler, load_job, seed
+)
+from banca_common import archive
+from banca_common.items import SUMMARY_PREFIX
+from local_dynamodb import LocalDynamoDB
+from local_s3 import LocalS3
+
+ARCHIVE_BUCKET = 'bench-archive'
+
+
+def load_transactions(archived: bool):
+    """get_transactions con o sin el bucket del archivo configurado"""
+    if archived:
+        os.environ['ARCHIVE_BUCKET_NAME'] = ARCHIVE_BUCKET
+    else:
+        os.environ.pop('ARCHIVE_BUCKET_NAME', None)
+    return load_handler('get_transactions').lambda_handler
+
+
+def collect(handler, db, customer_id, account_id, query):
+    """Recorrer todas las páginas de una consulta; retorna lo que ve el cliente"""
+    dynamo.set_client(SerializedClient(db))
+    path = {'accountId': account_id} if account_id else None
+    pages, cursor = [], None
+    while True:
+        params = dict(query, cursor=cursor) if cursor else dict(query)
+        with open(os.devnull, 'w') as devnull, redirect_stdout(devnull):
+            response = handler(api_event(customer_id, path_parameters=path, query=params), None)
+        assert response['statusCode'] == 200, response
+        if 'format' in query:
+            pages.append(response['body'])
+            cursor = response['headers'].get('X-Next-Cursor')
+        else:
+            body = json.loads(response['body'])
+            # El resumen no depende de la página: se guarda el de la primera
+            if not cursor and body.get('summary'):
+                pages.append(body['summary'])
+            pages.extend(body['transactions'])
+            cursor = body['pagination']['nextCursor']
+        if not cursor:
+            return ''.join(pages) if 'format' in query else pages
+
+
+def hot_rows(db, before=None):
+    """Filas del libro mayor en la tabla (con `before`, solo las anteriores a ese timestamp)"""
+    return sum(1 for key in db.tables[TRANSACTIONS_TABLE].items
+               if not key[0][1].startswith(SUMMARY_PREFIX) and (before is None or key[1][1] < before))
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--customers', type=int, default=20, help='Clientes sembrados')
+    parser.add_argument('--accounts', type=int, default=2, help='Cuentas por cliente')
+    parser.add_argument('--transactions', type=int, default=150, help='Transacciones sembradas por cuenta')
+    parser.add_argument('--transfers', type=int, default=200, help='Transferencias antes de archivar')
+    parser.add_argument('--after-days', type=int, default=90, help='Antigüedad mínima de las filas archivadas')
+    parser.add_argument('--segments', type=int, default=8, help='TotalSegments del scan del archivador')
+    parser.add_argument('--workers', type=int, default=4, help='Hilos del archivador')
+    parser.add_argument('--checked', type=int, default=4, help='Clientes cuyas respuestas se comparan')
+    parser.add_argument('--requests', type=int, default=300, help='Lecturas por consulta medida')
+    parser.add_argument('--latency-ms', type=float, default=0.0, help='Latencia simulada por llamada a DynamoDB')
+    parser.add_argument('--seed', type=int, default=0, help='Semilla de los datos')
+    args = parser.parse_args()
+    random.seed(args.seed)
+
+    # Bloques de exportación chicos para recorrer varios cursores
+    os.environ['EXPORT_PAGE_ROWS'] = '40'
+    db = LocalDynamoDB()
+    create_tables(db)
+    customers = seed(db, args.customers, args.accounts, args.transactions)
+    events = []
+    for _ in range(args.transfers):
+        customer_id = random.choice(list(customers))
+        source_id, target_id = random.sample(customers[customer_id], 2)
+        events.append(api_event(customer_id, 'POST', body={
+            'sourceAccountId': source_id, 'targetAccountId': target_id,
+            'amount': round(random.uniform(1, 20), 2), 'idempotencyKey': str(uuid.uuid4())
+        }))
+    drive(load_handler('post_transfer').lambda_handler, events, db, concurrency=4)
+
+    s3 = LocalS3(tempfile.mkdtemp(prefix='bench-archive-'))
+    archive.set_client(s3)
+    os.environ['ARCHIVE_BUCKET_NAME'] = ARCHIVE_BUCKET
+    job = load_job('archive_transactions')
+    cutoff = job.archive_cutoff(job.datetime.utcnow(), args.after_days)
+    before_cutoff = f'{int(cutoff[:4]) - 1}{cutoff[4:]}'
+
+    queries = [
+        {'limit': '25'},
+        {'limit': '30', 'from': before_cutoff, 'to': f'{cutoff[:8]}20'},
+        {'limit': '20', 'to': cutoff},
+        {'limit': '50', 'type': 'DEBIT'},
+        {'limit': '10', 'counterparty': 'Nómina'},
+        {'limit': '15', 'minAmount': '100', 'maxAmount': '2600', 'from': before_cutoff},
+        {'limit': '25', 'status': 'COMPLETED', 'type': 'CREDIT'},
+        {'format': 'ndjson'},
+        {'format': 'csv', 'from': before_cutoff}
+    ]
+    checked = list(customers.items())[:args.checked]
+
+    def responses(handler):
+        results = {}
+        for customer_id, account_ids in checked:
+            for account_id in account_ids:
+                for number, query in enumerate(queries):
+                    results[(account_id, number)] = collect(handler, db, customer_id, account_id, query)
+            results[(customer_id, 'feed')] = collect(handler, db, customer_id, None, {'limit': '30'})
+            results[(customer_id, 'feed-filtered')] = collect(handler, db, customer_id, None,
+                                                              {'limit': '20', 'type': 'DEBIT', 'from': before_cutoff})
+        return results
+
+    hot_handler, archive_handler = load_transactions(False), load_transactions(True)
+    expected = responses(hot_handler)
+    rows_before = hot_rows(db)
+    # Con pocas transacciones por cuenta puede no haber filas anteriores al corte
+    archivable = hot_rows(db, cutoff)
+
+    def measure(label):
+        customer_id, account_ids = checked[0]
+        print(f"{label:<16} {'query':<12} {'p50 ms':>8} {'p95 ms':>8} {'calls':>6} {'S3 GETs':>8}")
+        for name, query in (('first page', {'limit': '25'}), ('cold range', {'limit': '25', 'to': before_cutoff})):
+            reads = [api_event(customer_id, path_parameters={'accountId': random.choice(account_ids)}, query=query)
+                     for _ in range(args.requests)]
+            s3.reset_stats()
+            result = drive(archive_handler, reads, db, latency_ms=args.latency_ms)
+            print(f"{label:<16} {name:<12} {result['p50']:>8.2f} {result['p95']:>8.2f} "
+                  f"{result['callsPerRequest']:>6.1f} {s3.calls['GetObject'] / args.requests:>8.2f}")
+
+    measure('hot table')
+
+    # Primera corrida cortada a mitad de los borrados: la siguiente la completa
+    delete_rows, calls = job.delete_rows, []
+
+    def failing_delete_rows(*params):
+        calls.append(1)
+        if len(calls) > 10:
+            raise RuntimeError('interrupted')
+        return delete_rows(*params)
+
+    dynamo.set_client(SerializedClient(db))
+    job.delete_rows = failing_delete_rows
+    interrupted = False
+    try:
+        job.archive_transactions(args.segments, args.workers, args.after_days)
+    except RuntimeError:
+        interrupted = True
+    finally:
+        job.delete_rows = delete_rows
+    assert responses(archive_handler) == expected, 'interrupted run changed the responses'
+
+    summary = job.archive_transactions(args.segments, args.workers, args.after_days)
+    print(f"archive run: {json.dumps(summary)}")
+    # Solo una primera corrida cortada deja filas archivadas sin borrar; con
+    # pocos datos puede terminar antes de llegar al corte
+    if interrupted:
+        assert summary['alreadyArchived'] > 0, summary
+    assert hot_rows(db, cutoff) == 0 and rows_before - hot_rows(db) == archivable, summary
+    objects = s3.list_objects_v2(Bucket=ARCHIVE_BUCKET).get('Contents', [])
+    archived_bytes = sum(entry['Size'] for entry in objects if entry['Key'].endswith(archive.ARCHIVE_SUFFIX))
+    print(f"hot ledger rows {rows_before} -> {hot_rows(db)}  archive objects {len(objects)}  "
+          f"archive bytes {archived_bytes} ({archived_bytes / max(archivable, 1):.0f}/row)  "
+          f"first run interrupted: {interrupted}")
+
+    again = job.archive_transactions(args.segments, args.workers, args.after_days)
+    assert again['rows'] == 0, again
+
+    actual = responses(archive_handler)
+    for key in expected:
+        assert actual[key] == expected[key], f'{key} differs after archiving'
+    if archivable:
+        assert responses(hot_handler) != expected
+    print(f'{len(expected)} responses identical after archiving: ok')
+    measure('tiered')
+
+    dynamo.set_client(db)
+    reconcile = load_job('reconcile_ledger').reconcile(8, 2, 8, 512, tempfile.mkdtemp(prefix='bench-archive-'))
+    assert reconcile['drift'] == 0, reconcile
+    print(f"reconcile after archiving: accounts {reconcile['accounts']} drift {reconcile['drift']}: ok")
+
+
+if __name__ == '__main__':
+    main()
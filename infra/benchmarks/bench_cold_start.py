@@ -0,0 +1,112 @@
+"""
+Benchmark: costo de arranque en frío de cada handler.
+
+Cada corrida lanza un intérprete nuevo con `python -X importtime`, importa el
+`index.py` del handler (con el layer común en el path) y atiende un preflight
+OPTIONS. Reporta la mediana del tiempo de import del módulo, del preflight y
+si boto3 llegó a cargarse. Sirve para detectar regresiones de cold start.
+
+Uso:
+    python infra/benchmarks/bench_cold_start.py --runs 10
+    python infra/benchmarks/bench_cold_start.py --mode eager --top 10 --handlers post_transfer
+"""
+import argparse
+import json
+import os
+import re
+import statistics
+import subprocess
+import sys
+from typing import Dict, List, Tuple
+
+BENCHMARKS_DIR = os.path.dirname(os.path.abspath(__file__))
+LAMBDAS_DIR = os.path.join(BENCHMARKS_DIR, '..', 'src', 'lambdas')
+LAYER_DIR = os.path.join(BENCHMARKS_DIR, '..', 'src', 'layers', 'common', 'python')
+
+HANDLERS = ['get_accounts', 'get_account', 'get_dashboard', 'get_profile', 'get_transactions', 'get_transfer',
+            'post_transfer', 'seed_data', 'post_confirmation', 'pre_sign_up', 'provision_accounts']
+
+# Los triggers de Cognito y los workers de colas no reciben preflight; de ellos solo se mide el import
+COGNITO_TRIGGERS = {'post_confirmation', 'pre_sign_up'}
+QUEUE_WORKERS = {'provision_accounts'}
+IMPORT_ONLY = COGNITO_TRIGGERS | QUEUE_WORKERS
+
+# Variables que los handlers leen al importar; no se hace ninguna llamada a AWS
+HANDLER_ENV = {
+    'AWS_DEFAULT_REGION': 'us-east-1',
+    'ACCOUNTS_TABLE_NAME': 'bench-accounts',
+    'TRANSACTIONS_TABLE_NAME': 'bench-transactions',
+    'IDEMPOTENCY_TABLE_NAME': 'bench-idempotency',
+    'BALANCE_SHARDS_TABLE_NAME': 'bench-balance-shards',
+    'DAILY_LIMITS_TABLE_NAME': 'bench-daily-limits',
+    'USERS_TABLE_NAME': 'bench-users',
+    'PROVISIONING_QUEUE_URL': 'https://sqs.local/000000000000/bench-provisioning',
+    'CURSOR_SIGNING_KEY': 'bench-cursor-key'
+}
+
+# Se ejecuta dentro del intérprete nuevo; imprime una línea JSON en stdout
+PROBE = '''
+import json, sys, time
+import index
+imported = time.perf_counter()
+if sys.argv[1] == 'preflight':
+    index.lambda_handler({'httpMethod': 'OPTIONS'}, None)
+done = time.perf_counter()
+print(json.dumps({'preflightMs': (done - imported) * 1000, 'boto3': 'boto3' in sys.modules}))
+'''
+
+IMPORTTIME_LINE = re.compile(r'^import time:\s+(\d+) \|\s+(\d+) \| ( *)(\S+)$')
+
+
+def run_probe(handler: str, mode: str) -> Tuple[Dict, List[Tuple[int, int, str]]]:
+    env = dict(os.environ, **HANDLER_ENV)
+    env['SDK_INIT_MODE'] = mode
+    env['PYTHONPATH'] = os.pathsep.join([os.path.join(LAMBDAS_DIR, handler), LAYER_DIR])
+    completed = subprocess.run(
+        [sys.executable, '-X', 'importtime', '-c', PROBE,
+         'import-only' if handler in IMPORT_ONLY else 'preflight'],
+        env=env, capture_output=True, text=True, check=True
+    )
+    result = json.loads(completed.stdout.strip().splitlines()[-1])
+
+    # (self µs, acumulado µs, módulo) por cada import del handler
+    modules = []
+    for line in completed.stderr.splitlines():
+        match = IMPORTTIME_LINE.match(line)
+        if match:
+            modules.append((int(match.group(1)), int(match.group(2)), match.group(4)))
+            if match.group(4) == 'index' and not match.group(3):
+                result['importMs'] = int(match.group(2)) / 1000
+    return result, modules
+
+
+def run(handlers: List[str], runs: int, mode: str, top: int) -> None:
+    print(f"mode={mode} runs={runs}")
+    print(f"{'handler':<20} {'import ms':>10} {'preflight ms':>13} {'boto3':>6}")
+    for handler in handlers:
+        run_probe(handler, mode)  # genera los .pyc y calienta el cache de archivos
+        samples = [run_probe(handler, mode) for _ in range(runs)]
+        results = [result for result, _ in samples]
+        preflight = '-' if handler in IMPORT_ONLY else f"{statistics.median(r['preflightMs'] for r in results):.2f}"
+        print(f"{handler:<20} {statistics.median(r['importMs'] for r in results):>10.1f} {preflight:>13} "
+              f"{'yes' if any(r['boto3'] for r in results) else 'no':>6}")
+
+        if top:
+            _, modules = samples[-1]
+            for self_us, _, name in sorted(modules, reverse=True)[:top]:
+                print(f"    {self_us / 1000:>8.1f} ms  {name}")
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--handlers', default=','.join(HANDLERS), help='Handlers separados por coma')
+    parser.add_argument('--runs', type=int, default=10, help='Intérpretes nuevos por handler')
+    parser.add_argument('--mode', choices=['lazy', 'eager'], default='lazy',
+                        help='SDK_INIT_MODE del layer común')
+    parser.add_argument('--top', type=int, default=0, help='Mostrar los N módulos más costosos (tiempo propio)')
+    args = parser.parse_args()
+    run(args.handlers.split(','), args.runs, args.mode, args.top)
+
+
+if __name__ == '__main__':
+    main()
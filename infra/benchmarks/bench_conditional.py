@@ -0,0 +1,80 @@
+"""
+Benchmark: sondeo con If-None-Match (304) contra la respuesta completa, y gzip.
+
+Siembra clientes, obtiene el ETag de cada lectura con una primera llamada y
+repite el mismo sondeo de tres formas: sin ETag ni Accept-Encoding (200 completo),
+con Accept-Encoding: gzip (200 comprimido) y con If-None-Match (304). Reporta
+p50, llamadas a DynamoDB, RCU y bytes de cuerpo por request.
+
+Uso:
+    python infra/benchmarks/bench_conditional.py --customers 50 --transactions 200 --requests 1000
+"""
+import argparse
+import os
+import random
+from contextlib import redirect_stdout
+
+# Los datos recién sembrados tienen escrituras recientes: sin espera para emitir ETags
+os.environ['ETAG_SETTLE_SECONDS'] = '0'
+
+from harness import api_event, create_tables, drive, load_handler, seed
+from local_dynamodb import LocalDynamoDB
+
+READS = {
+    'get_transactions': ('get_transactions', lambda account_ids: {
+        'path_parameters': {'accountId': account_ids[0]}, 'query': {'limit': '50'}}),
+    'feed': ('get_transactions', lambda account_ids: {'query': {'limit': '50'}}),
+    'get_accounts': ('get_accounts', lambda account_ids: {}),
+    'get_profile': ('get_profile', lambda account_ids: {})
+}
+MODES = {
+    'full': lambda etag: {},
+    'gzip': lambda etag: {'Accept-Encoding': 'gzip, deflate, br'},
+    'if-none-match': lambda etag: {'If-None-Match': etag, 'Accept-Encoding': 'gzip, deflate, br'}
+}
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--customers', type=int, default=50, help='Clientes sembrados')
+    parser.add_argument('--accounts', type=int, default=3, help='Cuentas por cliente')
+    parser.add_argument('--transactions', type=int, default=200, help='Transacciones por cuenta')
+    parser.add_argument('--requests', type=int, default=1000, help='Requests por lectura y modo')
+    parser.add_argument('--latency-ms', type=float, default=0.0, help='Latencia simulada por llamada a DynamoDB')
+    parser.add_argument('--seed', type=int, default=0, help='Semilla de los datos')
+    args = parser.parse_args()
+    random.seed(args.seed)
+
+    db = LocalDynamoDB()
+    create_tables(db)
+    customers = seed(db, args.customers, args.accounts, args.transactions)
+    handlers = {}
+
+    print(f"{'read':<18} {'mode':<15} {'status':>7} {'p50 ms':>8} {'calls':>6} {'RCU':>6} {'bytes':>8}")
+    for read, (handler_name, request) in READS.items():
+        if handler_name not in handlers:
+            handlers[handler_name] = load_handler(handler_name).lambda_handler
+        handler = handlers[handler_name]
+
+        # ETag vigente de cada cliente, leído una vez antes de medir
+        etags = {}
+        with open(os.devnull, 'w') as devnull, redirect_stdout(devnull):
+            for customer_id, account_ids in customers.items():
+                etags[customer_id] = handler(api_event(customer_id, **request(account_ids)), None)['headers']['ETag']
+
+        for mode, headers in MODES.items():
+            events = []
+            for _ in range(args.requests):
+                customer_id = random.choice(list(customers))
+                events.append(api_event(customer_id, headers=headers(etags[customer_id]),
+                                        **request(customers[customer_id])))
+            sample = events[0]
+            with open(os.devnull, 'w') as devnull, redirect_stdout(devnull):
+                body_bytes = len(handler(sample, None)['body'])
+            result = drive(handler, events, db, latency_ms=args.latency_ms)
+            print(f"{read:<18} {mode:<15} {','.join(map(str, result['statuses'])):>7} {result['p50']:>8.2f} "
+                  f"{result['callsPerRequest']:>6.1f} {result['readCapacityPerRequest']:>6.1f} {body_bytes:>8}")
+
+
+if __name__ == '__main__':
+    main()
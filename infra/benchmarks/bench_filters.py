@@ -0,0 +1,109 @@
+"""
+Benchmark: filtros de get_transactions por GSI contra FilterExpression sobre la tabla.
+
+Siembra cuentas con una fracción de transacciones FAILED/PENDING y recorre
+todas las páginas de cada filtro dos veces: con los GSIs de filtros
+(AccountStatusIndex disperso, AccountTypeIndex) y con los índices
+desactivados, donde todo se resuelve con FilterExpression. Reporta llamadas,
+filas leídas (ScannedCount) y RCU por filtro; las filas devueltas deben
+coincidir entre ambas rutas.
+
+Uso:
+    python infra/benchmarks/bench_filters.py --rows 5000 --failed-rate 0.02
+"""
+import argparse
+import json
+import os
+import random
+from contextlib import redirect_stdout
+from datetime import datetime, timedelta
+
+from harness import TRANSACTIONS_TABLE, api_event, create_tables, dynamo, load_handler, seed
+from banca_common.items import transaction_item
+from local_dynamodb import LocalDynamoDB
+
+FILTERS = [
+    {'status': 'FAILED'},
+    {'status': 'PENDING', 'type': 'DEBIT'},
+    {'type': 'CREDIT'},
+    {'counterparty': 'Supermercado'},
+    {'type': 'DEBIT', 'minAmount': '100'}
+]
+INDEX_ENV = ('TRANSACTION_TYPE_INDEX_NAME', 'TRANSACTION_STATUS_INDEX_NAME')
+
+
+def ledger_rows(account_id: str, rows: int, failed_rate: float):
+    """Filas del libro mayor con estados y contrapartes variados"""
+    start = datetime(2025, 1, 1)
+    for position in range(rows):
+        transaction_type = random.choice(('DEBIT', 'CREDIT'))
+        amount = round(random.uniform(1, 400), 2)
+        roll = random.random()
+        status = 'FAILED' if roll < failed_rate else 'PENDING' if roll < failed_rate * 1.5 else 'COMPLETED'
+        yield transaction_item(
+            account_id, (start + timedelta(minutes=position)).isoformat(), transaction_type,
+            amount if transaction_type == 'CREDIT' else -amount,
+            random.choice(('Supermercado', 'Farmacia', 'Alquiler', 'Transferencia')), '', status=status
+        )
+
+
+def walk(handler, customer_id: str, account_id: str, query: dict, db: LocalDynamoDB) -> dict:
+    """Recorrer todas las páginas de un filtro y resumir el costo"""
+    db.reset_stats()
+    timestamps, scanned, cursor = [], 0, None
+    with open(os.devnull, 'w') as devnull, redirect_stdout(devnull):
+        while True:
+            params = dict(query, limit='100')
+            if cursor:
+                params['cursor'] = cursor
+            body = json.loads(handler(api_event(customer_id, path_parameters={'accountId': account_id},
+                                                query=params), None)['body'])
+            timestamps += [transaction['timestamp'] for transaction in body['transactions']]
+            scanned += body['query']['scannedCount']
+            cursor = body['pagination']['nextCursor']
+            if not cursor:
+                break
+    return {
+        'index': body['query']['index'],
+        'rows': timestamps,
+        'scanned': scanned,
+        'calls': db.calls['Query'],
+        'rcu': sum(db.read_capacity.values())
+    }
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--rows', type=int, default=5000, help='Transacciones en la cuenta medida')
+    parser.add_argument('--failed-rate', type=float, default=0.02, help='Fracción de transacciones FAILED')
+    parser.add_argument('--seed', type=int, default=0, help='Semilla de los datos')
+    args = parser.parse_args()
+    random.seed(args.seed)
+
+    db = LocalDynamoDB()
+    create_tables(db)
+    customers = seed(db, 1, 2, 0)
+    customer_id, account_ids = next(iter(customers.items()))
+    db.load_items(TRANSACTIONS_TABLE, ledger_rows(account_ids[0], args.rows, args.failed_rate))
+    dynamo.set_client(db)
+
+    with_indexes = load_handler('get_transactions').lambda_handler
+    for name in INDEX_ENV:
+        os.environ[name] = ''
+    table_only = load_handler('get_transactions').lambda_handler
+    for name in INDEX_ENV:
+        del os.environ[name]
+
+    print(f'rows={args.rows} failed_rate={args.failed_rate}')
+    print(f"{'filter':<38} {'path':<20} {'rows':>6} {'scanned':>8} {'queries':>8} {'RCU':>8}")
+    for query in FILTERS:
+        label = ' '.join(f'{key}={value}' for key, value in query.items())
+        results = [walk(handler, customer_id, account_ids[0], query, db) for handler in (with_indexes, table_only)]
+        assert results[0]['rows'] == results[1]['rows'], f'{label}: index and table paths differ'
+        for result in results:
+            print(f"{label:<38} {result['index']:<20} {len(result['rows']):>6} {result['scanned']:>8} "
+                  f"{result['calls']:>8} {result['rcu']:>8.1f}")
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,137 @@
+"""
+Benchmark: throughput y latencia de los handlers contra el stand-in local de DynamoDB.
+
+Siembra clientes con N cuentas × M transacciones, genera eventos de API
+Gateway y ejecuta cada handler con varios hilos concurrentes. Reporta
+p50/p95/p99, requests por segundo, llamadas a DynamoDB y capacidad
+consumida (RCU/WCU) por request, para comparar cambios en una sola máquina.
+Con --metrics además desglosa el tiempo por fase y por operación de DynamoDB
+a partir de las líneas EMF que emiten los handlers.
+
+Uso:
+    python infra/benchmarks/bench_handlers.py --customers 200 --requests 2000 --concurrency 8
+    python infra/benchmarks/bench_handlers.py --handlers get_transactions --latency-ms 5 --output base.json
+    python infra/benchmarks/bench_handlers.py --handlers post_transfer --latency-ms 5 --metrics
+"""
+import argparse
+import json
+import os
+import random
+import uuid
+
+from harness import api_event, create_tables, drive, load_handler, phase_breakdown, seed
+from local_dynamodb import LocalDynamoDB
+
+HANDLERS = ['post_transfer', 'get_transactions', 'get_accounts', 'get_account', 'get_dashboard']
+
+
+def post_transfer_event(customer_id, account_ids):
+    source_id, target_id = random.sample(account_ids, 2)
+    return api_event(customer_id, 'POST', body={
+        'sourceAccountId': source_id,
+        'targetAccountId': target_id,
+        'amount': 1,
+        'idempotencyKey': str(uuid.uuid4())
+    })
+
+
+def get_transactions_event(customer_id, account_ids):
+    return api_event(customer_id, path_parameters={'accountId': random.choice(account_ids)},
+                     query={'limit': '50'})
+
+
+def get_accounts_event(customer_id, account_ids):
+    return api_event(customer_id)
+
+
+def get_account_event(customer_id, account_ids):
+    return api_event(customer_id, path_parameters={'accountId': random.choice(account_ids)})
+
+
+def get_dashboard_event(customer_id, account_ids):
+    return api_event(customer_id)
+
+
+EVENT_FACTORIES = {
+    'post_transfer': post_transfer_event,
+    'get_transactions': get_transactions_event,
+    'get_accounts': get_accounts_event,
+    'get_account': get_account_event,
+    'get_dashboard': get_dashboard_event
+}
+
+
+def run(args) -> dict:
+    if args.no_cache:
+        os.environ['CACHE_MAX_ENTRIES'] = '0'
+    random.seed(args.seed)
+
+    db = LocalDynamoDB()
+    create_tables(db)
+    customers = seed(db, args.customers, args.accounts_per_customer, args.transactions_per_account)
+    customer_ids = list(customers)
+    print(f'customers={args.customers} accounts/customer={args.accounts_per_customer} '
+          f'transactions/account={args.transactions_per_account} requests={args.requests} '
+          f'concurrency={args.concurrency} latency_ms={args.latency_ms} cache={"off" if args.no_cache else "on"}')
+    print(f"{'handler':<18} {'req/s':>8} {'p50 ms':>8} {'p95 ms':>8} {'p99 ms':>8} "
+          f"{'calls/req':>10} {'RCU/req':>8} {'WCU/req':>8}  status")
+
+    results = {}
+    for name in args.handlers.split(','):
+        handler = load_handler(name).lambda_handler
+        factory = EVENT_FACTORIES[name]
+        events = []
+        for _ in range(args.requests):
+            customer_id = random.choice(customer_ids)
+            events.append(factory(customer_id, customers[customer_id]))
+
+        result = drive(handler, events, db, args.concurrency, args.latency_ms)
+        results[name] = result
+        print(f"{name:<18} {result['throughput']:>8.0f} {result['p50']:>8.3f} {result['p95']:>8.3f} "
+              f"{result['p99']:>8.3f} {result['callsPerRequest']:>10.2f} "
+              f"{result['readCapacityPerRequest']:>8.2f} {result['writeCapacityPerRequest']:>8.2f}  "
+              f"{result['statuses']}")
+
+        if args.metrics:
+            # Eventos nuevos: repetir los anteriores respondería desde los caches de idempotencia
+            events = []
+            for _ in range(args.metrics_requests):
+                customer_id = random.choice(customer_ids)
+                events.append(factory(customer_id, customers[customer_id]))
+            result['phases'] = phase_breakdown(handler, events, db, args.latency_ms)
+            for metric, values in sorted(result['phases'].items(), key=lambda entry: -entry[1]['mean']):
+                if values['unit'] != 'Milliseconds':
+                    print(f"  {metric:<32} {values['mean']:>8.2f}")
+                    continue
+                calls = f"  {values['callsPerRequest']:.2f} calls/req" if values['callsPerRequest'] else ''
+                print(f"  {metric:<32} {values['mean']:>8.3f} ms{calls}")
+    return results
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--handlers', default=','.join(HANDLERS), help='Handlers separados por coma')
+    parser.add_argument('--customers', type=int, default=100, help='Clientes sembrados')
+    parser.add_argument('--accounts-per-customer', type=int, default=2, help='Cuentas por cliente (>= 2)')
+    parser.add_argument('--transactions-per-account', type=int, default=100, help='Transacciones por cuenta')
+    parser.add_argument('--requests', type=int, default=1000, help='Requests por handler')
+    parser.add_argument('--concurrency', type=int, default=4, help='Hilos concurrentes')
+    parser.add_argument('--latency-ms', type=float, default=0.0,
+                        help='Latencia de red simulada por llamada a DynamoDB')
+    parser.add_argument('--no-cache', action='store_true', help='Desactivar los caches en caliente')
+    parser.add_argument('--seed', type=int, default=0, help='Semilla para la selección de clientes')
+    parser.add_argument('--output', help='Guardar los resultados en JSON')
+    parser.add_argument('--metrics', action='store_true',
+                        help='Desglosar el tiempo por fase y por llamada a DynamoDB (requiere METRICS_ENABLED)')
+    parser.add_argument('--metrics-requests', type=int, default=200,
+                        help='Requests en serie para el desglose de --metrics')
+    args = parser.parse_args()
+
+    results = run(args)
+    if args.output:
+        with open(args.output, 'w') as output:
+            json.dump({'args': vars(args), 'results': results}, output, indent=2)
+
+
+if __name__ == '__main__':
+    main()
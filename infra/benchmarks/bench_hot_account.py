@@ -0,0 +1,160 @@
+"""
+Benchmark: saldo repartido en shards para una cuenta que recibe muchas transferencias.
+
+Siembra un cliente con varias cuentas y dirige todas las transferencias a la
+primera (la cuenta "recaudadora"); una fracción son débitos desde ella, que
+traspasan shards al item base cuando no les alcanza. Corre el mismo tráfico
+sin shards y con --shards, y reporta las escrituras que recibe el item más
+escrito (el límite real es por item: ~1000 WCU/s, la mitad en transacciones),
+llamadas a DynamoDB por request y el resultado del compactador. Verifica que
+el dinero total no cambia, que get_accounts suma los shards y que los
+agregados de la cuenta cierran con sus filas antes (get_transactions suma los
+de los shards) y después de compactar.
+
+Uso:
+    python infra/benchmarks/bench_hot_account.py --transfers 2000 --shards 8 --debit-rate 0.05
+"""
+import argparse
+import json
+import os
+import random
+import uuid
+from collections import Counter
+from contextlib import redirect_stdout
+from decimal import Decimal
+
+from harness import (
+    ACCOUNTS_TABLE, BALANCE_SHARDS_TABLE, TRANSACTIONS_TABLE, USERS_TABLE, api_event, create_tables, drive, dynamo,
+    load_handler, seed, shard_account
+)
+from banca_common.items import SUMMARY_PREFIX, SUMMARY_TOTAL_BUCKET
+from banca_common.records import to_minor_units
+from local_dynamodb import LocalDynamoDB
+
+
+class ItemWriteCounter:
+    """Proxy del stand-in que cuenta las escrituras transaccionales por item"""
+
+    def __init__(self, db: LocalDynamoDB):
+        self._db = db
+        self.writes: Counter = Counter()
+
+    def __getattr__(self, name: str):
+        return getattr(self._db, name)
+
+    def transact_write_items(self, TransactItems, **kwargs):
+        response = self._db.transact_write_items(TransactItems=TransactItems, **kwargs)
+        for entry in TransactItems:
+            (action, params), = entry.items()
+            key = params['Item'] if action == 'Put' else params['Key']
+            self.writes[(params['TableName'], json.dumps(key, sort_keys=True))] += 1
+        return response
+
+
+def money_total(db: LocalDynamoDB, account_ids) -> Decimal:
+    """Saldo de las cuentas (items base) más todos los shards"""
+    total = sum(Decimal(item['balance']['N']) for item in db.tables[ACCOUNTS_TABLE].items.values()
+                if item['accountId']['S'] in account_ids)
+    return total + sum(Decimal(item['balance']['N']) for item in db.tables[BALANCE_SHARDS_TABLE].items.values())
+
+
+def ledger_totals(db: LocalDynamoDB, account_id: str):
+    """Filas, débitos y créditos (centavos) del libro mayor de una cuenta"""
+    amounts = [to_minor_units(item['amount']['N']) for item in db.tables[TRANSACTIONS_TABLE].items.values()
+               if item['accountId']['S'] == account_id]
+    return [len(amounts), sum(amount for amount in amounts if amount < 0),
+            sum(amount for amount in amounts if amount > 0)]
+
+
+def total_bucket(db: LocalDynamoDB, account_id: str):
+    item = db.get_item(TableName=TRANSACTIONS_TABLE, Key={
+        'accountId': {'S': f'{SUMMARY_PREFIX}{account_id}'}, 'timestamp': {'S': SUMMARY_TOTAL_BUCKET}
+    }).get('Item', {})
+    return [int(item.get('transactionCount', {'N': '0'})['N']),
+            to_minor_units(item.get('totalDebits', {'N': '0'})['N']),
+            to_minor_units(item.get('totalCredits', {'N': '0'})['N'])]
+
+
+def run(args, shards: int) -> None:
+    random.seed(args.seed)
+    db = LocalDynamoDB()
+    create_tables(db)
+    customers = seed(db, 1, args.accounts, 0)
+    customer_id, account_ids = next(iter(customers.items()))
+    hot_account = account_ids[0]
+    hot_key = {'accountId': {'S': hot_account}, 'customerId': {'S': customer_id}}
+    # Sin saldo inicial ni tope diario: los débitos se cubren con lo recibido
+    db.update_item(TableName=ACCOUNTS_TABLE, Key=hot_key,
+                   UpdateExpression='SET balance = :zero, dailyTransferLimit = :limit',
+                   ExpressionAttributeValues={':zero': {'N': '0'}, ':limit': {'N': '1000000000'}})
+    if shards:
+        shard_account(db, hot_account, shards)
+    before = money_total(db, account_ids)
+
+    events = []
+    for _ in range(args.transfers):
+        other = random.choice(account_ids[1:])
+        # Débitos desde la recaudadora por más de lo que tiene en el item base
+        debit = random.random() < args.debit_rate
+        events.append(api_event(customer_id, 'POST', body={
+            'sourceAccountId': hot_account if debit else other,
+            'targetAccountId': other if debit else hot_account,
+            'amount': args.debit_amount if debit else 1,
+            'idempotencyKey': str(uuid.uuid4())
+        }))
+
+    counter = ItemWriteCounter(db)
+    result = drive(load_handler('post_transfer').lambda_handler, events, counter,
+                   args.concurrency, args.latency_ms)
+    account_writes = counter.writes[(ACCOUNTS_TABLE, json.dumps(hot_key, sort_keys=True))]
+    shard_writes = max([writes for (table, key), writes in counter.writes.items()
+                        if table == BALANCE_SHARDS_TABLE] or [0])
+    summary_writes = max([writes for (table, key), writes in counter.writes.items()
+                          if table == TRANSACTIONS_TABLE and SUMMARY_PREFIX in key] or [0])
+    user_writes = counter.writes[(USERS_TABLE, json.dumps({'id': {'S': customer_id}}, sort_keys=True))]
+    hottest, writes = counter.writes.most_common(1)[0]
+
+    dynamo.set_client(db)
+    with open(os.devnull, 'w') as devnull, redirect_stdout(devnull):
+        body = json.loads(load_handler('get_accounts').lambda_handler(api_event(customer_id), None)['body'])
+        reported = {account['accountId']: Decimal(str(account['balance'])) for account in body['accounts']}
+        summary = json.loads(load_handler('get_transactions').lambda_handler(
+            api_event(customer_id, path_parameters={'accountId': hot_account}), None)['body'])['summary']
+        compacted = load_handler('compact_balances').lambda_handler({}, None)
+    after = money_total(db, account_ids)
+    base = Decimal(db.get_item(TableName=ACCOUNTS_TABLE, Key=hot_key)['Item']['balance']['N'])
+
+    assert before == after, f'money changed: {before} -> {after}'
+    assert sum(reported.values()) == after, 'get_accounts does not add up the shards'
+    ledger = ledger_totals(db, hot_account)
+    assert [summary['totalTransactions'], to_minor_units(str(summary['totalDebits'])),
+            to_minor_units(str(summary['totalCredits']))] == ledger, 'get_transactions summary != ledger'
+    assert total_bucket(db, hot_account) == ledger, 'compacted TOTAL does not match the ledger'
+    print(f"{shards:>6} {','.join(f'{k}:{v}' for k, v in sorted(result['statuses'].items())):>14} "
+          f"{account_writes:>10} {shard_writes:>10} {result['callsPerRequest']:>6.2f} "
+          f"{result['writeCapacityPerRequest']:>6.1f} {compacted['compacted']:>9} "
+          f"{reported[hot_account]:>10} {base:>10}")
+    print(f"{'':>6} item más escrito: {writes} escrituras en {hottest[0]} {json.loads(hottest[1])}; "
+          f"máx. por bucket SUMMARY# {summary_writes}, item de Users {user_writes}")
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--transfers', type=int, default=2000, help='Transferencias totales')
+    parser.add_argument('--accounts', type=int, default=20, help='Cuentas del cliente (la primera recibe)')
+    parser.add_argument('--shards', type=int, default=8, help='Shards de saldo de la cuenta recaudadora')
+    parser.add_argument('--debit-rate', type=float, default=0.02, help='Fracción de débitos desde la recaudadora')
+    parser.add_argument('--debit-amount', type=float, default=20, help='Monto de cada débito')
+    parser.add_argument('--concurrency', type=int, default=8, help='Hilos concurrentes')
+    parser.add_argument('--latency-ms', type=float, default=0.0, help='Latencia simulada por llamada a DynamoDB')
+    parser.add_argument('--seed', type=int, default=0, help='Semilla de los datos')
+    args = parser.parse_args()
+
+    print(f"{'shards':>6} {'statuses':>14} {'item cta.':>10} {'max shard':>10} {'calls':>6} {'WCU':>6} "
+          f"{'compacted':>9} {'balance':>10} {'base':>10}")
+    for shards in (0, args.shards):
+        run(args, shards)
+
+
+if __name__ == '__main__':
+    main()
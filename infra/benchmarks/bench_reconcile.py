@@ -0,0 +1,118 @@
+"""
+Benchmark: conciliación del libro mayor (src/jobs/reconcile_ledger) con diferencias inyectadas.
+
+Siembra clientes, reparte en shards el saldo de algunas cuentas y ejecuta
+transferencias con post_transfer; una primera conciliación no debe encontrar
+diferencias. Después rompe cuentas a propósito (saldo tocado a mano, una fila
+del libro mayor borrada, una cuenta borrada con sus filas, una cuenta sin
+openingBalance) y verifica que el reporte contiene exactamente esas. Repite
+la conciliación sin numpy y con un presupuesto de memoria mínimo (fuerza la
+re-partición en disco) y compara tiempos y resultados. El tiempo de scan es
+casi todo del stand-in en memoria (copia y proyección de cada item).
+
+Uso:
+    python infra/benchmarks/bench_reconcile.py --customers 200 --transactions 200 --segments 8 --workers 4
+"""
+import argparse
+import json
+import os
+import random
+import tempfile
+import uuid
+
+from harness import (
+    ACCOUNTS_TABLE, TRANSACTIONS_TABLE, api_event, create_tables, drive, dynamo, load_handler, load_job, seed,
+    shard_account
+)
+from local_dynamodb import LocalDynamoDB
+
+
+def account_key(db: LocalDynamoDB, account_id: str):
+    return next(key for key in db.tables[ACCOUNTS_TABLE].items if key[0] == ('S', account_id))
+
+
+def run(job, args, label: str, memory_mb: float):
+    report_dir = tempfile.mkdtemp(prefix='bench-reconcile-')
+    summary = job.reconcile(args.segments, args.workers, args.partitions, memory_mb, report_dir)
+    drift = {}
+    for name in summary['reports']:
+        with open(os.path.join(report_dir, name)) as handle:
+            for line in handle:
+                entry = json.loads(line)
+                drift.setdefault(entry['accountId'], set()).add(entry['check'])
+    rows = summary['ledgerRows']
+    seconds = summary['scanSeconds'] + summary['reconcileSeconds']
+    print(f"{label:<22} scan {summary['scanSeconds']:>7.2f}s  reconcile {summary['reconcileSeconds']:>6.2f}s  "
+          f"rows/s {rows / seconds:>9.0f}  accounts {summary['accounts']}  drift {summary['drift']}  "
+          f"unbaselined {summary['unbaselined']}")
+    return summary, drift
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--customers', type=int, default=200, help='Clientes sembrados')
+    parser.add_argument('--accounts', type=int, default=2, help='Cuentas por cliente')
+    parser.add_argument('--transactions', type=int, default=200, help='Transacciones sembradas por cuenta')
+    parser.add_argument('--transfers', type=int, default=500, help='Transferencias antes de conciliar')
+    parser.add_argument('--segments', type=int, default=8, help='TotalSegments de cada scan')
+    parser.add_argument('--workers', type=int, default=4, help='Procesos del pool')
+    parser.add_argument('--partitions', type=int, default=16, help='Particiones de la fase 2')
+    parser.add_argument('--seed', type=int, default=0, help='Semilla de los datos')
+    args = parser.parse_args()
+    random.seed(args.seed)
+
+    db = LocalDynamoDB()
+    create_tables(db)
+    customers = seed(db, args.customers, args.accounts, args.transactions)
+    for account_ids in list(customers.values())[::10]:
+        shard_account(db, account_ids[0], 4)
+
+    events = []
+    for _ in range(args.transfers):
+        customer_id = random.choice(list(customers))
+        source_id, target_id = random.sample(customers[customer_id], 2)
+        events.append(api_event(customer_id, 'POST', body={
+            'sourceAccountId': source_id, 'targetAccountId': target_id,
+            'amount': round(random.uniform(1, 20), 2), 'idempotencyKey': str(uuid.uuid4())
+        }))
+    transfers = drive(load_handler('post_transfer').lambda_handler, events, db, concurrency=4)
+    print(f"transfers {transfers['statuses']}  ledger items {len(db.tables[TRANSACTIONS_TABLE].items)}")
+
+    # Los workers heredan el stand-in por fork
+    dynamo.set_client(db)
+    job = load_job('reconcile_ledger')
+    summary, drift = run(job, args, 'clean', 512)
+    assert not drift and summary['accounts'] == args.customers * args.accounts, summary
+
+    # Diferencias inyectadas
+    accounts = [account_ids for account_ids in customers.values()]
+    touched, truncated, deleted, legacy = accounts[1][0], accounts[2][1], accounts[3][0], accounts[4][0]
+    transactions = db.tables[TRANSACTIONS_TABLE]
+
+    item = db.tables[ACCOUNTS_TABLE].items[account_key(db, touched)]
+    item['balance'] = {'N': str(float(item['balance']['N']) + 1)}
+    row = next(key for key in transactions.items if key[0] == ('S', truncated))
+    transactions.delete(row)
+    db.tables[ACCOUNTS_TABLE].delete(account_key(db, deleted))
+    del db.tables[ACCOUNTS_TABLE].items[account_key(db, legacy)]['openingBalance']
+    expected = {touched: {'balance'}, truncated: {'balance', 'summary'}, deleted: {'orphanLedger'}}
+
+    results = []
+    for label, vectorized, memory_mb in (('numpy', True, 512), ('python', False, 512),
+                                         ('numpy, 4 KB budget', True, 4 * 8 / 1024)):
+        numpy = job.np
+        if not vectorized:
+            job.np = None
+        try:
+            summary, drift = run(job, args, label, memory_mb)
+        finally:
+            job.np = numpy
+        assert drift == expected, f'{label}: {drift}'
+        assert summary['unbaselined'] == 1 and summary['transient'] == 0, summary
+        results.append({name: summary[name] for name in ('ledgerRows', 'balanceDifference', 'drift')})
+    assert all(result == results[0] for result in results), results
+    print(f"reported drift {json.dumps({account: sorted(checks) for account, checks in drift.items()})}: ok")
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,113 @@
+"""
+Benchmark: costo por fila de unmarshalling + serialización JSON de transacciones.
+
+Compara la ruta anterior (to_transaction -> dict con floats -> encode_json)
+con los registros de banca_common.records (Transaction.from_item -> to_json,
+montos en centavos). Reporta µs por fila de cada etapa y de la página
+completa, y la memoria retenida por fila según tracemalloc.
+
+Uso:
+    python infra/benchmarks/bench_serialization.py --rows 1000 --repeat 50
+"""
+import argparse
+import json
+import random
+import statistics
+import time
+import tracemalloc
+import uuid
+from datetime import datetime, timedelta
+from typing import Any, Callable, Dict, List
+
+import harness  # noqa: F401  (agrega el layer común al path)
+from banca_common.items import to_transaction, transaction_item
+from banca_common.records import Transaction, encode_records
+from banca_common.responses import encode_json
+from banca_common.seeding import TRANSACTION_TEMPLATES
+
+
+def build_items(rows: int) -> List[Dict[str, Any]]:
+    """Filas con la forma de query() sobre la tabla Transactions"""
+    account_id = str(uuid.uuid4())
+    templates = TRANSACTION_TEMPLATES['CHECKING'] + TRANSACTION_TEMPLATES['SAVINGS']
+    now = datetime(2024, 1, 1)
+    items = []
+    for position in range(rows):
+        tx_type, amount, counterparty, note, _ = random.choice(templates)
+        cents = random.randint(1, 500000) / 100
+        items.append(transaction_item(
+            account_id, (now - timedelta(minutes=position)).isoformat(), tx_type,
+            cents if amount > 0 else -cents, counterparty, note,
+            transfer_id=str(uuid.uuid4()) if position % 3 == 0 else None
+        ))
+    return items
+
+
+def time_per_row(function: Callable[[], Any], rows: int, repeat: int) -> float:
+    """Mediana en µs por fila de `repeat` ejecuciones"""
+    samples = []
+    for _ in range(repeat):
+        start = time.perf_counter()
+        function()
+        samples.append((time.perf_counter() - start) * 1e6 / rows)
+    return statistics.median(samples)
+
+
+def bytes_per_row(function: Callable[[], Any], rows: int) -> float:
+    """Memoria retenida por el resultado de `function`, por fila"""
+    tracemalloc.start()
+    before = tracemalloc.get_traced_memory()[0]
+    result = function()
+    retained = tracemalloc.get_traced_memory()[0] - before
+    tracemalloc.stop()
+    del result
+    return retained / rows
+
+
+def run(rows: int, repeat: int) -> Dict[str, Dict[str, float]]:
+    items = build_items(rows)
+
+    dicts = [to_transaction(item) for item in items]
+    records = [Transaction.from_item(item) for item in items]
+
+    # Ambas rutas deben producir el mismo contenido (los montos solo cambian de formato)
+    for before, after in zip(dicts, json.loads(encode_records(records))):
+        assert before == after, (before, after)
+
+    paths = {
+        'dict+encode_json': {
+            'unmarshal': lambda: [to_transaction(item) for item in items],
+            'encode': lambda: encode_json(dicts),
+            'page': lambda: encode_json({'transactions': [to_transaction(item) for item in items]})
+        },
+        'records+to_json': {
+            'unmarshal': lambda: [Transaction.from_item(item) for item in items],
+            'encode': lambda: encode_records(records),
+            'page': lambda: encode_records(Transaction.from_item(item) for item in items)
+        }
+    }
+
+    results = {}
+    print(f'rows={rows} repeat={repeat}')
+    print(f"{'path':<18} {'unmarshal µs':>13} {'encode µs':>10} {'page µs':>8} {'bytes/row':>10}")
+    for name, stages in paths.items():
+        result = {stage: time_per_row(function, rows, repeat) for stage, function in stages.items()}
+        result['bytesPerRow'] = bytes_per_row(stages['unmarshal'], rows)
+        results[name] = result
+        print(f"{name:<18} {result['unmarshal']:>13.2f} {result['encode']:>10.2f} "
+              f"{result['page']:>8.2f} {result['bytesPerRow']:>10.0f}")
+    return results
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--rows', type=int, default=1000, help='Filas por página')
+    parser.add_argument('--repeat', type=int, default=50, help='Repeticiones por etapa')
+    parser.add_argument('--seed', type=int, default=0, help='Semilla de los montos generados')
+    args = parser.parse_args()
+    random.seed(args.seed)
+    run(args.rows, args.repeat)
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,129 @@
+"""
+Benchmark: latencia del registro (post_confirmation) y aprovisionamiento asíncrono.
+
+Compara el registro con las cuentas creadas en línea (perfil + seed_customer
+dentro del trigger, como antes) contra el trigger actual (perfil + un mensaje
+a la cola). Después vacía la cola con el worker provision_accounts, con
+reentregas duplicadas y UnprocessedItems simulados, y verifica que cada
+usuario termina con exactamente sus cuentas y su libro mayor.
+
+Uso:
+    python infra/benchmarks/bench_signup.py --users 200 --latency-ms 5
+    python infra/benchmarks/bench_signup.py --duplicate-rate 0.3 --unprocessed-rate 0.2
+"""
+import argparse
+import os
+import time
+import uuid
+from contextlib import redirect_stdout
+from datetime import datetime
+
+from harness import (
+    ACCOUNTS_TABLE, PROVISIONING_QUEUE_URL, TRANSACTIONS_TABLE, USERS_TABLE, SerializedClient,
+    create_tables, dynamo, load_handler, percentile
+)
+from banca_common import sqs
+from banca_common.items import user_item
+from banca_common.seeding import ACCOUNT_TEMPLATES, TRANSACTION_TEMPLATES, seed_customer
+from local_dynamodb import LocalDynamoDB
+from local_sqs import LocalSQS
+
+
+def cognito_event(user_id: str) -> dict:
+    return {'triggerSource': 'PostConfirmation_ConfirmSignUp', 'request': {'userAttributes': {
+        'sub': user_id, 'email': f'{user_id}@example.com', 'given_name': 'Bench', 'family_name': 'User'
+    }}}
+
+
+def inline_signup(user_id: str) -> None:
+    """El trigger anterior: perfil y cuentas de ejemplo antes de responder a Cognito"""
+    email = f'{user_id}@example.com'
+    dynamo.dynamodb.put_item(TableName=USERS_TABLE, Item=user_item(
+        user_id, email, 'Bench', 'User', 'bench', datetime.utcnow().isoformat()))
+    seed_customer(user_id, email, ACCOUNTS_TABLE, TRANSACTIONS_TABLE)
+
+
+def measure(name: str, signup, users: int, db: LocalDynamoDB, queue: LocalSQS) -> None:
+    db.reset_stats()
+    queue.calls.clear()
+    latencies = []
+    with open(os.devnull, 'w') as devnull, redirect_stdout(devnull):
+        for _ in range(users):
+            user_id = str(uuid.uuid4())
+            start = time.perf_counter()
+            signup(user_id)
+            latencies.append((time.perf_counter() - start) * 1000)
+    latencies.sort()
+    calls = sum(db.calls.values()) + sum(queue.calls.values())
+    print(f'{name:<10} {percentile(latencies, 0.50):>8.2f} {percentile(latencies, 0.95):>8.2f} '
+          f'{calls / users:>10.2f}')
+
+
+def verify(db: LocalDynamoDB) -> int:
+    """Contar usuarios cuyo aprovisionamiento no quedó exacto"""
+    accounts = db.tables[ACCOUNTS_TABLE].items.values()
+    transactions = db.tables[TRANSACTIONS_TABLE].items.values()
+    per_customer = {}
+    for account in accounts:
+        per_customer.setdefault(account['customerId']['S'], []).append(account['accountId']['S'])
+    rows_per_account = {}
+    for row in transactions:
+        rows_per_account[row['accountId']['S']] = rows_per_account.get(row['accountId']['S'], 0) + 1
+
+    expected_accounts = len(ACCOUNT_TEMPLATES)
+    broken = 0
+    for user in db.tables[USERS_TABLE].items.values():
+        if user.get('provisioningStatus', {}).get('S') != 'COMPLETED':
+            broken += 1
+            continue
+        account_ids = per_customer.get(user['id']['S'], [])
+        accounts_by_type = {account['accountId']['S']: account['accountType']['S'] for account in accounts
+                            if account['accountId']['S'] in account_ids}
+        if len(account_ids) != expected_accounts or any(
+                rows_per_account.get(account_id, 0) != len(TRANSACTION_TEMPLATES[account_type])
+                for account_id, account_type in accounts_by_type.items()):
+            broken += 1
+    return broken
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--users', type=int, default=200, help='Registros simulados por modo')
+    parser.add_argument('--latency-ms', type=float, default=2.0, help='Latencia simulada por llamada a AWS')
+    parser.add_argument('--duplicate-rate', type=float, default=0.2, help='Fracción de mensajes reentregados')
+    parser.add_argument('--unprocessed-rate', type=float, default=0.1,
+                        help='Fracción de UnprocessedItems en batch_write_item')
+    args = parser.parse_args()
+
+    db = LocalDynamoDB(unprocessed_rate=args.unprocessed_rate)
+    create_tables(db)
+    queue = LocalSQS(duplicate_rate=args.duplicate_rate)
+    queue.create_queue(QueueName=PROVISIONING_QUEUE_URL.rsplit('/', 1)[1])
+
+    post_confirmation = load_handler('post_confirmation').lambda_handler
+    worker = load_handler('provision_accounts').lambda_handler
+    dynamo.set_client(SerializedClient(db, args.latency_ms))
+    sqs.set_client(SerializedClient(queue, args.latency_ms))
+
+    print(f'users={args.users} latency_ms={args.latency_ms}')
+    print(f"{'signup':<10} {'p50 ms':>8} {'p95 ms':>8} {'calls/user':>10}")
+    measure('inline', inline_signup, args.users, db, queue)
+    # El modo en línea no deja usuarios pendientes; solo se verifican los del trigger actual
+    for table in (ACCOUNTS_TABLE, TRANSACTIONS_TABLE, USERS_TABLE):
+        db.tables[table].items.clear()
+        db.tables[table].partitions.clear()
+        for index in db.tables[table].index_data.values():
+            index.clear()
+    measure('queued', lambda user_id: post_confirmation(cognito_event(user_id), None), args.users, db, queue)
+
+    db.reset_stats()
+    started = time.perf_counter()
+    with open(os.devnull, 'w') as devnull, redirect_stdout(devnull):
+        stats = queue.drain(PROVISIONING_QUEUE_URL, worker)
+    elapsed = time.perf_counter() - started
+    print(f'worker: {stats} in {elapsed:.2f}s, {sum(db.calls.values()) / args.users:.2f} calls/user')
+    print(f'users with missing or duplicated rows: {verify(db)}')
+
+
+if __name__ == '__main__':
+    main()
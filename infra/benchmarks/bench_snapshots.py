@@ -0,0 +1,137 @@
+"""
+Benchmark: dashboard desde el snapshot por cliente (project_snapshots) contra el fan-out.
+
+Siembra clientes con los streams locales activos (Accounts, Transactions,
+BalanceShards y DailyLimits), reparte en shards el saldo de una cuenta de uno
+de cada --sharded-every clientes (esos leen siempre con el fan-out), ejecuta
+transferencias y entrega los streams al worker con reentregas y, con
+--shuffle, en cualquier orden. Verifica que el dashboard armado desde el
+snapshot coincide con el del fan-out y compara p50, llamadas a DynamoDB y RCU
+por request de los dos caminos, además de las escrituras del worker.
+
+Uso:
+    python infra/benchmarks/bench_snapshots.py --customers 50 --transfers 1000 --duplicate-rate 0.2 --shuffle
+"""
+import argparse
+import json
+import os
+import random
+import uuid
+from contextlib import redirect_stdout
+
+from harness import (
+    ACCOUNTS_TABLE, BALANCE_SHARDS_TABLE, DAILY_LIMITS_TABLE, SNAPSHOTS_TABLE, TRANSACTIONS_TABLE, api_event,
+    create_tables, drive, dynamo, load_handler, seed, shard_account
+)
+from local_dynamodb import LocalDynamoDB
+from local_streams import LocalStreams
+
+
+def load_dashboard(snapshots: bool):
+    """get_dashboard con o sin la tabla de snapshots configurada"""
+    if snapshots:
+        os.environ['SNAPSHOTS_TABLE_NAME'] = SNAPSHOTS_TABLE
+    else:
+        os.environ.pop('SNAPSHOTS_TABLE_NAME', None)
+    return load_handler('get_dashboard').lambda_handler
+
+
+def dashboard_body(handler, customer_id):
+    with open(os.devnull, 'w') as devnull, redirect_stdout(devnull):
+        body = json.loads(handler(api_event(customer_id), None)['body'])
+    body.pop('correlationId')
+    # Dos filas de una transferencia comparten timestamp: el desempate entre
+    # cuentas puede diferir, así que de los movimientos se comparan los timestamps
+    body['recentTransactions'] = [row['timestamp'] for row in body['recentTransactions']]
+    body['accounts'].sort(key=lambda account: account['accountId'])
+    return body
+
+
+def target_balance(body, account_id):
+    return next(account['balance'] for account in body['accounts'] if account['accountId'] == account_id)
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--customers', type=int, default=50, help='Clientes sembrados')
+    parser.add_argument('--accounts', type=int, default=3, help='Cuentas por cliente')
+    parser.add_argument('--transactions', type=int, default=60, help='Transacciones sembradas por cuenta')
+    parser.add_argument('--transfers', type=int, default=1000, help='Transferencias antes de leer')
+    parser.add_argument('--shards', type=int, default=4, help='Shards de saldo de la primera cuenta repartida')
+    parser.add_argument('--sharded-every', type=int, default=10, help='Uno de cada N clientes con una cuenta repartida')
+    parser.add_argument('--duplicate-rate', type=float, default=0.2, help='Fracción de lotes reentregados')
+    parser.add_argument('--shuffle', action='store_true', help='Entregar los registros de cada shard desordenados')
+    parser.add_argument('--batch-size', type=int, default=100, help='Registros por invocación del worker')
+    parser.add_argument('--requests', type=int, default=1000, help='Lecturas del dashboard por camino')
+    parser.add_argument('--latency-ms', type=float, default=0.0, help='Latencia simulada por llamada a DynamoDB')
+    parser.add_argument('--seed', type=int, default=0, help='Semilla de los datos')
+    args = parser.parse_args()
+    random.seed(args.seed)
+
+    db = LocalDynamoDB()
+    create_tables(db)
+    streams = LocalStreams(db, [ACCOUNTS_TABLE, TRANSACTIONS_TABLE, BALANCE_SHARDS_TABLE, DAILY_LIMITS_TABLE],
+                           duplicate_rate=args.duplicate_rate, shuffle=args.shuffle, seed=args.seed)
+    customers = seed(db, args.customers, args.accounts, args.transactions)
+    for account_ids in list(customers.values())[::args.sharded_every]:
+        shard_account(db, account_ids[0], args.shards)
+
+    events = []
+    for _ in range(args.transfers):
+        customer_id = random.choice(list(customers))
+        source_id, target_id = random.sample(customers[customer_id], 2)
+        events.append(api_event(customer_id, 'POST', body={
+            'sourceAccountId': source_id, 'targetAccountId': target_id,
+            'amount': round(random.uniform(1, 20), 2), 'idempotencyKey': str(uuid.uuid4())
+        }))
+    transfers = drive(load_handler('post_transfer').lambda_handler, events, db, concurrency=4)
+
+    os.environ['SNAPSHOTS_TABLE_NAME'] = SNAPSHOTS_TABLE
+    worker = load_handler('project_snapshots').lambda_handler
+    records = streams.pending()
+    dynamo.set_client(db)
+    db.reset_stats()
+    with open(os.devnull, 'w') as devnull, redirect_stdout(devnull):
+        delivery = streams.drain(worker, batch_size=args.batch_size)
+    sizes = [len(item['document']['S']) for item in db.tables[SNAPSHOTS_TABLE].items.values()
+             if item['part']['S'] == 'SNAPSHOT']
+    print(f"transfers {transfers['statuses']}  stream records {records}  delivery {delivery}")
+    print(f"worker: calls {dict(db.calls)}  WCU/record {sum(db.write_capacity.values()) / records:.2f}  "
+          f"snapshot bytes p50 {sorted(sizes)[len(sizes) // 2]} max {max(sizes)}")
+
+    snapshot_dashboard, fanout_dashboard = load_dashboard(True), load_dashboard(False)
+    for customer_id in customers:
+        expected = dashboard_body(fanout_dashboard, customer_id)
+        actual = dashboard_body(snapshot_dashboard, customer_id)
+        assert actual == expected, f'snapshot differs for {customer_id}:\n{actual}\n{expected}'
+
+    print(f"{'path':<10} {'p50 ms':>8} {'p95 ms':>8} {'calls':>6} {'RCU':>6}")
+    reads = [api_event(random.choice(list(customers))) for _ in range(args.requests)]
+    for name, handler in (('fan-out', fanout_dashboard), ('snapshot', snapshot_dashboard)):
+        result = drive(handler, reads, db, latency_ms=args.latency_ms)
+        print(f"{name:<10} {result['p50']:>8.2f} {result['p95']:>8.2f} {result['callsPerRequest']:>6.1f} "
+              f"{result['readCapacityPerRequest']:>6.1f}")
+
+    # Transferencias sin entregar el stream: el snapshot queda atrasado y el
+    # dashboard vuelve al fan-out en lugar de mostrar saldos viejos. El crédito
+    # a una cuenta repartida no toca el item de Users: ese cliente lee siempre
+    # con el fan-out, que ya suma el shard
+    post_transfer = load_handler('post_transfer').lambda_handler
+    sharded_customers = set(list(customers)[::args.sharded_every])
+    for customer_id in (next(c for c in customers if c not in sharded_customers), next(iter(sharded_customers))):
+        source_id, target_id = customers[customer_id][1], customers[customer_id][0]
+        before = target_balance(dashboard_body(snapshot_dashboard, customer_id), target_id)
+        dynamo.set_client(db)
+        with open(os.devnull, 'w') as devnull, redirect_stdout(devnull):
+            post_transfer(api_event(customer_id, 'POST', body={
+                'sourceAccountId': source_id, 'targetAccountId': target_id,
+                'amount': 1, 'idempotencyKey': str(uuid.uuid4())
+            }), None)
+        actual = dashboard_body(snapshot_dashboard, customer_id)
+        assert actual == dashboard_body(fanout_dashboard, customer_id)
+        assert target_balance(actual, target_id) == before + 1, f'credit to {target_id} not visible'
+    print('stale snapshot falls back to the fan-out: ok')
+
+
+if __name__ == '__main__':
+    main()
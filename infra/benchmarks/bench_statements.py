@@ -0,0 +1,198 @@
+"""
+Benchmark: estados de cuenta mensuales (src/jobs/monthly_statements) sobre un pool de procesos.
+
+Siembra clientes con varios meses de movimientos, reparte en shards el saldo
+de algunas cuentas, ejecuta transferencias y archiva en el stand-in de S3 los
+meses viejos. Genera los estados de los últimos --months meses y verifica que
+el saldo final de cada mes es el inicial del siguiente, que el del mes en
+curso es el saldo de la cuenta (item más shards), que el saldo corrido del
+CSV y las páginas cierran con el final y que el resultado no depende de la
+cantidad de workers. Con una cuenta de --heavy-rows movimientos en un mes
+compara la memoria pico de su estado con la de una cuenta normal.
+
+Uso:
+    python infra/benchmarks/bench_statements.py --customers 200 --months 6 --workers 4 --heavy-rows 20000
+"""
+import argparse
+import csv
+import hashlib
+import json
+import os
+import random
+import tempfile
+import tracemalloc
+import uuid
+from collections import defaultdict
+from datetime import date, datetime, timedelta
+
+from harness import (
+    ACCOUNTS_TABLE, BALANCE_SHARDS_TABLE, TRANSACTIONS_TABLE, api_event, create_tables, drive, dynamo,
+    load_handler, load_job, seed, shard_account
+)
+from banca_common import archive
+from banca_common.items import account_item, balance_shard_account_id, summary_item, transaction_item
+from banca_common.records import format_minor, to_minor_units
+from local_dynamodb import LocalDynamoDB
+from local_s3 import LocalS3
+
+ARCHIVE_BUCKET = 'bench-archive'
+
+
+def periods(months: int):
+    month = date.today().replace(day=1)
+    result = []
+    for _ in range(months):
+        result.append(month.strftime('%Y-%m'))
+        month = (month - timedelta(days=1)).replace(day=1)
+    return result[::-1]
+
+
+def add_heavy_account(db: LocalDynamoDB, period: str, rows: int) -> str:
+    """Cuenta con `rows` movimientos en un mes, con sus DAY# y openingBalance"""
+    account_id, customer_id = str(uuid.uuid4()), str(uuid.uuid4())
+    start = datetime.strptime(period, '%Y-%m')
+    days = defaultdict(lambda: [0, 0, 0])
+    items = []
+    for position in range(rows):
+        timestamp = start + timedelta(seconds=position * (27 * 86400 // rows))
+        amount = '10.00' if position % 3 else '-7.25'
+        items.append(transaction_item(account_id, timestamp.isoformat(), 'CREDIT' if position % 3 else 'DEBIT',
+                                      float(amount), 'Bench', 'heavy'))
+        totals = days[timestamp.date().isoformat()]
+        totals[0] += 1
+        totals[1 if amount.startswith('-') else 2] += to_minor_units(amount)
+    now = datetime.utcnow().isoformat()
+    items += [summary_item(account_id, f'DAY#{day}', count, format_minor(debits), format_minor(credits), now)
+              for day, (count, debits, credits) in days.items()]
+    db.load_items(TRANSACTIONS_TABLE, items)
+    net = sum(debits + credits for _, debits, credits in days.values())
+    db.load_items(ACCOUNTS_TABLE, [account_item(account_id, customer_id, 'heavy@example.com', 'CHECKING', 'Heavy',
+                                                format_minor(100000 + net), now, opening_balance=1000.0)])
+    return account_id
+
+
+def current_balances(db: LocalDynamoDB):
+    balances = {key[0][1]: to_minor_units(item['balance']['N']) for key, item in db.tables[ACCOUNTS_TABLE].items.items()}
+    for item in db.tables[BALANCE_SHARDS_TABLE].items.values():
+        balances[balance_shard_account_id(item)] += to_minor_units(item['balance']['N'])
+    return balances
+
+
+def read_index(output_dir: str, summary):
+    entries = {}
+    for name in summary['indexes']:
+        with open(os.path.join(output_dir, name)) as handle:
+            for line in handle:
+                entry = json.loads(line)
+                entries[entry['accountId']] = entry
+    return entries
+
+
+def check_files(output_dir: str, entry) -> None:
+    """Saldo corrido del CSV y cadena de saldos de las páginas contra el cierre"""
+    base = os.path.join(output_dir, entry['period'], entry['customerId'], entry['accountId'])
+    with open(f'{base}.csv', newline='') as handle:
+        rows = list(csv.DictReader(handle))
+    closing = to_minor_units(str(entry['closingBalance']))
+    assert len(rows) == entry['transactionCount']
+    assert to_minor_units(rows[-1]['balance'] if rows else str(entry['openingBalance'])) == closing
+    with open(f'{base}.pages.ndjson') as handle:
+        records = [json.loads(line) for line in handle]
+    brought = records[0]['openingBalance']
+    for page in records[1:-1]:
+        assert page['broughtForward'] == brought
+        brought = page['carriedForward']
+    assert brought == entry['closingBalance'] and records[-1]['closingBalance'] == entry['closingBalance']
+
+
+def digest(output_dir: str) -> str:
+    checksum = hashlib.sha256()
+    for directory, _, names in sorted(os.walk(output_dir)):
+        for name in sorted(names):
+            if name != 'summary.json':
+                with open(os.path.join(directory, name), 'rb') as handle:
+                    checksum.update(name.encode() + handle.read())
+    return checksum.hexdigest()
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--customers', type=int, default=200, help='Clientes sembrados')
+    parser.add_argument('--accounts', type=int, default=2, help='Cuentas por cliente')
+    parser.add_argument('--transactions', type=int, default=60, help='Transacciones sembradas por cuenta')
+    parser.add_argument('--transfers', type=int, default=500, help='Transferencias del mes en curso')
+    parser.add_argument('--months', type=int, default=6, help='Meses generados (hasta el actual)')
+    parser.add_argument('--after-days', type=int, default=90, help='Antigüedad de las filas archivadas')
+    parser.add_argument('--segments', type=int, default=16, help='TotalSegments del scan de Accounts')
+    parser.add_argument('--workers', type=int, default=4, help='Procesos del pool')
+    parser.add_argument('--heavy-rows', type=int, default=20000, help='Movimientos de la cuenta grande en un mes')
+    parser.add_argument('--seed', type=int, default=0, help='Semilla de los datos')
+    args = parser.parse_args()
+    random.seed(args.seed)
+
+    db = LocalDynamoDB()
+    create_tables(db)
+    customers = seed(db, args.customers, args.accounts, args.transactions)
+    for account_ids in list(customers.values())[::10]:
+        shard_account(db, account_ids[0], 4)
+    events = []
+    for _ in range(args.transfers):
+        customer_id = random.choice(list(customers))
+        source_id, target_id = random.sample(customers[customer_id], 2)
+        events.append(api_event(customer_id, 'POST', body={
+            'sourceAccountId': source_id, 'targetAccountId': target_id,
+            'amount': round(random.uniform(1, 20), 2), 'idempotencyKey': str(uuid.uuid4())
+        }))
+    drive(load_handler('post_transfer').lambda_handler, events, db, concurrency=4)
+    months = periods(args.months)
+    heavy_id = add_heavy_account(db, months[-2], args.heavy_rows)
+
+    # Los meses viejos pasan al archivo: sus estados se leen de S3
+    s3 = LocalS3(tempfile.mkdtemp(prefix='bench-statements-'))
+    archive.set_client(s3)
+    os.environ['ARCHIVE_BUCKET_NAME'] = ARCHIVE_BUCKET
+    dynamo.set_client(db)
+    archived = load_job('archive_transactions').archive_transactions(8, 1, args.after_days)
+    print(f"archived rows {archived['rows']} before {archived['archivedBefore']}  "
+          f"ledger items {len(db.tables[TRANSACTIONS_TABLE].items)}")
+
+    job = load_job('monthly_statements')
+    results = {}
+    print(f"{'period':<8} {'accounts':>8} {'statements':>10} {'rows':>7} {'seconds':>8} {'rows/s':>8}")
+    for period in months:
+        output_dir = tempfile.mkdtemp(prefix=f'statements-{period}-')
+        summary = job.generate_statements(period, args.segments, args.workers, output_dir)
+        assert summary['mismatch'] == 0 and summary['unbaselined'] == 0, summary
+        print(f"{period:<8} {summary['accounts']:>8} {summary['statements']:>10} {summary['rows']:>7} "
+              f"{summary['seconds']:>8.2f} {summary['rows'] / summary['seconds']:>8.0f}")
+        results[period] = (output_dir, read_index(output_dir, summary))
+
+    for previous, following in zip(months, months[1:]):
+        for account_id, entry in results[previous][1].items():
+            assert results[following][1][account_id]['openingBalance'] == entry['closingBalance'], account_id
+    balances = current_balances(db)
+    for account_id, entry in results[months[-1]][1].items():
+        assert to_minor_units(str(entry['closingBalance'])) == balances[account_id], account_id
+    for output_dir, entries in results.values():
+        for entry in entries.values():
+            check_files(output_dir, entry)
+    print('closing = next opening, current month = account balance, running balances: ok')
+
+    output_dir = tempfile.mkdtemp(prefix='statements-serial-')
+    job.generate_statements(months[-2], args.segments, 1, output_dir)
+    assert digest(output_dir) == digest(results[months[-2]][0])
+    print(f'1 worker and {args.workers} workers produce identical files: ok')
+
+    # Memoria pico de un estado: una página de filas y una de documento, no el mes
+    accounts = {key[0][1]: item for key, item in db.tables[ACCOUNTS_TABLE].items.items()}
+    normal_id = next(iter(results[months[-2]][1]))
+    for label, account_id in (('normal', normal_id), ('heavy', heavy_id)):
+        tracemalloc.start()
+        entry, _ = job.account_statement(accounts[account_id], months[-2], tempfile.mkdtemp(), list(job.FORMATS))
+        peak = tracemalloc.get_traced_memory()[1]
+        tracemalloc.stop()
+        print(f"{label:<7} account: {entry['transactionCount']:>6} rows  peak {peak / 1024:>8.0f} KB")
+
+
+if __name__ == '__main__':
+    main()
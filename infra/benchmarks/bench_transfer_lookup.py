@@ -0,0 +1,89 @@
+"""
+Benchmark: latencia de post_transfer según el tamaño de la tabla Accounts.
+
+Carga N cuentas en el stand-in local de DynamoDB y ejecuta transferencias
+entre dos cuentas del mismo cliente. Con la lectura por clave primaria la
+latencia debe mantenerse plana de 1k a 1M cuentas.
+
+Uso:
+    python infra/benchmarks/bench_transfer_lookup.py --sizes 1000,10000,100000,1000000
+"""
+import argparse
+import time
+import uuid
+
+from harness import ACCOUNTS_TABLE, api_event, create_tables, drive, load_handler
+from local_dynamodb import LocalDynamoDB
+
+
+def load_post_transfer():
+    return load_handler('post_transfer')
+
+
+def build_database(total_accounts: int, customer_id: str, source_id: str, target_id: str) -> LocalDynamoDB:
+    db = LocalDynamoDB()
+    create_tables(db)
+
+    # Cuentas de relleno con atributos compartidos para acotar memoria
+    filler_balance = {'N': '1000'}
+    filler_customer = {'S': 'filler-customer'}
+    db.load_items(ACCOUNTS_TABLE, (
+        {'accountId': {'S': f'filler-{i:08d}'}, 'customerId': filler_customer, 'balance': filler_balance}
+        for i in range(max(0, total_accounts - 2))
+    ))
+
+    now = time.strftime('%Y-%m-%dT%H:%M:%S')
+    for account_id in (source_id, target_id):
+        db.load_items(ACCOUNTS_TABLE, [{
+            'accountId': {'S': account_id},
+            'customerId': {'S': customer_id},
+            'balance': {'N': '1000000'},
+            'currency': {'S': 'USD'},
+            'accountType': {'S': 'CHECKING'},
+            'dailyTransferUsed': {'N': '0'},
+            'dailyTransferLimit': {'N': '1000000000'},
+            'status': {'S': 'ACTIVE'},
+            'createdAt': {'S': now},
+            'updatedAt': {'S': now}
+        }])
+    return db
+
+
+def transfer_event(customer_id: str, source_id: str, target_id: str) -> dict:
+    return api_event(customer_id, 'POST', body={
+        'sourceAccountId': source_id,
+        'targetAccountId': target_id,
+        'amount': 1,
+        'idempotencyKey': str(uuid.uuid4())
+    })
+
+
+def run(sizes, iterations: int) -> None:
+    module = load_post_transfer()
+    customer_id = str(uuid.uuid4())
+    source_id, target_id = str(uuid.uuid4()), str(uuid.uuid4())
+
+    print(f"{'accounts':>10} {'p50 ms':>9} {'p95 ms':>9} {'p99 ms':>9} {'calls/req':>10}")
+    for size in sizes:
+        db = build_database(size, customer_id, source_id, target_id)
+        events = [transfer_event(customer_id, source_id, target_id) for _ in range(iterations)]
+        result = drive(module.lambda_handler, events, db)
+        if result['statuses'] != {200: iterations}:
+            raise RuntimeError(f"Transfers failed: {result['statuses']}")
+
+        print(f"{size:>10} {result['p50']:>9.3f} {result['p95']:>9.3f} "
+              f"{result['p99']:>9.3f} {result['callsPerRequest']:>10.1f}")
+        del db
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--sizes', default='1000,10000,100000,1000000',
+                        help='Cantidades de cuentas separadas por coma')
+    parser.add_argument('--iterations', type=int, default=500, help='Transferencias por tamaño')
+    args = parser.parse_args()
+    run([int(size) for size in args.sizes.split(',')], args.iterations)
+
+
+if __name__ == '__main__':
+    main()
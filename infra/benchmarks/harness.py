@@ -0,0 +1,226 @@
+"""
+Utilidades compartidas por los benchmarks locales.
+
+Carga los handlers y los jobs de src/jobs con el layer común en el path,
+crea las tablas en el stand-in en memoria, siembra datos con el mismo código
+de seed_data, reparte saldos con el job shard_account y arma eventos con la forma de API Gateway (claims del
+authorizer de Cognito incluidos). `drive` ejecuta un handler con N hilos
+concurrentes y devuelve latencias, códigos de estado y las llamadas/capacidad
+consumidas en DynamoDB; `phase_breakdown` agrega las líneas EMF de
+banca_common.metrics por fase.
+"""
+import importlib.util
+import io
+import json
+import os
+import sys
+import threading
+import time
+import uuid
+from collections import Counter
+from concurrent.futures import ThreadPoolExecutor
+from contextlib import redirect_stdout
+from typing import Any, Callable, Dict, List, Optional
+
+BENCHMARKS_DIR = os.path.dirname(os.path.abspath(__file__))
+LAMBDAS_DIR = os.path.join(BENCHMARKS_DIR, '..', 'src', 'lambdas')
+JOBS_DIR = os.path.join(BENCHMARKS_DIR, '..', 'src', 'jobs')
+LAYER_DIR = os.path.join(BENCHMARKS_DIR, '..', 'src', 'layers', 'common', 'python')
+
+sys.path.insert(0, BENCHMARKS_DIR)
+sys.path.insert(0, LAYER_DIR)
+
+from banca_common import dynamo  # noqa: E402
+from banca_common.items import user_item  # noqa: E402
+from banca_common.seeding import seed_customer  # noqa: E402
+from local_dynamodb import LocalDynamoDB  # noqa: E402
+
+ACCOUNTS_TABLE = 'bench-accounts'
+TRANSACTIONS_TABLE = 'bench-transactions'
+IDEMPOTENCY_TABLE = 'bench-idempotency'
+BALANCE_SHARDS_TABLE = 'bench-balance-shards'
+DAILY_LIMITS_TABLE = 'bench-daily-limits'
+USERS_TABLE = 'bench-users'
+SNAPSHOTS_TABLE = 'bench-snapshots'
+PROVISIONING_QUEUE_URL = 'https://sqs.local/000000000000/bench-provisioning'
+
+HANDLER_ENV = {
+    'AWS_DEFAULT_REGION': 'us-east-1',
+    'ACCOUNTS_TABLE_NAME': ACCOUNTS_TABLE,
+    'TRANSACTIONS_TABLE_NAME': TRANSACTIONS_TABLE,
+    'IDEMPOTENCY_TABLE_NAME': IDEMPOTENCY_TABLE,
+    'BALANCE_SHARDS_TABLE_NAME': BALANCE_SHARDS_TABLE,
+    'DAILY_LIMITS_TABLE_NAME': DAILY_LIMITS_TABLE,
+    'USERS_TABLE_NAME': USERS_TABLE,
+    'PROVISIONING_QUEUE_URL': PROVISIONING_QUEUE_URL,
+    'CURSOR_SIGNING_KEY': 'bench-cursor-key'
+}
+
+
+def load_handler(name: str) -> Any:
+    """Importar src/lambdas/<name>/index.py como módulo independiente"""
+    os.environ.update(HANDLER_ENV)
+    path = os.path.join(LAMBDAS_DIR, name, 'index.py')
+    spec = importlib.util.spec_from_file_location(f'{name}_index', path)
+    module = importlib.util.module_from_spec(spec)
+    spec.loader.exec_module(module)
+    return module
+
+
+def load_job(name: str) -> Any:
+    """Importar src/jobs/<name>/main.py; queda en sys.modules para que el pool de procesos lo encuentre"""
+    os.environ.update(HANDLER_ENV)
+    path = os.path.join(JOBS_DIR, name, 'main.py')
+    spec = importlib.util.spec_from_file_location(f'{name}_main', path)
+    module = importlib.util.module_from_spec(spec)
+    sys.modules[spec.name] = module
+    spec.loader.exec_module(module)
+    return module
+
+
+def create_tables(db: LocalDynamoDB) -> None:
+    """
+    Crear Accounts (con CustomerIdIndex/AccountIdIndex), Transactions (con sus
+    GSIs), Users, Idempotency, BalanceShards, DailyLimits y Snapshots
+    """
+    db.create_table(ACCOUNTS_TABLE, 'accountId', 'customerId',
+                    indexes={'CustomerIdIndex': ('customerId', None),
+                             'AccountIdIndex': ('accountId', None),
+                             'ShardedBalanceIndex': ('shardGroup', None)})
+    db.create_table(TRANSACTIONS_TABLE, 'accountId', 'timestamp',
+                    indexes={'TransferIdIndex': ('transferId', None),
+                             'AccountTypeIndex': ('typeKey', 'timestamp'),
+                             'AccountStatusIndex': ('statusKey', 'timestamp')})
+    db.create_table(IDEMPOTENCY_TABLE, 'operationId')
+    db.create_table(BALANCE_SHARDS_TABLE, 'shardId')
+    db.create_table(DAILY_LIMITS_TABLE, 'accountId', 'day')
+    db.create_table(USERS_TABLE, 'id')
+    db.create_table(SNAPSHOTS_TABLE, 'customerId', 'part')
+
+
+def seed(db: LocalDynamoDB, customers: int, accounts_per_customer: int,
+         transactions_per_account: Optional[int]) -> Dict[str, List[str]]:
+    """Sembrar clientes con seed_customer; retorna customerId -> accountIds"""
+    dynamo.set_client(db)
+    now = time.strftime('%Y-%m-%dT%H:%M:%S')
+    seeded = {}
+    for _ in range(customers):
+        customer_id = str(uuid.uuid4())
+        email = f'{customer_id}@example.com'
+        db.load_items(USERS_TABLE, [user_item(customer_id, email, 'Bench', 'User', 'bench', now)])
+        result = seed_customer(customer_id, email, ACCOUNTS_TABLE, TRANSACTIONS_TABLE,
+                               accounts_per_customer, transactions_per_account)
+        seeded[customer_id] = result['accountIds']
+    db.reset_stats()
+    return seeded
+
+
+def shard_account(db: LocalDynamoDB, account_id: str, shards: int) -> None:
+    """Repartir el saldo de una cuenta con el job shard_account (marca también al cliente en Users)"""
+    dynamo.set_client(db)
+    with open(os.devnull, 'w') as devnull, redirect_stdout(devnull):
+        load_job('shard_account').shard_account(account_id, shards)
+    db.reset_stats()
+
+
+def api_event(customer_id: str, method: str = 'GET', path_parameters: Optional[Dict[str, str]] = None,
+              query: Optional[Dict[str, str]] = None, body: Optional[Dict[str, Any]] = None,
+              headers: Optional[Dict[str, str]] = None) -> Dict[str, Any]:
+    """Evento de API Gateway (proxy REST) autenticado con el authorizer de Cognito"""
+    return {
+        'httpMethod': method,
+        'headers': headers or {},
+        'pathParameters': path_parameters,
+        'queryStringParameters': query,
+        'body': json.dumps(body) if body is not None else None,
+        'requestContext': {
+            'requestId': str(uuid.uuid4()),
+            'authorizer': {'claims': {'sub': customer_id}}
+        }
+    }
+
+
+class SerializedClient:
+    """Proxy del stand-in para hilos concurrentes: serializa cada llamada y simula latencia de red"""
+
+    def __init__(self, db: LocalDynamoDB, latency_ms: float = 0.0):
+        self._db = db
+        self._latency = latency_ms / 1000
+        self._lock = threading.Lock()
+
+    def __getattr__(self, name: str) -> Callable[..., Any]:
+        method = getattr(self._db, name)
+
+        def call(**kwargs):
+            if self._latency:
+                time.sleep(self._latency)
+            with self._lock:
+                return method(**kwargs)
+        return call
+
+
+def percentile(sorted_values: List[float], fraction: float) -> float:
+    return sorted_values[max(0, int(len(sorted_values) * fraction) - 1)]
+
+
+def drive(handler: Callable[[Dict[str, Any], Any], Dict[str, Any]], events: List[Dict[str, Any]],
+          db: LocalDynamoDB, concurrency: int = 1, latency_ms: float = 0.0) -> Dict[str, Any]:
+    """Ejecutar los eventos con `concurrency` hilos y resumir latencias y uso de DynamoDB"""
+    dynamo.set_client(SerializedClient(db, latency_ms))
+    db.reset_stats()
+    statuses: Counter = Counter()
+
+    def invoke(event):
+        start = time.perf_counter()
+        response = handler(event, None)
+        elapsed = (time.perf_counter() - start) * 1000
+        statuses[response['statusCode']] += 1
+        return elapsed
+
+    # Los handlers registran cada request con print; se descarta durante la medición
+    with open(os.devnull, 'w') as devnull, redirect_stdout(devnull):
+        started = time.perf_counter()
+        with ThreadPoolExecutor(max_workers=concurrency) as pool:
+            latencies = sorted(pool.map(invoke, events))
+        wall_seconds = time.perf_counter() - started
+
+    requests = len(events)
+    return {
+        'requests': requests,
+        'throughput': requests / wall_seconds,
+        'p50': percentile(latencies, 0.50),
+        'p95': percentile(latencies, 0.95),
+        'p99': percentile(latencies, 0.99),
+        'callsPerRequest': sum(db.calls.values()) / requests,
+        'calls': dict(db.calls),
+        'readCapacityPerRequest': sum(db.read_capacity.values()) / requests,
+        'writeCapacityPerRequest': sum(db.write_capacity.values()) / requests,
+        'statuses': dict(statuses)
+    }
+
+
+def phase_breakdown(handler: Callable[[Dict[str, Any], Any], Dict[str, Any]], events: List[Dict[str, Any]],
+                    db: LocalDynamoDB, latency_ms: float = 0.0) -> Dict[str, Dict[str, float]]:
+    """Ejecutar los eventos en serie y promediar las métricas EMF por invocación emitida"""
+    # En serie: la invocación en curso es global al contenedor, como en Lambda
+    dynamo.set_client(SerializedClient(db, latency_ms))
+    output = io.StringIO()
+    with redirect_stdout(output):
+        for event in events:
+            handler(event, None)
+
+    totals: Dict[str, Dict[str, float]] = {}
+    documents = 0
+    for line in output.getvalue().splitlines():
+        if not line.startswith('{') or '"_aws"' not in line:
+            continue
+        document = json.loads(line)
+        documents += 1
+        for metric in document['_aws']['CloudWatchMetrics'][0]['Metrics']:
+            entry = totals.setdefault(metric['Name'], {'unit': metric['Unit'], 'mean': 0.0, 'callsPerRequest': 0.0})
+            entry['mean'] += document[metric['Name']]
+            entry['callsPerRequest'] += document.get(f"{metric['Name']}.calls", 0)
+    for entry in totals.values():
+        entry['mean'] /= max(documents, 1)
+        entry['callsPerRequest'] /= max(documents, 1)
+    return totals
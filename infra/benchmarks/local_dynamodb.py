@@ -0,0 +1,740 @@
+"""
+Stand-in en memoria del cliente de bajo nivel de DynamoDB para benchmarks locales.
+
+Implementa el subconjunto de la API que usan las lambdas (get_item, put_item,
+update_item, delete_item, query, scan) con la misma forma de request/response
+que boto3, incluyendo índices secundarios globales y expresiones de
+condición/actualización. Las búsquedas por clave primaria y por índice son
+O(1); el scan recorre la tabla completa, igual que en DynamoDB.
+"""
+import bisect
+import random
+import re
+import zlib
+from collections import Counter, defaultdict
+from decimal import Decimal
+from typing import Callable, Dict, Any, List, Optional, Tuple
+
+from botocore.exceptions import ClientError
+
+# ---------------------------------------------------------------------------
+# Expresiones
+# ---------------------------------------------------------------------------
+
+_TOKEN_RE = re.compile(r"""
+    \s*(?:
+        (?P<op><>|<=|>=|=|<|>|\(|\)|,|\+|-)
+      | (?P<value>:[A-Za-z0-9_]+)
+      | (?P<name>\#?[A-Za-z_][A-Za-z0-9_]*(?:\.[A-Za-z_][A-Za-z0-9_]*)*)
+    )""", re.VERBOSE)
+
+_KEYWORDS = {'AND', 'OR', 'NOT', 'BETWEEN', 'IN', 'SET', 'ADD', 'REMOVE', 'DELETE'}
+
+
+def _tokenize(expression: str) -> List[Tuple[str, str]]:
+    tokens = []
+    pos = 0
+    expression = expression.strip()
+    while pos < len(expression):
+        match = _TOKEN_RE.match(expression, pos)
+        if not match or match.end() == pos:
+            raise _validation_error(f'Invalid expression near: {expression[pos:]}')
+        pos = match.end()
+        kind = match.lastgroup
+        text = match.group(kind)
+        if kind == 'name' and text.upper() in _KEYWORDS:
+            tokens.append(('kw', text.upper()))
+        else:
+            tokens.append((kind, text))
+    return tokens
+
+
+def _validation_error(message: str) -> ClientError:
+    return ClientError({'Error': {'Code': 'ValidationException', 'Message': message}}, 'LocalDynamoDB')
+
+
+def _to_number(value: Dict[str, Any]) -> Decimal:
+    return Decimal(value['N'])
+
+
+def _compare_key(value: Dict[str, Any]):
+    if 'N' in value:
+        return (0, _to_number(value))
+    if 'S' in value:
+        return (1, value['S'])
+    if 'BOOL' in value:
+        return (2, value['BOOL'])
+    return (3, repr(value))
+
+
+class _Expression:
+    """Parser/evaluador recursivo para expresiones de DynamoDB."""
+
+    def __init__(self, expression: str, names: Optional[Dict[str, str]], values: Optional[Dict[str, Any]]):
+        self.tokens = _tokenize(expression)
+        self.pos = 0
+        self.names = names or {}
+        self.values = values or {}
+
+    # Utilidades del parser
+    def _peek(self):
+        return self.tokens[self.pos] if self.pos < len(self.tokens) else (None, None)
+
+    def _next(self):
+        token = self._peek()
+        self.pos += 1
+        return token
+
+    def _expect(self, text: str):
+        kind, value = self._next()
+        if value != text:
+            raise _validation_error(f'Expected {text}, got {value}')
+
+    def _path(self, text: str) -> List[str]:
+        return [self.names.get(part, part) for part in text.split('.')]
+
+    # Operandos
+    def _operand(self):
+        kind, text = self._next()
+        if kind == 'value':
+            if text not in self.values:
+                raise _validation_error(f'Missing expression attribute value {text}')
+            value = self.values[text]
+            return lambda item: value
+        if kind == 'name':
+            if self._peek()[1] == '(':
+                return self._function(text)
+            path = self._path(text)
+            return lambda item: _get_path(item, path)
+        raise _validation_error(f'Unexpected token {text}')
+
+    def _function(self, name: str):
+        self._expect('(')
+        args = []
+        raw_paths = []
+        while self._peek()[1] != ')':
+            kind, text = self._peek()
+            raw_paths.append(self._path(text) if kind == 'name' else None)
+            args.append(self._operand())
+            if self._peek()[1] == ',':
+                self._next()
+        self._expect(')')
+
+        if name == 'attribute_exists':
+            path = raw_paths[0]
+            return lambda item: {'BOOL': _get_path(item, path) is not None}
+        if name == 'attribute_not_exists':
+            path = raw_paths[0]
+            return lambda item: {'BOOL': _get_path(item, path) is None}
+        if name == 'begins_with':
+            return lambda item: {'BOOL': _begins_with(args[0](item), args[1](item))}
+        if name == 'contains':
+            return lambda item: {'BOOL': _contains(args[0](item), args[1](item))}
+        if name == 'size':
+            return lambda item: {'N': str(_size(args[0](item)))}
+        if name == 'if_not_exists':
+            return lambda item: args[0](item) if args[0](item) is not None else args[1](item)
+        if name == 'list_append':
+            return lambda item: {'L': (args[0](item) or {'L': []})['L'] + (args[1](item) or {'L': []})['L']}
+        raise _validation_error(f'Unsupported function {name}')
+
+    def _arith(self):
+        left = self._operand()
+        while self._peek()[1] in ('+', '-'):
+            _, op = self._next()
+            right = self._operand()
+            left = _arith_fn(left, right, op)
+        return left
+
+    # Condiciones
+    def parse_condition(self):
+        result = self._or()
+        if self.pos != len(self.tokens):
+            raise _validation_error(f'Unexpected trailing token {self._peek()[1]}')
+        return lambda item: bool(result(item))
+
+    def _or(self):
+        left = self._and()
+        while self._peek() == ('kw', 'OR'):
+            self._next()
+            right = self._and()
+            left = (lambda l, r: lambda item: l(item) or r(item))(left, right)
+        return left
+
+    def _and(self):
+        left = self._not()
+        while self._peek() == ('kw', 'AND'):
+            self._next()
+            right = self._not()
+            left = (lambda l, r: lambda item: l(item) and r(item))(left, right)
+        return left
+
+    def _not(self):
+        if self._peek() == ('kw', 'NOT'):
+            self._next()
+            inner = self._not()
+            return lambda item: not inner(item)
+        return self._comparison()
+
+    def _comparison(self):
+        if self._peek()[1] == '(':
+            self._next()
+            inner = self._or()
+            self._expect(')')
+            return inner
+
+        left = self._operand()
+        kind, op = self._peek()
+        if op in ('=', '<>', '<', '<=', '>', '>='):
+            self._next()
+            right = self._operand()
+            return lambda item: _compare(left(item), op, right(item))
+        if (kind, op) == ('kw', 'BETWEEN'):
+            self._next()
+            low = self._operand()
+            self._expect('AND')
+            high = self._operand()
+            return lambda item: (_compare(left(item), '>=', low(item))
+                                 and _compare(left(item), '<=', high(item)))
+        if (kind, op) == ('kw', 'IN'):
+            self._next()
+            self._expect('(')
+            options = [self._operand()]
+            while self._peek()[1] == ',':
+                self._next()
+                options.append(self._operand())
+            self._expect(')')
+            return lambda item: any(_compare(left(item), '=', option(item)) for option in options)
+        # Funciones booleanas (attribute_exists, begins_with, ...)
+        return lambda item: bool((left(item) or {}).get('BOOL'))
+
+    # Actualizaciones
+    def parse_update(self):
+        actions = []
+        while self.pos < len(self.tokens):
+            kind, clause = self._next()
+            if kind != 'kw':
+                raise _validation_error(f'Expected update clause, got {clause}')
+            while True:
+                _, target = self._next()
+                path = self._path(target)
+                if clause == 'SET':
+                    self._expect('=')
+                    actions.append(('SET', path, self._arith()))
+                elif clause == 'ADD':
+                    actions.append(('ADD', path, self._operand()))
+                elif clause in ('REMOVE', 'DELETE'):
+                    if clause == 'DELETE':
+                        self._operand()
+                    actions.append(('REMOVE', path, None))
+                if self._peek()[1] != ',':
+                    break
+                self._next()
+        return actions
+
+
+def _arith_fn(left, right, op):
+    def evaluate(item):
+        a = _to_number(left(item))
+        b = _to_number(right(item))
+        return {'N': str(a + b if op == '+' else a - b)}
+    return evaluate
+
+
+def _get_path(item: Dict[str, Any], path: List[str]):
+    current = {'M': item}
+    for part in path:
+        if current is None or 'M' not in current:
+            return None
+        current = current['M'].get(part)
+    return current
+
+
+def _set_path(item: Dict[str, Any], path: List[str], value: Optional[Dict[str, Any]]):
+    target = item
+    for part in path[:-1]:
+        target = target.setdefault(part, {'M': {}})['M']
+    if value is None:
+        target.pop(path[-1], None)
+    else:
+        target[path[-1]] = value
+
+
+def _compare(left, op: str, right) -> bool:
+    if left is None or right is None:
+        return op == '<>' and (left is None) != (right is None)
+    if op == '=':
+        return left == right or (('N' in left and 'N' in right) and _to_number(left) == _to_number(right))
+    if op == '<>':
+        return not _compare(left, '=', right)
+    a, b = _compare_key(left), _compare_key(right)
+    if a[0] != b[0]:
+        return False
+    return {'<': a < b, '<=': a <= b, '>': a > b, '>=': a >= b}[op]
+
+
+def _begins_with(value, prefix) -> bool:
+    return bool(value and prefix and 'S' in value and value['S'].startswith(prefix['S']))
+
+
+def _contains(value, operand) -> bool:
+    if not value or not operand:
+        return False
+    if 'S' in value and 'S' in operand:
+        return operand['S'] in value['S']
+    if 'L' in value:
+        return operand in value['L']
+    if 'SS' in value and 'S' in operand:
+        return operand['S'] in value['SS']
+    return False
+
+
+def _size(value) -> int:
+    if not value:
+        return 0
+    for kind in ('S', 'L', 'M', 'SS', 'NS'):
+        if kind in value:
+            return len(value[kind])
+    return 0
+
+
+def _item_size(item: Dict[str, Any]) -> int:
+    """Tamaño aproximado del item en bytes (para calcular capacidad consumida)."""
+    return sum(len(name) + len(repr(value)) for name, value in item.items())
+
+
+# ---------------------------------------------------------------------------
+# Tablas
+# ---------------------------------------------------------------------------
+
+class _Table:
+    def __init__(self, name: str, hash_key: str, range_key: Optional[str],
+                 indexes: Dict[str, Tuple[str, Optional[str]]]):
+        self.name = name
+        self.hash_key = hash_key
+        self.range_key = range_key
+        self.items: Dict[Tuple, Dict[str, Any]] = {}
+        self.indexes = indexes
+        # index -> valor hash -> conjunto de claves primarias
+        self.index_data: Dict[str, Dict[Any, set]] = {name: defaultdict(set) for name in indexes}
+        # valor hash -> conjunto de claves primarias (para query sobre la tabla base)
+        self.partitions: Dict[Any, set] = defaultdict(set)
+        # Callbacks (tabla, imagen anterior, imagen nueva) por cada escritura (local_streams)
+        self.listeners: List[Callable[['_Table', Optional[Dict[str, Any]], Optional[Dict[str, Any]]], None]] = []
+        # (Segment, TotalSegments) -> claves en orden de scan y su posición; se
+        # descarta cuando cambia el conjunto de claves
+        self._scan_orders: Dict[Tuple, Tuple[List[Tuple], Dict[Tuple, int]]] = {}
+
+    def key_of(self, item: Dict[str, Any]) -> Tuple:
+        try:
+            hash_value = _value_key(item[self.hash_key])
+            range_value = _value_key(item[self.range_key]) if self.range_key else None
+        except KeyError as e:
+            raise _validation_error(f'Missing key attribute {e} for table {self.name}')
+        return (hash_value, range_value)
+
+    def put(self, item: Dict[str, Any]) -> Optional[Dict[str, Any]]:
+        key = self.key_of(item)
+        old = self.items.get(key)
+        if old is not None:
+            self._unindex(key, old)
+        else:
+            self._scan_orders.clear()
+        self.items[key] = item
+        self._index(key, item)
+        for listener in self.listeners:
+            listener(self, old, item)
+        return old
+
+    def delete(self, key: Tuple) -> Optional[Dict[str, Any]]:
+        old = self.items.pop(key, None)
+        if old is not None:
+            self._unindex(key, old)
+            self._scan_orders.clear()
+            for listener in self.listeners:
+                listener(self, old, None)
+        return old
+
+    def scan_order(self, segment: Optional[int], total_segments: Optional[int]) -> Tuple[List[Tuple], Dict[Tuple, int]]:
+        """Claves de un segmento en orden de scan; el segmento sale de la clave de partición"""
+        cached = self._scan_orders.get((segment, total_segments))
+        if cached is None:
+            keys = sorted(self.items, key=repr)
+            if total_segments:
+                # crc32 y no hash(): el mismo segmento en cualquier proceso
+                keys = [key for key in keys if zlib.crc32(repr(key[0]).encode()) % total_segments == segment]
+            cached = keys, {key: position for position, key in enumerate(keys)}
+            self._scan_orders[(segment, total_segments)] = cached
+        return cached
+
+    def _index(self, key: Tuple, item: Dict[str, Any]):
+        self.partitions[key[0]].add(key)
+        for name, (hash_key, _) in self.indexes.items():
+            if hash_key in item:
+                self.index_data[name][_value_key(item[hash_key])].add(key)
+
+    def _unindex(self, key: Tuple, item: Dict[str, Any]):
+        self.partitions[key[0]].discard(key)
+        for name, (hash_key, _) in self.indexes.items():
+            if hash_key in item:
+                self.index_data[name][_value_key(item[hash_key])].discard(key)
+
+
+def _value_key(value: Dict[str, Any]):
+    if 'S' in value:
+        return ('S', value['S'])
+    if 'N' in value:
+        return ('N', Decimal(value['N']))
+    return ('B', value.get('B'))
+
+
+class LocalDynamoDB:
+    """Cliente DynamoDB en memoria compatible con las llamadas de las lambdas."""
+
+    def __init__(self, unprocessed_rate: float = 0.0):
+        self.tables: Dict[str, _Table] = {}
+        self.calls: Counter = Counter()
+        self.consumed_capacity: Counter = Counter()
+        self.read_capacity: Counter = Counter()
+        self.write_capacity: Counter = Counter()
+        # Fracción de escrituras que batch_write_item devuelve como UnprocessedItems
+        self.unprocessed_rate = unprocessed_rate
+        self._random = random.Random(0)
+
+    # -- Administración ----------------------------------------------------
+    def create_table(self, name: str, hash_key: str, range_key: Optional[str] = None,
+                     indexes: Optional[Dict[str, Tuple[str, Optional[str]]]] = None) -> None:
+        self.tables[name] = _Table(name, hash_key, range_key, indexes or {})
+
+    def load_items(self, table_name: str, items) -> None:
+        """Cargar items directamente, sin contar llamadas ni capacidad."""
+        table = self._table(table_name)
+        for item in items:
+            table.put(item)
+
+    def reset_stats(self) -> None:
+        self.calls.clear()
+        self.consumed_capacity.clear()
+        self.read_capacity.clear()
+        self.write_capacity.clear()
+
+    def _table(self, name: str) -> _Table:
+        if name not in self.tables:
+            raise ClientError({'Error': {'Code': 'ResourceNotFoundException',
+                                         'Message': f'Table {name} not found'}}, 'LocalDynamoDB')
+        return self.tables[name]
+
+    def _consume(self, table: str, units: float, write: bool = False) -> None:
+        self.consumed_capacity[table] += units
+        (self.write_capacity if write else self.read_capacity)[table] += units
+
+    # -- Operaciones de item -----------------------------------------------
+    def get_item(self, TableName: str, Key: Dict[str, Any], ConsistentRead: bool = False,
+                 ProjectionExpression: Optional[str] = None,
+                 ExpressionAttributeNames: Optional[Dict[str, str]] = None, **kwargs) -> Dict[str, Any]:
+        self.calls['GetItem'] += 1
+        table = self._table(TableName)
+        item = table.items.get(table.key_of(Key))
+        self._consume(TableName, 1.0 if ConsistentRead else 0.5)
+        if item is None:
+            return {}
+        return {'Item': _project(item, ProjectionExpression, ExpressionAttributeNames)}
+
+    def put_item(self, TableName: str, Item: Dict[str, Any], ConditionExpression: Optional[str] = None,
+                 ExpressionAttributeNames: Optional[Dict[str, str]] = None,
+                 ExpressionAttributeValues: Optional[Dict[str, Any]] = None, **kwargs) -> Dict[str, Any]:
+        self.calls['PutItem'] += 1
+        table = self._table(TableName)
+        current = table.items.get(table.key_of(Item))
+        self._check_condition(current, ConditionExpression, ExpressionAttributeNames, ExpressionAttributeValues,
+                              kwargs.get('ReturnValuesOnConditionCheckFailure'))
+        table.put(_copy(Item))
+        self._consume(TableName, max(1.0, _item_size(Item) / 1024), write=True)
+        return {}
+
+    def update_item(self, TableName: str, Key: Dict[str, Any], UpdateExpression: str,
+                    ConditionExpression: Optional[str] = None,
+                    ExpressionAttributeNames: Optional[Dict[str, str]] = None,
+                    ExpressionAttributeValues: Optional[Dict[str, Any]] = None,
+                    ReturnValues: str = 'NONE', **kwargs) -> Dict[str, Any]:
+        self.calls['UpdateItem'] += 1
+        table = self._table(TableName)
+        current = table.items.get(table.key_of(Key))
+        self._check_condition(current, ConditionExpression, ExpressionAttributeNames, ExpressionAttributeValues,
+                              kwargs.get('ReturnValuesOnConditionCheckFailure'))
+        updated = self._apply_update(current, Key, UpdateExpression,
+                                     ExpressionAttributeNames, ExpressionAttributeValues)
+        table.put(updated)
+        self._consume(TableName, max(1.0, _item_size(updated) / 1024), write=True)
+        if ReturnValues == 'ALL_NEW':
+            return {'Attributes': _copy(updated)}
+        if ReturnValues == 'ALL_OLD' and current is not None:
+            return {'Attributes': _copy(current)}
+        return {}
+
+    def delete_item(self, TableName: str, Key: Dict[str, Any], ConditionExpression: Optional[str] = None,
+                    ExpressionAttributeNames: Optional[Dict[str, str]] = None,
+                    ExpressionAttributeValues: Optional[Dict[str, Any]] = None, **kwargs) -> Dict[str, Any]:
+        self.calls['DeleteItem'] += 1
+        table = self._table(TableName)
+        key = table.key_of(Key)
+        self._check_condition(table.items.get(key), ConditionExpression,
+                              ExpressionAttributeNames, ExpressionAttributeValues,
+                              kwargs.get('ReturnValuesOnConditionCheckFailure'))
+        table.delete(key)
+        self._consume(TableName, 1.0, write=True)
+        return {}
+
+    # -- Lecturas de colección ---------------------------------------------
+    def query(self, TableName: str, KeyConditionExpression: str, IndexName: Optional[str] = None,
+              ExpressionAttributeNames: Optional[Dict[str, str]] = None,
+              ExpressionAttributeValues: Optional[Dict[str, Any]] = None,
+              FilterExpression: Optional[str] = None, ProjectionExpression: Optional[str] = None,
+              Limit: Optional[int] = None, ScanIndexForward: bool = True,
+              ExclusiveStartKey: Optional[Dict[str, Any]] = None, Select: str = 'ALL_ATTRIBUTES',
+              ConsistentRead: bool = False, **kwargs) -> Dict[str, Any]:
+        self.calls['Query'] += 1
+        table = self._table(TableName)
+        if IndexName:
+            if IndexName not in table.indexes:
+                raise _validation_error(f'Index {IndexName} not found on table {TableName}')
+            hash_key, range_key = table.indexes[IndexName]
+        else:
+            hash_key, range_key = table.hash_key, table.range_key
+
+        key_condition = _Expression(KeyConditionExpression, ExpressionAttributeNames,
+                                    ExpressionAttributeValues).parse_condition()
+        hash_value = _extract_hash_value(KeyConditionExpression, hash_key,
+                                         ExpressionAttributeNames, ExpressionAttributeValues)
+        if IndexName:
+            keys = table.index_data[IndexName].get(_value_key(hash_value), ())
+        else:
+            keys = table.partitions.get(_value_key(hash_value), ())
+
+        candidates = [table.items[key] for key in keys]
+        candidates = [item for item in candidates if key_condition(item)]
+        sort_attr = range_key or table.hash_key
+        candidates.sort(key=lambda item: _compare_key(item.get(sort_attr, {'S': ''})) +
+                        (_compare_key(item[table.range_key]) if table.range_key and table.range_key in item else ()),
+                        reverse=not ScanIndexForward)
+        return self._page(TableName, table, candidates, hash_key, range_key, FilterExpression,
+                          ProjectionExpression, ExpressionAttributeNames, ExpressionAttributeValues,
+                          Limit, ExclusiveStartKey, Select, ConsistentRead)
+
+    def scan(self, TableName: str, FilterExpression: Optional[str] = None,
+             ExpressionAttributeNames: Optional[Dict[str, str]] = None,
+             ExpressionAttributeValues: Optional[Dict[str, Any]] = None,
+             ProjectionExpression: Optional[str] = None, Limit: Optional[int] = None,
+             ExclusiveStartKey: Optional[Dict[str, Any]] = None, Select: str = 'ALL_ATTRIBUTES',
+             Segment: Optional[int] = None, TotalSegments: Optional[int] = None,
+             IndexName: Optional[str] = None, ConsistentRead: bool = False, **kwargs) -> Dict[str, Any]:
+        self.calls['Scan'] += 1
+        table = self._table(TableName)
+        keys, positions = table.scan_order(Segment, TotalSegments)
+        start = 0
+        if ExclusiveStartKey:
+            start_key = table.key_of(ExclusiveStartKey)
+            # Si la clave de inicio se borró entre páginas se sigue desde donde estaría
+            start = positions[start_key] + 1 if start_key in positions \
+                else bisect.bisect_right(keys, repr(start_key), key=repr)
+        # Un elemento más que Limit: _page decide con él si hay LastEvaluatedKey
+        end = start + Limit + 1 if Limit else len(keys)
+        return self._page(TableName, table, [table.items[key] for key in keys[start:end]], table.hash_key,
+                          table.range_key, FilterExpression, ProjectionExpression,
+                          ExpressionAttributeNames, ExpressionAttributeValues, Limit,
+                          None, Select, ConsistentRead)
+
+    def _page(self, table_name, table, candidates, hash_key, range_key, filter_expression,
+              projection, names, values, limit, start_key, select, consistent):
+        if start_key:
+            start = _key_tuple(start_key, table, hash_key, range_key)
+            for position, item in enumerate(candidates):
+                if _key_tuple(item, table, hash_key, range_key) == start:
+                    candidates = candidates[position + 1:]
+                    break
+
+        evaluated = candidates[:limit] if limit else candidates
+        last_key = None
+        if limit and len(candidates) > limit:
+            last = evaluated[-1]
+            last_key = {attr: last[attr] for attr in {table.hash_key, table.range_key, hash_key, range_key}
+                        if attr and attr in last}
+
+        read_bytes = sum(_item_size(item) for item in evaluated)
+        self._consume(table_name, max(0.5, read_bytes / 4096 * (1.0 if consistent else 0.5)))
+
+        if filter_expression:
+            condition = _Expression(filter_expression, names, values).parse_condition()
+            matched = [item for item in evaluated if condition(item)]
+        else:
+            matched = evaluated
+
+        response: Dict[str, Any] = {'Count': len(matched), 'ScannedCount': len(evaluated)}
+        if select != 'COUNT':
+            response['Items'] = [_project(item, projection, names) for item in matched]
+        if last_key:
+            response['LastEvaluatedKey'] = last_key
+        return response
+
+    # -- Transacciones ------------------------------------------------------
+    def transact_write_items(self, TransactItems: List[Dict[str, Any]], **kwargs) -> Dict[str, Any]:
+        self.calls['TransactWriteItems'] += 1
+        if len(TransactItems) > 100:
+            raise _validation_error('Member must have length less than or equal to 100')
+
+        reasons = []
+        failed = False
+        touched = set()
+        for entry in TransactItems:
+            (action, params), = entry.items()
+            table = self._table(params['TableName'])
+            key = table.key_of(params['Item'] if action == 'Put' else params['Key'])
+            if (table.name, key) in touched:
+                raise _validation_error('Transaction request cannot include multiple operations on one item')
+            touched.add((table.name, key))
+            try:
+                self._check_condition(table.items.get(key), params.get('ConditionExpression'),
+                                      params.get('ExpressionAttributeNames'),
+                                      params.get('ExpressionAttributeValues'))
+                reasons.append({'Code': 'None'})
+            except ClientError:
+                failed = True
+                reason = {'Code': 'ConditionalCheckFailed', 'Message': 'The conditional request failed'}
+                current = table.items.get(key)
+                if params.get('ReturnValuesOnConditionCheckFailure') == 'ALL_OLD' and current is not None:
+                    reason['Item'] = _copy(current)
+                reasons.append(reason)
+
+        if failed:
+            error = ClientError({'Error': {'Code': 'TransactionCanceledException',
+                                           'Message': 'Transaction cancelled'},
+                                 'CancellationReasons': reasons}, 'TransactWriteItems')
+            error.response['CancellationReasons'] = reasons
+            raise error
+
+        for entry in TransactItems:
+            (action, params), = entry.items()
+            table = self._table(params['TableName'])
+            names = params.get('ExpressionAttributeNames')
+            values = params.get('ExpressionAttributeValues')
+            if action == 'Put':
+                table.put(_copy(params['Item']))
+            elif action == 'Update':
+                current = table.items.get(table.key_of(params['Key']))
+                table.put(self._apply_update(current, params['Key'], params['UpdateExpression'],
+                                             names, values))
+            elif action == 'Delete':
+                table.delete(table.key_of(params['Key']))
+            # Las transacciones consumen el doble de capacidad de escritura
+            self._consume(params['TableName'], 2.0, write=True)
+        return {}
+
+    def transact_get_items(self, TransactItems: List[Dict[str, Any]], **kwargs) -> Dict[str, Any]:
+        self.calls['TransactGetItems'] += 1
+        responses = []
+        for entry in TransactItems:
+            params = entry['Get']
+            table = self._table(params['TableName'])
+            item = table.items.get(table.key_of(params['Key']))
+            self._consume(params['TableName'], 2.0)
+            responses.append({'Item': _copy(item)} if item is not None else {})
+        return {'Responses': responses}
+
+    # -- Lotes ---------------------------------------------------------------
+    def batch_get_item(self, RequestItems: Dict[str, Dict[str, Any]], **kwargs) -> Dict[str, Any]:
+        self.calls['BatchGetItem'] += 1
+        if sum(len(request['Keys']) for request in RequestItems.values()) > 100:
+            raise _validation_error('Too many items requested for the BatchGetItem call')
+        responses = {}
+        for table_name, request in RequestItems.items():
+            table = self._table(table_name)
+            found = []
+            for key in request['Keys']:
+                item = table.items.get(table.key_of(key))
+                if item is not None:
+                    found.append(_project(item, request.get('ProjectionExpression'),
+                                          request.get('ExpressionAttributeNames')))
+            self._consume(table_name, 0.5 * max(1, len(request['Keys'])))
+            responses[table_name] = found
+        return {'Responses': responses, 'UnprocessedKeys': {}}
+
+    def batch_write_item(self, RequestItems: Dict[str, List[Dict[str, Any]]], **kwargs) -> Dict[str, Any]:
+        self.calls['BatchWriteItem'] += 1
+        if sum(len(requests) for requests in RequestItems.values()) > 25:
+            raise _validation_error('Too many items requested for the BatchWriteItem call')
+        unprocessed: Dict[str, List[Dict[str, Any]]] = {}
+        for table_name, requests in RequestItems.items():
+            table = self._table(table_name)
+            for request in requests:
+                if self.unprocessed_rate and self._random.random() < self.unprocessed_rate:
+                    unprocessed.setdefault(table_name, []).append(request)
+                    continue
+                if 'PutRequest' in request:
+                    table.put(_copy(request['PutRequest']['Item']))
+                else:
+                    table.delete(table.key_of(request['DeleteRequest']['Key']))
+                self._consume(table_name, 1.0, write=True)
+        return {'UnprocessedItems': unprocessed}
+
+    # -- Internos ------------------------------------------------------------
+    def _check_condition(self, current, expression, names, values, return_old: Optional[str] = None) -> None:
+        if not expression:
+            return
+        condition = _Expression(expression, names, values).parse_condition()
+        if not condition(current or {}):
+            response = {'Error': {'Code': 'ConditionalCheckFailedException',
+                                  'Message': 'The conditional request failed'}}
+            if return_old == 'ALL_OLD' and current is not None:
+                response['Item'] = _copy(current)
+            raise ClientError(response, 'LocalDynamoDB')
+
+    def _apply_update(self, current, key, expression, names, values) -> Dict[str, Any]:
+        updated = _copy(current) if current is not None else _copy(key)
+        actions = _Expression(expression, names, values).parse_update()
+        # Todas las expresiones se evalúan sobre el item original
+        snapshot = _copy(updated)
+        for action, path, operand in actions:
+            if action == 'SET':
+                _set_path(updated, path, operand(snapshot))
+            elif action == 'ADD':
+                existing = _get_path(snapshot, path)
+                delta = operand(snapshot)
+                if 'N' in delta:
+                    base = _to_number(existing) if existing else Decimal(0)
+                    _set_path(updated, path, {'N': str(base + _to_number(delta))})
+                elif 'SS' in delta:
+                    merged = set((existing or {'SS': []})['SS']) | set(delta['SS'])
+                    _set_path(updated, path, {'SS': sorted(merged)})
+            elif action == 'REMOVE':
+                _set_path(updated, path, None)
+        return updated
+
+
+def _extract_hash_value(expression, hash_key, names, values):
+    names = names or {}
+    for part in re.split(r'\s+AND\s+', expression, flags=re.IGNORECASE):
+        match = re.match(r'\s*\(?\s*(\#?\w+)\s*=\s*(:\w+)', part)
+        if match and names.get(match.group(1), match.group(1)) == hash_key:
+            return values[match.group(2)]
+    raise _validation_error(f'Query condition missed key schema element: {hash_key}')
+
+
+def _key_tuple(item, table, hash_key, range_key):
+    attrs = [table.hash_key, table.range_key, hash_key, range_key]
+    return tuple(_value_key(item[attr]) if attr and attr in item else None for attr in attrs)
+
+
+def _project(item, projection, names):
+    if not projection:
+        return _copy(item)
+    names = names or {}
+    attrs = [names.get(part.strip(), part.strip()) for part in projection.split(',')]
+    return {attr: _copy(item[attr]) for attr in attrs if attr in item}
+
+
+def _copy(value):
+    if isinstance(value, dict):
+        return {k: _copy(v) for k, v in value.items()}
+    if isinstance(value, list):
+        return [_copy(v) for v in value]
+    return value
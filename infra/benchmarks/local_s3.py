@@ -0,0 +1,77 @@
+"""
+Stand-in de S3 sobre un directorio local para benchmarks.
+
+Implementa put_object, get_object (con Range de bytes, como los GET por
+miembro del archivo de transacciones) y list_objects_v2 con la forma de
+boto3. Los objetos son archivos bajo `root`, así que procesos e hilos ven
+lo mismo; cuenta llamadas y bytes leídos.
+"""
+import io
+import os
+import re
+import threading
+from collections import Counter
+from typing import Any, Dict
+
+from botocore.exceptions import ClientError
+
+_RANGE_RE = re.compile(r'bytes=(\d+)-(\d+)')
+
+
+class LocalS3:
+    def __init__(self, root: str):
+        self.root = root
+        self.calls: Counter = Counter()
+        self.bytes_read = 0
+        self._lock = threading.Lock()
+
+    def _path(self, bucket: str, key: str) -> str:
+        return os.path.join(self.root, bucket, *key.split('/'))
+
+    def reset_stats(self) -> None:
+        self.calls.clear()
+        self.bytes_read = 0
+
+    def put_object(self, Bucket: str, Key: str, Body: Any, **kwargs) -> Dict[str, Any]:
+        with self._lock:
+            self.calls['PutObject'] += 1
+        path = self._path(Bucket, Key)
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+        data = Body if isinstance(Body, (bytes, bytearray)) else Body.read()
+        # Escritura atómica: un lector nunca ve un objeto a medias
+        with open(f'{path}.part', 'wb') as handle:
+            handle.write(data)
+        os.replace(f'{path}.part', path)
+        return {}
+
+    def get_object(self, Bucket: str, Key: str, Range: str = None, **kwargs) -> Dict[str, Any]:
+        path = self._path(Bucket, Key)
+        if not os.path.exists(path):
+            raise ClientError({'Error': {'Code': 'NoSuchKey', 'Message': Key}}, 'GetObject')
+        with open(path, 'rb') as handle:
+            if Range:
+                start, end = map(int, _RANGE_RE.fullmatch(Range).groups())
+                handle.seek(start)
+                data = handle.read(end - start + 1)
+            else:
+                data = handle.read()
+        with self._lock:
+            self.calls['GetObject'] += 1
+            self.bytes_read += len(data)
+        return {'Body': io.BytesIO(data), 'ContentLength': len(data)}
+
+    def list_objects_v2(self, Bucket: str, Prefix: str = '', **kwargs) -> Dict[str, Any]:
+        with self._lock:
+            self.calls['ListObjectsV2'] += 1
+        base = os.path.join(self.root, Bucket)
+        contents = []
+        for directory, _, names in os.walk(base):
+            for name in names:
+                if name.endswith('.part'):
+                    continue
+                path = os.path.join(directory, name)
+                key = os.path.relpath(path, base).replace(os.sep, '/')
+                if key.startswith(Prefix):
+                    contents.append({'Key': key, 'Size': os.path.getsize(path)})
+        contents.sort(key=lambda entry: entry['Key'])
+        return {'Contents': contents, 'KeyCount': len(contents), 'IsTruncated': False}
@@ -0,0 +1,67 @@
+"""
+Stand-in en memoria de SQS para benchmarks locales.
+
+Implementa send_message con la forma de boto3 y `drain`, que entrega los
+mensajes a un handler con el evento de una fuente SQS de Lambda (lotes,
+respuesta parcial con batchItemFailures, reintentos y DLQ). Con
+`duplicate_rate` reentrega mensajes ya procesados, como la entrega
+"al menos una vez" de SQS estándar.
+"""
+import random
+import uuid
+from collections import Counter, deque
+from typing import Any, Callable, Dict, List
+
+
+class LocalSQS:
+    def __init__(self, duplicate_rate: float = 0.0):
+        self.duplicate_rate = duplicate_rate
+        self.queues: Dict[str, deque] = {}
+        self.dead_letters: Dict[str, List[Dict[str, Any]]] = {}
+        self.calls: Counter = Counter()
+
+    def create_queue(self, QueueName: str, **kwargs) -> Dict[str, Any]:
+        url = f'https://sqs.local/000000000000/{QueueName}'
+        self.queues.setdefault(url, deque())
+        self.dead_letters.setdefault(url, [])
+        return {'QueueUrl': url}
+
+    def send_message(self, QueueUrl: str, MessageBody: str, **kwargs) -> Dict[str, Any]:
+        self.calls['SendMessage'] += 1
+        message = {'messageId': str(uuid.uuid4()), 'body': MessageBody, 'receiveCount': 0}
+        self.queues[QueueUrl].append(message)
+        return {'MessageId': message['messageId']}
+
+    def drain(self, queue_url: str, handler: Callable[[Dict[str, Any], Any], Dict[str, Any]],
+              batch_size: int = 10, max_receive_count: int = 5) -> Dict[str, int]:
+        """Entregar mensajes al handler hasta vaciar la cola"""
+        queue = self.queues[queue_url]
+        stats = Counter()
+        while queue:
+            batch = [queue.popleft() for _ in range(min(batch_size, len(queue)))]
+            for message in batch:
+                message['receiveCount'] += 1
+
+            response = handler({'Records': [{
+                'messageId': message['messageId'],
+                'body': message['body'],
+                'attributes': {'ApproximateReceiveCount': str(message['receiveCount'])},
+                'eventSource': 'aws:sqs'
+            } for message in batch]}, None)
+            stats['invocations'] += 1
+
+            failed = {failure['itemIdentifier'] for failure in response.get('batchItemFailures', [])}
+            for message in batch:
+                if message['messageId'] in failed:
+                    stats['failed'] += 1
+                    if message['receiveCount'] >= max_receive_count:
+                        self.dead_letters[queue_url].append(message)
+                    else:
+                        queue.append(message)
+                else:
+                    stats['processed'] += 1
+                    if random.random() < self.duplicate_rate:
+                        stats['duplicated'] += 1
+                        queue.append(dict(message))
+        stats['deadLetters'] = len(self.dead_letters[queue_url])
+        return dict(stats)
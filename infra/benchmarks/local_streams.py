@@ -0,0 +1,120 @@
+"""
+Stand-in en memoria de DynamoDB Streams para benchmarks locales.
+
+Registra cada escritura de las tablas indicadas del stand-in de DynamoDB como
+un registro NEW_AND_OLD_IMAGES (INSERT/MODIFY/REMOVE con SequenceNumber
+creciente) en uno de `shards` shards por tabla, elegido por la clave de
+partición como en DynamoDB. `drain` entrega los registros a un handler con el
+evento de una fuente de streams de Lambda: un lote es de una sola tabla y un
+solo shard, y con respuesta parcial (batchItemFailures) el shard se reintenta
+desde el menor SequenceNumber informado. Con `duplicate_rate` reentrega lotes
+ya procesados más tarde (al menos una vez) y con `shuffle` desordena los
+registros de cada shard, algo que DynamoDB no hace: sirve para verificar que
+el consumidor no depende del orden.
+"""
+import copy
+import random
+import threading
+import time
+import uuid
+import zlib
+from collections import Counter, deque
+from typing import Any, Callable, Dict, List, Optional, Tuple
+
+from local_dynamodb import LocalDynamoDB
+
+REGION = 'us-east-1'
+ACCOUNT = '000000000000'
+
+
+class LocalStreams:
+    def __init__(self, db: LocalDynamoDB, table_names: List[str], shards: int = 4,
+                 duplicate_rate: float = 0.0, shuffle: bool = False, seed: int = 0):
+        self.shards = shards
+        self.duplicate_rate = duplicate_rate
+        self.shuffle = shuffle
+        self.queues: Dict[Tuple[str, int], deque] = {}
+        self.dead_letters: List[Dict[str, Any]] = []
+        self._sequence = 0
+        self._lock = threading.Lock()
+        self._random = random.Random(seed)
+        for name in table_names:
+            table = db.tables[name]
+            table.listeners.append(self._record)
+            for shard in range(shards):
+                self.queues[(name, shard)] = deque()
+
+    def _record(self, table, old: Optional[Dict[str, Any]], new: Optional[Dict[str, Any]]) -> None:
+        image = new if new is not None else old
+        keys = {attr: copy.deepcopy(image[attr]) for attr in (table.hash_key, table.range_key) if attr}
+        shard = zlib.crc32(repr(keys[table.hash_key]).encode()) % self.shards
+        with self._lock:
+            self._sequence += 1
+            stream = {
+                'ApproximateCreationDateTime': time.time(),
+                'Keys': keys,
+                'SequenceNumber': f'{self._sequence:021d}',
+                'StreamViewType': 'NEW_AND_OLD_IMAGES'
+            }
+            if new is not None:
+                stream['NewImage'] = copy.deepcopy(new)
+            if old is not None:
+                stream['OldImage'] = copy.deepcopy(old)
+            self.queues[(table.name, shard)].append({
+                'eventID': uuid.uuid4().hex,
+                'eventName': 'INSERT' if old is None else ('REMOVE' if new is None else 'MODIFY'),
+                'eventSource': 'aws:dynamodb',
+                'eventSourceARN': f'arn:aws:dynamodb:{REGION}:{ACCOUNT}:table/{table.name}/stream/local',
+                'awsRegion': REGION,
+                'dynamodb': stream,
+                'attempts': 0
+            })
+
+    def pending(self) -> int:
+        return sum(len(queue) for queue in self.queues.values())
+
+    def drain(self, handler: Callable[[Dict[str, Any], Any], Dict[str, Any]],
+              batch_size: int = 100, max_attempts: int = 3) -> Dict[str, int]:
+        """Entregar registros al handler, shard por shard en orden aleatorio, hasta vaciar"""
+        stats = Counter()
+        if self.shuffle:
+            for queue in self.queues.values():
+                self._random.shuffle(queue)
+
+        while True:
+            pending = [key for key, queue in self.queues.items() if queue]
+            if not pending:
+                break
+            queue = self.queues[self._random.choice(pending)]
+            batch = [queue.popleft() for _ in range(min(batch_size, len(queue)))]
+            for record in batch:
+                record['attempts'] += 1
+
+            response = handler({'Records': [
+                {name: value for name, value in record.items() if name != 'attempts'} for record in batch
+            ]}, None)
+            stats['invocations'] += 1
+
+            failed = [failure['itemIdentifier'] for failure in response.get('batchItemFailures', [])]
+            if failed:
+                # Se reintenta desde el registro fallido con menor SequenceNumber
+                retry_from = min(failed)
+                position = next(index for index, record in enumerate(batch)
+                                if record['dynamodb']['SequenceNumber'] == retry_from)
+                stats['processed'] += position
+                stats['failed'] += 1
+                retry = batch[position:]
+                if retry[0]['attempts'] >= max_attempts:
+                    # Destino on-failure: el lote se descarta y el shard sigue
+                    self.dead_letters += retry
+                else:
+                    queue.extendleft(reversed(retry))
+                continue
+
+            stats['processed'] += len(batch)
+            if self._random.random() < self.duplicate_rate:
+                # Reentrega tardía: llega después de registros más nuevos del shard
+                stats['duplicated'] += len(batch)
+                queue.extend(dict(record, attempts=0) for record in batch)
+        stats['deadLetters'] = len(self.dead_letters)
+        return dict(stats)
@@ -0,0 +1,372 @@
+"""
+Archivo de transacciones: mueve a S3 las filas del libro mayor más viejas que
+ARCHIVE_AFTER_DAYS para que la tabla Transactions quede chica.
+
+Job por lotes (tarea de contenedor o CLI, como reconcile_ledger). El corte es
+el primer día del mes de (hoy - ARCHIVE_AFTER_DAYS): cada cuenta archiva
+meses completos. Scans segmentados de Transactions en un pool de hilos (el
+trabajo es de E/S); cada segmento:
+
+1. Agrupa sus filas anteriores al corte por cuenta y mes y las escribe en un
+   archivo local por mes (banca_common.archive: un miembro gzip por cuenta y
+   su índice). Las filas que ya están en el archivo de una corrida anterior
+   interrumpida no se vuelven a escribir.
+2. Sube los archivos y sus índices a ARCHIVE_BUCKET_NAME.
+3. Por cuenta, agrega los segmentos nuevos al bucket ARCHIVED y mueve su
+   `archivedBefore` al corte en una sola escritura: desde ahí get_transactions
+   lee lo anterior del archivo y deja de verlo en la tabla. Si la lista pasa
+   de ARCHIVE_INLINE_SEGMENTS entradas, las escribe todas en un manifiesto
+   nuevo en S3 y deja la lista vacía (el item no llega a los 400 KB).
+4. Borra las filas con TransactWriteItems; cada transacción suma los totales
+   de las filas borradas al bucket ARCHIVED (la conciliación cuenta con ellos).
+
+Los agregados DAY# y TOTAL no cambian. Si el job se corta, la siguiente
+corrida retoma lo que quedó en la tabla sin duplicar filas ni totales.
+
+Uso:
+    PYTHONPATH=src/layers/common/python python src/jobs/archive_transactions/main.py \\
+        --segments 16 --workers 8
+"""
+import argparse
+import json
+import os
+import shutil
+import sys
+import tempfile
+import time
+import uuid
+from collections import Counter
+from concurrent.futures import ThreadPoolExecutor
+from datetime import datetime, timedelta
+from typing import Dict, Any, Iterator, List, Optional, Tuple
+
+from banca_common import archive, dynamo
+from banca_common.dynamo import dynamodb
+from banca_common.items import STATUS_COMPLETED, SUMMARY_PREFIX
+from banca_common.records import format_minor, to_minor_units
+
+TRANSACTIONS_TABLE = os.environ['TRANSACTIONS_TABLE_NAME']
+ARCHIVE_BUCKET = os.environ.get('ARCHIVE_BUCKET_NAME', '')
+ARCHIVE_PREFIX = os.environ.get('ARCHIVE_PREFIX', 'transactions/')
+# Items por página de scan (DynamoDB además corta cada página en 1 MB)
+PAGE_ITEMS = int(os.environ.get('ARCHIVE_PAGE_ITEMS', '5000'))
+# Borrados por TransactWriteItems: el límite es 100 y uno va al bucket ARCHIVED
+DELETE_CHUNK = 99
+# Reintentos de un lote de borrados cancelado por conflicto con otra escritura
+DELETE_ATTEMPTS = 5
+# Entradas de `segments` en el bucket ARCHIVED antes de pasarlas a un manifiesto en S3
+INLINE_SEGMENTS = int(os.environ.get('ARCHIVE_INLINE_SEGMENTS', '50'))
+
+def archive_cutoff(now: datetime, after_days: int) -> str:
+    """Primer día del mes de now - after_days: todo lo anterior se archiva"""
+    return (now - timedelta(days=after_days)).strftime('%Y-%m-01')
+
+# -- Fase 1: archivos locales ------------------------------------------------
+
+class MonthFiles:
+    """Archivos locales de un segmento, uno por mes, con su índice por cuenta"""
+
+    def __init__(self, directory: str, run_id: str, segment: int):
+        self.directory = directory
+        self.run_id = run_id
+        self.segment = segment
+        self.files: Dict[str, Any] = {}
+        self.indexes: Dict[str, Dict[str, List[List[Any]]]] = {}
+        # accountId -> segmentos nuevos (entradas del índice con la clave del objeto)
+        self.segments: Dict[str, List[archive.Segment]] = {}
+
+    def add(self, account_id: str, month: str, items: List[Dict[str, Any]]) -> None:
+        """Agregar el miembro de una cuenta y un mes (filas más nuevas primero)"""
+        key = archive.archive_object_key(ARCHIVE_PREFIX, month, self.run_id, self.segment)
+        handle = self.files.get(month)
+        if handle is None:
+            handle = self.files[month] = open(os.path.join(self.directory, f'{month}.ndjson.gz'), 'wb')
+            self.indexes[month] = {}
+        member = archive.encode_member(items)
+        entry = archive.segment_entry(key, handle.tell(), len(member), items)
+        handle.write(member)
+        self.indexes[month].setdefault(account_id, []).append(
+            [entry['offset'], entry['length'], entry['rows'], entry['first'], entry['last']])
+        self.segments.setdefault(account_id, []).append(entry)
+
+    def upload(self) -> int:
+        """Subir cada archivo y después su índice; retorna los bytes subidos"""
+        client = archive.get_client()
+        uploaded = 0
+        for month, handle in self.files.items():
+            handle.close()
+            key = archive.archive_object_key(ARCHIVE_PREFIX, month, self.run_id, self.segment)
+            with open(handle.name, 'rb') as body:
+                client.put_object(Bucket=ARCHIVE_BUCKET, Key=key, Body=body, ContentType='application/gzip')
+            client.put_object(Bucket=ARCHIVE_BUCKET, Key=archive.index_object_key(key),
+                              Body=json.dumps(self.indexes[month], separators=(',', ':')).encode(),
+                              ContentType='application/json')
+            uploaded += os.path.getsize(handle.name)
+        return uploaded
+
+    def close(self) -> None:
+        for handle in self.files.values():
+            handle.close()
+
+def get_archived(account_id: str) -> Optional[Dict[str, Any]]:
+    return dynamodb.get_item(TableName=TRANSACTIONS_TABLE, Key=archive.archived_key(account_id),
+                             ConsistentRead=True).get('Item')
+
+def already_archived(account_id: str, items: List[Dict[str, Any]]) -> set:
+    """Timestamps de estas filas que ya están en el archivo (corrida anterior interrumpida)"""
+    segments = archive.segments_of(ARCHIVE_BUCKET, get_archived(account_id))
+    first, last = items[0]['timestamp']['S'], items[-1]['timestamp']['S']
+    timestamps = set()
+    for segment in segments:
+        if segment['first'] <= last and segment['last'] >= first:
+            timestamps.update(item['timestamp']['S'] for item in archive.read_member(ARCHIVE_BUCKET, segment))
+    return timestamps
+
+def account_groups(segment: int, total_segments: int, cutoff: str) -> Iterator[Tuple[str, List[Dict[str, Any]]]]:
+    """Filas anteriores al corte de un segmento, agrupadas por cuenta (orden ascendente por timestamp)"""
+    scan_kwargs = {
+        'TableName': TRANSACTIONS_TABLE,
+        'FilterExpression': 'NOT begins_with(accountId, :summary) AND #timestamp < :cutoff',
+        'ExpressionAttributeNames': {'#timestamp': 'timestamp'},
+        'ExpressionAttributeValues': {':summary': {'S': SUMMARY_PREFIX}, ':cutoff': {'S': cutoff}},
+        'Segment': segment,
+        'TotalSegments': total_segments,
+        'Limit': PAGE_ITEMS
+    }
+    account_id, rows = None, []
+    while True:
+        response = dynamodb.scan(**scan_kwargs)
+        for item in response.get('Items', []):
+            if item['accountId']['S'] != account_id:
+                if rows:
+                    yield account_id, rows
+                account_id, rows = item['accountId']['S'], []
+            rows.append(item)
+        if not response.get('LastEvaluatedKey'):
+            break
+        scan_kwargs['ExclusiveStartKey'] = response['LastEvaluatedKey']
+    if rows:
+        yield account_id, rows
+
+# -- Fase 2: bucket ARCHIVED y borrados ----------------------------------------
+
+def publish_segments(account_id: str, segments: List[archive.Segment], cutoff: str, now: str) -> None:
+    """Agregar los segmentos y mover archivedBefore al corte (nunca hacia atrás) en una escritura"""
+    values = {
+        ':new': {'L': [archive.to_attribute(segment) for segment in segments]},
+        ':empty': {'L': []},
+        ':cutoff': {'S': cutoff},
+        ':updatedAt': {'S': now}
+    }
+    try:
+        dynamodb.update_item(
+            TableName=TRANSACTIONS_TABLE,
+            Key=archive.archived_key(account_id),
+            UpdateExpression='SET segments = list_append(if_not_exists(segments, :empty), :new), '
+                             'archivedBefore = :cutoff, updatedAt = :updatedAt',
+            ConditionExpression='attribute_not_exists(archivedBefore) OR archivedBefore <= :cutoff',
+            ExpressionAttributeValues=values
+        )
+    except dynamo.ClientError as e:
+        if e.response['Error']['Code'] != 'ConditionalCheckFailedException':
+            raise
+        # Una corrida con más días de antigüedad: el límite ya está más adelante
+        del values[':cutoff']
+        dynamodb.update_item(
+            TableName=TRANSACTIONS_TABLE,
+            Key=archive.archived_key(account_id),
+            UpdateExpression='SET segments = list_append(if_not_exists(segments, :empty), :new), '
+                             'updatedAt = :updatedAt',
+            ExpressionAttributeValues=values
+        )
+
+def compact_segments(account_id: str, run_id: str, now: str) -> bool:
+    """
+    Pasar los segmentos de la cuenta a un manifiesto nuevo si la lista del
+    bucket ARCHIVED supera INLINE_SEGMENTS. El cambio se condiciona a que la
+    lista y el manifiesto sigan iguales; si otra escritura ganó, la siguiente
+    corrida compacta. Los manifiestos anteriores quedan para la regla de ciclo
+    de vida del bucket (un lector en curso puede estar usándolos).
+    """
+    item = get_archived(account_id)
+    inline = len((item or {}).get('segments', {'L': []})['L'])
+    if inline <= INLINE_SEGMENTS:
+        return False
+    key = archive.manifest_object_key(ARCHIVE_PREFIX, account_id, run_id)
+    archive.get_client().put_object(
+        Bucket=ARCHIVE_BUCKET, Key=key,
+        Body=json.dumps(archive.segments_of(ARCHIVE_BUCKET, item), separators=(',', ':')).encode(),
+        ContentType='application/json'
+    )
+    values = {
+        ':manifest': {'S': key},
+        ':empty': {'L': []},
+        ':inline': {'N': str(inline)},
+        ':updatedAt': {'S': now}
+    }
+    condition = 'size(segments) = :inline AND attribute_not_exists(manifest)'
+    previous = archive.manifest_of(item)
+    if previous:
+        condition = 'size(segments) = :inline AND manifest = :previous'
+        values[':previous'] = {'S': previous}
+    try:
+        dynamodb.update_item(
+            TableName=TRANSACTIONS_TABLE,
+            Key=archive.archived_key(account_id),
+            UpdateExpression='SET manifest = :manifest, segments = :empty, updatedAt = :updatedAt',
+            ConditionExpression=condition,
+            ExpressionAttributeValues=values
+        )
+    except dynamo.ClientError as e:
+        if e.response['Error']['Code'] != 'ConditionalCheckFailedException':
+            raise
+        return False
+    return True
+
+def delete_rows(account_id: str, rows: List[Tuple[str, str, str]], now: str) -> Dict[str, int]:
+    """
+    Borrar filas (timestamp, amount, status) de una cuenta sumando sus totales
+    al bucket ARCHIVED en la misma transacción. Una fila que ya no existe
+    (borrada por una corrida anterior) se descarta y el lote se reintenta.
+    """
+    stats = Counter()
+    for attempt in range(DELETE_ATTEMPTS):
+        if not rows:
+            break
+        cents = [to_minor_units(amount) if status == STATUS_COMPLETED else 0 for _, amount, status in rows]
+        update = {
+            'TableName': TRANSACTIONS_TABLE,
+            'Key': archive.archived_key(account_id),
+            'UpdateExpression': 'ADD transactionCount :count, completedCount :completed, '
+                                'totalDebits :debits, totalCredits :credits, archiveVersion :one '
+                                'SET updatedAt = :updatedAt',
+            'ExpressionAttributeValues': {
+                ':count': {'N': str(len(rows))},
+                ':completed': {'N': str(sum(status == STATUS_COMPLETED for _, _, status in rows))},
+                ':debits': {'N': format_minor(sum(value for value in cents if value < 0))},
+                ':credits': {'N': format_minor(sum(value for value in cents if value > 0))},
+                ':one': {'N': '1'},
+                ':updatedAt': {'S': now}
+            }
+        }
+        deletes = [{'Delete': {
+            'TableName': TRANSACTIONS_TABLE,
+            'Key': {'accountId': {'S': account_id}, 'timestamp': {'S': timestamp}},
+            'ConditionExpression': 'attribute_exists(accountId)'
+        }} for timestamp, _, _ in rows]
+        try:
+            dynamodb.transact_write_items(TransactItems=deletes + [{'Update': update}])
+        except dynamo.ClientError as e:
+            if e.response['Error']['Code'] != 'TransactionCanceledException':
+                raise
+            stats['retries'] += 1
+            reasons = e.response.get('CancellationReasons', [])
+            rows = [row for row, reason in zip(rows, reasons)
+                    if reason.get('Code') != 'ConditionalCheckFailed']
+            continue
+        stats['deleted'] += len(rows)
+        return dict(stats)
+    if rows:
+        raise RuntimeError(f'Could not delete archived rows of {account_id} after {DELETE_ATTEMPTS} attempts')
+    return dict(stats)
+
+# -- Segmento ----------------------------------------------------------------
+
+def archive_segment(segment: int, total_segments: int, cutoff: str, run_id: str,
+                    work_dir: Optional[str] = None) -> Dict[str, int]:
+    """Archivar las filas anteriores al corte de un segmento de la tabla"""
+    directory = tempfile.mkdtemp(prefix=f'archive-{segment:05d}-', dir=work_dir)
+    files = MonthFiles(directory, run_id, segment)
+    stats = Counter()
+    now = datetime.utcnow().isoformat()
+    try:
+        # Filas a borrar volcadas a disco: en memoria solo queda una cuenta a la vez
+        with open(os.path.join(directory, 'deletes.tsv'), 'w') as deletes:
+            for account_id, rows in account_groups(segment, total_segments, cutoff):
+                skip = already_archived(account_id, rows)
+                months: Dict[str, List[Dict[str, Any]]] = {}
+                for item in rows:
+                    timestamp = item['timestamp']['S']
+                    deletes.write(f"{account_id}\t{timestamp}\t{item['amount']['N']}\t"
+                                  f"{item.get('status', {'S': STATUS_COMPLETED})['S']}\n")
+                    if timestamp not in skip:
+                        months.setdefault(timestamp[:7], []).append(item)
+                for month, items in months.items():
+                    files.add(account_id, month, items[::-1])
+                stats['accounts'] += 1
+                stats['rows'] += len(rows)
+                stats['alreadyArchived'] += len(skip)
+
+        stats['bytes'] += files.upload()
+        for account_id, segments in files.segments.items():
+            publish_segments(account_id, segments, cutoff, now)
+            stats['segments'] += len(segments)
+            stats['manifests'] += compact_segments(account_id, run_id, now)
+
+        for account_id, rows in _delete_groups(os.path.join(directory, 'deletes.tsv')):
+            for start in range(0, len(rows), DELETE_CHUNK):
+                stats.update(delete_rows(account_id, rows[start:start + DELETE_CHUNK], now))
+    finally:
+        files.close()
+        shutil.rmtree(directory, ignore_errors=True)
+    return dict(stats)
+
+def _delete_groups(path: str) -> Iterator[Tuple[str, List[Tuple[str, str, str]]]]:
+    account_id, rows = None, []
+    with open(path) as handle:
+        for line in handle:
+            row_account, timestamp, amount, status = line.rstrip('\n').split('\t')
+            if row_account != account_id:
+                if rows:
+                    yield account_id, rows
+                account_id, rows = row_account, []
+            rows.append((timestamp, amount, status))
+    if rows:
+        yield account_id, rows
+
+# -- Job ---------------------------------------------------------------------
+
+def archive_transactions(segments: int, workers: int, after_days: int,
+                         work_dir: Optional[str] = None, now: Optional[datetime] = None) -> Dict[str, Any]:
+    """Archivar todos los segmentos en paralelo y resumir la corrida"""
+    if not ARCHIVE_BUCKET:
+        raise ValueError('ARCHIVE_BUCKET_NAME is not configured')
+    now = now or datetime.utcnow()
+    cutoff = archive_cutoff(now, after_days)
+    run_id = f"{now.strftime('%Y%m%dT%H%M%S')}-{uuid.uuid4().hex[:8]}"
+    stats = Counter()
+    started = time.perf_counter()
+    with ThreadPoolExecutor(max_workers=workers, thread_name_prefix='archive') as pool:
+        futures = [pool.submit(archive_segment, segment, segments, cutoff, run_id, work_dir)
+                   for segment in range(segments)]
+        for future in futures:
+            stats.update(future.result())
+
+    for name in ('accounts', 'rows', 'alreadyArchived', 'segments', 'manifests', 'bytes', 'deleted', 'retries'):
+        stats[name] += 0
+    return {
+        'runId': run_id,
+        'archivedBefore': cutoff,
+        'totalSegments': segments,
+        'seconds': round(time.perf_counter() - started, 3),
+        **dict(sorted(stats.items()))
+    }
+
+def main() -> int:
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--segments', type=int, default=int(os.environ.get('ARCHIVE_SEGMENTS', '16')),
+                        help='TotalSegments del scan')
+    parser.add_argument('--workers', type=int, default=int(os.environ.get('ARCHIVE_WORKERS', '8')),
+                        help='Hilos del pool')
+    parser.add_argument('--after-days', type=int, default=int(os.environ.get('ARCHIVE_AFTER_DAYS', '90')),
+                        help='Antigüedad mínima de las filas archivadas')
+    parser.add_argument('--work-dir', default=os.environ.get('ARCHIVE_WORK_DIR'),
+                        help='Directorio de los archivos locales (por defecto el temporal del sistema)')
+    args = parser.parse_args()
+
+    summary = archive_transactions(args.segments, args.workers, args.after_days, args.work_dir)
+    print(f'[INFO] Archivo de transacciones: {json.dumps(summary)}')
+    return 0
+
+if __name__ == '__main__':
+    sys.exit(main())
@@ -0,0 +1,271 @@
+"""
+Backfill de agregados: construye los buckets DAY# y TOTAL de SUMMARY#<accountId>
+desde las filas del libro mayor.
+
+Los agregados solo los escriben las transferencias (en la misma transacción
+que sus filas), así que las filas anteriores a ellos (datos cargados o
+migrados) no están en ningún bucket y el resumen de get_transactions y el
+dashboard no las cuentan. Job de una sola vez (tarea de contenedor o CLI, como
+reconcile_ledger), que se puede repetir: solo escribe lo que falta.
+
+Scan segmentado de Accounts en un pool de hilos; por cada cuenta:
+
+1. Lee con lecturas consistentes sus buckets DAY# (los de la cuenta y los de
+   sus shards de saldo que el compactador todavía no pasó) y el bucket
+   ARCHIVED, y después sus filas: las de la tabla y las anteriores a
+   `archivedBefore` desde el archivo en S3.
+2. Por cada día en que las filas y los buckets no coinciden, suma la
+   diferencia al DAY# y al TOTAL de la cuenta en una transacción que
+   verifica que ningún bucket leído (ni el archivo) cambió desde la lectura:
+   una transferencia o un archivado concurrente cancela la transacción y la
+   cuenta se vuelve a calcular. La misma transacción incrementa el
+   `dataVersion` del cliente en Users, como una transferencia, para que el
+   dashboard no sirva su snapshot anterior.
+
+Uso:
+    PYTHONPATH=src/layers/common/python python src/jobs/backfill_summaries/main.py \\
+        --segments 16 --workers 8 [--dry-run]
+"""
+import argparse
+import json
+import os
+import sys
+import time
+from collections import Counter
+from concurrent.futures import ThreadPoolExecutor
+from datetime import datetime
+from typing import Dict, Any, Iterator, List, Optional, Tuple
+
+from banca_common import archive, dynamo
+from banca_common.dynamo import dynamodb
+from banca_common.items import STATUS_COMPLETED, SUMMARY_TOTAL_BUCKET, balance_shard_count, summary_partition
+from banca_common.records import format_minor, minor_units, to_minor_units
+
+ACCOUNTS_TABLE = os.environ['ACCOUNTS_TABLE_NAME']
+TRANSACTIONS_TABLE = os.environ['TRANSACTIONS_TABLE_NAME']
+USERS_TABLE = os.environ['USERS_TABLE_NAME']
+ARCHIVE_BUCKET = os.environ.get('ARCHIVE_BUCKET_NAME', '')
+# Items por página de scan (DynamoDB además corta cada página en 1 MB)
+PAGE_ITEMS = int(os.environ.get('BACKFILL_PAGE_ITEMS', '1000'))
+# Recálculos de una cuenta cuyas transacciones cancela una escritura concurrente
+BACKFILL_ATTEMPTS = 5
+
+# Conteos y montos (centavos) de un día: filas, filas COMPLETED y FAILED, débitos, créditos
+FIELDS = ('transactionCount', 'completedCount', 'failedCount', 'totalDebits', 'totalCredits')
+COUNT_FIELDS = 3
+
+Totals = List[int]
+
+def iter_accounts(segment: int, total_segments: int) -> Iterator[Dict[str, Any]]:
+    """Cuentas de un segmento de Accounts (accountId y shards de saldo)"""
+    scan_kwargs = {
+        'TableName': ACCOUNTS_TABLE,
+        'ProjectionExpression': 'accountId, customerId, balanceShards',
+        'Segment': segment,
+        'TotalSegments': total_segments,
+        'Limit': PAGE_ITEMS
+    }
+    while True:
+        response = dynamodb.scan(**scan_kwargs)
+        yield from response.get('Items', [])
+        if not response.get('LastEvaluatedKey'):
+            return
+        scan_kwargs['ExclusiveStartKey'] = response['LastEvaluatedKey']
+
+def query_all(query_kwargs: Dict[str, Any]) -> Iterator[Dict[str, Any]]:
+    """Items de una query consistente, todas las páginas"""
+    query_kwargs = dict(query_kwargs, ConsistentRead=True)
+    while True:
+        response = dynamodb.query(**query_kwargs)
+        yield from response.get('Items', [])
+        if not response.get('LastEvaluatedKey'):
+            return
+        query_kwargs['ExclusiveStartKey'] = response['LastEvaluatedKey']
+
+def read_days(partition: str) -> Dict[str, Dict[str, Any]]:
+    """Buckets DAY# de una partición de agregados, por nombre"""
+    return {bucket['timestamp']['S']: bucket for bucket in query_all({
+        'TableName': TRANSACTIONS_TABLE,
+        'KeyConditionExpression': 'accountId = :accountId AND begins_with(#timestamp, :day)',
+        'ExpressionAttributeNames': {'#timestamp': 'timestamp'},
+        'ExpressionAttributeValues': {':accountId': {'S': partition}, ':day': {'S': 'DAY#'}}
+    })}
+
+def read_rows(account_id: str, archived: Optional[Dict[str, Any]]) -> Iterator[Dict[str, Any]]:
+    """Filas de la cuenta: las de la tabla y, si hay archivo, las anteriores a `archivedBefore`"""
+    watermark = archive.archived_before(archived)
+    query_kwargs = {
+        'TableName': TRANSACTIONS_TABLE,
+        'KeyConditionExpression': 'accountId = :accountId',
+        'ExpressionAttributeValues': {':accountId': {'S': account_id}}
+    }
+    if watermark:
+        if not ARCHIVE_BUCKET:
+            raise ValueError(f'Account {account_id} has archived rows but ARCHIVE_BUCKET_NAME is not configured')
+        query_kwargs['KeyConditionExpression'] += ' AND #timestamp >= :watermark'
+        query_kwargs['ExpressionAttributeNames'] = {'#timestamp': 'timestamp'}
+        query_kwargs['ExpressionAttributeValues'][':watermark'] = {'S': watermark}
+        yield from archive.iter_archived(ARCHIVE_BUCKET, archive.segments_of(ARCHIVE_BUCKET, archived), None, None, watermark)
+    yield from query_all(query_kwargs)
+
+def row_totals(rows: Iterator[Dict[str, Any]]) -> Dict[str, Totals]:
+    """Totales por bucket DAY# de las filas (montos solo de las COMPLETED, como las transferencias)"""
+    days: Dict[str, Totals] = {}
+    for item in rows:
+        totals = days.setdefault(f"DAY#{item['timestamp']['S'][:10]}", [0] * len(FIELDS))
+        totals[0] += 1
+        status = item.get('status', {'S': STATUS_COMPLETED})['S']
+        if status != STATUS_COMPLETED:
+            totals[2] += status == 'FAILED'
+            continue
+        totals[1] += 1
+        amount = to_minor_units(item['amount']['N'])
+        totals[3 if amount < 0 else 4] += amount
+    return days
+
+def bucket_totals(bucket: Dict[str, Any]) -> Totals:
+    count = int(bucket.get('transactionCount', {'N': '0'})['N'])
+    completed = bucket.get('completedCount')
+    return [count, int(completed['N']) if completed else count,
+            int(bucket.get('failedCount', {'N': '0'})['N']),
+            minor_units(bucket, 'totalDebits'), minor_units(bucket, 'totalCredits')]
+
+def version_check(key: Dict[str, Any], item: Optional[Dict[str, Any]], name: str) -> Dict[str, Any]:
+    """ConditionCheck de que un item no cambió (ni apareció) desde que se leyó"""
+    check = {'TableName': TRANSACTIONS_TABLE, 'Key': key}
+    if item and name in item:
+        check['ConditionExpression'] = f'{name} = :seen'
+        check['ExpressionAttributeValues'] = {':seen': item[name]}
+    else:
+        check['ConditionExpression'] = f'attribute_not_exists({name})'
+    return {'ConditionCheck': check}
+
+def backfill_day(account: Dict[str, Any], day: str, delta: Totals, bucket: Optional[Dict[str, Any]],
+                 checks: List[Dict[str, Any]], now: str) -> bool:
+    """Sumar `delta` al DAY# y al TOTAL de la cuenta; False si algo leído cambió"""
+    account_id = account['accountId']['S']
+    values = {f':{field}': {'N': str(value) if index < COUNT_FIELDS else format_minor(value)}
+              for index, (field, value) in enumerate(zip(FIELDS, delta))}
+    values.update({':one': {'N': '1'}, ':updatedAt': {'S': now}})
+    # `ledgerVersion` cambia el ETag de get_transactions, como una transferencia
+    update_expression = ('ADD ' + ', '.join(f'{field} :{field}' for field in FIELDS) +
+                         ', ledgerVersion :one SET updatedAt = if_not_exists(updatedAt, :updatedAt)')
+    day_update = {
+        'TableName': TRANSACTIONS_TABLE,
+        'Key': {'accountId': {'S': summary_partition(account_id)}, 'timestamp': {'S': day}},
+        'UpdateExpression': update_expression,
+        'ExpressionAttributeValues': dict(values)
+    }
+    if bucket and 'ledgerVersion' in bucket:
+        day_update['ConditionExpression'] = 'ledgerVersion = :seen'
+        day_update['ExpressionAttributeValues'][':seen'] = bucket['ledgerVersion']
+    else:
+        day_update['ConditionExpression'] = 'attribute_not_exists(ledgerVersion)'
+    total_update = {
+        'TableName': TRANSACTIONS_TABLE,
+        'Key': {'accountId': {'S': summary_partition(account_id)}, 'timestamp': {'S': SUMMARY_TOTAL_BUCKET}},
+        'UpdateExpression': update_expression,
+        'ExpressionAttributeValues': values
+    }
+    data_version = {
+        'TableName': USERS_TABLE,
+        'Key': {'id': account['customerId']},
+        'UpdateExpression': 'ADD dataVersion :one SET accountsUpdatedAt = :updatedAt',
+        'ExpressionAttributeValues': {':one': {'N': '1'}, ':updatedAt': {'S': now}}
+    }
+    try:
+        dynamodb.transact_write_items(TransactItems=[{'Update': day_update}, {'Update': total_update},
+                                                     {'Update': data_version}] + checks)
+    except dynamo.ClientError as e:
+        if e.response['Error']['Code'] != 'TransactionCanceledException':
+            raise
+        return False
+    return True
+
+def backfill_account(account: Dict[str, Any], dry_run: bool) -> Dict[str, int]:
+    """Completar los agregados de una cuenta; reintenta si una escritura concurrente la cambia"""
+    account_id = account['accountId']['S']
+    shards = balance_shard_count(account)
+    stats = Counter()
+    for attempt in range(BACKFILL_ATTEMPTS):
+        # Primero los buckets y después las filas: una escritura entre las dos
+        # lecturas cambia alguna versión y cancela la transacción
+        archived = dynamodb.get_item(TableName=TRANSACTIONS_TABLE, Key=archive.archived_key(account_id),
+                                     ConsistentRead=True).get('Item')
+        main_days = read_days(summary_partition(account_id))
+        shard_days = [read_days(summary_partition(account_id, shard)) for shard in range(shards)]
+        rows = row_totals(read_rows(account_id, archived))
+
+        now = datetime.utcnow().isoformat()
+        pending: List[Tuple[str, Totals]] = []
+        for day in sorted(set(rows) | set(main_days) | {name for days in shard_days for name in days}):
+            buckets = [days[day] for days in [main_days] + shard_days if day in days]
+            current = [sum(values) for values in zip([0] * len(FIELDS), *(bucket_totals(b) for b in buckets))]
+            delta = [row - bucket for row, bucket in zip(rows.get(day, [0] * len(FIELDS)), current)]
+            if any(delta):
+                pending.append((day, delta))
+        if dry_run or not pending:
+            stats['days'] += len(pending)
+            return dict(stats)
+
+        conflict = False
+        for day, delta in pending:
+            checks = [version_check(archive.archived_key(account_id), archived, 'archiveVersion')]
+            checks += [version_check({'accountId': {'S': summary_partition(account_id, shard)},
+                                      'timestamp': {'S': day}}, days.get(day), 'ledgerVersion')
+                       for shard, days in enumerate(shard_days)]
+            if not backfill_day(account, day, delta, main_days.get(day), checks, now):
+                conflict = True
+                break
+            stats['days'] += 1
+        if not conflict:
+            return dict(stats)
+        stats['conflicts'] += 1
+    raise RuntimeError(f'Could not backfill summaries of {account_id} after {BACKFILL_ATTEMPTS} attempts')
+
+def backfill_segment(segment: int, total_segments: int, dry_run: bool) -> Dict[str, int]:
+    """Completar los agregados de las cuentas de un segmento de Accounts"""
+    stats = Counter()
+    for account in iter_accounts(segment, total_segments):
+        try:
+            stats.update(backfill_account(account, dry_run))
+        except (RuntimeError, ValueError) as e:
+            print(f"[ERROR] {str(e)}")
+            stats['failed'] += 1
+        stats['accounts'] += 1
+    return dict(stats)
+
+def backfill_summaries(segments: int, workers: int, dry_run: bool = False) -> Dict[str, Any]:
+    """Completar los agregados de todas las cuentas en paralelo y resumir la corrida"""
+    stats = Counter()
+    started = time.perf_counter()
+    with ThreadPoolExecutor(max_workers=workers, thread_name_prefix='backfill') as pool:
+        futures = [pool.submit(backfill_segment, segment, segments, dry_run) for segment in range(segments)]
+        for future in futures:
+            stats.update(future.result())
+
+    for name in ('accounts', 'days', 'conflicts', 'failed'):
+        stats[name] += 0
+    return {
+        'dryRun': dry_run,
+        'totalSegments': segments,
+        'seconds': round(time.perf_counter() - started, 3),
+        **dict(sorted(stats.items()))
+    }
+
+def main() -> int:
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--segments', type=int, default=int(os.environ.get('BACKFILL_SEGMENTS', '16')),
+                        help='TotalSegments del scan de Accounts')
+    parser.add_argument('--workers', type=int, default=int(os.environ.get('BACKFILL_WORKERS', '8')),
+                        help='Hilos del pool')
+    parser.add_argument('--dry-run', action='store_true',
+                        help='Solo contar los días con diferencias, sin escribir')
+    args = parser.parse_args()
+
+    summary = backfill_summaries(args.segments, args.workers, args.dry_run)
+    print(f'[INFO] Backfill de agregados: {json.dumps(summary)}')
+    return 1 if summary['failed'] else 0
+
+if __name__ == '__main__':
+    sys.exit(main())
@@ -0,0 +1,370 @@
+"""
+Estados de cuenta mensuales: saldo inicial, movimientos con saldo corrido y
+saldo final de cada cuenta para un mes.
+
+Job por lotes (tarea de contenedor o CLI, como reconcile_ledger). Las cuentas
+salen de scans segmentados de Accounts repartidos en un pool de procesos;
+cada worker genera los estados de su segmento de a una cuenta, leyendo el
+libro mayor del mes por páginas (y del archivo en S3 si el mes ya se
+archivó) y escribiendo cada fila a medida que llega: en memoria solo hay una
+página de filas y una página del documento.
+
+- Saldo inicial: `openingBalance` de la cuenta más los agregados DAY#
+  anteriores al mes (se leen en la misma query que el bucket ARCHIVED y los
+  DAY# del mes). Una cuenta sin `openingBalance` no tiene estado. En una
+  cuenta con saldo repartido se suman también los DAY# de sus shards que el
+  compactador todavía no pasó a la cuenta.
+- Los totales de las filas del mes se comparan con sus DAY#; si no
+  coinciden el estado no se publica y la cuenta va al reporte.
+
+Formatos por cuenta en <output>/<YYYY-MM>/<customerId>/<accountId>.<ext>:
+`csv` (una fila por movimiento con el saldo corrido) y `pages` (NDJSON listo
+para un renderizador de PDF: encabezado, una línea por página impresa con
+saldo anterior y saldo a transportar, y cierre). Con STATEMENTS_BUCKET_NAME
+los archivos se suben a S3 y se borran del disco. El índice del mes queda en
+statements-<segmento>.ndjson y summary.json.
+
+Uso:
+    PYTHONPATH=src/layers/common/python python src/jobs/monthly_statements/main.py \\
+        --period 2026-09 --segments 64 --workers 8 --output-dir /tmp/statements
+"""
+import argparse
+import csv
+import json
+import multiprocessing
+import os
+import sys
+import time
+from collections import Counter
+from concurrent.futures import ProcessPoolExecutor
+from datetime import date, datetime, timedelta
+from typing import Dict, Any, Iterator, List, Optional, Tuple
+
+from banca_common import archive
+from banca_common.dynamo import dynamodb
+from banca_common.items import STATUS_COMPLETED, SUMMARY_ARCHIVED_BUCKET, balance_shard_count, summary_partition
+from banca_common.records import Transaction, format_amount, format_minor, minor_units, money
+from banca_common.responses import RawJSON, encode_object
+
+ACCOUNTS_TABLE = os.environ['ACCOUNTS_TABLE_NAME']
+TRANSACTIONS_TABLE = os.environ['TRANSACTIONS_TABLE_NAME']
+ARCHIVE_BUCKET = os.environ.get('ARCHIVE_BUCKET_NAME', '')
+STATEMENTS_BUCKET = os.environ.get('STATEMENTS_BUCKET_NAME', '')
+STATEMENTS_PREFIX = os.environ.get('STATEMENTS_PREFIX', 'statements/')
+# Items por página de scan y de query del libro mayor
+PAGE_ITEMS = int(os.environ.get('STATEMENT_PAGE_ITEMS', '1000'))
+# Movimientos por página impresa del formato `pages`
+PAGE_LINES = int(os.environ.get('STATEMENT_PAGE_LINES', '40'))
+FORMATS = ('csv', 'pages')
+CSV_FIELDS = ['timestamp', 'type', 'counterparty', 'note', 'status', 'transferId', 'amount', 'balance']
+
+def period_bounds(period: str) -> Tuple[str, str]:
+    """Primer y último día (YYYY-MM-DD) de un mes YYYY-MM; lanza ValueError si es inválido"""
+    first = datetime.strptime(period, '%Y-%m').date()
+    following = (first.replace(day=28) + timedelta(days=4)).replace(day=1)
+    return first.isoformat(), (following - timedelta(days=1)).isoformat()
+
+def previous_period(today: date) -> str:
+    return (today.replace(day=1) - timedelta(days=1)).strftime('%Y-%m')
+
+# -- Lecturas ----------------------------------------------------------------
+
+def summary_buckets(partition: str, last_day: str) -> Iterator[Dict[str, Any]]:
+    """
+    Bucket ARCHIVED y DAY# de una partición de agregados hasta el último día
+    del mes ('ARCHIVED' < 'DAY#...' en el orden de la clave)
+    """
+    query_kwargs = {
+        'TableName': TRANSACTIONS_TABLE,
+        'KeyConditionExpression': 'accountId = :accountId AND #timestamp BETWEEN :archived AND :lastDay',
+        'ExpressionAttributeNames': {'#timestamp': 'timestamp'},
+        'ExpressionAttributeValues': {
+            ':accountId': {'S': partition},
+            ':archived': {'S': SUMMARY_ARCHIVED_BUCKET},
+            ':lastDay': {'S': f'DAY#{last_day}'}
+        },
+        'ConsistentRead': True,
+        'Limit': PAGE_ITEMS
+    }
+    while True:
+        response = dynamodb.query(**query_kwargs)
+        yield from response.get('Items', [])
+        if not response.get('LastEvaluatedKey'):
+            return
+        query_kwargs['ExclusiveStartKey'] = response['LastEvaluatedKey']
+
+def period_rows(account_id: str, period: str, archived: Optional[Dict[str, Any]]) -> Iterator[Dict[str, Any]]:
+    """
+    Filas del mes, más viejas primero, por páginas. `archivedBefore` siempre es
+    un primer día de mes: un mes anterior está entero en el archivo y uno
+    posterior entero en la tabla (la misma regla que get_transactions).
+    """
+    watermark = archive.archived_before(archived) if ARCHIVE_BUCKET else None
+    first_day, last_day = period_bounds(period)
+    if watermark and first_day < watermark:
+        following = (date.fromisoformat(last_day) + timedelta(days=1)).isoformat()
+        yield from archive.iter_archived(ARCHIVE_BUCKET, archive.segments_of(ARCHIVE_BUCKET, archived), first_day, None,
+                                         min(watermark, following), ascending=True)
+        return
+
+    query_kwargs = {
+        'TableName': TRANSACTIONS_TABLE,
+        'KeyConditionExpression': 'accountId = :accountId AND begins_with(#timestamp, :period)',
+        'ExpressionAttributeNames': {'#timestamp': 'timestamp'},
+        'ExpressionAttributeValues': {':accountId': {'S': account_id}, ':period': {'S': period}},
+        'ScanIndexForward': True,
+        'Limit': PAGE_ITEMS
+    }
+    while True:
+        response = dynamodb.query(**query_kwargs)
+        yield from response.get('Items', [])
+        if not response.get('LastEvaluatedKey'):
+            return
+        query_kwargs['ExclusiveStartKey'] = response['LastEvaluatedKey']
+
+# -- Documento ---------------------------------------------------------------
+
+class StatementWriter:
+    """Escribe un estado de cuenta fila por fila en los formatos pedidos"""
+
+    def __init__(self, base_path: str, formats: List[str], header: Dict[str, Any], opening: int):
+        self.paths = {name: f'{base_path}.{"csv" if name == "csv" else "pages.ndjson"}' for name in formats}
+        os.makedirs(os.path.dirname(base_path), exist_ok=True)
+        self.files = {name: open(path, 'w', newline='') for name, path in self.paths.items()}
+        self.csv = csv.writer(self.files['csv']) if 'csv' in self.files else None
+        if self.csv:
+            self.csv.writerow(CSV_FIELDS)
+        self.pages = self.files.get('pages')
+        if self.pages:
+            self.pages.write(encode_object(dict(header, record='header')) + '\n')
+        self.page: List[RawJSON] = []
+        self.page_number = 0
+        self.brought_forward = opening
+
+    def add(self, transaction: Transaction, balance: int) -> None:
+        if self.csv:
+            self.csv.writerow([transaction.timestamp, transaction.type, transaction.counterparty, transaction.note,
+                               transaction.status, transaction.transfer_id, format_amount(transaction.raw_amount),
+                               format_minor(balance)])
+        if self.pages:
+            self.page.append(RawJSON(encode_object({
+                'timestamp': transaction.timestamp,
+                'type': transaction.type,
+                'counterparty': transaction.counterparty,
+                'note': transaction.note,
+                'status': transaction.status,
+                'amount': RawJSON(format_amount(transaction.raw_amount)),
+                'balance': money(balance)
+            })))
+            if len(self.page) == PAGE_LINES:
+                self._flush_page(balance)
+
+    def _flush_page(self, balance: int) -> None:
+        self.page_number += 1
+        self.pages.write(encode_object({
+            'record': 'page',
+            'page': self.page_number,
+            'broughtForward': money(self.brought_forward),
+            'lines': RawJSON('[' + ','.join(self.page) + ']'),
+            'carriedForward': money(balance)
+        }) + '\n')
+        self.page = []
+        self.brought_forward = balance
+
+    def close(self, footer: Dict[str, Any], closing: int) -> None:
+        if self.pages:
+            if self.page or not self.page_number:
+                self._flush_page(closing)
+            self.pages.write(encode_object(dict(footer, record='footer', pages=self.page_number)) + '\n')
+        for handle in self.files.values():
+            handle.close()
+
+    def discard(self) -> None:
+        for handle in self.files.values():
+            handle.close()
+        for path in self.paths.values():
+            os.remove(path)
+
+def account_statement(account: Dict[str, Any], period: str, output_dir: str,
+                      formats: List[str]) -> Tuple[Optional[Dict[str, Any]], Counter]:
+    """
+    Generar el estado de una cuenta; retorna su línea del índice (o None si no
+    tiene estado) y los contadores
+    """
+    stats = Counter()
+    account_id, customer_id = account['accountId']['S'], account['customerId']['S']
+    if 'openingBalance' not in account:
+        stats['unbaselined'] += 1
+        return None, stats
+
+    first_day, last_day = period_bounds(period)
+    opening = minor_units(account, 'openingBalance')
+    archived = None
+    # Totales de los DAY# del mes: [filas COMPLETED, débitos, créditos]
+    expected = [0, 0, 0]
+    partitions = [summary_partition(account_id)] + [summary_partition(account_id, shard)
+                                                    for shard in range(balance_shard_count(account))]
+    for bucket in (bucket for partition in partitions for bucket in summary_buckets(partition, last_day)):
+        if bucket['timestamp']['S'] == SUMMARY_ARCHIVED_BUCKET:
+            archived = bucket
+        elif bucket['timestamp']['S'] < f'DAY#{first_day}':
+            opening += minor_units(bucket, 'totalDebits') + minor_units(bucket, 'totalCredits')
+        else:
+            completed = bucket.get('completedCount', bucket['transactionCount'])
+            expected[0] += int(completed['N'])
+            expected[1] += minor_units(bucket, 'totalDebits')
+            expected[2] += minor_units(bucket, 'totalCredits')
+
+    header = {
+        'accountId': account_id,
+        'customerId': customer_id,
+        'accountName': account.get('accountName', {'S': ''})['S'],
+        'accountType': account.get('accountType', {'S': ''})['S'],
+        'currency': account.get('currency', {'S': 'USD'})['S'],
+        'period': period,
+        'openingBalance': money(opening)
+    }
+    writer = StatementWriter(os.path.join(output_dir, period, customer_id, account_id), formats, header, opening)
+    balance = opening
+    actual = [0, 0, 0]
+    rows = 0
+    try:
+        for item in period_rows(account_id, period, archived):
+            transaction = Transaction.from_item(item)
+            if transaction.status == STATUS_COMPLETED:
+                amount = transaction.amount
+                balance += amount
+                actual[0] += 1
+                actual[1 if amount < 0 else 2] += amount
+            writer.add(transaction, balance)
+            rows += 1
+    except Exception:
+        writer.discard()
+        raise
+
+    totals = {'transactionCount': rows, 'completedCount': actual[0],
+              'totalDebits': money(actual[1]), 'totalCredits': money(actual[2])}
+    if actual != expected:
+        # Los agregados del mes no coinciden con las filas: no se emite el estado
+        writer.discard()
+        stats['mismatch'] += 1
+        return {'accountId': account_id, 'customerId': customer_id, 'period': period, 'mismatch': True,
+                'expected': RawJSON(encode_object({'completedCount': expected[0], 'totalDebits': money(expected[1]),
+                                                   'totalCredits': money(expected[2])})),
+                'actual': RawJSON(encode_object(totals))}, stats
+
+    writer.close(dict(totals, closingBalance=money(balance)), balance)
+    files = publish(writer.paths, output_dir)
+    stats['statements'] += 1
+    stats['rows'] += rows
+    return dict(header, closingBalance=money(balance), files=files, **totals), stats
+
+def publish(paths: Dict[str, str], output_dir: str) -> List[str]:
+    """Subir los archivos a STATEMENTS_BUCKET_NAME (y borrarlos del disco) o dejarlos en output_dir"""
+    if not STATEMENTS_BUCKET:
+        return [os.path.relpath(path, output_dir) for path in paths.values()]
+
+    client = archive.get_client()
+    keys = []
+    for path in paths.values():
+        key = STATEMENTS_PREFIX + os.path.relpath(path, output_dir).replace(os.sep, '/')
+        with open(path, 'rb') as body:
+            client.put_object(Bucket=STATEMENTS_BUCKET, Key=key, Body=body,
+                              ContentType='text/csv' if path.endswith('.csv') else 'application/x-ndjson')
+        os.remove(path)
+        keys.append(key)
+    return keys
+
+# -- Segmento ----------------------------------------------------------------
+
+def statements_segment(segment: int, total_segments: int, period: str, output_dir: str,
+                       formats: List[str]) -> Dict[str, int]:
+    """Generar los estados de las cuentas de un segmento de Accounts, de a una cuenta"""
+    scan_kwargs = {
+        'TableName': ACCOUNTS_TABLE,
+        'ProjectionExpression': 'accountId, customerId, accountName, accountType, currency, openingBalance, '
+                                'balanceShards',
+        'Segment': segment,
+        'TotalSegments': total_segments,
+        'Limit': PAGE_ITEMS
+    }
+    stats = Counter()
+    index_path = os.path.join(output_dir, f'statements-{segment:05d}.ndjson')
+    with open(index_path, 'w') as index:
+        while True:
+            response = dynamodb.scan(**scan_kwargs)
+            for account in response.get('Items', []):
+                stats['accounts'] += 1
+                entry, account_stats = account_statement(account, period, output_dir, formats)
+                stats.update(account_stats)
+                if entry is not None:
+                    index.write(encode_object(entry) + '\n')
+            if not response.get('LastEvaluatedKey'):
+                break
+            scan_kwargs['ExclusiveStartKey'] = response['LastEvaluatedKey']
+    if not stats['accounts']:
+        os.remove(index_path)
+    return dict(stats)
+
+# -- Job ---------------------------------------------------------------------
+
+def generate_statements(period: str, segments: int, workers: int, output_dir: str,
+                        formats: Optional[List[str]] = None) -> Dict[str, Any]:
+    """Generar los estados del mes en paralelo y escribir summary.json en output_dir"""
+    formats = formats or list(FORMATS)
+    period_bounds(period)
+    os.makedirs(output_dir, exist_ok=True)
+    stats = Counter()
+    started = time.perf_counter()
+    # fork: igual que reconcile_ledger, cada worker crea sus clientes en su primera llamada
+    context = multiprocessing.get_context('fork')
+    with ProcessPoolExecutor(max_workers=workers, mp_context=context) as pool:
+        futures = [pool.submit(statements_segment, segment, segments, period, output_dir, formats)
+                   for segment in range(segments)]
+        for future in futures:
+            stats.update(future.result())
+
+    for name in ('accounts', 'statements', 'rows', 'unbaselined', 'mismatch'):
+        stats[name] += 0
+    summary = {
+        'period': period,
+        'segments': segments,
+        'formats': formats,
+        'seconds': round(time.perf_counter() - started, 3),
+        **dict(sorted(stats.items())),
+        'indexes': sorted(name for name in os.listdir(output_dir) if name.startswith('statements-'))
+    }
+    with open(os.path.join(output_dir, 'summary.json'), 'w') as handle:
+        json.dump(summary, handle, indent=2)
+    return summary
+
+def main() -> int:
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--period', default=os.environ.get('STATEMENT_PERIOD') or previous_period(date.today()),
+                        help='Mes YYYY-MM (por defecto el anterior)')
+    parser.add_argument('--segments', type=int, default=int(os.environ.get('STATEMENT_SEGMENTS', '64')),
+                        help='TotalSegments del scan de Accounts')
+    parser.add_argument('--workers', type=int, default=int(os.environ.get('STATEMENT_WORKERS', os.cpu_count() or 1)),
+                        help='Procesos del pool')
+    parser.add_argument('--output-dir', default=os.environ.get('STATEMENT_OUTPUT_DIR', 'statements'),
+                        help='Directorio de los estados y del índice')
+    parser.add_argument('--formats', default=os.environ.get('STATEMENT_FORMATS', ','.join(FORMATS)),
+                        help='Formatos separados por coma: csv, pages')
+    args = parser.parse_args()
+
+    formats = [name for name in args.formats.split(',') if name]
+    if not formats or any(name not in FORMATS for name in formats):
+        parser.error(f'--formats must be a comma-separated subset of: {", ".join(FORMATS)}')
+    try:
+        period_bounds(args.period)
+    except ValueError:
+        parser.error('--period must be YYYY-MM')
+
+    summary = generate_statements(args.period, args.segments, args.workers, args.output_dir, formats)
+    print(f'[INFO] Estados de cuenta: {json.dumps(summary)}')
+    if summary['mismatch']:
+        print(f"[ERROR] {summary['mismatch']} cuentas con agregados distintos de sus filas: {args.output_dir}")
+    return 1 if summary['mismatch'] else 0
+
+if __name__ == '__main__':
+    sys.exit(main())
@@ -0,0 +1,530 @@
+"""
+Conciliación del libro mayor: saldo de cada cuenta contra sus filas en Transactions.
+
+Job por lotes (tarea de contenedor o CLI, no Lambda: usa un pool de procesos
+y disco local). Por cada cuenta verifica:
+
+- balance: `balance` del item más sus shards de saldo igual a `openingBalance`
+  más la suma de las filas COMPLETED del libro mayor;
+- summary: el bucket TOTAL de SUMMARY#<accountId> igual a los conteos y
+  totales de las filas;
+- orphanLedger: filas o agregados de una cuenta que ya no existe.
+
+Las filas movidas al archivo en S3 (archive_transactions) cuentan por los
+totales de su bucket ARCHIVED, que se escriben en la misma transacción que
+las borra de la tabla.
+
+Fase 1: scans segmentados (Segment/TotalSegments) de Transactions, Accounts y
+BalanceShards (shards de saldo) repartidos en el pool. Cada página se suma por
+cuenta con operaciones vectorizadas (numpy si está instalado) y los parciales
+se vuelcan a disco en `partitions` archivos por crc32(accountId): un worker
+nunca tiene en memoria más que una página.
+
+Fase 2: un worker por partición suma los parciales de sus cuentas y compara.
+Una partición que no entra en el presupuesto de memoria se vuelve a partir en
+disco antes de cargarla. Los scans no son una foto (una transferencia
+concurrente puede verse en una tabla y no en la otra), así que las cuentas con
+diferencias se releen con lecturas consistentes y solo las que siguen
+distintas van al reporte NDJSON (drift-<partición>.ndjson y summary.json).
+
+Uso:
+    PYTHONPATH=src/layers/common/python python src/jobs/reconcile_ledger/main.py \\
+        --segments 64 --workers 8 --report-dir /tmp/reconcile
+"""
+import argparse
+import json
+import multiprocessing
+import os
+import shutil
+import sys
+import tempfile
+import time
+import zlib
+from collections import Counter
+from concurrent.futures import ProcessPoolExecutor
+from typing import Dict, Any, Iterator, List, Optional, Tuple
+
+from banca_common import dynamo
+from banca_common.balances import pending_summary_keys
+from banca_common.dynamo import dynamodb
+from banca_common.items import (
+    STATUS_COMPLETED, SUMMARY_ARCHIVED_BUCKET, SUMMARY_PREFIX, SUMMARY_TOTAL_BUCKET,
+    balance_shard_account_id, balance_shard_count, balance_shard_key, summary_account_id, summary_partition
+)
+from banca_common.records import format_minor, minor_units, money, to_minor_units
+from banca_common.responses import RawJSON, encode_object
+
+# numpy es opcional: sin él las sumas por cuenta se hacen con un dict
+try:
+    import numpy as np
+except ImportError:
+    np = None
+
+ACCOUNTS_TABLE = os.environ['ACCOUNTS_TABLE_NAME']
+TRANSACTIONS_TABLE = os.environ['TRANSACTIONS_TABLE_NAME']
+BALANCE_SHARDS_TABLE = os.environ['BALANCE_SHARDS_TABLE_NAME']
+# Items por página de scan (DynamoDB además corta cada página en 1 MB)
+PAGE_ITEMS = int(os.environ.get('RECONCILE_PAGE_ITEMS', '5000'))
+# Relecturas de una cuenta con diferencias mientras una transferencia la cambia
+RECHECK_ATTEMPTS = 3
+# Memoria por byte de parciales al cargar una partición (strings, listas y arrays)
+LOAD_EXPANSION = 8
+# Archivos por re-partición y niveles máximos (una sola cuenta no se puede partir)
+SPLIT_FANOUT = 16
+MAX_SPLIT_LEVELS = 4
+
+# Parciales por cuenta: tipo y cuatro enteros (conteos o centavos)
+LEDGER = 'L'    # filas, filas COMPLETED, débitos, créditos (de las COMPLETED)
+TOTAL = 'T'     # transactionCount, completedCount, totalDebits, totalCredits del bucket TOTAL
+ACCOUNT = 'A'   # balance, openingBalance, 1 si tiene openingBalance, 0
+SHARD = 'S'     # saldo de los shards, 0, 0, 0
+ROW_WIDTH = 4
+# Contadores del resumen con diferencias confirmadas, por verificación
+DRIFT_STATS = ('balanceDrift', 'summaryDrift', 'orphanLedgerDrift')
+
+Records = Dict[str, List[int]]
+
+# (tabla, parámetros) del scan de cada fuente de la fase 1
+SCANS = {
+    'transactions': (TRANSACTIONS_TABLE, {
+        'ProjectionExpression': 'accountId, #timestamp, amount, #status, '
+                                'transactionCount, completedCount, totalDebits, totalCredits',
+        'ExpressionAttributeNames': {'#timestamp': 'timestamp', '#status': 'status'}
+    }),
+    'accounts': (ACCOUNTS_TABLE, {
+        'ProjectionExpression': 'accountId, balance, openingBalance'
+    }),
+    'shards': (BALANCE_SHARDS_TABLE, {
+        'ProjectionExpression': 'shardId, balance'
+    })
+}
+
+def partition_of(account_id: str, partitions: int, level: int = 0) -> int:
+    """Partición de una cuenta; cada nivel de re-partición usa otra función de hash"""
+    return zlib.crc32(f'{level}#{account_id}'.encode()) % partitions
+
+# -- Sumas por cuenta --------------------------------------------------------
+
+def group_sums(keys: List[str], rows: Any) -> Tuple[List[str], List[List[int]]]:
+    """Sumar por clave filas de ROW_WIDTH enteros"""
+    if np is not None and len(keys) > 1:
+        unique, inverse = np.unique(np.array(keys), return_inverse=True)
+        sums = np.zeros((len(unique), ROW_WIDTH), dtype=np.int64)
+        np.add.at(sums, inverse, np.asarray(rows, dtype=np.int64).reshape(-1, ROW_WIDTH))
+        return unique.tolist(), sums.tolist()
+
+    grouped: Dict[str, List[int]] = {}
+    for key, row in zip(keys, rows):
+        total = grouped.get(key)
+        if total is None:
+            grouped[key] = [int(value) for value in row]
+        else:
+            for position in range(ROW_WIDTH):
+                total[position] += int(row[position])
+    return list(grouped), list(grouped.values())
+
+def ledger_rows(amounts: List[str], statuses: List[str]) -> Any:
+    """Filas [1, completada, débito, crédito] (centavos) de las filas del libro mayor"""
+    if np is None:
+        rows = []
+        for amount, status in zip(amounts, statuses):
+            cents = to_minor_units(amount) if status == STATUS_COMPLETED else 0
+            rows.append([1, int(status == STATUS_COMPLETED), min(cents, 0), max(cents, 0)])
+        return rows
+
+    values = np.array(amounts)
+    # Hasta dos decimales float * 100 redondeado es exacto (como to_minor_units);
+    # los montos con más decimales se convierten uno por uno con Decimal
+    cents = np.rint(values.astype(np.float64) * 100).astype(np.int64)
+    dots = np.char.find(values, '.')
+    for position in np.flatnonzero((dots >= 0) & (np.char.str_len(values) - dots > 3)):
+        cents[position] = to_minor_units(amounts[position])
+    completed = np.array(statuses) == STATUS_COMPLETED
+    cents = np.where(completed, cents, 0)
+    return np.column_stack([np.ones(len(amounts), dtype=np.int64), completed.astype(np.int64),
+                            np.minimum(cents, 0), np.maximum(cents, 0)])
+
+def ledger_records(items: List[Dict[str, Any]]) -> Tuple[List[str], List[List[int]]]:
+    """Filas del libro mayor sumadas por cuenta"""
+    if not items:
+        return [], []
+    return group_sums([item['accountId']['S'] for item in items],
+                      ledger_rows([item['amount']['N'] for item in items],
+                                  [item['status']['S'] for item in items]))
+
+def total_row(item: Dict[str, Any]) -> List[int]:
+    # Un bucket ARCHIVED todavía sin filas borradas no tiene totales
+    count = int(item.get('transactionCount', {'N': '0'})['N'])
+    completed = item.get('completedCount')
+    return [count, int(completed['N']) if completed else count,
+            minor_units(item, 'totalDebits'), minor_units(item, 'totalCredits')]
+
+def account_row(item: Dict[str, Any]) -> List[int]:
+    opening = item.get('openingBalance')
+    return [minor_units(item, 'balance'), minor_units(item, 'openingBalance'), int(opening is not None), 0]
+
+def page_records(source: str, items: List[Dict[str, Any]]) -> Iterator[Tuple[str, List[str], List[List[int]]]]:
+    """(tipo, cuentas, filas) de una página de scan, ya sumados por cuenta"""
+    if source == 'accounts':
+        yield ACCOUNT, [item['accountId']['S'] for item in items], [account_row(item) for item in items]
+    elif source == 'shards':
+        yield (SHARD,) + group_sums([balance_shard_account_id(item) for item in items],
+                                    [[minor_units(item, 'balance'), 0, 0, 0] for item in items])
+    else:
+        ledger, totals, archived = [], [], []
+        for item in items:
+            if not item['accountId']['S'].startswith(SUMMARY_PREFIX):
+                ledger.append(item)
+            elif item['timestamp']['S'] == SUMMARY_TOTAL_BUCKET:
+                # Los buckets DAY# no se concilian: los lee el dashboard, el TOTAL es el que suma
+                # todo. Los TOTAL de los shards de saldo (aún sin compactar) suman a su cuenta
+                totals.append(item)
+            elif item['timestamp']['S'] == SUMMARY_ARCHIVED_BUCKET:
+                archived.append(item)
+        yield (LEDGER,) + ledger_records(ledger)
+        # Las filas archivadas suman al libro mayor como si siguieran en la tabla
+        yield LEDGER, [item['accountId']['S'][len(SUMMARY_PREFIX):] for item in archived], \
+            [total_row(item) for item in archived]
+        yield (TOTAL,) + group_sums([summary_account_id(item['accountId']['S']) for item in totals],
+                                    [total_row(item) for item in totals])
+
+# -- Fase 1: scans segmentados -------------------------------------------------
+
+class SpillWriter:
+    """Parciales de un scan volcados a disco, un archivo por partición"""
+
+    def __init__(self, directory: str, name: str, partitions: int):
+        self.directory = directory
+        self.name = name
+        self.partitions = partitions
+        self.files: Dict[int, Any] = {}
+        self.written = 0
+
+    def write(self, kind: str, keys: List[str], rows: List[List[int]]) -> None:
+        for account_id, row in zip(keys, rows):
+            partition = partition_of(account_id, self.partitions)
+            handle = self.files.get(partition)
+            if handle is None:
+                directory = os.path.join(self.directory, f'{partition:05d}')
+                os.makedirs(directory, exist_ok=True)
+                handle = self.files[partition] = open(os.path.join(directory, f'{self.name}.tsv'), 'w')
+            handle.write(f'{account_id}\t{kind}\t' + '\t'.join(str(value) for value in row) + '\n')
+            self.written += 1
+
+    def close(self) -> None:
+        for handle in self.files.values():
+            handle.close()
+
+def scan_segment(source: str, segment: int, total_segments: int, spill_dir: str,
+                 partitions: int) -> Dict[str, int]:
+    """Recorrer un segmento de una fuente y volcar sus parciales por cuenta"""
+    table_name, params = SCANS[source]
+    scan_kwargs = dict(params, TableName=table_name, Segment=segment, TotalSegments=total_segments,
+                       Limit=PAGE_ITEMS)
+    writer = SpillWriter(spill_dir, f'{source}-{segment:05d}', partitions)
+    stats = Counter()
+    try:
+        while True:
+            response = dynamodb.scan(**scan_kwargs)
+            items = response.get('Items', [])
+            stats['pages'] += 1
+            stats[f'{source}Items'] += len(items)
+            for kind, keys, rows in page_records(source, items):
+                writer.write(kind, keys, rows)
+            if not response.get('LastEvaluatedKey'):
+                break
+            scan_kwargs['ExclusiveStartKey'] = response['LastEvaluatedKey']
+    finally:
+        writer.close()
+    stats['spilledRecords'] = writer.written
+    return dict(stats)
+
+# -- Fase 2: conciliación por partición ----------------------------------------
+
+def account_checks(account_id: str, records: Records) -> List[Dict[str, Any]]:
+    """Diferencias de una cuenta a partir de sus parciales"""
+    ledger, total, account = records.get(LEDGER), records.get(TOTAL), records.get(ACCOUNT)
+    if account is None:
+        if ledger or total:
+            return [{'accountId': account_id, 'check': 'orphanLedger',
+                     'ledgerRows': ledger[0] if ledger else 0, 'summary': total is not None}]
+        return []
+
+    drift = []
+    ledger = ledger or [0] * ROW_WIDTH
+    if (total or [0] * ROW_WIDTH) != ledger:
+        drift.append({'accountId': account_id, 'check': 'summary', 'expected': ledger, 'actual': total})
+    if account[2]:
+        expected = account[1] + ledger[2] + ledger[3]
+        actual = account[0] + records.get(SHARD, [0])[0]
+        if actual != expected:
+            drift.append({'accountId': account_id, 'check': 'balance', 'expected': expected, 'actual': actual})
+    return drift
+
+def _version(item: Optional[Dict[str, Any]], name: str = 'ledgerVersion') -> Optional[str]:
+    return item[name]['N'] if item and name in item else None
+
+def _ledger_version(totals: List[Dict[str, Any]]) -> int:
+    return sum(int(_version(item) or 0) for item in totals)
+
+def reread(account_id: str) -> Optional[Records]:
+    """
+    Parciales de una cuenta con lecturas consistentes; None si una transferencia
+    la cambió en cada intento.
+
+    Cuenta, shards y buckets TOTAL (el de la cuenta y los de sus shards) se
+    leen en una transacción (post_transfer los escribe juntos); las filas van
+    en una query aparte, válida si la versión del libro mayor (suma de los
+    ledgerVersion de los TOTAL, que el compactador no cambia) ni la del
+    archivo (archiveVersion del bucket ARCHIVED) cambiaron mientras tanto.
+    """
+    archived_key = {'accountId': {'S': summary_partition(account_id)}, 'timestamp': {'S': SUMMARY_ARCHIVED_BUCKET}}
+    for attempt in range(RECHECK_ATTEMPTS):
+        accounts = dynamodb.query(
+            TableName=ACCOUNTS_TABLE,
+            KeyConditionExpression='accountId = :accountId',
+            ExpressionAttributeValues={':accountId': {'S': account_id}},
+            ProjectionExpression='accountId, customerId, balanceShards',
+            ConsistentRead=True
+        ).get('Items', [])
+        shards = balance_shard_count(accounts[0]) if accounts else 0
+        total_keys = [{'accountId': archived_key['accountId'], 'timestamp': {'S': SUMMARY_TOTAL_BUCKET}}]
+        total_keys += pending_summary_keys(account_id, shards)
+        # Hasta 34 claves (TOTAL, uno por shard y ARCHIVED): un solo lote, con
+        # las UnprocessedKeys reintentadas hasta leerlas todas
+        before = []
+        request_items = {TRANSACTIONS_TABLE: {
+            'Keys': total_keys + [archived_key],
+            'ProjectionExpression': '#timestamp, ledgerVersion, archiveVersion',
+            'ExpressionAttributeNames': {'#timestamp': 'timestamp'},
+            'ConsistentRead': True
+        }}
+        while request_items:
+            response = dynamodb.batch_get_item(RequestItems=request_items)
+            before += response.get('Responses', {}).get(TRANSACTIONS_TABLE, [])
+            request_items = response.get('UnprocessedKeys') or None
+        archived_before = next((item for item in before if item['timestamp']['S'] == SUMMARY_ARCHIVED_BUCKET), None)
+        totals_before = [item for item in before if item['timestamp']['S'] == SUMMARY_TOTAL_BUCKET]
+
+        keys, rows = [], []
+        query_kwargs = {
+            'TableName': TRANSACTIONS_TABLE,
+            'KeyConditionExpression': 'accountId = :accountId',
+            'ExpressionAttributeValues': {':accountId': {'S': account_id}},
+            'ExpressionAttributeNames': {'#status': 'status'},
+            'ProjectionExpression': 'accountId, amount, #status',
+            'ConsistentRead': True
+        }
+        while True:
+            response = dynamodb.query(**query_kwargs)
+            page_keys, page_rows = ledger_records(response.get('Items', []))
+            keys += page_keys
+            rows += page_rows
+            if not response.get('LastEvaluatedKey'):
+                break
+            query_kwargs['ExclusiveStartKey'] = response['LastEvaluatedKey']
+
+        gets = [{'TableName': TRANSACTIONS_TABLE, 'Key': archived_key}]
+        gets += [{'TableName': TRANSACTIONS_TABLE, 'Key': key} for key in total_keys]
+        if accounts:
+            account = accounts[0]
+            gets.append({'TableName': ACCOUNTS_TABLE,
+                         'Key': {'accountId': account['accountId'], 'customerId': account['customerId']}})
+            gets += [{'TableName': BALANCE_SHARDS_TABLE, 'Key': balance_shard_key(account_id, shard)}
+                     for shard in range(balance_shard_count(account))]
+        try:
+            responses = dynamodb.transact_get_items(TransactItems=[{'Get': get} for get in gets])['Responses']
+        except dynamo.ClientError as e:
+            if e.response['Error']['Code'] != 'TransactionCanceledException':
+                raise
+            continue
+        items = [response.get('Item') for response in responses]
+        archived, totals = items[0], [item for item in items[1:1 + len(total_keys)] if item]
+        account_items = items[1 + len(total_keys):]
+        if (_ledger_version(totals_before) != _ledger_version(totals)
+                or _version(archived_before, 'archiveVersion') != _version(archived, 'archiveVersion')):
+            continue
+
+        records = {}
+        if archived:
+            keys.append(account_id)
+            rows.append(total_row(archived))
+        if rows:
+            records[LEDGER] = group_sums(keys, rows)[1][0]
+        if totals:
+            records[TOTAL] = [sum(column) for column in zip(*(total_row(item) for item in totals))]
+        if account_items and account_items[0]:
+            records[ACCOUNT] = account_row(account_items[0])
+            records[SHARD] = [sum(minor_units(item, 'balance') for item in account_items[1:] if item), 0, 0, 0]
+        return records
+    return None
+
+def _summary_object(row: Optional[List[int]]) -> Any:
+    if row is None:
+        return None
+    return RawJSON(encode_object({
+        'transactionCount': row[0],
+        'completedCount': row[1],
+        'totalDebits': money(row[2]),
+        'totalCredits': money(row[3])
+    }))
+
+def encode_drift(entry: Dict[str, Any]) -> str:
+    """Línea NDJSON del reporte"""
+    fields = dict(entry)
+    if entry['check'] == 'balance':
+        fields.update(expected=money(entry['expected']), actual=money(entry['actual']),
+                      difference=money(entry['actual'] - entry['expected']))
+    elif entry['check'] == 'summary':
+        fields.update(expected=_summary_object(entry['expected']), actual=_summary_object(entry['actual']))
+    return encode_object(fields)
+
+def _chunks(paths: List[str], max_bytes: int, scratch: str, level: int = 1) -> Iterator[List[str]]:
+    """Grupos de archivos que entran en `max_bytes`; los que no, se re-parten en disco por cuenta"""
+    if level > MAX_SPLIT_LEVELS or sum(os.path.getsize(path) for path in paths) <= max_bytes:
+        yield paths
+        return
+
+    directory = tempfile.mkdtemp(prefix=f'split{level}-', dir=scratch)
+    outputs = [open(os.path.join(directory, f'{part:02d}.tsv'), 'w') for part in range(SPLIT_FANOUT)]
+    try:
+        for path in paths:
+            with open(path) as handle:
+                for line in handle:
+                    outputs[partition_of(line[:line.index('\t')], SPLIT_FANOUT, level)].write(line)
+    finally:
+        for output in outputs:
+            output.close()
+    for output in outputs:
+        yield from _chunks([output.name], max_bytes, scratch, level + 1)
+    shutil.rmtree(directory)
+
+def load_records(paths: List[str]) -> Dict[str, Records]:
+    """Parciales de un grupo de archivos sumados por cuenta y tipo"""
+    keys, rows = [], []
+    for path in paths:
+        with open(path) as handle:
+            for line in handle:
+                account_id, kind, values = line.rstrip('\n').split('\t', 2)
+                keys.append(f'{account_id}\t{kind}')
+                rows.append([int(value) for value in values.split('\t')])
+
+    accounts: Dict[str, Records] = {}
+    for key, row in zip(*group_sums(keys, rows)):
+        account_id, kind = key.split('\t')
+        accounts.setdefault(account_id, {})[kind] = row
+    return accounts
+
+def reconcile_partition(spill_dir: str, partition: int, report_dir: str, max_bytes: int) -> Dict[str, int]:
+    """Conciliar las cuentas de una partición y escribir sus diferencias confirmadas"""
+    directory = os.path.join(spill_dir, f'{partition:05d}')
+    if not os.path.isdir(directory):
+        return {}
+    paths = [os.path.join(directory, name) for name in sorted(os.listdir(directory))]
+    stats = Counter()
+    report_path = os.path.join(report_dir, f'drift-{partition:05d}.ndjson')
+
+    with open(report_path, 'w') as report:
+        for chunk in _chunks(paths, max_bytes, directory):
+            for account_id, records in load_records(chunk).items():
+                stats['accounts'] += 1
+                stats['ledgerRows'] += records.get(LEDGER, [0])[0]
+                if ACCOUNT in records and not records[ACCOUNT][2]:
+                    # Cuenta anterior a openingBalance: solo se puede verificar el TOTAL
+                    stats['unbaselined'] += 1
+                drift = account_checks(account_id, records)
+                if not drift:
+                    continue
+
+                stats['flagged'] += 1
+                current = reread(account_id)
+                confirmed = current is not None
+                if confirmed:
+                    drift = account_checks(account_id, current)
+                    if not drift:
+                        stats['transient'] += 1
+                        continue
+                for entry in drift:
+                    stats[f"{entry['check']}Drift"] += 1
+                    if entry['check'] == 'balance':
+                        stats['balanceDifference'] += entry['actual'] - entry['expected']
+                    report.write(encode_drift(dict(entry, confirmed=confirmed)) + '\n')
+
+    if not any(stats[name] for name in DRIFT_STATS):
+        os.remove(report_path)
+    return dict(stats)
+
+# -- Job ---------------------------------------------------------------------
+
+def reconcile(segments: int, workers: int, partitions: int, memory_mb: float, report_dir: str,
+              work_dir: Optional[str] = None) -> Dict[str, Any]:
+    """Ejecutar las dos fases y escribir summary.json en report_dir"""
+    os.makedirs(report_dir, exist_ok=True)
+    spill_dir = tempfile.mkdtemp(prefix='reconcile-', dir=work_dir)
+    stats = Counter()
+    timings = {}
+    # fork: el proceso padre no crea el cliente de DynamoDB antes de los workers,
+    # cada worker crea el suyo en su primera llamada
+    context = multiprocessing.get_context('fork')
+    try:
+        with ProcessPoolExecutor(max_workers=workers, mp_context=context) as pool:
+            started = time.perf_counter()
+            futures = [pool.submit(scan_segment, source, segment, segments, spill_dir, partitions)
+                       for source in SCANS for segment in range(segments)]
+            for future in futures:
+                stats.update(future.result())
+            timings['scanSeconds'] = round(time.perf_counter() - started, 3)
+
+            started = time.perf_counter()
+            max_bytes = int(memory_mb * 2 ** 20) // LOAD_EXPANSION
+            futures = [pool.submit(reconcile_partition, spill_dir, partition, report_dir, max_bytes)
+                       for partition in range(partitions)]
+            for future in futures:
+                stats.update(future.result())
+            timings['reconcileSeconds'] = round(time.perf_counter() - started, 3)
+    finally:
+        shutil.rmtree(spill_dir, ignore_errors=True)
+
+    for name in ('accounts', 'ledgerRows', 'unbaselined', 'flagged', 'transient') + DRIFT_STATS:
+        stats[name] += 0
+    drift = sum(stats[name] for name in DRIFT_STATS)
+    summary = {
+        'segments': segments,
+        'partitions': partitions,
+        'vectorized': np is not None,
+        **timings,
+        **{name: stats[name] for name in sorted(stats) if name != 'balanceDifference'},
+        'balanceDifference': format_minor(stats['balanceDifference']),
+        'drift': drift,
+        'reports': sorted(name for name in os.listdir(report_dir) if name.startswith('drift-'))
+    }
+    with open(os.path.join(report_dir, 'summary.json'), 'w') as handle:
+        json.dump(summary, handle, indent=2)
+    return summary
+
+def main() -> int:
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--segments', type=int, default=int(os.environ.get('RECONCILE_SEGMENTS', '64')),
+                        help='TotalSegments de cada scan')
+    parser.add_argument('--workers', type=int, default=int(os.environ.get('RECONCILE_WORKERS', os.cpu_count() or 1)),
+                        help='Procesos del pool')
+    parser.add_argument('--partitions', type=int, default=int(os.environ.get('RECONCILE_PARTITIONS', '64')),
+                        help='Archivos de parciales por cuenta (unidades de la fase 2)')
+    parser.add_argument('--memory-mb', type=float, default=float(os.environ.get('RECONCILE_MEMORY_MB', '512')),
+                        help='Memoria por worker para cargar una partición')
+    parser.add_argument('--report-dir', default=os.environ.get('RECONCILE_REPORT_DIR', 'reconcile-report'),
+                        help='Directorio del reporte')
+    parser.add_argument('--work-dir', default=os.environ.get('RECONCILE_WORK_DIR'),
+                        help='Directorio de los parciales (por defecto el temporal del sistema)')
+    args = parser.parse_args()
+
+    summary = reconcile(args.segments, args.workers, args.partitions, args.memory_mb,
+                        args.report_dir, args.work_dir)
+    print(f'[INFO] Conciliación: {json.dumps(summary)}')
+    if summary['drift']:
+        print(f"[ERROR] {summary['drift']} diferencias en el libro mayor: {args.report_dir}")
+    # Código de salida distinto de cero para que el scheduler lo marque como fallido
+    return 1 if summary['drift'] else 0
+
+if __name__ == '__main__':
+    sys.exit(main())
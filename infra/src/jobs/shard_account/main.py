@@ -0,0 +1,111 @@
+"""
+Saldo repartido: activa (o amplía) los shards de saldo de una cuenta.
+
+CLI de operación, como los otros jobs. En una sola transacción pone
+`balanceShards`/`shardGroup` en el item de Accounts y marca al cliente con
+`shardedAccounts` en Users, incrementando su `dataVersion`.
+
+Los créditos que van a un shard no escriben el item de Users (sería tan
+caliente como el de la cuenta), así que su versión no sirve para saber si
+cambió un saldo: con la marca, get_accounts y el feed de get_transactions no
+usan cache ni ETag para ese cliente y get_dashboard hace siempre el fan-out,
+que suma los shards. El incremento de `dataVersion` invalida lo que ya estaba
+guardado con la versión anterior.
+
+`balanceShards` solo puede aumentar: para reducirlo hay que compactar antes
+(compact_balances) y cambiarlo a mano.
+
+Uso:
+    PYTHONPATH=src/layers/common/python python src/jobs/shard_account/main.py \\
+        --account-id <accountId> --shards 8
+"""
+import argparse
+import json
+import os
+import sys
+from typing import Dict, Any
+
+from banca_common import dynamo
+from banca_common.dynamo import dynamodb
+from banca_common.items import MAX_BALANCE_SHARDS, SHARDED_BALANCE_GROUP, balance_shard_count
+
+ACCOUNTS_TABLE = os.environ['ACCOUNTS_TABLE_NAME']
+USERS_TABLE = os.environ['USERS_TABLE_NAME']
+ACCOUNT_ID_INDEX = os.environ.get('ACCOUNT_ID_INDEX_NAME', 'AccountIdIndex')
+
+def find_account(account_id: str) -> Dict[str, Any]:
+    """Clave de la cuenta (con su customerId) y shards actuales; ValueError si no existe"""
+    response = dynamodb.query(
+        TableName=ACCOUNTS_TABLE,
+        IndexName=ACCOUNT_ID_INDEX,
+        KeyConditionExpression='accountId = :accountId',
+        ExpressionAttributeValues={':accountId': {'S': account_id}}
+    )
+    items = response.get('Items', [])
+    if not items:
+        raise ValueError(f'Account {account_id} not found')
+    return items[0]
+
+def shard_account(account_id: str, shards: int) -> Dict[str, Any]:
+    """Repartir el saldo de la cuenta en `shards` contadores y marcar a su cliente"""
+    if not 1 <= shards <= MAX_BALANCE_SHARDS:
+        raise ValueError(f'shards must be between 1 and {MAX_BALANCE_SHARDS}')
+    account = find_account(account_id)
+    current = balance_shard_count(account)
+    if shards < current:
+        raise ValueError(f'Account {account_id} already has {current} shards; compact before reducing them')
+
+    try:
+        dynamodb.transact_write_items(TransactItems=[
+            {
+                'Update': {
+                    'TableName': ACCOUNTS_TABLE,
+                    'Key': {'accountId': account['accountId'], 'customerId': account['customerId']},
+                    'UpdateExpression': 'SET balanceShards = :shards, shardGroup = :group',
+                    # El GSI es eventualmente consistente: la condición evita bajar
+                    # los shards si otra ejecución ya los aumentó
+                    'ConditionExpression': ('attribute_exists(accountId) AND '
+                                            '(attribute_not_exists(balanceShards) OR balanceShards <= :shards)'),
+                    'ExpressionAttributeValues': {
+                        ':shards': {'N': str(shards)},
+                        ':group': {'S': SHARDED_BALANCE_GROUP}
+                    }
+                }
+            },
+            {
+                'Update': {
+                    'TableName': USERS_TABLE,
+                    'Key': {'id': account['customerId']},
+                    'UpdateExpression': 'SET shardedAccounts = :sharded ADD dataVersion :one',
+                    'ConditionExpression': 'attribute_exists(id)',
+                    'ExpressionAttributeValues': {
+                        ':sharded': {'BOOL': True},
+                        ':one': {'N': '1'}
+                    }
+                }
+            }
+        ])
+    except dynamo.ClientError as e:
+        if e.response['Error']['Code'] != 'TransactionCanceledException':
+            raise
+        raise ValueError(f'Account {account_id} changed or its customer does not exist; try again')
+
+    return {'accountId': account_id, 'customerId': account['customerId']['S'],
+            'previousShards': current, 'shards': shards}
+
+def main() -> int:
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--account-id', required=True, help='Cuenta a repartir')
+    parser.add_argument('--shards', type=int, required=True, help=f'Shards de saldo (1 a {MAX_BALANCE_SHARDS})')
+    args = parser.parse_args()
+
+    try:
+        result = shard_account(args.account_id, args.shards)
+    except ValueError as e:
+        print(f'[ERROR] {str(e)}')
+        return 1
+    print(f'[INFO] Saldo repartido: {json.dumps(result)}')
+    return 0
+
+if __name__ == '__main__':
+    sys.exit(main())
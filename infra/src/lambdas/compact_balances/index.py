@@ -0,0 +1,224 @@
+import os
+from datetime import datetime
+from decimal import Decimal
+from typing import Dict, Any, Iterator, List
+
+from banca_common import dynamo
+from banca_common.balances import pending_summary_keys, read_shards, shard_fold
+from banca_common.dynamo import BATCH_GET_MAX_KEYS, dynamodb
+from banca_common.items import (
+    SHARDED_BALANCE_GROUP, SUMMARY_TOTAL_BUCKET, balance_shard_count, summary_account_id, summary_partition
+)
+from banca_common.metrics import instrument, phase
+from banca_common.records import format_minor, minor_units
+
+ACCOUNTS_TABLE = os.environ['ACCOUNTS_TABLE_NAME']
+BALANCE_SHARDS_TABLE = os.environ['BALANCE_SHARDS_TABLE_NAME']
+TRANSACTIONS_TABLE = os.environ['TRANSACTIONS_TABLE_NAME']
+# GSI disperso de Accounts (partición shardGroup): solo las cuentas con saldo repartido
+SHARDED_ACCOUNTS_INDEX = os.environ.get('SHARDED_ACCOUNTS_INDEX_NAME', 'ShardedBalanceIndex')
+# Cuentas cuyos shards se leen en un mismo batch_get_item
+ACCOUNTS_PER_READ = 10
+# Días de un shard que se pasan por transacción: dos items por día más los dos
+# TOTAL, dentro del límite de 100 de transact_write_items
+MAX_FOLD_DAYS = 48
+
+def iter_sharded_accounts() -> Iterator[Dict[str, Any]]:
+    """Recorrer las cuentas con saldo repartido desde el GSI disperso"""
+    query_kwargs = {
+        'TableName': ACCOUNTS_TABLE,
+        'IndexName': SHARDED_ACCOUNTS_INDEX,
+        'KeyConditionExpression': 'shardGroup = :group',
+        'ExpressionAttributeValues': {':group': {'S': SHARDED_BALANCE_GROUP}},
+        'ProjectionExpression': 'accountId, customerId, balanceShards'
+    }
+    while True:
+        response = dynamodb.query(**query_kwargs)
+        yield from response.get('Items', [])
+        if not response.get('LastEvaluatedKey'):
+            return
+        query_kwargs['ExclusiveStartKey'] = response['LastEvaluatedKey']
+
+def compact_account(account: Dict[str, Any], shards: Dict[int, Decimal]) -> bool:
+    """Traspasar al item base el saldo de los shards; False si un crédito o débito concurrente lo impidió"""
+    folded = {shard: amount for shard, amount in shards.items() if amount > 0}
+    total = sum(folded.values(), Decimal(0))
+
+    # El saldo total no cambia: no se toca updatedAt ni la versión de datos del cliente
+    transact_items = [{
+        'Update': {
+            'TableName': ACCOUNTS_TABLE,
+            'Key': {'accountId': account['accountId'], 'customerId': account['customerId']},
+            'UpdateExpression': 'ADD balance :total',
+            'ConditionExpression': 'attribute_exists(accountId)',
+            'ExpressionAttributeValues': {':total': {'N': str(total)}}
+        }
+    }]
+    transact_items += [shard_fold(BALANCE_SHARDS_TABLE, account['accountId']['S'], shard, amount)
+                       for shard, amount in folded.items()]
+
+    try:
+        dynamodb.transact_write_items(TransactItems=transact_items)
+    except dynamo.ClientError as e:
+        if e.response['Error']['Code'] != 'TransactionCanceledException':
+            raise
+        # La próxima ejecución lo vuelve a intentar con los saldos nuevos
+        return False
+    return True
+
+# -- Agregados pendientes de los shards ---------------------------------------
+
+def _version(bucket: Dict[str, Any]) -> int:
+    return int(bucket.get('ledgerVersion', {'N': '0'})['N'])
+
+def read_pending_shards(accounts: List[Dict[str, Any]]) -> Dict[str, List[int]]:
+    """Shards de cada cuenta con agregados sin pasar (ledgerVersion del TOTAL del shard > 0)"""
+    keys = [key for account in accounts
+            for key in pending_summary_keys(account['accountId']['S'], balance_shard_count(account))]
+    pending: Dict[str, List[int]] = {account['accountId']['S']: [] for account in accounts}
+    for start in range(0, len(keys), BATCH_GET_MAX_KEYS):
+        request_items = {TRANSACTIONS_TABLE: {
+            'Keys': keys[start:start + BATCH_GET_MAX_KEYS],
+            'ProjectionExpression': 'accountId, ledgerVersion',
+            'ConsistentRead': True
+        }}
+        while request_items:
+            response = dynamodb.batch_get_item(RequestItems=request_items)
+            for item in response.get('Responses', {}).get(TRANSACTIONS_TABLE, []):
+                if _version(item) > 0:
+                    partition = item['accountId']['S']
+                    pending[summary_account_id(partition)].append(int(partition.rsplit('#', 1)[1]))
+            request_items = response.get('UnprocessedKeys') or None
+    return pending
+
+def pending_days(account_id: str, shard: int) -> List[Dict[str, Any]]:
+    """Buckets DAY# de un shard con agregados sin pasar, más viejos primero"""
+    query_kwargs = {
+        'TableName': TRANSACTIONS_TABLE,
+        'KeyConditionExpression': 'accountId = :accountId AND begins_with(#timestamp, :day)',
+        'ExpressionAttributeNames': {'#timestamp': 'timestamp'},
+        'ExpressionAttributeValues': {
+            ':accountId': {'S': summary_partition(account_id, shard)},
+            ':day': {'S': 'DAY#'}
+        },
+        'ConsistentRead': True
+    }
+    days = []
+    while True:
+        response = dynamodb.query(**query_kwargs)
+        days += [bucket for bucket in response.get('Items', []) if _version(bucket) > 0]
+        if not response.get('LastEvaluatedKey'):
+            return days
+        query_kwargs['ExclusiveStartKey'] = response['LastEvaluatedKey']
+
+def summary_add(partition: str, bucket: str, totals: Dict[str, int], sign: int,
+                condition: str = '') -> Dict[str, Any]:
+    """Update (transacción) que suma (sign 1) o resta (-1) unos agregados de un bucket"""
+    update = {
+        'TableName': TRANSACTIONS_TABLE,
+        'Key': {'accountId': {'S': partition}, 'timestamp': {'S': bucket}},
+        'UpdateExpression': ('ADD transactionCount :count, completedCount :completed, totalDebits :debits, '
+                             'totalCredits :credits, ledgerVersion :version '
+                             'SET updatedAt = if_not_exists(updatedAt, :updatedAt)'),
+        'ExpressionAttributeValues': {
+            ':count': {'N': str(sign * totals['count'])},
+            ':completed': {'N': str(sign * totals['completed'])},
+            ':debits': {'N': format_minor(sign * totals['debits'])},
+            ':credits': {'N': format_minor(sign * totals['credits'])},
+            ':version': {'N': str(sign * totals['version'])},
+            ':updatedAt': {'S': datetime.now().isoformat()}
+        }
+    }
+    if condition:
+        update['ConditionExpression'] = condition
+        update['ExpressionAttributeValues'][':seen'] = {'N': str(totals['version'])}
+    return {'Update': update}
+
+def fold_summaries(account: Dict[str, Any], shard: int) -> bool:
+    """
+    Pasar los agregados de un shard a los buckets DAY#/TOTAL de la cuenta;
+    False si una escritura concurrente lo impidió.
+
+    Al shard se le resta exactamente lo que se suma a la cuenta (los créditos
+    concurrentes solo lo aumentan). Los días anteriores al actual, que ya no
+    reciben créditos, se borran del shard si no cambiaron desde la lectura.
+    """
+    account_id = account['accountId']['S']
+    partition = summary_partition(account_id, shard)
+    today = f'DAY#{datetime.now().date().isoformat()}'
+    fields = {'count': 0, 'completed': 0, 'debits': 0, 'credits': 0, 'version': 0}
+    total = dict(fields)
+    transact_items = []
+    for bucket in pending_days(account_id, shard)[:MAX_FOLD_DAYS]:
+        count = int(bucket.get('transactionCount', {'N': '0'})['N'])
+        completed = bucket.get('completedCount')
+        day = {'count': count, 'completed': int(completed['N']) if completed else count,
+               'debits': minor_units(bucket, 'totalDebits'), 'credits': minor_units(bucket, 'totalCredits'),
+               'version': _version(bucket)}
+        for name, value in day.items():
+            total[name] += value
+        name = bucket['timestamp']['S']
+        transact_items.append(summary_add(summary_partition(account_id), name, day, 1))
+        if name < today:
+            transact_items.append({'Delete': {
+                'TableName': TRANSACTIONS_TABLE,
+                'Key': {'accountId': {'S': partition}, 'timestamp': {'S': name}},
+                'ConditionExpression': 'ledgerVersion = :seen',
+                'ExpressionAttributeValues': {':seen': {'N': str(day['version'])}}
+            }})
+        else:
+            transact_items.append(summary_add(partition, name, day, -1, 'ledgerVersion >= :seen'))
+    if not transact_items:
+        return True
+
+    transact_items.append(summary_add(summary_partition(account_id), SUMMARY_TOTAL_BUCKET, total, 1))
+    transact_items.append(summary_add(partition, SUMMARY_TOTAL_BUCKET, total, -1, 'ledgerVersion >= :seen'))
+
+    try:
+        dynamodb.transact_write_items(TransactItems=transact_items)
+    except dynamo.ClientError as e:
+        if e.response['Error']['Code'] != 'TransactionCanceledException':
+            raise
+        return False
+    return True
+
+def compact_group(accounts: List[Dict[str, Any]], stats: Dict[str, int]) -> None:
+    """Leer los shards de un grupo de cuentas y compactar las que tienen saldo o agregados en ellos"""
+    with phase('read'):
+        shards = read_shards(BALANCE_SHARDS_TABLE, {
+            account['accountId']['S']: balance_shard_count(account) for account in accounts
+        })
+        pending = read_pending_shards(accounts)
+
+    for account in accounts:
+        account_id = account['accountId']['S']
+        account_shards = shards[account_id]
+        has_balance = any(amount > 0 for amount in account_shards.values())
+        if not has_balance and not pending[account_id]:
+            stats['idle'] += 1
+            continue
+        with phase('write'):
+            if has_balance:
+                stats['compacted' if compact_account(account, account_shards) else 'conflicts'] += 1
+            for shard in pending[account_id]:
+                stats['folded' if fold_summaries(account, shard) else 'conflicts'] += 1
+
+@instrument('compact_balances')
+def lambda_handler(event: Dict[str, Any], context: Any) -> Dict[str, Any]:
+    """Compactador programado: pasa saldo y agregados de los shards de cada cuenta a la cuenta"""
+    stats = {'accounts': 0, 'compacted': 0, 'folded': 0, 'idle': 0, 'conflicts': 0}
+    group: List[Dict[str, Any]] = []
+
+    for account in iter_sharded_accounts():
+        if not balance_shard_count(account):
+            continue
+        stats['accounts'] += 1
+        group.append(account)
+        if len(group) == ACCOUNTS_PER_READ:
+            compact_group(group, stats)
+            group = []
+    if group:
+        compact_group(group, stats)
+
+    print(f'[INFO] Compactación de saldos: {stats}')
+    return stats
@@ -0,0 +1,92 @@
+import os
+from datetime import datetime
+from typing import Dict, Any
+
+from banca_common import dynamo
+from banca_common.balances import consolidate_balances
+from banca_common.dynamo import dynamodb
+from banca_common.events import get_customer_id, get_correlation_id, get_path_parameter
+from banca_common.items import daily_limit_key
+from banca_common.metrics import instrument
+from banca_common.records import Account, minor_units
+from banca_common.responses import RawJSON, make_json_response, make_response, preflight_response, unauthorized_response
+
+ACCOUNTS_TABLE = os.environ['ACCOUNTS_TABLE_NAME']
+BALANCE_SHARDS_TABLE = os.environ['BALANCE_SHARDS_TABLE_NAME']
+DAILY_LIMITS_TABLE = os.environ['DAILY_LIMITS_TABLE_NAME']
+ACCOUNT_MAX_AGE_SECONDS = int(os.environ.get('ACCOUNT_MAX_AGE_SECONDS', '5'))
+
+# El saldo cambia con cada transferencia: solo un reuso breve en el navegador
+ACCOUNT_HEADERS = {'Cache-Control': f'private, max-age={ACCOUNT_MAX_AGE_SECONDS}'}
+
+def get_account(account_id: str, customer_id: str, day: str) -> Dict[str, Any]:
+    """Leer la cuenta por clave primaria y el contador del límite del día en un batch_get_item"""
+    request_items = {
+        ACCOUNTS_TABLE: {
+            # La clave incluye customerId: una cuenta ajena simplemente no existe
+            'Keys': [{'accountId': {'S': account_id}, 'customerId': {'S': customer_id}}],
+            'ConsistentRead': True
+        },
+        DAILY_LIMITS_TABLE: {
+            'Keys': [daily_limit_key(account_id, day)],
+            'ProjectionExpression': 'used'
+        }
+    }
+    responses = {ACCOUNTS_TABLE: [], DAILY_LIMITS_TABLE: []}
+    while request_items:
+        response = dynamodb.batch_get_item(RequestItems=request_items)
+        for table_name, items in response.get('Responses', {}).items():
+            responses[table_name] += items
+        request_items = response.get('UnprocessedKeys') or None
+    return responses
+
+@instrument('get_account')
+def lambda_handler(event: Dict[str, Any], context: Any) -> Dict[str, Any]:
+    """Handler para obtener el detalle de una cuenta del usuario"""
+
+    # Manejar preflight OPTIONS request
+    if event.get('httpMethod') == 'OPTIONS':
+        return preflight_response()
+
+    try:
+        customer_id = get_customer_id(event)
+        if not customer_id:
+            return unauthorized_response()
+
+        account_id = get_path_parameter(event, 'accountId')
+        if not account_id:
+            return make_response(400, {
+                'error': 'Bad Request',
+                'message': 'Account ID is required'
+            })
+
+        today = datetime.now().date().isoformat()
+        responses = get_account(account_id, customer_id, today)
+        if not responses[ACCOUNTS_TABLE]:
+            return make_response(404, {
+                'error': 'Not Found',
+                'message': 'Account not found'
+            })
+
+        # Con saldo repartido se suman los shards (lectura transaccional aparte)
+        item, = consolidate_balances(responses[ACCOUNTS_TABLE], ACCOUNTS_TABLE, BALANCE_SHARDS_TABLE)
+        counters = responses[DAILY_LIMITS_TABLE]
+        account = Account.from_item(item, minor_units(counters[0], 'used') if counters else 0)
+
+        return make_json_response(200, {
+            'account': RawJSON(account.to_json()),
+            'correlationId': get_correlation_id(event)
+        }, ACCOUNT_HEADERS)
+
+    except dynamo.ClientError as e:
+        print(f'DynamoDB error: {str(e)}')
+        return make_response(500, {
+            'error': 'Database error',
+            'message': 'Error retrieving account'
+        })
+    except Exception as e:
+        print(f'Unexpected error: {str(e)}')
+        return make_response(500, {
+            'error': 'Internal server error',
+            'message': 'An unexpected error occurred'
+        })
@@ -1,97 +1,136 @@
-import json
 import os
-import boto3
+from datetime import datetime
 from typing import Dict, Any
-from botocore.exceptions import ClientError
 
-# Cliente de DynamoDB
-dynamodb = boto3.client('dynamodb')
+from banca_common.cache import TTLCache
+from banca_common import dynamo
+from banca_common.accounts import get_customer_accounts, get_daily_used
+from banca_common.balances import consolidate_balances
+from banca_common.dynamo import dynamodb
+from banca_common.events import get_customer_id, get_correlation_id, get_header
+from banca_common.metrics import instrument
+from banca_common.records import Account, encode_records, money
+from banca_common.responses import (
+    RawJSON, compress_response, encode_object, etag_headers, etag_matches, make_etag, make_json_response,
+    make_response, not_modified_response, preflight_response, unauthorized_response
+)
+
 ACCOUNTS_TABLE = os.environ['ACCOUNTS_TABLE_NAME']
+USERS_TABLE = os.environ['USERS_TABLE_NAME']
+BALANCE_SHARDS_TABLE = os.environ['BALANCE_SHARDS_TABLE_NAME']
+DAILY_LIMITS_TABLE = os.environ['DAILY_LIMITS_TABLE_NAME']
+CACHE_MAX_ENTRIES = int(os.environ.get('CACHE_MAX_ENTRIES', '1024'))
+ACCOUNTS_CACHE_TTL_SECONDS = float(os.environ.get('ACCOUNTS_CACHE_TTL_SECONDS', '60'))
+
+# Cuentas por sub de Cognito, válidas mientras no cambie dataVersion del usuario;
+# se guardan ya serializadas para que un hit no vuelva a codificar el JSON. Un
+# cliente con cuentas repartidas (shardedAccounts) no usa cache ni ETag: los
+# créditos a sus shards no incrementan dataVersion
+accounts_cache = TTLCache('accounts', CACHE_MAX_ENTRIES, ACCOUNTS_CACHE_TTL_SECONDS)
 
-def make_response(status_code: int, body: Dict[str, Any]) -> Dict[str, Any]:
-    """Crear respuesta HTTP con headers CORS"""
+def get_data_version(customer_id: str) -> Dict[str, Any]:
+    """Leer la versión de datos del cliente (incrementada por post_transfer) y si tiene cuentas repartidas"""
+    response = dynamodb.get_item(
+        TableName=USERS_TABLE,
+        Key={'id': {'S': customer_id}},
+        ProjectionExpression='dataVersion, accountsUpdatedAt, shardedAccounts',
+        ConsistentRead=True
+    )
+    item = response.get('Item', {})
     return {
-        'statusCode': status_code,
-        'headers': {
-            'Access-Control-Allow-Origin': '*',
-            'Access-Control-Allow-Headers': 'Content-Type,Authorization,X-Amz-Date,X-Api-Key,X-Amz-Security-Token,X-Requested-With,X-Environment',
-            'Access-Control-Allow-Methods': 'OPTIONS,GET,POST,PUT,DELETE',
-            'Access-Control-Max-Age': '86400',
-            'Content-Type': 'application/json'
-        },
-        'body': json.dumps(body, ensure_ascii=False)
+        'dataVersion': item.get('dataVersion', {'N': '0'})['N'],
+        'accountsUpdatedAt': item.get('accountsUpdatedAt', {'S': ''})['S'],
+        'shardedAccounts': item.get('shardedAccounts', {'BOOL': False})['BOOL']
     }
 
+@instrument('get_accounts')
 def lambda_handler(event: Dict[str, Any], context: Any) -> Dict[str, Any]:
     """Handler para obtener cuentas de un usuario"""
-    
+
     # Manejar preflight OPTIONS request
     if event.get('httpMethod') == 'OPTIONS':
-        return make_response(200, {'message': 'CORS preflight successful'})
+        return preflight_response()
 
     try:
-        # Obtener customerId del token JWT (sub claim)
-        authorizer_context = event.get('requestContext', {}).get('authorizer', {})
-        customer_id = authorizer_context.get('claims', {}).get('sub')
-        
+        customer_id = get_customer_id(event)
         if not customer_id:
-            # Debug: imprimir el contexto completo para ver qué está disponible
-            print(f"Authorizer context: {authorizer_context}")
-            return make_response(401, {
-                'error': 'Unauthorized',
-                'message': 'Customer ID not found in token'
-            })
+            return unauthorized_response()
+
+        # Servir desde cache si la versión de datos del cliente no cambió;
+        # el día forma parte de la versión porque el uso del límite es diario
+        today = datetime.now().date().isoformat()
+        version = get_data_version(customer_id)
+        cache_version = f"{version['dataVersion']}#{today}"
+        versioned = not version['shardedAccounts']
+
+        # Sondeo sin cambios: 304 con una sola lectura de clave, sin query ni serialización
+        etag = make_etag(customer_id, version['dataVersion'], version['accountsUpdatedAt'], today)
+        if versioned and etag_matches(get_header(event, 'If-None-Match'), etag):
+            return not_modified_response(etag)
+
+        accept_encoding = get_header(event, 'Accept-Encoding')
+        cached = accounts_cache.get(customer_id, cache_version) if versioned else None
+        accounts_cache.log_stats(cached is not None)
+        if cached is not None:
+            return compress_response(make_json_response(200, {
+                'accounts': cached['accounts'],
+                'summary': cached['summary'],
+                'correlationId': get_correlation_id(event)
+            }, etag_headers(etag)), accept_encoding)
 
         # Buscar cuentas del usuario
-        response = dynamodb.query(
-            TableName=ACCOUNTS_TABLE,
-            IndexName='CustomerIdIndex',
-            KeyConditionExpression='customerId = :customerId',
-            ExpressionAttributeValues={
-                ':customerId': {'S': customer_id}
-            }
-        )
+        items = get_customer_accounts(ACCOUNTS_TABLE, customer_id)
 
         accounts = []
         total_balance = 0
         daily_transfer_used = 0
         daily_transfer_limit = 0
 
-        for item in response.get('Items', []):
-            account = {
-                'accountId': item['accountId']['S'],
-                'customerId': item['customerId']['S'],
-                'balance': float(item['balance']['N']),
-                'currency': item['currency']['S'],
-                'accountType': item['accountType']['S'],
-                'accountName': item.get('accountName', {}).get('S', ''),
-                'dailyTransferUsed': float(item.get('dailyTransferUsed', {'N': '0'})['N']),
-                'dailyTransferLimit': float(item.get('dailyTransferLimit', {'N': '500'})['N']),
-                'status': item.get('status', {'S': 'ACTIVE'})['S'],
-                'createdAt': item['createdAt']['S'],
-                'updatedAt': item['updatedAt']['S']
-            }
-            
+        # Cuentas con saldo repartido: item base más shards, leídos en un snapshot
+        items = consolidate_balances(items, ACCOUNTS_TABLE, BALANCE_SHARDS_TABLE)
+        # Uso del límite leído del contador del día actual
+        daily_used = (get_daily_used(DAILY_LIMITS_TABLE, [item['accountId']['S'] for item in items], today)
+                      if items else {})
+
+        # Montos en centavos (enteros) hasta serializar
+        for item in items:
+            account = Account.from_item(item, daily_used.get(item['accountId']['S'], 0))
             accounts.append(account)
-            total_balance += account['balance']
-            daily_transfer_used += account['dailyTransferUsed']
-            daily_transfer_limit += account['dailyTransferLimit']
+            total_balance += account.balance
+            daily_transfer_used += account.daily_transfer_used
+            daily_transfer_limit += account.daily_transfer_limit
 
-        summary = {
-            'totalBalance': total_balance,
+        summary = RawJSON(encode_object({
+            'totalBalance': money(total_balance),
             'totalAccounts': len(accounts),
-            'dailyTransferUsed': daily_transfer_used,
-            'dailyTransferLimit': daily_transfer_limit,
-            'remainingDailyLimit': daily_transfer_limit - daily_transfer_used
-        }
+            'dailyTransferUsed': money(daily_transfer_used),
+            'dailyTransferLimit': money(daily_transfer_limit),
+            'remainingDailyLimit': money(daily_transfer_limit - daily_transfer_used)
+        }))
+        accounts_json = encode_records(accounts)
 
-        return make_response(200, {
-            'accounts': accounts,
+        # El GSI es eventualmente consistente: solo se guarda en cache si ya
+        # refleja la última transferencia registrada en el usuario. Lo mismo
+        # vale para el ETag: un cliente nunca guarda una respuesta atrasada
+        # con la versión vigente
+        latest_update = max((account.updated_at for account in accounts), default='')
+        headers = None
+        if versioned and accounts and latest_update >= version['accountsUpdatedAt']:
+            accounts_cache.put(customer_id, {
+                'accounts': accounts_json,
+                'summary': summary
+            }, cache_version)
+            headers = etag_headers(etag)
+        else:
+            accounts_cache.invalidate(customer_id)
+
+        return compress_response(make_json_response(200, {
+            'accounts': accounts_json,
             'summary': summary,
-            'correlationId': event.get('requestContext', {}).get('requestId', '')
-        })
+            'correlationId': get_correlation_id(event)
+        }, headers), accept_encoding)
 
-    except ClientError as e:
+    except dynamo.ClientError as e:
         print(f'DynamoDB error: {str(e)}')
         return make_response(500, {
             'error': 'Database error',
@@ -0,0 +1,207 @@
+import os
+from concurrent.futures import ThreadPoolExecutor
+from datetime import datetime
+from typing import Dict, Any, List, Optional, Tuple
+
+from banca_common import dynamo
+from banca_common.accounts import get_customer_accounts, get_daily_used
+from banca_common.balances import consolidate_balances
+from banca_common.dynamo import MAX_POOL_CONNECTIONS, dynamodb
+from banca_common.events import get_customer_id, get_correlation_id
+from banca_common.items import balance_shard_count, summary_partition
+from banca_common.metrics import instrument
+from banca_common.records import Account, Transaction, UserProfile, encode_records, money
+from banca_common.responses import (
+    RawJSON, encode_object, make_json_response, make_response, preflight_response, unauthorized_response
+)
+from banca_common.snapshots import (
+    accounts_updated_at, add_bucket, encode_monthly_totals, load_document, month_offset, snapshot_accounts,
+    snapshot_key, snapshot_recent
+)
+
+ACCOUNTS_TABLE = os.environ['ACCOUNTS_TABLE_NAME']
+TRANSACTIONS_TABLE = os.environ['TRANSACTIONS_TABLE_NAME']
+BALANCE_SHARDS_TABLE = os.environ['BALANCE_SHARDS_TABLE_NAME']
+DAILY_LIMITS_TABLE = os.environ['DAILY_LIMITS_TABLE_NAME']
+USERS_TABLE = os.environ['USERS_TABLE_NAME']
+RECENT_TRANSACTIONS = int(os.environ.get('DASHBOARD_RECENT_TRANSACTIONS', '5'))
+# Meses con totales en la respuesta, contando el actual
+MONTHLY_TOTALS_MONTHS = int(os.environ.get('DASHBOARD_MONTHS', '6'))
+# Con la tabla de snapshots (project_snapshots) el dashboard se arma desde un
+# solo documento; sin ella, o si el snapshot está atrasado, con el fan-out
+SNAPSHOTS_TABLE = os.environ.get('SNAPSHOTS_TABLE_NAME')
+# Hilos del fan-out; no más que las conexiones del pool del cliente compartido
+MAX_WORKERS = min(int(os.environ.get('DASHBOARD_MAX_WORKERS', '16')), MAX_POOL_CONNECTIONS)
+
+# Un pool por contenedor, reutilizado entre invocaciones en caliente; el
+# cliente de boto3 es thread-safe y comparte su pool de conexiones keep-alive
+executor = ThreadPoolExecutor(max_workers=MAX_WORKERS, thread_name_prefix='dashboard')
+
+def get_profile(customer_id: str) -> Optional[RawJSON]:
+    """Perfil del cliente serializado (None si aún no existe)"""
+    response = dynamodb.get_item(
+        TableName=USERS_TABLE,
+        Key={'id': {'S': customer_id}}
+    )
+    if 'Item' not in response:
+        return None
+    return RawJSON(UserProfile.from_item(response['Item']).to_json())
+
+def get_profile_and_snapshot(customer_id: str) -> Tuple[Optional[Dict[str, Any]], Optional[Dict[str, Any]]]:
+    """Item de Users y documento del snapshot del cliente en un solo batch_get_item"""
+    found = {}
+    request_items = {
+        USERS_TABLE: {'Keys': [{'id': {'S': customer_id}}]},
+        SNAPSHOTS_TABLE: {'Keys': [snapshot_key(customer_id)]}
+    }
+    while request_items:
+        response = dynamodb.batch_get_item(RequestItems=request_items)
+        for table, items in response.get('Responses', {}).items():
+            if items:
+                found[table] = items[0]
+        request_items = response.get('UnprocessedKeys') or None
+    return found.get(USERS_TABLE), found.get(SNAPSHOTS_TABLE)
+
+def get_recent_transactions(account_id: str) -> List[Transaction]:
+    """Últimas RECENT_TRANSACTIONS transacciones de una cuenta"""
+    response = dynamodb.query(
+        TableName=TRANSACTIONS_TABLE,
+        KeyConditionExpression='accountId = :accountId',
+        ExpressionAttributeValues={
+            ':accountId': {'S': account_id}
+        },
+        ScanIndexForward=False,
+        Limit=RECENT_TRANSACTIONS
+    )
+    return [Transaction.from_item(item) for item in response.get('Items', [])]
+
+def get_day_buckets(account_id: str, first_month: str, shards: int = 0) -> List[Dict[str, Any]]:
+    """
+    Agregados diarios (DAY#) de una cuenta desde el primer día de first_month;
+    en una cuenta repartida, también los de sus `shards` que el compactador
+    todavía no pasó a la cuenta
+    """
+    buckets = []
+    for shard in [None] + list(range(shards)):
+        query_kwargs = {
+            'TableName': TRANSACTIONS_TABLE,
+            'KeyConditionExpression': 'accountId = :accountId AND #timestamp BETWEEN :fromDay AND :toDay',
+            'ExpressionAttributeNames': {'#timestamp': 'timestamp'},
+            'ExpressionAttributeValues': {
+                ':accountId': {'S': summary_partition(account_id, shard)},
+                ':fromDay': {'S': f'DAY#{first_month}-01'},
+                ':toDay': {'S': 'DAY#9999-12-31'}
+            }
+        }
+        while True:
+            response = dynamodb.query(**query_kwargs)
+            buckets += response.get('Items', [])
+            if not response.get('LastEvaluatedKey'):
+                break
+            query_kwargs['ExclusiveStartKey'] = response['LastEvaluatedKey']
+    return buckets
+
+def dashboard_response(event: Dict[str, Any], profile: Optional[RawJSON], accounts: List[Account],
+                       recent: RawJSON, monthly_totals: RawJSON) -> Dict[str, Any]:
+    """Respuesta del dashboard (igual desde el snapshot o desde el fan-out)"""
+    total_balance = daily_transfer_used = daily_transfer_limit = 0
+    for account in accounts:
+        total_balance += account.balance
+        daily_transfer_used += account.daily_transfer_used
+        daily_transfer_limit += account.daily_transfer_limit
+
+    return make_json_response(200, {
+        'profile': profile,
+        'accounts': encode_records(accounts),
+        'summary': RawJSON(encode_object({
+            'totalBalance': money(total_balance),
+            'totalAccounts': len(accounts),
+            'dailyTransferUsed': money(daily_transfer_used),
+            'dailyTransferLimit': money(daily_transfer_limit),
+            'remainingDailyLimit': money(daily_transfer_limit - daily_transfer_used)
+        })),
+        'recentTransactions': recent,
+        'monthlyTotals': monthly_totals,
+        'correlationId': get_correlation_id(event)
+    })
+
+@instrument('get_dashboard')
+def lambda_handler(event: Dict[str, Any], context: Any) -> Dict[str, Any]:
+    """Handler del dashboard: perfil, cuentas, movimientos recientes y totales por mes en una sola respuesta"""
+
+    # Manejar preflight OPTIONS request
+    if event.get('httpMethod') == 'OPTIONS':
+        return preflight_response()
+
+    try:
+        customer_id = get_customer_id(event)
+        if not customer_id:
+            return unauthorized_response()
+
+        today = datetime.now().date().isoformat()
+        first_month = month_offset(today[:7], 1 - MONTHLY_TOTALS_MONTHS)
+
+        profile = profile_future = None
+        if SNAPSHOTS_TABLE:
+            user_item, snapshot_item = get_profile_and_snapshot(customer_id)
+            profile = RawJSON(UserProfile.from_item(user_item).to_json()) if user_item else None
+            document = load_document(snapshot_item, dict)
+            # Mismo criterio que el cache de get_accounts: el snapshot sirve si ya
+            # refleja la última transferencia registrada en el usuario. Con cuentas
+            # repartidas esa marca no cubre los créditos a los shards: fan-out
+            required = (user_item or {}).get('accountsUpdatedAt', {'S': ''})['S']
+            sharded = (user_item or {}).get('shardedAccounts', {'BOOL': False})['BOOL']
+            fresh = bool(document) and not sharded and accounts_updated_at(document) >= required
+            status = 'hit' if fresh else 'sharded' if sharded else 'stale' if document else 'missing'
+            print(f'[SNAPSHOT] {status}')
+            if fresh:
+                return dashboard_response(
+                    event, profile, snapshot_accounts(document, today),
+                    snapshot_recent(document, RECENT_TRANSACTIONS),
+                    encode_monthly_totals(document['months'], first_month)
+                )
+        else:
+            # El perfil no depende de nada: corre en paralelo con las dos oleadas
+            profile_future = executor.submit(get_profile, customer_id)
+
+        items = get_customer_accounts(ACCOUNTS_TABLE, customer_id)
+        account_ids = [item['accountId']['S'] for item in items]
+
+        # Segunda oleada: por cuenta, los movimientos y los agregados diarios, y
+        # los contadores del día, todo a la vez
+        daily_used_future = executor.submit(get_daily_used, DAILY_LIMITS_TABLE, account_ids, today) if account_ids else None
+        recent_futures = [executor.submit(get_recent_transactions, account_id) for account_id in account_ids]
+        bucket_futures = [executor.submit(get_day_buckets, item['accountId']['S'], first_month,
+                                          balance_shard_count(item)) for item in items]
+        # Saldos repartidos en shards: sin lecturas si ninguna cuenta los usa
+        items = consolidate_balances(items, ACCOUNTS_TABLE, BALANCE_SHARDS_TABLE)
+
+        daily_used = daily_used_future.result() if daily_used_future else {}
+        accounts = [Account.from_item(item, daily_used.get(item['accountId']['S'], 0)) for item in items]
+
+        # Movimientos recientes de todas las cuentas, los más nuevos primero
+        recent = [transaction for future in recent_futures for transaction in future.result()]
+        recent.sort(key=lambda transaction: transaction.timestamp, reverse=True)
+
+        months: Dict[str, List[int]] = {}
+        for future in bucket_futures:
+            for bucket in future.result():
+                add_bucket(months, bucket['timestamp']['S'][len('DAY#'):], bucket)
+
+        return dashboard_response(
+            event, profile_future.result() if profile_future else profile, accounts,
+            encode_records(recent[:RECENT_TRANSACTIONS]), encode_monthly_totals(months, first_month)
+        )
+
+    except dynamo.ClientError as e:
+        print(f'DynamoDB error: {str(e)}')
+        return make_response(500, {
+            'error': 'Database error',
+            'message': 'Error retrieving dashboard'
+        })
+    except Exception as e:
+        print(f'Unexpected error: {str(e)}')
+        return make_response(500, {
+            'error': 'Internal server error',
+            'message': 'An unexpected error occurred'
+        })
@@ -1,92 +1,74 @@
-import json
 import os
-import boto3
 from typing import Dict, Any
-from botocore.exceptions import ClientError
 
-# Cliente de DynamoDB
-dynamodb = boto3.client('dynamodb')
+from banca_common.cache import TTLCache
+from banca_common import dynamo
+from banca_common.dynamo import dynamodb
+from banca_common.events import get_customer_id, get_correlation_id, get_header
+from banca_common.metrics import instrument
+from banca_common.records import UserProfile
+from banca_common.responses import (
+    RawJSON, compress_response, etag_headers, etag_matches, make_etag, make_json_response, make_response,
+    not_modified_response, preflight_response, unauthorized_response
+)
+
 USERS_TABLE = os.environ['USERS_TABLE_NAME']
+CACHE_MAX_ENTRIES = int(os.environ.get('CACHE_MAX_ENTRIES', '1024'))
+PROFILE_CACHE_TTL_SECONDS = float(os.environ.get('PROFILE_CACHE_TTL_SECONDS', '300'))
 
-def make_response(status_code: int, body: Dict[str, Any]) -> Dict[str, Any]:
-    """Crear respuesta HTTP con headers CORS"""
-    return {
-        'statusCode': status_code,
-        'headers': {
-            'Access-Control-Allow-Origin': '*',
-            'Access-Control-Allow-Headers': 'Content-Type,Authorization,X-Amz-Date,X-Api-Key,X-Amz-Security-Token,X-Requested-With,X-Environment',
-            'Access-Control-Allow-Methods': 'OPTIONS,GET,POST,PUT,DELETE',
-            'Access-Control-Max-Age': '86400',
-            'Content-Type': 'application/json'
-        },
-        'body': json.dumps(body, ensure_ascii=False)
-    }
+# Perfiles por sub de Cognito, ya serializados junto a su ETag; el perfil solo
+# se escribe en post_confirmation
+profile_cache = TTLCache('profile', CACHE_MAX_ENTRIES, PROFILE_CACHE_TTL_SECONDS)
 
+@instrument('get_profile')
 def lambda_handler(event: Dict[str, Any], context: Any) -> Dict[str, Any]:
     """Handler para obtener perfil de usuario"""
-    
+
     # Manejar preflight OPTIONS request
     if event.get('httpMethod') == 'OPTIONS':
-        return make_response(200, {'message': 'CORS preflight successful'})
+        return preflight_response()
 
     try:
-        # Obtener customerId del token JWT (sub claim)
-        authorizer_context = event.get('requestContext', {}).get('authorizer', {})
-        customer_id = authorizer_context.get('claims', {}).get('sub')
-        
+        customer_id = get_customer_id(event)
         if not customer_id:
-            return make_response(401, {
-                'error': 'Unauthorized',
-                'message': 'Customer ID not found in token'
-            })
+            return unauthorized_response()
+
+        if_none_match = get_header(event, 'If-None-Match')
+        cached = profile_cache.get(customer_id)
+        profile_cache.log_stats(cached is not None)
+        if cached is not None:
+            user_profile, etag = cached
+        else:
+            # Buscar usuario en la tabla Users
+            response = dynamodb.get_item(
+                TableName=USERS_TABLE,
+                Key={'id': {'S': customer_id}}
+            )
 
-        # Buscar usuario en la tabla Users
-        response = dynamodb.get_item(
-            TableName=USERS_TABLE,
-            Key={'id': {'S': customer_id}}
-        )
+            if 'Item' not in response:
+                return make_response(404, {
+                    'error': 'Not Found',
+                    'message': 'User profile not found'
+                })
 
-        if 'Item' not in response:
-            return make_response(404, {
-                'error': 'Not Found',
-                'message': 'User profile not found'
-            })
+            # La versión del perfil es su updatedAt: el 304 no llega a armar el registro
+            item = response['Item']
+            etag = make_etag(customer_id, item.get('updatedAt', item['createdAt'])['S'])
+            if etag_matches(if_none_match, etag):
+                return not_modified_response(etag)
 
-        item = response['Item']
-        
-        # Extraer datos del usuario
-        user_profile = {
-            'id': item['id']['S'],
-            'email': item['email']['S'],
-            'name': item.get('name', {}).get('S', ''),
-            'givenName': item.get('givenName', {}).get('S', ''),
-            'familyName': item.get('familyName', {}).get('S', ''),
-            'createdAt': item['createdAt']['S'],
-            'updatedAt': item.get('updatedAt', {}).get('S', item['createdAt']['S']),
-            'status': item.get('status', {'S': 'ACTIVE'})['S'],
-            'customerType': item.get('customerType', {'S': 'INDIVIDUAL'})['S'],
-            'riskProfile': item.get('riskProfile', {'S': 'CONSERVATIVE'})['S'],
-            'preferences': {}
-        }
+            user_profile = RawJSON(UserProfile.from_item(item).to_json())
+            profile_cache.put(customer_id, (user_profile, etag))
 
-        # Extraer preferencias si existen
-        if 'preferences' in item:
-            preferences = item['preferences']['M']
-            user_profile['preferences'] = {
-                'notifications': {
-                    'email': preferences.get('notifications', {}).get('M', {}).get('email', {}).get('BOOL', True),
-                    'sms': preferences.get('notifications', {}).get('M', {}).get('sms', {}).get('BOOL', False)
-                },
-                'language': preferences.get('language', {}).get('S', 'es'),
-                'currency': preferences.get('currency', {}).get('S', 'USD')
-            }
+        if etag_matches(if_none_match, etag):
+            return not_modified_response(etag)
 
-        return make_response(200, {
+        return compress_response(make_json_response(200, {
             'profile': user_profile,
-            'correlationId': event.get('requestContext', {}).get('requestId', '')
-        })
+            'correlationId': get_correlation_id(event)
+        }, etag_headers(etag)), get_header(event, 'Accept-Encoding'))
 
-    except ClientError as e:
+    except dynamo.ClientError as e:
         print(f'DynamoDB error: {str(e)}')
         return make_response(500, {
             'error': 'Database error',
@@ -98,4 +80,3 @@ def lambda_handler(event: Dict[str, Any], context: Any) -> Dict[str, Any]:
             'error': 'Internal server error',
             'message': 'An unexpected error occurred'
         })
-
@@ -1,135 +1,855 @@
+import base64
+import csv
+import hashlib
+import heapq
+import hmac
+import io
 import json
 import os
-import boto3
-from typing import Dict, Any
-from botocore.exceptions import ClientError
+from concurrent.futures import ThreadPoolExecutor
+from collections import Counter
+from datetime import date, datetime, timedelta
+from decimal import Decimal, InvalidOperation
+from itertools import islice
+from typing import Dict, Any, Iterable, Iterator, List, Optional, Tuple
+
+from banca_common import archive, dynamo
+from banca_common.accounts import get_customer_accounts
+from banca_common.balances import pending_summary_keys
+from banca_common.dynamo import MAX_POOL_CONNECTIONS, dynamodb
+from banca_common.events import get_correlation_id, get_customer_id, get_header, get_path_parameter, get_query_parameters
+from banca_common.items import (
+    SUMMARY_ARCHIVED_BUCKET, SUMMARY_PREFIX, SUMMARY_TOTAL_BUCKET, STATUS_COMPLETED, balance_shard_count,
+    filter_key, summary_partition
+)
+from banca_common.metrics import instrument, phase
+from banca_common.records import Transaction, encode_records, minor_units, money, to_minor_units
+from banca_common.responses import (
+    RawJSON, compress_response, encode_object, etag_headers, etag_matches, make_etag, make_json_response,
+    make_response, make_raw_response, not_modified_response, preflight_response, unauthorized_response
+)
 
-# Cliente de DynamoDB
-dynamodb = boto3.client('dynamodb')
 TRANSACTIONS_TABLE = os.environ['TRANSACTIONS_TABLE_NAME']
+ACCOUNTS_TABLE = os.environ['ACCOUNTS_TABLE_NAME']
+USERS_TABLE = os.environ['USERS_TABLE_NAME']
+# Bucket del archivo de transacciones (archive_transactions); vacío si no se archiva
+ARCHIVE_BUCKET = os.environ.get('ARCHIVE_BUCKET_NAME', '')
+
+# Clave secreta para firmar los cursores de paginación (obligatoria: sin ella
+# cualquiera podría fabricar un cursor válido)
+CURSOR_SIGNING_KEY = os.environ['CURSOR_SIGNING_KEY'].encode()
+
+DEFAULT_PAGE_LIMIT = 50
+MAX_PAGE_LIMIT = 1000
+# Filas por respuesta en modo exportación; el cliente sigue X-Next-Cursor
+EXPORT_PAGE_ROWS = int(os.environ.get('EXPORT_PAGE_ROWS', '5000'))
+EXPORT_QUERY_PAGE_SIZE = 500
+EXPORT_FIELDS = ['accountId', 'timestamp', 'type', 'amount', 'counterparty', 'transferId', 'status', 'note']
+EXPORT_CONTENT_TYPES = {
+    'ndjson': 'application/x-ndjson',
+    'csv': 'text/csv; charset=utf-8'
+}
+# GSIs de filtros (partición <accountId>#<valor>, orden timestamp, proyección ALL);
+# con el nombre vacío ese filtro se resuelve con FilterExpression sobre la tabla
+TYPE_INDEX = os.environ.get('TRANSACTION_TYPE_INDEX_NAME', 'AccountTypeIndex')
+STATUS_INDEX = os.environ.get('TRANSACTION_STATUS_INDEX_NAME', 'AccountStatusIndex')
+INDEX_KEYS = {TYPE_INDEX: 'typeKey', STATUS_INDEX: 'statusKey'}
+TRANSACTION_TYPES = ('DEBIT', 'CREDIT')
+TRANSACTION_STATUSES = (STATUS_COMPLETED, 'FAILED', 'PENDING')
+MAX_COUNTERPARTY_FILTER_LENGTH = 100
+# Atributos que lee Transaction.from_item; el resto (transactionId, claves de
+# los GSIs) no viaja en la respuesta de DynamoDB
+TRANSACTION_FIELDS = ['accountId', 'timestamp', 'createdAt', 'type', 'amount', 'counterparty',
+                      'transferId', 'status', 'note']
+# Hilos para las queries por cuenta del feed; no más que las conexiones del cliente
+FEED_MAX_WORKERS = min(int(os.environ.get('FEED_MAX_WORKERS', '16')), MAX_POOL_CONNECTIONS)
+
+# Segundos desde la última escritura antes de emitir un ETag: las queries (y los
+# GSIs) son eventualmente consistentes y podrían no reflejar todavía esa versión
+ETAG_SETTLE_SECONDS = float(os.environ.get('ETAG_SETTLE_SECONDS', '2'))
+
+# Un pool por contenedor, reutilizado entre invocaciones en caliente
+executor = ThreadPoolExecutor(max_workers=FEED_MAX_WORKERS, thread_name_prefix='feed')
+
+def make_export_response(body: str, content_type: str, next_cursor: Optional[str]) -> Dict[str, Any]:
+    """Crear respuesta de exportación (NDJSON/CSV) con headers CORS"""
+    headers = {'Access-Control-Expose-Headers': 'X-Next-Cursor'}
+    if next_cursor:
+        headers['X-Next-Cursor'] = next_cursor
+
+    return make_raw_response(200, body, content_type, headers)
+
+def _b64encode(data: bytes) -> str:
+    return base64.urlsafe_b64encode(data).rstrip(b'=').decode()
+
+def _b64decode(data: str) -> bytes:
+    return base64.urlsafe_b64decode(data + '=' * (-len(data) % 4))
+
+def encode_cursor(last_evaluated_key: Dict[str, Any]) -> str:
+    """Codificar LastEvaluatedKey como token opaco firmado"""
+    payload = _b64encode(json.dumps(last_evaluated_key, separators=(',', ':'), sort_keys=True).encode())
+    signature = _b64encode(hmac.new(CURSOR_SIGNING_KEY, payload.encode(), hashlib.sha256).digest())
+    return f'{payload}.{signature}'
+
+def verify_cursor(token: str) -> Dict[str, Any]:
+    """Validar la firma y decodificar un cursor; lanza ValueError si es inválido"""
+    try:
+        payload, signature = token.split('.', 1)
+        expected = _b64encode(hmac.new(CURSOR_SIGNING_KEY, payload.encode(), hashlib.sha256).digest())
+        if not hmac.compare_digest(signature, expected):
+            raise ValueError('Invalid cursor signature')
+        decoded = json.loads(_b64decode(payload))
+    except ValueError:
+        raise
+    except Exception:
+        raise ValueError('Malformed cursor')
+    if not isinstance(decoded, dict):
+        raise ValueError('Malformed cursor')
+    return decoded
+
+def decode_cursor(token: str, account_id: str) -> Dict[str, Any]:
+    """Validar y decodificar un cursor de una cuenta; lanza ValueError si es inválido"""
+    start_key = verify_cursor(token)
+
+    # El cursor solo es válido para la cuenta con la que fue emitido
+    if start_key.get('accountId', {}).get('S') != account_id:
+        raise ValueError('Cursor does not belong to this account')
+    return start_key
+
+def decode_feed_cursor(token: str, customer_id: str) -> Dict[str, Optional[str]]:
+    """Decodificar el cursor compuesto del feed: accountId -> posición de su stream"""
+    cursor = verify_cursor(token)
+    if cursor.get('customerId') != customer_id:
+        raise ValueError('Cursor does not belong to this customer')
+
+    positions = cursor.get('positions')
+    if not isinstance(positions, dict) or not all(
+            isinstance(position, str) or position is None for position in positions.values()):
+        raise ValueError('Malformed cursor')
+    return positions
+
+def parse_filters(query_params: Dict[str, str]) -> Dict[str, Any]:
+    """Validar los filtros de la query string; lanza ValueError con el mensaje para el 400"""
+    filters: Dict[str, Any] = {}
+
+    if query_params.get('type'):
+        filters['type'] = query_params['type'].upper()
+        if filters['type'] not in TRANSACTION_TYPES:
+            raise ValueError(f'type must be one of: {", ".join(TRANSACTION_TYPES)}')
+
+    if query_params.get('status'):
+        filters['status'] = query_params['status'].upper()
+        if filters['status'] not in TRANSACTION_STATUSES:
+            raise ValueError(f'status must be one of: {", ".join(TRANSACTION_STATUSES)}')
+
+    if query_params.get('counterparty'):
+        if len(query_params['counterparty']) > MAX_COUNTERPARTY_FILTER_LENGTH:
+            raise ValueError(f'counterparty must be at most {MAX_COUNTERPARTY_FILTER_LENGTH} characters')
+        filters['counterparty'] = query_params['counterparty']
+
+    # Rango sobre el monto absoluto: los débitos se guardan negativos
+    for name in ('minAmount', 'maxAmount'):
+        if query_params.get(name):
+            try:
+                value = Decimal(query_params[name])
+            except InvalidOperation:
+                value = Decimal('NaN')
+            if not value.is_finite() or value < 0:
+                raise ValueError(f'{name} must be a non-negative number')
+            filters[name] = value
+    if 'minAmount' in filters and 'maxAmount' in filters and filters['minAmount'] > filters['maxAmount']:
+        raise ValueError('minAmount must be less than or equal to maxAmount')
+
+    return filters
+
+def amount_condition(filters: Dict[str, Any], values: Dict[str, Any]) -> Optional[str]:
+    """Condición de FilterExpression para el rango de monto absoluto (créditos y débitos)"""
+    low = filters.get('minAmount')
+    high = filters.get('maxAmount')
+    if low is None and high is None:
+        return None
+    if high is None:
+        values[':minAmount'] = {'N': str(low)}
+        values[':negMinAmount'] = {'N': str(-low)}
+        return '(#amount >= :minAmount OR #amount <= :negMinAmount)'
+
+    values[':maxAmount'] = {'N': str(high)}
+    values[':negMaxAmount'] = {'N': str(-high)}
+    if low is None or low == 0:
+        return '#amount BETWEEN :negMaxAmount AND :maxAmount'
+    values[':minAmount'] = {'N': str(low)}
+    values[':negMinAmount'] = {'N': str(-low)}
+    return ('(#amount BETWEEN :minAmount AND :maxAmount '
+            'OR #amount BETWEEN :negMaxAmount AND :negMinAmount)')
+
+def matches(item: Dict[str, Any], filters: Dict[str, Any]) -> bool:
+    """Los mismos filtros que build_query, sobre una fila ya leída (filas del archivo)"""
+    for name in ('type', 'status'):
+        if name in filters and item.get(name, {}).get('S') != filters[name]:
+            return False
+    if 'counterparty' in filters and filters['counterparty'] not in item.get('counterparty', {}).get('S', ''):
+        return False
+    amount = abs(Decimal(item['amount']['N']))
+    if 'minAmount' in filters and amount < filters['minAmount']:
+        return False
+    if 'maxAmount' in filters and amount > filters['maxAmount']:
+        return False
+    return True
+
+def filter_index(filters: Dict[str, Any]) -> Tuple[Optional[str], Optional[str]]:
+    """GSI para los filtros y filtro que va en su clave: (None, None) si conviene la tabla"""
+    # Los estados distintos de COMPLETED son pocos: el índice disperso lee solo esas filas
+    if STATUS_INDEX and filters.get('status', STATUS_COMPLETED) != STATUS_COMPLETED:
+        return STATUS_INDEX, 'status'
+    if TYPE_INDEX and 'type' in filters:
+        return TYPE_INDEX, 'type'
+    return None, None
+
+def build_query(account_id: str, from_date: Optional[str], to_date: Optional[str],
+                filters: Optional[Dict[str, Any]] = None) -> Dict[str, Any]:
+    """
+    Construir los parámetros de query para las transacciones de una cuenta.
+
+    Un filtro selectivo va en la clave de un GSI: estados distintos de
+    COMPLETED en el índice disperso de estados, si no el tipo en el índice de
+    tipos. El resto se aplica con FilterExpression (consume la capacidad de
+    las filas leídas, no solo de las devueltas).
+    """
+    filters = filters or {}
+    expression_values = {
+        ':accountId': {'S': account_id}
+    }
+    expression_names = {f'#{field}': field for field in TRANSACTION_FIELDS}
+
+    query_kwargs = {
+        'TableName': TRANSACTIONS_TABLE,
+        'KeyConditionExpression': 'accountId = :accountId',
+        'ExpressionAttributeNames': expression_names,
+        'ExpressionAttributeValues': expression_values,
+        'ProjectionExpression': ', '.join(expression_names),
+        'ScanIndexForward': False  # Orden descendente (más recientes primero)
+    }
+
+    index_name, index_filter = filter_index(filters)
+    if index_name:
+        query_kwargs['IndexName'] = index_name
+        query_kwargs['KeyConditionExpression'] = f'{INDEX_KEYS[index_name]} = :indexKey'
+        expression_values[':indexKey'] = {'S': filter_key(account_id, filters[index_filter])}
 
-def make_response(status_code: int, body: Dict[str, Any]) -> Dict[str, Any]:
-    """Crear respuesta HTTP con headers CORS"""
+    # Rangos abiertos: basta con uno de los extremos
+    if from_date and to_date:
+        query_kwargs['KeyConditionExpression'] += ' AND #timestamp BETWEEN :fromDate AND :toDate'
+    elif from_date:
+        query_kwargs['KeyConditionExpression'] += ' AND #timestamp >= :fromDate'
+    elif to_date:
+        query_kwargs['KeyConditionExpression'] += ' AND #timestamp <= :toDate'
+    if from_date:
+        expression_values[':fromDate'] = {'S': from_date}
+    if to_date:
+        expression_values[':toDate'] = {'S': to_date}
+
+    conditions = []
+    for name in ('type', 'status'):
+        if name in filters and name != index_filter:
+            conditions.append(f'#{name} = :{name}')
+            expression_values[f':{name}'] = {'S': filters[name]}
+    if 'counterparty' in filters:
+        conditions.append('contains(#counterparty, :counterparty)')
+        expression_values[':counterparty'] = {'S': filters['counterparty']}
+    amount = amount_condition(filters, expression_values)
+    if amount:
+        conditions.append(amount)
+    if conditions:
+        query_kwargs['FilterExpression'] = ' AND '.join(conditions)
+
+    return query_kwargs
+
+def start_key_at(query_kwargs: Dict[str, Any], account_id: str, timestamp: str) -> Dict[str, Any]:
+    """ExclusiveStartKey para seguir después de una fila (incluye la clave del GSI si hay)"""
+    start_key = {'accountId': {'S': account_id}, 'timestamp': {'S': timestamp}}
+    index_key = INDEX_KEYS.get(query_kwargs.get('IndexName'))
+    if index_key:
+        start_key[index_key] = query_kwargs['ExpressionAttributeValues'][':indexKey']
+    return start_key
+
+def check_start_key(query_kwargs: Dict[str, Any], account_id: str, start_key: Dict[str, Any]) -> None:
+    """Un cursor solo continúa la misma ruta de índice con la que se emitió"""
+    timestamp = start_key.get('timestamp', {}).get('S', '')
+    if start_key != start_key_at(query_kwargs, account_id, timestamp):
+        raise ValueError('Cursor does not match these filters')
+
+def query_plan(filters: Dict[str, Any]) -> Dict[str, Any]:
+    """Describir la ruta usada: índice (o tabla), filtro en su clave y filtros en FilterExpression"""
+    index_name, index_filter = filter_index(filters)
+    server_filters = [name for name in ('type', 'status', 'counterparty') if name in filters and name != index_filter]
+    if 'minAmount' in filters or 'maxAmount' in filters:
+        server_filters.append('amount')
     return {
-        'statusCode': status_code,
-        'headers': {
-            'Access-Control-Allow-Origin': '*',
-            'Access-Control-Allow-Headers': 'Content-Type,Authorization,X-Amz-Date,X-Api-Key,X-Amz-Security-Token,X-Requested-With,X-Environment',
-            'Access-Control-Allow-Methods': 'OPTIONS,GET,POST,PUT,DELETE',
-            'Access-Control-Max-Age': '86400',
-            'Content-Type': 'application/json'
-        },
-        'body': json.dumps(body, ensure_ascii=False)
+        'index': index_name or 'table',
+        'keyFilter': index_filter,
+        'filterExpression': server_filters
     }
 
-def lambda_handler(event: Dict[str, Any], context: Any) -> Dict[str, Any]:
-    """Handler para obtener transacciones de una cuenta"""
-    
-    # Manejar preflight OPTIONS request
-    if event.get('httpMethod') == 'OPTIONS':
-        return make_response(200, {'message': 'CORS preflight successful'})
+def get_account_buckets(account_id: str, customer_id: str,
+                        buckets: List[str]) -> Optional[Tuple[int, Dict[str, Dict[str, Any]]]]:
+    """
+    Verificar por clave primaria que la cuenta pertenece al cliente y leer sus
+    buckets de SUMMARY# en el mismo batch_get_item: (shards de saldo de la
+    cuenta, bucket -> item), o None si la cuenta no existe o es de otro cliente.
+    """
+    request = {ACCOUNTS_TABLE: {
+        'Keys': [{'accountId': {'S': account_id}, 'customerId': {'S': customer_id}}],
+        'ProjectionExpression': 'accountId, balanceShards'
+    }}
+    if buckets:
+        request[TRANSACTIONS_TABLE] = {
+            'Keys': [{'accountId': {'S': f'{SUMMARY_PREFIX}{account_id}'}, 'timestamp': {'S': bucket}}
+                     for bucket in buckets],
+            'ConsistentRead': True
+        }
+    account, found = None, {}
+    while request:
+        response = dynamodb.batch_get_item(RequestItems=request)
+        responses = response.get('Responses', {})
+        account = account or next(iter(responses.get(ACCOUNTS_TABLE, [])), None)
+        for item in responses.get(TRANSACTIONS_TABLE, []):
+            found[item['timestamp']['S']] = item
+        request = response.get('UnprocessedKeys')
+    return (balance_shard_count(account), found) if account else None
+
+def get_pending_totals(account_id: str, shards: int) -> List[Dict[str, Any]]:
+    """Buckets TOTAL de los shards de saldo de la cuenta (créditos que el compactador aún no pasó)"""
+    found = []
+    request = {TRANSACTIONS_TABLE: {'Keys': pending_summary_keys(account_id, shards), 'ConsistentRead': True}}
+    while request:
+        response = dynamodb.batch_get_item(RequestItems=request)
+        found += response.get('Responses', {}).get(TRANSACTIONS_TABLE, [])
+        request = response.get('UnprocessedKeys')
+    return found
+
+def get_archived_buckets(account_ids: List[str]) -> Dict[str, Dict[str, Any]]:
+    """
+    Buckets ARCHIVED de las cuentas en lecturas por lote consistentes:
+    '<accountId>#ARCHIVED' -> item.
+    """
+    keys = [{'accountId': {'S': f'{SUMMARY_PREFIX}{account_id}'}, 'timestamp': {'S': SUMMARY_ARCHIVED_BUCKET}}
+            for account_id in account_ids]
+    found = {}
+    for start in range(0, len(keys), 100):
+        request = {TRANSACTIONS_TABLE: {'Keys': keys[start:start + 100], 'ConsistentRead': True}}
+        while request:
+            response = dynamodb.batch_get_item(RequestItems=request)
+            for item in response.get('Responses', {}).get(TRANSACTIONS_TABLE, []):
+                account_id = item['accountId']['S'][len(SUMMARY_PREFIX):]
+                found[f"{account_id}#{item['timestamp']['S']}"] = item
+            request = response.get('UnprocessedKeys')
+    return found
+
+def get_feed_version(customer_id: str) -> Tuple[str, str, bool]:
+    """
+    dataVersion y accountsUpdatedAt del cliente (post_transfer los actualiza) y
+    si tiene cuentas repartidas: los créditos a sus shards no los actualizan
+    """
+    response = dynamodb.get_item(
+        TableName=USERS_TABLE,
+        Key={'id': {'S': customer_id}},
+        ProjectionExpression='dataVersion, accountsUpdatedAt, shardedAccounts',
+        ConsistentRead=True
+    )
+    item = response.get('Item', {})
+    return (item.get('dataVersion', {'N': '0'})['N'], item.get('accountsUpdatedAt', {'S': ''})['S'],
+            item.get('shardedAccounts', {'BOOL': False})['BOOL'])
 
+def query_etag(query_params: Dict[str, str], *versions: str) -> str:
+    """ETag de una respuesta: las versiones de los datos más la query string completa"""
+    return make_etag(*versions, *sorted(f'{name}={value}' for name, value in query_params.items()))
+
+def settled(updated_at: str) -> bool:
+    """Si la última escritura ya tuvo ETAG_SETTLE_SECONDS para propagarse a las lecturas"""
+    if not updated_at:
+        return True
     try:
-        # Obtener parámetros de la URL
-        account_id = event.get('pathParameters', {}).get('accountId')
-        
-        if not account_id:
+        return (datetime.now() - datetime.fromisoformat(updated_at)).total_seconds() >= ETAG_SETTLE_SECONDS
+    except ValueError:
+        return False
+
+def valid_bound(value: str) -> bool:
+    """Si un extremo del rango (from/to) empieza con una fecha YYYY-MM-DD válida"""
+    try:
+        date.fromisoformat(value[:10])
+    except ValueError:
+        return False
+    return len(value) == 10 or value[10] == 'T'
+
+def _shift_day(day: str, days: int) -> str:
+    return (date.fromisoformat(day) + timedelta(days=days)).isoformat()
+
+def summary_ranges(from_date: Optional[str], to_date: Optional[str]
+                   ) -> Tuple[Optional[Tuple[str, str]], List[Tuple[str, str]]]:
+    """
+    Partir el rango [from, to] (timestamps exactos, como la query de las filas)
+    en días completos, que salen de los buckets DAY#, y tramos de un día que
+    salen de las filas: (primer y último día completos o None, tramos).
+    """
+    from_day = from_date[:10] if from_date else ''
+    to_day = to_date[:10] if to_date else ''
+    # '~' ordena después de cualquier hora: <día>T~ es el final del día
+    if from_day and from_day == to_day:
+        return None, [(from_date, to_date)]
+
+    partial = []
+    first = from_day
+    if from_date and from_date != from_day:
+        partial.append((from_date, f'{from_day}T~'))
+        first = _shift_day(from_day, 1)
+    last = '9999-12-31'
+    if to_date:
+        # Una fecha sola como `to` no incluye filas de ese día (van después)
+        if to_date != to_day:
+            partial.append((to_day, to_date))
+        last = _shift_day(to_day, -1)
+    return ((first, last) if first <= last else None), partial
+
+def get_summary(account_id: str, from_date: Optional[str], to_date: Optional[str],
+                totals: List[Dict[str, Any]], shards: int = 0,
+                archived: Optional[Dict[str, Any]] = None) -> RawJSON:
+    """
+    Sumar los agregados diarios del rango (o los TOTAL ya leídos); en una
+    cuenta repartida incluye los buckets de sus `shards`. Los días que el
+    rango cubre en parte se suman desde sus filas (de la tabla o del archivo)
+    """
+    counts = {'transactionCount': 0, 'completedCount': 0, 'failedCount': 0}
+    total_debits = total_credits = 0
+    if from_date or to_date:
+        days, partial = summary_ranges(from_date, to_date)
+        buckets = []
+        if days:
+            partitions = [summary_partition(account_id)] + [summary_partition(account_id, shard)
+                                                            for shard in range(shards)]
+            buckets = (bucket for partition in partitions for bucket in iter_transactions({
+                'TableName': TRANSACTIONS_TABLE,
+                'KeyConditionExpression': 'accountId = :accountId AND #timestamp BETWEEN :fromDay AND :toDay',
+                'ExpressionAttributeNames': {'#timestamp': 'timestamp'},
+                'ExpressionAttributeValues': {
+                    ':accountId': {'S': partition},
+                    ':fromDay': {'S': f'DAY#{days[0]}'},
+                    ':toDay': {'S': f'DAY#{days[1]}'}
+                }
+            }))
+        # Mismas reglas que los buckets: montos solo de las filas COMPLETED
+        for low, high in partial:
+            for item in account_rows(account_id, low, high, {}, archived):
+                status = item.get('status', {'S': STATUS_COMPLETED})['S']
+                counts['transactionCount'] += 1
+                if status != STATUS_COMPLETED:
+                    counts['failedCount'] += status == 'FAILED'
+                    continue
+                counts['completedCount'] += 1
+                amount = to_minor_units(item['amount']['N'])
+                if amount < 0:
+                    total_debits += amount
+                else:
+                    total_credits += amount
+    else:
+        buckets = totals
+
+    # Montos sumados en centavos: la suma de muchos buckets no acumula error de float
+    for bucket in buckets:
+        for field in counts:
+            if field in bucket:
+                counts[field] += int(bucket[field]['N'])
+        total_debits += minor_units(bucket, 'totalDebits')
+        total_credits += minor_units(bucket, 'totalCredits')
+
+    return RawJSON(encode_object({
+        'totalTransactions': counts['transactionCount'],
+        'totalDebits': money(total_debits),
+        'totalCredits': money(total_credits),
+        'completedTransactions': counts['completedCount'],
+        'failedTransactions': counts['failedCount'],
+        'netAmount': money(total_credits - abs(total_debits))
+    }))
+
+def iter_transactions(query_kwargs: Dict[str, Any], start_key: Optional[Dict[str, Any]] = None,
+                      page_size: int = EXPORT_QUERY_PAGE_SIZE,
+                      stats: Optional[Counter] = None) -> Iterator[Dict[str, Any]]:
+    """Recorrer todas las páginas de la query, una página en memoria a la vez"""
+    while True:
+        page_kwargs = dict(query_kwargs, Limit=page_size)
+        if start_key:
+            page_kwargs['ExclusiveStartKey'] = start_key
+
+        response = dynamodb.query(**page_kwargs)
+        if stats is not None:
+            stats['scannedCount'] += response.get('ScannedCount', 0)
+        yield from response.get('Items', [])
+
+        start_key = response.get('LastEvaluatedKey')
+        if not start_key:
+            return
+
+def account_rows(account_id: str, from_date: Optional[str], to_date: Optional[str], filters: Dict[str, Any],
+                 archived: Optional[Dict[str, Any]], start_key: Optional[Dict[str, Any]] = None,
+                 page_size: int = EXPORT_QUERY_PAGE_SIZE, stats: Optional[Counter] = None
+                 ) -> Iterator[Dict[str, Any]]:
+    """
+    Filas de una cuenta con los filtros, más nuevas primero, continuando
+    después de `start_key`. Con filas archivadas (bucket ARCHIVED) la tabla
+    solo se consulta desde `archivedBefore` y lo anterior sale del archivo en
+    S3, con los filtros aplicados al leerlo: el resultado es el mismo que si
+    las filas siguieran en la tabla.
+    """
+    watermark = archive.archived_before(archived) if ARCHIVE_BUCKET else None
+    if not watermark or (from_date and from_date >= watermark):
+        yield from iter_transactions(build_query(account_id, from_date, to_date, filters), start_key,
+                                     page_size, stats)
+        return
+
+    position = start_key['timestamp']['S'] if start_key else None
+    if not (position and position < watermark) and not (to_date and to_date < watermark):
+        yield from iter_transactions(build_query(account_id, watermark, to_date, filters), start_key,
+                                     page_size, stats)
+
+    before = min(position, watermark) if position else watermark
+    for item in archive.iter_archived(ARCHIVE_BUCKET, archive.segments_of(ARCHIVE_BUCKET, archived), from_date, to_date, before):
+        if stats is not None:
+            stats['archiveRows'] += 1
+        if matches(item, filters):
+            yield item
+
+def uses_archive(archived: Optional[Dict[str, Any]], from_date: Optional[str]) -> bool:
+    """Si el rango pedido llega a filas archivadas de la cuenta"""
+    watermark = archive.archived_before(archived) if ARCHIVE_BUCKET else None
+    return watermark is not None and not (from_date and from_date >= watermark)
+
+def export_transactions(query_kwargs: Dict[str, Any], start_key: Optional[Dict[str, Any]],
+                        export_format: str, rows: Optional[Iterable[Dict[str, Any]]] = None) -> Dict[str, Any]:
+    """Exportar transacciones (las de la query o `rows`) como NDJSON/CSV en bloques de EXPORT_PAGE_ROWS filas"""
+    buffer = io.StringIO()
+    writer = csv.writer(buffer)
+    if export_format == 'csv' and not start_key:
+        writer.writerow(EXPORT_FIELDS)
+
+    if rows is None:
+        rows = iter_transactions(query_kwargs, start_key)
+    next_cursor = None
+    last_item = None
+    for count, item in enumerate(rows):
+        if count == EXPORT_PAGE_ROWS:
+            # Hay más filas: el siguiente bloque continúa después de la última emitida
+            next_cursor = encode_cursor(start_key_at(
+                query_kwargs, last_item['accountId']['S'], last_item['timestamp']['S']))
+            break
+
+        transaction = Transaction.from_item(item)
+        if export_format == 'csv':
+            writer.writerow(transaction.to_row())
+        else:
+            buffer.write(transaction.to_json())
+            buffer.write('\n')
+        last_item = item
+
+    return make_export_response(buffer.getvalue(), EXPORT_CONTENT_TYPES[export_format], next_cursor)
+
+class AccountStream:
+    """Transacciones de una cuenta, más nuevas primero, leídas por páginas a demanda (account_rows)"""
+
+    def __init__(self, account_id: str, rows: Iterator[Dict[str, Any]], position: Optional[str]):
+        self.account_id = account_id
+        self.rows = rows
+        # Timestamp de la última fila emitida; las filas siguen después de ella
+        self.position = position
+        # Fila leída y todavía no entregada al merge, y la última entregada
+        self.head: List[Dict[str, Any]] = []
+        self.last: Optional[Dict[str, Any]] = None
+
+    def _pull(self) -> bool:
+        if not self.head:
+            self.head.extend(islice(self.rows, 1))
+        return bool(self.head)
+
+    def fetch(self) -> 'AccountStream':
+        """Leer la primera fila (la primera página de la query)"""
+        self._pull()
+        return self
+
+    def __iter__(self) -> Iterator[Dict[str, Any]]:
+        while self._pull():
+            self.last = self.head.pop()
+            yield self.last
+
+    def finished(self) -> bool:
+        """Sin más filas y con la última leída ya emitida"""
+        if self.last is not None and self.last['timestamp']['S'] != self.position:
+            # El merge tiene en su heap una fila que no entró en la página
+            return False
+        return not self._pull()
+
+def _row_timestamp(item: Dict[str, Any]) -> str:
+    return item['timestamp']['S']
+
+def customer_feed(customer_id: str, from_date: Optional[str], to_date: Optional[str],
+                  filters: Dict[str, Any], limit: int, positions: Dict[str, Optional[str]]
+                  ) -> Tuple[List[Dict[str, Any]], Dict[str, Optional[str]], bool]:
+    """
+    Mezclar las transacciones de todas las cuentas del cliente, más nuevas primero.
+    Retorna las filas, la posición de cada cuenta para el cursor y si quedan filas.
+    """
+    # None en el cursor: la cuenta ya se recorrió completa
+    account_ids = [item['accountId']['S'] for item in get_customer_accounts(ACCOUNTS_TABLE, customer_id, 'accountId')]
+    account_ids = [account_id for account_id in account_ids
+                   if not (account_id in positions and positions[account_id] is None)]
+    archived = get_archived_buckets(account_ids) if ARCHIVE_BUCKET and account_ids else {}
+
+    streams = []
+    for account_id in account_ids:
+        position = positions.get(account_id)
+        start_key = start_key_at(build_query(account_id, from_date, to_date, filters), account_id, position) \
+            if position else None
+        rows = account_rows(account_id, from_date, to_date, filters,
+                            archived.get(f'{account_id}#{SUMMARY_ARCHIVED_BUCKET}'), start_key, limit)
+        streams.append(AccountStream(account_id, rows, position))
+    by_account = {stream.account_id: stream for stream in streams}
+
+    # Primera página de cada cuenta en paralelo; ninguna aporta más de `limit` filas
+    list(executor.map(AccountStream.fetch, streams))
+
+    # Merge k-way con heap: solo se mantiene la cabeza de cada stream
+    rows = []
+    for item in heapq.merge(*streams, key=_row_timestamp, reverse=True):
+        rows.append(item)
+        by_account[item['accountId']['S']].position = item['timestamp']['S']
+        if len(rows) == limit:
+            break
+
+    next_positions = {account_id: None for account_id, position in positions.items() if position is None}
+    has_more = False
+    for stream in streams:
+        if stream.finished():
+            next_positions[stream.account_id] = None
+        else:
+            has_more = True
+            # Sin filas emitidas se omite: la siguiente página empieza la cuenta desde el principio
+            if stream.position:
+                next_positions[stream.account_id] = stream.position
+    return rows, next_positions, has_more
+
+def feed_response(event: Dict[str, Any], query_params: Dict[str, str], from_date: Optional[str],
+                  to_date: Optional[str], filters: Dict[str, Any], export_format: Optional[str],
+                  cursor: Optional[str], limit: int) -> Dict[str, Any]:
+    """Responder GET /v1/transactions: feed de todas las cuentas del cliente"""
+    customer_id = get_customer_id(event)
+    if not customer_id:
+        return unauthorized_response()
+
+    if export_format:
+        return make_response(400, {
+            'error': 'Bad Request',
+            'message': 'format is only supported for a single account'
+        })
+
+    positions = {}
+    if cursor:
+        try:
+            positions = decode_feed_cursor(cursor, customer_id)
+        except ValueError as e:
             return make_response(400, {
                 'error': 'Bad Request',
-                'message': 'Account ID is required'
+                'message': f'Invalid cursor: {str(e)}'
             })
 
+    # Sondeo sin cambios: 304 con una sola lectura de clave, sin queries por cuenta.
+    # Con cuentas repartidas la versión no cubre los créditos: sin 304 ni ETag
+    with phase('read'):
+        data_version, updated_at, sharded = get_feed_version(customer_id)
+    etag = query_etag(query_params, customer_id, data_version, updated_at)
+    if not sharded and etag_matches(get_header(event, 'If-None-Match'), etag):
+        return not_modified_response(etag)
+
+    with phase('read'):
+        rows, next_positions, has_more = customer_feed(customer_id, from_date, to_date, filters, limit, positions)
+
+    # Sin filas o con una escritura reciente no se emite ETag: la respuesta
+    # podría estar atrasada respecto de la versión leída
+    headers = etag_headers(etag) if rows and not sharded and settled(updated_at) else None
+
+    with phase('serialize'):
+        return compress_response(make_json_response(200, {
+            'transactions': encode_records(Transaction.from_item(item) for item in rows),
+            'pagination': {
+                'limit': limit,
+                'hasMore': has_more,
+                'nextCursor': encode_cursor({
+                    'customerId': customer_id,
+                    'positions': next_positions
+                }) if has_more else None
+            },
+            # Misma ruta para todas las cuentas del cliente
+            'query': query_plan(filters),
+            'correlationId': get_correlation_id(event)
+        }, headers), get_header(event, 'Accept-Encoding'))
+
+@instrument('get_transactions')
+def lambda_handler(event: Dict[str, Any], context: Any) -> Dict[str, Any]:
+    """Handler para obtener transacciones de una cuenta o el feed de todas las del cliente"""
+
+    # Manejar preflight OPTIONS request
+    if event.get('httpMethod') == 'OPTIONS':
+        return preflight_response()
+
+    try:
+        # Obtener parámetros de la URL; sin accountId se sirve el feed del cliente
+        account_id = get_path_parameter(event, 'accountId')
+
         # Obtener query parameters
-        query_params = event.get('queryStringParameters') or {}
-        limit = int(query_params.get('limit', 50))
+        query_params = get_query_parameters(event)
         from_date = query_params.get('from')
         to_date = query_params.get('to')
+        export_format = query_params.get('format')
+        cursor = query_params.get('cursor')
 
-        # Construir KeyConditionExpression
-        key_condition = 'accountId = :accountId'
-        expression_values = {
-            ':accountId': {'S': account_id}
-        }
+        try:
+            limit = int(query_params.get('limit', DEFAULT_PAGE_LIMIT))
+        except ValueError:
+            limit = 0
+        if not 1 <= limit <= MAX_PAGE_LIMIT:
+            return make_response(400, {
+                'error': 'Bad Request',
+                'message': f'limit must be an integer between 1 and {MAX_PAGE_LIMIT}'
+            })
 
-        if from_date and to_date:
-            key_condition += ' AND #timestamp BETWEEN :fromDate AND :toDate'
-            expression_values[':fromDate'] = {'S': from_date}
-            expression_values[':toDate'] = {'S': to_date}
-            expression_names = {'#timestamp': 'timestamp'}
-        else:
-            expression_names = None
-
-        # Buscar transacciones
-        scan_kwargs = {
-            'TableName': TRANSACTIONS_TABLE,
-            'KeyConditionExpression': key_condition,
-            'ExpressionAttributeValues': expression_values,
-            'Limit': limit,
-            'ScanIndexForward': False  # Orden descendente (más recientes primero)
-        }
-        
-        if expression_names:
-            scan_kwargs['ExpressionAttributeNames'] = expression_names
-
-        response = dynamodb.query(**scan_kwargs)
-
-        transactions = []
-        total_debits = 0
-        total_credits = 0
-        completed_count = 0
-        failed_count = 0
-
-        for item in response.get('Items', []):
-            amount = float(item['amount']['N'])
-            
-            transaction = {
-                'accountId': item['accountId']['S'],
-                'timestamp': item['timestamp']['S'],
-                'createdAt': item.get('createdAt', {}).get('S', item['timestamp']['S']),
-                'type': item['type']['S'],
-                'amount': amount,
-                'counterparty': item['counterparty']['S'],
-                'transferId': item.get('transferId', {}).get('S', ''),
-                'status': item.get('status', {'S': 'COMPLETED'})['S'],
-                'note': item.get('note', {}).get('S', '')
-            }
-            
-            transactions.append(transaction)
-            
-            # Calcular estadísticas
-            if transaction['type'] == 'DEBIT':
-                total_debits += amount
-            elif transaction['type'] == 'CREDIT':
-                total_credits += amount
-                
-            if transaction['status'] == 'COMPLETED':
-                completed_count += 1
-            elif transaction['status'] == 'FAILED':
-                failed_count += 1
-
-        summary = {
-            'totalTransactions': len(transactions),
-            'totalDebits': total_debits,
-            'totalCredits': total_credits,
-            'completedTransactions': completed_count,
-            'failedTransactions': failed_count,
-            'netAmount': total_credits - abs(total_debits)
-        }
+        for name, value in (('from', from_date), ('to', to_date)):
+            if value and not valid_bound(value):
+                return make_response(400, {
+                    'error': 'Bad Request',
+                    'message': f'{name} must be an ISO date (YYYY-MM-DD) or timestamp'
+                })
+        if from_date and to_date and from_date > to_date:
+            return make_response(400, {
+                'error': 'Bad Request',
+                'message': 'from must not be after to'
+            })
+
+        if export_format and export_format not in EXPORT_CONTENT_TYPES:
+            return make_response(400, {
+                'error': 'Bad Request',
+                'message': 'format must be one of: ndjson, csv'
+            })
+
+        try:
+            filters = parse_filters(query_params)
+        except ValueError as e:
+            return make_response(400, {
+                'error': 'Bad Request',
+                'message': str(e)
+            })
+
+        if not account_id:
+            return feed_response(event, query_params, from_date, to_date, filters, export_format, cursor, limit)
+
+        customer_id = get_customer_id(event)
+        if not customer_id:
+            return unauthorized_response()
+
+        query_kwargs = build_query(account_id, from_date, to_date, filters)
+
+        start_key = None
+        if cursor:
+            try:
+                start_key = decode_cursor(cursor, account_id)
+                check_start_key(query_kwargs, account_id, start_key)
+            except ValueError as e:
+                return make_response(400, {
+                    'error': 'Bad Request',
+                    'message': f'Invalid cursor: {str(e)}'
+                })
+
+        # Propiedad de la cuenta y buckets de resumen en una sola lectura, antes
+        # de paginar, exportar o responder 304; una cuenta ajena es un 404
+        archive_buckets = [SUMMARY_ARCHIVED_BUCKET] if ARCHIVE_BUCKET else []
+        with phase('read'):
+            account = get_account_buckets(account_id, customer_id, archive_buckets if export_format
+                                          else [SUMMARY_TOTAL_BUCKET] + archive_buckets)
+        if account is None:
+            return make_response(404, {
+                'error': 'Not Found',
+                'message': 'Account not found'
+            })
+        shards, buckets = account
+        archived = buckets.get(SUMMARY_ARCHIVED_BUCKET)
+
+        # Modo exportación: recorre todas las páginas con memoria acotada
+        accept_encoding = get_header(event, 'Accept-Encoding')
+        if export_format:
+            rows = None
+            if uses_archive(archived, from_date):
+                rows = account_rows(account_id, from_date, to_date, filters, archived, start_key)
+            return compress_response(export_transactions(query_kwargs, start_key, export_format, rows),
+                                     accept_encoding)
+
+        # En una cuenta repartida los créditos recientes están en los TOTAL de sus
+        # shards: la versión es la suma de todos, que no cambia al compactarlos
+        totals = [buckets[SUMMARY_TOTAL_BUCKET]] if SUMMARY_TOTAL_BUCKET in buckets else []
+        if shards:
+            with phase('read'):
+                totals += get_pending_totals(account_id, shards)
+
+        # Sondeo sin cambios: 304 sin query ni serialización
+        ledger_version = sum(int(bucket.get('ledgerVersion', {'N': '0'})['N']) for bucket in totals)
+        updated_at = max((bucket.get('updatedAt', {'S': ''})['S'] for bucket in totals), default='')
+        etag = query_etag(query_params, account_id, str(ledger_version), updated_at)
+        if etag_matches(get_header(event, 'If-None-Match'), etag):
+            return not_modified_response(etag)
+
+        with phase('read'):
+            if uses_archive(archived, from_date):
+                # El rango llega al archivo: tabla y archivo como una sola secuencia;
+                # una fila de más indica si hay otra página
+                stats = Counter()
+                items = list(islice(account_rows(account_id, from_date, to_date, filters, archived,
+                                                 start_key, limit + 1, stats), limit + 1))
+                last_evaluated_key = None
+                if len(items) > limit:
+                    items = items[:limit]
+                    last_evaluated_key = start_key_at(query_kwargs, account_id, items[-1]['timestamp']['S'])
+                plan = dict(query_plan(filters), scannedCount=stats['scannedCount'],
+                            archiveRows=stats['archiveRows'])
+            else:
+                # Buscar transacciones
+                query_kwargs['Limit'] = limit
+                if start_key:
+                    query_kwargs['ExclusiveStartKey'] = start_key
+                response = dynamodb.query(**query_kwargs)
+                items = response.get('Items', [])
+                last_evaluated_key = response.get('LastEvaluatedKey')
+                plan = dict(query_plan(filters), scannedCount=response.get('ScannedCount', 0))
+
+            # Resumen del rango (abierto o no) desde los agregados precalculados;
+            # no depende de los filtros de tipo, estado, contraparte o monto
+            summary = get_summary(account_id, from_date, to_date, totals, shards, archived)
 
         pagination = {
             'limit': limit,
-            'hasMore': 'LastEvaluatedKey' in response
+            'hasMore': last_evaluated_key is not None,
+            'nextCursor': encode_cursor(last_evaluated_key) if last_evaluated_key else None
         }
 
-        return make_response(200, {
-            'accountId': account_id,
-            'transactions': transactions,
-            'summary': summary,
-            'pagination': pagination,
-            'correlationId': event.get('requestContext', {}).get('requestId', '')
-        })
+        # Igual que en el feed: sin ETag para respuestas vacías o recién escritas
+        headers = etag_headers(etag) if items and settled(updated_at) else None
+
+        with phase('serialize'):
+            # Registros serializados directamente, sin dict intermedio por fila
+            transactions = encode_records(Transaction.from_item(item) for item in items)
+            return compress_response(make_json_response(200, {
+                'accountId': account_id,
+                'transactions': transactions,
+                'summary': summary,
+                'pagination': pagination,
+                'query': plan,
+                'correlationId': get_correlation_id(event)
+            }, headers), accept_encoding)
 
-    except ClientError as e:
+    except dynamo.ClientError as e:
         print(f'DynamoDB error: {str(e)}')
         return make_response(500, {
             'error': 'Database error',
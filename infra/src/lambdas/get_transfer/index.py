@@ -0,0 +1,163 @@
+import os
+from typing import Dict, Any, List, Optional
+
+from banca_common.cache import TTLCache
+from banca_common import dynamo
+from banca_common.dynamo import dynamodb
+from banca_common.events import get_customer_id, get_correlation_id, get_path_parameter
+from banca_common.metrics import instrument
+from banca_common.records import Transaction, money
+from banca_common.responses import (
+    RawJSON, encode_object, make_json_response, make_response, preflight_response, unauthorized_response
+)
+
+TRANSACTIONS_TABLE = os.environ['TRANSACTIONS_TABLE_NAME']
+ACCOUNTS_TABLE = os.environ['ACCOUNTS_TABLE_NAME']
+IDEMPOTENCY_TABLE = os.environ['IDEMPOTENCY_TABLE_NAME']
+TRANSFER_ID_INDEX = os.environ.get('TRANSFER_ID_INDEX_NAME', 'TransferIdIndex')
+CACHE_MAX_ENTRIES = int(os.environ.get('CACHE_MAX_ENTRIES', '1024'))
+TRANSFER_CACHE_TTL_SECONDS = float(os.environ.get('TRANSFER_CACHE_TTL_SECONDS', '3600'))
+TRANSFER_MAX_AGE_SECONDS = int(os.environ.get('TRANSFER_MAX_AGE_SECONDS', '86400'))
+PENDING_RETRY_AFTER_SECONDS = 1
+
+STATUS_IN_PROGRESS = 'IN_PROGRESS'
+
+# Una transferencia completada no cambia: el navegador y el contenedor la
+# reutilizan; mientras está en curso el cliente vuelve a consultar
+COMPLETED_HEADERS = {'Cache-Control': f'private, max-age={TRANSFER_MAX_AGE_SECONDS}, immutable'}
+PENDING_HEADERS = {'Cache-Control': 'no-store', 'Retry-After': str(PENDING_RETRY_AFTER_SECONDS)}
+
+# Transferencias completadas por transferId, como (customerId, JSON serializado)
+transfer_cache = TTLCache('transfer', CACHE_MAX_ENTRIES, TRANSFER_CACHE_TTL_SECONDS)
+
+def get_transfer_legs(transfer_id: str) -> List[Dict[str, Any]]:
+    """Leer las filas del libro mayor (débito y crédito) de la transferencia desde el GSI"""
+    response = dynamodb.query(
+        TableName=TRANSACTIONS_TABLE,
+        IndexName=TRANSFER_ID_INDEX,
+        KeyConditionExpression='transferId = :transferId',
+        ExpressionAttributeValues={
+            ':transferId': {'S': transfer_id}
+        }
+    )
+    return response.get('Items', [])
+
+def owns_account(account_id: str, customer_id: str) -> bool:
+    """Verificar por clave primaria que la cuenta pertenece al cliente"""
+    response = dynamodb.get_item(
+        TableName=ACCOUNTS_TABLE,
+        Key={'accountId': {'S': account_id}, 'customerId': {'S': customer_id}},
+        ProjectionExpression='accountId'
+    )
+    return 'Item' in response
+
+def get_operation_record(transfer_id: str) -> Optional[Dict[str, Any]]:
+    """Registro de idempotencia de la transferencia (el transferId es la idempotencyKey)"""
+    response = dynamodb.get_item(
+        TableName=IDEMPOTENCY_TABLE,
+        Key={'operationId': {'S': transfer_id}},
+        ProjectionExpression='customerId, #status, #result',
+        ExpressionAttributeNames={'#status': 'status', '#result': 'result'},
+        ConsistentRead=True
+    )
+    return response.get('Item')
+
+def encode_transfer(transfer_id: str, legs: List[Dict[str, Any]]) -> RawJSON:
+    """Armar la transferencia a partir de sus filas del libro mayor"""
+    transfer = {
+        'transferId': transfer_id,
+        'status': None,
+        'amount': None,
+        'sourceAccountId': None,
+        'targetAccountId': None,
+        'note': '',
+        'timestamp': None
+    }
+    for item in legs:
+        leg = Transaction.from_item(item)
+        transfer['status'] = leg.status
+        transfer['amount'] = money(abs(leg.amount))
+        transfer['note'] = leg.note
+        transfer['timestamp'] = leg.timestamp
+        transfer['sourceAccountId' if leg.type == 'DEBIT' else 'targetAccountId'] = leg.account_id
+    return RawJSON(encode_object(transfer))
+
+@instrument('get_transfer')
+def lambda_handler(event: Dict[str, Any], context: Any) -> Dict[str, Any]:
+    """Handler para consultar el estado de una transferencia"""
+
+    # Manejar preflight OPTIONS request
+    if event.get('httpMethod') == 'OPTIONS':
+        return preflight_response()
+
+    try:
+        customer_id = get_customer_id(event)
+        if not customer_id:
+            return unauthorized_response()
+
+        transfer_id = get_path_parameter(event, 'transferId')
+        if not transfer_id:
+            return make_response(400, {
+                'error': 'Bad Request',
+                'message': 'Transfer ID is required'
+            })
+
+        cached = transfer_cache.get(transfer_id)
+        transfer_cache.log_stats(cached is not None)
+        if cached is not None and cached[0] == customer_id:
+            return make_json_response(200, {
+                'transfer': cached[1],
+                'correlationId': get_correlation_id(event)
+            }, COMPLETED_HEADERS)
+
+        legs = get_transfer_legs(transfer_id)
+        if legs:
+            # Filas previas a customerId en el libro mayor: se valida con la cuenta
+            owner = legs[0].get('customerId', {}).get('S')
+            owned = owner == customer_id if owner else owns_account(legs[0]['accountId']['S'], customer_id)
+            if owned:
+                transfer = encode_transfer(transfer_id, legs)
+                # El GSI replica cada fila por separado: solo con ambas patas es definitiva
+                if len(legs) == 2:
+                    transfer_cache.put(transfer_id, (customer_id, transfer))
+                    headers = COMPLETED_HEADERS
+                else:
+                    headers = PENDING_HEADERS
+                return make_json_response(200, {
+                    'transfer': transfer,
+                    'correlationId': get_correlation_id(event)
+                }, headers)
+        else:
+            # Sin filas en el GSI: en curso, o completada y aún no replicada
+            record = get_operation_record(transfer_id)
+            if record is not None and record.get('customerId', {}).get('S') == customer_id:
+                if record.get('status', {}).get('S') == STATUS_IN_PROGRESS or 'result' not in record:
+                    transfer = {'transferId': transfer_id, 'status': 'PENDING'}
+                else:
+                    transfer = RawJSON(record['result']['S'])
+                return make_json_response(200, {
+                    'transfer': transfer,
+                    'correlationId': get_correlation_id(event)
+                }, PENDING_HEADERS)
+
+        # Transferencias de otros clientes responden igual que las inexistentes.
+        # También las archivadas (anteriores al corte de archive_transactions):
+        # el archivo se indexa por cuenta, no por transferId, y el registro de
+        # idempotencia ya venció; su detalle sale del listado de la cuenta
+        return make_response(404, {
+            'error': 'Not Found',
+            'message': 'Transfer not found'
+        })
+
+    except dynamo.ClientError as e:
+        print(f'DynamoDB error: {str(e)}')
+        return make_response(500, {
+            'error': 'Database error',
+            'message': 'Error retrieving transfer'
+        })
+    except Exception as e:
+        print(f'Unexpected error: {str(e)}')
+        return make_response(500, {
+            'error': 'Internal server error',
+            'message': 'An unexpected error occurred'
+        })
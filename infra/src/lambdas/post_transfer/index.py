@@ -1,308 +1,1030 @@
 import json
 import os
-import boto3
 import uuid
-from datetime import datetime
-from typing import Dict, Any
-from botocore.exceptions import ClientError
+from datetime import datetime, timedelta
+from decimal import Decimal
+from typing import Dict, Any, Callable, List, Optional, Sequence, Tuple
+
+from banca_common import dynamo
+from banca_common.balances import pick_shard, read_shards, shard_credit, shard_fold
+from banca_common.cache import TTLCache
+from banca_common.dynamo import BATCH_GET_MAX_KEYS, dynamodb
+from banca_common.events import get_customer_id
+from banca_common.items import (
+    DAILY_LIMIT_TTL_SECONDS, DEFAULT_DAILY_TRANSFER_LIMIT, SUMMARY_TOTAL_BUCKET,
+    balance_shard_count, daily_limit_key, summary_partition, transaction_item
+)
+from banca_common.metrics import instrument, phase
+from banca_common.records import MINOR_UNITS_PER_UNIT, format_minor, minor_units, to_minor_units
+from banca_common.responses import (
+    encode_json, make_raw_response, make_response, preflight_response, unauthorized_response
+)
 
-# Clientes de AWS
-dynamodb = boto3.client('dynamodb')
 ACCOUNTS_TABLE = os.environ['ACCOUNTS_TABLE_NAME']
 TRANSACTIONS_TABLE = os.environ['TRANSACTIONS_TABLE_NAME']
 IDEMPOTENCY_TABLE = os.environ['IDEMPOTENCY_TABLE_NAME']
+BALANCE_SHARDS_TABLE = os.environ['BALANCE_SHARDS_TABLE_NAME']
+DAILY_LIMITS_TABLE = os.environ['DAILY_LIMITS_TABLE_NAME']
+USERS_TABLE = os.environ['USERS_TABLE_NAME']
+ACCOUNT_ID_INDEX = os.environ.get('ACCOUNT_ID_INDEX_NAME', 'AccountIdIndex')
+MAX_BATCH_TRANSFERS = int(os.environ.get('MAX_BATCH_TRANSFERS', '500'))
+CACHE_MAX_ENTRIES = int(os.environ.get('CACHE_MAX_ENTRIES', '1024'))
+IDEMPOTENCY_CACHE_TTL_SECONDS = float(os.environ.get('IDEMPOTENCY_CACHE_TTL_SECONDS', '900'))
+# Tiempo tras el cual una reserva IN_PROGRESS abandonada se puede retomar
+IDEMPOTENCY_LOCK_SECONDS = int(os.environ.get('IDEMPOTENCY_LOCK_SECONDS', '30'))
+IDEMPOTENCY_TTL_SECONDS = 48 * 60 * 60
 
-def make_response(status_code: int, body: Dict[str, Any]) -> Dict[str, Any]:
-    """Crear respuesta HTTP con headers CORS"""
-    return {
-        'statusCode': status_code,
-        'headers': {
-            'Access-Control-Allow-Origin': '*',
-            'Access-Control-Allow-Headers': 'Content-Type,Authorization,X-Amz-Date,X-Api-Key,X-Amz-Security-Token,X-Requested-With,X-Environment',
-            'Access-Control-Allow-Methods': 'OPTIONS,GET,POST,PUT,DELETE',
-            'Access-Control-Max-Age': '86400',
-            'Content-Type': 'application/json'
-        },
-        'body': json.dumps(body, ensure_ascii=False)
-    }
+STATUS_IN_PROGRESS = 'IN_PROGRESS'
+STATUS_COMPLETED = 'COMPLETED'
 
-def check_idempotency(operation_id: str) -> bool:
-    """Verificar si la operación ya fue procesada"""
-    try:
-        response = dynamodb.get_item(
-            TableName=IDEMPOTENCY_TABLE,
-            Key={'operationId': {'S': operation_id}}
-        )
-        return 'Item' in response
-    except Exception as e:
-        print(f'Error checking idempotency: {str(e)}')
-        return False
+# Límites de la API de DynamoDB
+TRANSACT_MAX_ITEMS = 100
+
+# Cada cuenta nueva en un lote agrega su actualización, dos buckets de agregados
+# y (si es origen) su contador del límite diario; cada lote agrega además (si
+# ningún crédito fue a un shard) la versión de datos del cliente
+ITEMS_PER_BATCH_ACCOUNT = 4
+ITEMS_PER_BATCH_CHUNK = 1
+
+# Cuerpo de respuesta de operaciones completadas por cliente#idempotencyKey;
+# los reintentos en ráfaga se responden sin leer DynamoDB
+completed_cache = TTLCache('idempotency', CACHE_MAX_ENTRIES, IDEMPOTENCY_CACHE_TTL_SECONDS)
+
+def reserve_idempotency(operation_id: str, customer_id: str,
+                        reservation_id: str) -> Optional[Dict[str, Any]]:
+    """Reservar la operación como IN_PROGRESS; si ya existe retorna el registro guardado"""
+    now = datetime.now()
+    epoch = int(now.timestamp())
 
-def save_idempotency(operation_id: str, result: Dict[str, Any]) -> None:
-    """Guardar resultado de operación para idempotencia"""
     try:
-        # TTL de 48 horas
-        ttl = int(datetime.now().timestamp()) + (48 * 60 * 60)
-        
         dynamodb.put_item(
             TableName=IDEMPOTENCY_TABLE,
             Item={
                 'operationId': {'S': operation_id},
-                'result': {'S': json.dumps(result)},
-                'timestamp': {'S': datetime.now().isoformat()},
-                'ttl': {'N': str(ttl)}
-            }
-        )
-    except Exception as e:
-        print(f'Error saving idempotency: {str(e)}')
-
-def get_account(account_id: str) -> Dict[str, Any]:
-    """Obtener cuenta por ID"""
-    try:
-        # Usar scan para buscar por accountId ya que la tabla tiene sort key
-        response = dynamodb.scan(
-            TableName=ACCOUNTS_TABLE,
-            FilterExpression='accountId = :accountId',
+                'status': {'S': STATUS_IN_PROGRESS},
+                'customerId': {'S': customer_id},
+                'reservationId': {'S': reservation_id},
+                'lockExpiresAt': {'N': str(epoch + IDEMPOTENCY_LOCK_SECONDS)},
+                'timestamp': {'S': now.isoformat()},
+                'ttl': {'N': str(epoch + IDEMPOTENCY_TTL_SECONDS)}
+            },
+            ConditionExpression=(
+                'attribute_not_exists(operationId) OR (#status = :inProgress AND lockExpiresAt < :now)'
+            ),
+            ExpressionAttributeNames={'#status': 'status'},
             ExpressionAttributeValues={
-                ':accountId': {'S': account_id}
-            }
+                ':inProgress': {'S': STATUS_IN_PROGRESS},
+                ':now': {'N': str(epoch)}
+            },
+            ReturnValuesOnConditionCheckFailure='ALL_OLD'
         )
-        
-        if not response.get('Items'):
-            return None
-            
-        item = response['Items'][0]  # Tomar el primer (y único) resultado
-        return {
-            'accountId': item['accountId']['S'],
-            'customerId': item['customerId']['S'],
-            'balance': float(item['balance']['N']),
-            'dailyTransferUsed': float(item.get('dailyTransferUsed', {'N': '0'})['N']),
-            'dailyTransferLimit': float(item.get('dailyTransferLimit', {'N': '500'})['N'])
-        }
-    except Exception as e:
-        print(f'Error getting account: {str(e)}')
         return None
+    except dynamo.ClientError as e:
+        if e.response['Error']['Code'] != 'ConditionalCheckFailedException':
+            raise
+        return e.response.get('Item', {})
 
-def update_account_balance(account_id: str, new_balance: float, daily_used: float) -> bool:
-    """Actualizar saldo y límite diario de cuenta"""
+def release_idempotency(operation_id: str, reservation_id: str) -> None:
+    """Liberar la reserva propia cuando la transferencia no se realizó"""
     try:
-        # Primero obtener la cuenta completa para tener ambas keys
-        account = get_account(account_id)
-        if not account:
-            print(f'Account {account_id} not found for update')
-            return False
-        
-        # Usar put_item para actualizar (más simple que update_item con keys compuestas)
-        response = dynamodb.scan(
-            TableName=ACCOUNTS_TABLE,
-            FilterExpression='accountId = :accountId',
+        dynamodb.delete_item(
+            TableName=IDEMPOTENCY_TABLE,
+            Key={'operationId': {'S': operation_id}},
+            ConditionExpression='#status = :inProgress AND reservationId = :reservationId',
+            ExpressionAttributeNames={'#status': 'status'},
             ExpressionAttributeValues={
-                ':accountId': {'S': account_id}
+                ':inProgress': {'S': STATUS_IN_PROGRESS},
+                ':reservationId': {'S': reservation_id}
             }
         )
-        
-        if not response.get('Items'):
-            print(f'Account {account_id} not found for update')
-            return False
-        
-        # Obtener el item completo
-        item = response['Items'][0]
-        
-        # Actualizar los campos necesarios
-        item['balance'] = {'N': str(new_balance)}
-        item['dailyTransferUsed'] = {'N': str(daily_used)}
-        item['updatedAt'] = {'S': datetime.now().isoformat()}
-        
-        # Usar put_item para actualizar
-        dynamodb.put_item(
-            TableName=ACCOUNTS_TABLE,
-            Item=item
-        )
-        return True
     except Exception as e:
-        print(f'Error updating account balance: {str(e)}')
-        return False
+        print(f'Error releasing idempotency reservation: {str(e)}')
+
+def replay_response(record: Dict[str, Any], customer_id: str, operation_id: str) -> Dict[str, Any]:
+    """Responder un duplicado a partir del registro de idempotencia guardado"""
+    owner = record.get('customerId', {}).get('S')
+    if owner and owner != customer_id:
+        return make_response(409, {
+            'error': 'Conflict',
+            'message': 'idempotencyKey was already used for a different operation'
+        })
+
+    # Registros previos a la reserva no tienen status y siempre están completos
+    if record.get('status', {}).get('S', STATUS_COMPLETED) == STATUS_IN_PROGRESS or 'result' not in record:
+        return make_response(409, {
+            'error': 'Conflict',
+            'message': 'A transfer with this idempotencyKey is already in progress, please retry'
+        })
+
+    result_body = record['result']['S']
+    completed_cache.put(f'{customer_id}#{operation_id}', result_body)
+    return make_raw_response(200, result_body, 'application/json')
+
+def check_idempotency_batch(operation_ids: List[str]) -> Dict[str, Dict[str, Any]]:
+    """Obtener los registros de idempotencia existentes de las operaciones"""
+    records = {}
+    unique_ids = list(dict.fromkeys(operation_ids))
 
-def create_transaction(account_id: str, transaction_type: str, amount: float, 
-                      counterparty: str, note: str, transfer_id: str) -> bool:
-    """Crear transacción en DynamoDB"""
     try:
-        timestamp = datetime.now().isoformat()
-        
-        dynamodb.put_item(
-            TableName=TRANSACTIONS_TABLE,
-            Item={
-                'accountId': {'S': account_id},
-                'timestamp': {'S': timestamp},
-                'transactionId': {'S': str(uuid.uuid4())},
-                'type': {'S': transaction_type},
-                'amount': {'N': str(amount)},
-                'counterparty': {'S': counterparty},
-                'transferId': {'S': transfer_id},
-                'status': {'S': 'COMPLETED'},
-                'note': {'S': note or ''},
-                'createdAt': {'S': timestamp}
+        for start in range(0, len(unique_ids), BATCH_GET_MAX_KEYS):
+            request_items = {IDEMPOTENCY_TABLE: {
+                'Keys': [{'operationId': {'S': operation_id}}
+                         for operation_id in unique_ids[start:start + BATCH_GET_MAX_KEYS]],
+                'ProjectionExpression': 'operationId, #status, #result, customerId',
+                'ExpressionAttributeNames': {'#status': 'status', '#result': 'result'}
+            }}
+            while request_items:
+                response = dynamodb.batch_get_item(RequestItems=request_items)
+                for item in response.get('Responses', {}).get(IDEMPOTENCY_TABLE, []):
+                    records[item['operationId']['S']] = item
+                request_items = response.get('UnprocessedKeys') or None
+    except Exception as e:
+        print(f'Error checking idempotency: {str(e)}')
+
+    return records
+
+def idempotency_complete(operation_id: str, reservation_id: str, result_body: str,
+                         timestamp: str) -> Dict[str, Any]:
+    """Construir el Update que pasa la reserva a COMPLETED con el resultado"""
+    return {
+        'Update': {
+            'TableName': IDEMPOTENCY_TABLE,
+            'Key': {'operationId': {'S': operation_id}},
+            'UpdateExpression': 'SET #status = :completed, #result = :result, completedAt = :timestamp '
+                                'REMOVE lockExpiresAt',
+            # Si la reserva venció y la tomó otra invocación, la transacción se cancela
+            'ConditionExpression': '#status = :inProgress AND reservationId = :reservationId',
+            'ExpressionAttributeNames': {'#status': 'status', '#result': 'result'},
+            'ExpressionAttributeValues': {
+                ':completed': {'S': STATUS_COMPLETED},
+                ':inProgress': {'S': STATUS_IN_PROGRESS},
+                ':reservationId': {'S': reservation_id},
+                ':result': {'S': result_body},
+                ':timestamp': {'S': timestamp}
+            },
+            'ReturnValuesOnConditionCheckFailure': 'ALL_OLD'
+        }
+    }
+
+def idempotency_put(operation_id: str, customer_id: str, result_body: str) -> Dict[str, Any]:
+    """Construir el Put del registro de idempotencia completo (modo lote)"""
+    now = datetime.now()
+
+    return {
+        'Put': {
+            'TableName': IDEMPOTENCY_TABLE,
+            'Item': {
+                'operationId': {'S': operation_id},
+                'status': {'S': STATUS_COMPLETED},
+                'customerId': {'S': customer_id},
+                'result': {'S': result_body},
+                'timestamp': {'S': now.isoformat()},
+                'ttl': {'N': str(int(now.timestamp()) + IDEMPOTENCY_TTL_SECONDS)}
+            },
+            # Un reintento concurrente con la misma clave cancela la transacción;
+            # el registro que ya estaba vuelve en los motivos de la cancelación
+            'ConditionExpression': 'attribute_not_exists(operationId)',
+            'ReturnValuesOnConditionCheckFailure': 'ALL_OLD'
+        }
+    }
+
+def transfer_account(item: Dict[str, Any]) -> Dict[str, Any]:
+    """Campos de una cuenta que usa la transferencia, con los montos en centavos"""
+    return {
+        'accountId': item['accountId']['S'],
+        'customerId': item['customerId']['S'],
+        'balance': minor_units(item, 'balance'),
+        'dailyTransferLimit': minor_units(
+            item, 'dailyTransferLimit', int(DEFAULT_DAILY_TRANSFER_LIMIT * MINOR_UNITS_PER_UNIT)
+        ),
+        'balanceShards': balance_shard_count(item)
+    }
+
+def get_accounts(account_ids: List[str], customer_id: str, day: str) -> Dict[str, Dict[str, Any]]:
+    """Obtener cuentas del cliente y su uso del límite diario con batch_get_item"""
+    unique_ids = list(dict.fromkeys(account_ids))
+    accounts = {}
+    daily_used = {}
+
+    # Sin try: un error de DynamoDB (throttling, caída) llega al handler como
+    # 500; una cuenta que no se pudo leer no es una cuenta inexistente.
+    # Cada cuenta aporta dos claves: el item de Accounts y el contador del día
+    for start in range(0, len(unique_ids), BATCH_GET_MAX_KEYS // 2):
+        chunk = unique_ids[start:start + BATCH_GET_MAX_KEYS // 2]
+        request_items = {
+            ACCOUNTS_TABLE: {
+                'Keys': [{'accountId': {'S': account_id}, 'customerId': {'S': customer_id}}
+                         for account_id in chunk],
+                'ConsistentRead': True
+            },
+            DAILY_LIMITS_TABLE: {
+                'Keys': [daily_limit_key(account_id, day) for account_id in chunk],
+                'ProjectionExpression': 'accountId, used',
+                'ConsistentRead': True
+            }
+        }
+        while request_items:
+            response = dynamodb.batch_get_item(RequestItems=request_items)
+            for item in response.get('Responses', {}).get(ACCOUNTS_TABLE, []):
+                accounts[item['accountId']['S']] = transfer_account(item)
+            for item in response.get('Responses', {}).get(DAILY_LIMITS_TABLE, []):
+                daily_used[item['accountId']['S']] = minor_units(item, 'used')
+            request_items = response.get('UnprocessedKeys') or None
+
+    for account_id, account in accounts.items():
+        account['dailyTransferUsed'] = daily_used.get(account_id, 0)
+    return accounts
+
+def load_balance_shards(accounts: Dict[str, Dict[str, Any]], account_ids: List[str]) -> None:
+    """Sumar al saldo de las cuentas de origen con saldo repartido el de sus shards"""
+    shard_counts = {account_id: accounts[account_id]['balanceShards'] for account_id in set(account_ids)
+                    if account_id in accounts and accounts[account_id]['balanceShards']}
+    if not shard_counts:
+        return
+
+    for account_id, shards in read_shards(BALANCE_SHARDS_TABLE, shard_counts).items():
+        account = accounts[account_id]
+        # `baseBalance` es el saldo del item: lo que un débito puede tomar sin traspasos
+        account['baseBalance'] = account['balance']
+        account['shards'] = {shard: to_minor_units(str(balance)) for shard, balance in shards.items()}
+        account['balance'] += sum(account['shards'].values())
+
+def account_exists(account_id: str) -> bool:
+    """Verificar si existe una cuenta con el accountId (de cualquier cliente)"""
+    # Solo se usa cuando la cuenta no pertenece al cliente autenticado, para
+    # distinguir "no existe" (404) de "no pertenece al usuario" (403); como
+    # en get_accounts, un error de DynamoDB no se convierte en 404
+    response = dynamodb.query(
+        TableName=ACCOUNTS_TABLE,
+        IndexName=ACCOUNT_ID_INDEX,
+        KeyConditionExpression='accountId = :accountId',
+        ExpressionAttributeValues={
+            ':accountId': {'S': account_id}
+        },
+        Select='COUNT',
+        Limit=1
+    )
+    return response.get('Count', 0) > 0
+
+def account_update(account: Dict[str, Any], balance_delta: int, min_balance: int,
+                   timestamp: str) -> Dict[str, Any]:
+    """Construir la actualización condicional (ADD) del saldo de una cuenta (montos en centavos)"""
+    conditions = ['attribute_exists(accountId)']
+    values = {
+        ':delta': {'N': format_minor(balance_delta)},
+        ':updatedAt': {'S': timestamp}
+    }
+
+    # Las validaciones se repiten en DynamoDB para que transferencias
+    # concurrentes de la misma cuenta no pierdan actualizaciones
+    if min_balance > 0:
+        conditions.append('balance >= :minBalance')
+        values[':minBalance'] = {'N': format_minor(min_balance)}
+
+    return {
+        'Update': {
+            'TableName': ACCOUNTS_TABLE,
+            'Key': {
+                'accountId': {'S': account['accountId']},
+                'customerId': {'S': account['customerId']}
+            },
+            'UpdateExpression': 'ADD balance :delta SET updatedAt = :updatedAt',
+            'ConditionExpression': ' AND '.join(conditions),
+            'ExpressionAttributeValues': values,
+            'ReturnValuesOnConditionCheckFailure': 'ALL_OLD'
+        }
+    }
+
+def balance_updates(account: Dict[str, Any], balance_delta: int, min_balance: int, timestamp: str,
+                    credit_key: str) -> Tuple[List[Dict[str, Any]], int, Dict[int, int]]:
+    """
+    Items de la transacción que cambian el saldo de una cuenta, con el cambio
+    que producen en su item base y en cada shard (en centavos).
+
+    En una cuenta con saldo repartido un crédito neto va a uno de sus shards.
+    Un débito usa el item base y, si no alcanza, le traspasa en la misma
+    transacción los shards necesarios, los de más saldo primero.
+    """
+    shard_count = account['balanceShards']
+    if shard_count and balance_delta > 0 and min_balance <= 0:
+        shard = pick_shard(credit_key, shard_count)
+        credit = shard_credit(BALANCE_SHARDS_TABLE, account['accountId'], shard, format_minor(balance_delta),
+                              timestamp)
+        return [credit], 0, {shard: balance_delta}
+
+    folded: Dict[int, int] = {}
+    if 'shards' in account:
+        available = account['baseBalance']
+        for shard, amount in sorted(account['shards'].items(), key=lambda entry: entry[1], reverse=True):
+            if available >= min_balance or amount <= 0:
+                break
+            folded[shard] = amount
+            available += amount
+    if not folded:
+        return [account_update(account, balance_delta, min_balance, timestamp)], balance_delta, {}
+
+    total = sum(folded.values())
+    update = account_update(account, balance_delta + total, min_balance - total, timestamp)
+    folds = [shard_fold(BALANCE_SHARDS_TABLE, account['accountId'], shard, Decimal(format_minor(amount)))
+             for shard, amount in folded.items()]
+    return [update] + folds, balance_delta + total, {shard: -amount for shard, amount in folded.items()}
+
+def daily_limit_update(account: Dict[str, Any], used_delta: int, timestamp: str) -> Dict[str, Any]:
+    """Construir el incremento (ADD) del contador del día con tope en el límite de la cuenta (centavos)"""
+    expires_at = int(datetime.fromisoformat(timestamp[:10]).timestamp()) + DAILY_LIMIT_TTL_SECONDS
+
+    return {
+        'Update': {
+            'TableName': DAILY_LIMITS_TABLE,
+            'Key': daily_limit_key(account['accountId'], timestamp[:10]),
+            'UpdateExpression': 'ADD used :delta SET #ttl = if_not_exists(#ttl, :ttl)',
+            'ConditionExpression': 'attribute_not_exists(used) OR used <= :maxUsed',
+            'ExpressionAttributeNames': {'#ttl': 'ttl'},
+            'ExpressionAttributeValues': {
+                ':delta': {'N': format_minor(used_delta)},
+                ':maxUsed': {'N': format_minor(account['dailyTransferLimit'] - used_delta)},
+                ':ttl': {'N': str(expires_at)}
+            }
+        }
+    }
+
+def transaction_put(account_id: str, transaction_type: str, amount: int, counterparty: str,
+                    note: str, transfer_id: str, customer_id: str, timestamp: str) -> Dict[str, Any]:
+    """Construir el Put de la fila del libro mayor (Transactions); monto en centavos"""
+    return {
+        'Put': {
+            'TableName': TRANSACTIONS_TABLE,
+            'Item': transaction_item(account_id, timestamp, transaction_type, format_minor(amount),
+                                     counterparty, note, transfer_id, customer_id=customer_id),
+            'ConditionExpression': 'attribute_not_exists(accountId)'
+        }
+    }
+
+def summary_updates(account_id: str, count: int, debits: int, credits: int,
+                    timestamp: str, shard: Optional[int] = None) -> List[Dict[str, Any]]:
+    """
+    Construir los incrementos de los agregados diario y total de una cuenta
+    (montos en centavos). Con `shard` van a los buckets de ese shard de saldo,
+    que el compactador pasa después a los de la cuenta: así los créditos a una
+    cuenta repartida tampoco escriben siempre los mismos dos items.
+    """
+    values = {
+        ':count': {'N': str(count)},
+        ':debits': {'N': format_minor(debits)},
+        ':credits': {'N': format_minor(credits)},
+        ':updatedAt': {'S': timestamp},
+        ':one': {'N': '1'}
+    }
+    # Las transferencias solo registran filas COMPLETED; `ledgerVersion` cambia el
+    # ETag de get_transactions de la cuenta
+    update_expression = (
+        'ADD transactionCount :count, completedCount :count, '
+        'totalDebits :debits, totalCredits :credits, ledgerVersion :one SET updatedAt = :updatedAt'
+    )
+
+    return [
+        {
+            'Update': {
+                'TableName': TRANSACTIONS_TABLE,
+                'Key': {
+                    'accountId': {'S': summary_partition(account_id, shard)},
+                    'timestamp': {'S': bucket}
+                },
+                'UpdateExpression': update_expression,
+                'ExpressionAttributeValues': values
             }
+        }
+        for bucket in (f'DAY#{timestamp[:10]}', SUMMARY_TOTAL_BUCKET)
+    ]
+
+def credited_shard(shard_deltas: Dict[int, int]) -> Optional[int]:
+    """Shard que recibió el crédito de una cuenta (None si el cambio fue al item base)"""
+    # Los traspasos de un débito restan de los shards; un crédito suma en uno solo
+    return next((shard for shard, amount in shard_deltas.items() if amount > 0), None)
+
+def data_version_update(customer_id: str, timestamp: str) -> Dict[str, Any]:
+    """
+    Incrementar la versión de datos del cliente (invalida el cache de get_accounts).
+
+    No se escribe si un crédito fue a un shard de saldo: el item de Users sería
+    tan caliente como el de la cuenta. Esos clientes tienen `shardedAccounts`
+    (jobs/shard_account) y sus lecturas no dependen de esta versión.
+    """
+    return {
+        'Update': {
+            'TableName': USERS_TABLE,
+            'Key': {'id': {'S': customer_id}},
+            'UpdateExpression': 'ADD dataVersion :one SET accountsUpdatedAt = :updatedAt',
+            'ExpressionAttributeValues': {
+                ':one': {'N': '1'},
+                ':updatedAt': {'S': timestamp}
+            }
+        }
+    }
+
+def cancellation_reasons(error: Exception) -> List[Dict[str, Any]]:
+    """Extraer los motivos de cancelación de una TransactionCanceledException"""
+    return error.response.get('CancellationReasons', [])
+
+def amount_units(amount: Any) -> Optional[int]:
+    """Monto del cuerpo en centavos; None si no es un número finito, positivo y de hasta dos decimales"""
+    # bool es int en Python; NaN/Infinity llegan desde json.loads
+    if isinstance(amount, bool) or not isinstance(amount, (int, float)):
+        return None
+    value = Decimal(str(amount))
+    if not value.is_finite() or value <= 0 or value.as_tuple().exponent < -2:
+        return None
+    return int(value.scaleb(2))
+
+def validate_transfer_fields(source_account_id: str, target_account_id: str,
+                             amount: Any) -> Optional[Tuple[int, Dict[str, Any]]]:
+    """Validaciones básicas de una transferencia; retorna (status, body) si falla"""
+    if not all([source_account_id, target_account_id]) or amount is None:
+        return 400, {
+            'error': 'Bad Request',
+            'message': 'Missing required fields: sourceAccountId, targetAccountId, amount'
+        }
+
+    if source_account_id == target_account_id:
+        return 400, {
+            'error': 'Bad Request',
+            'message': 'Source and target accounts cannot be the same'
+        }
+
+    if amount_units(amount) is None:
+        return 400, {
+            'error': 'Bad Request',
+            'message': 'Amount must be a number greater than 0 with at most two decimals'
+        }
+
+    return None
+
+def validate_account_access(source_account_id: str, target_account_id: str,
+                            source_account: Optional[Dict[str, Any]],
+                            target_account: Optional[Dict[str, Any]],
+                            exists: Callable[[str], bool]) -> Optional[Tuple[int, Dict[str, Any]]]:
+    """Validar existencia y pertenencia de las cuentas al usuario actual"""
+    if not source_account and not exists(source_account_id):
+        return 404, {
+            'error': 'Not Found',
+            'message': 'Source account not found'
+        }
+
+    if not target_account and not exists(target_account_id):
+        return 404, {
+            'error': 'Not Found',
+            'message': 'Target account not found'
+        }
+
+    # get_accounts solo retorna cuentas del cliente autenticado
+    if not source_account:
+        return 403, {
+            'error': 'Forbidden',
+            'message': 'Source account does not belong to current user'
+        }
+
+    if not target_account:
+        return 403, {
+            'error': 'Forbidden',
+            'message': 'Target account does not belong to current user'
+        }
+
+    return None
+
+def validate_funds(balance: int, daily_used: int, daily_limit: int,
+                   amount: int) -> Optional[Tuple[int, Dict[str, Any]]]:
+    """Validar saldo suficiente y límite diario disponible (todo en centavos)"""
+    if balance < amount:
+        return 400, {
+            'error': 'Insufficient Funds',
+            'message': 'Insufficient balance in source account'
+        }
+
+    if daily_limit - daily_used < amount:
+        return 400, {
+            'error': 'Daily Limit Exceeded',
+            'message': 'Transfer amount exceeds remaining daily limit'
+        }
+
+    return None
+
+def transfer_failed_response(reasons: List[Dict[str, Any]], idempotency_key: Optional[str],
+                             customer_id: str, fold_positions: Sequence[int] = ()) -> Dict[str, Any]:
+    """Traducir los motivos de cancelación de la transacción a una respuesta HTTP"""
+    codes = [reason.get('Code', 'None') for reason in reasons]
+    print(f'Transfer transaction cancelled: {codes}')
+
+    # Orden de los items: débito, crédito, débito mayor, crédito mayor, idempotencia,
+    # ..., traspasos de shards del origen, contador del límite diario (último).
+    # La reserva dejó de ser propia: se responde con el registro actual
+    if idempotency_key and len(codes) > 4 and codes[4] == 'ConditionalCheckFailed':
+        return replay_response(reasons[4].get('Item', {}), customer_id, idempotency_key)
+
+    # Otro débito o el compactador ya traspasó un shard leído: se puede reintentar
+    if any(codes[position] == 'ConditionalCheckFailed' for position in fold_positions if position < len(codes)):
+        return make_response(409, {
+            'error': 'Conflict',
+            'message': 'Account is being updated by another transfer, please retry'
+        })
+
+    if codes and codes[0] == 'ConditionalCheckFailed':
+        return make_response(400, {
+            'error': 'Insufficient Funds',
+            'message': 'Insufficient balance in source account'
+        })
+
+    if codes and codes[-1] == 'ConditionalCheckFailed':
+        return make_response(400, {
+            'error': 'Daily Limit Exceeded',
+            'message': 'Transfer amount exceeds remaining daily limit'
+        })
+
+    if len(codes) > 1 and codes[1] == 'ConditionalCheckFailed':
+        return make_response(404, {
+            'error': 'Not Found',
+            'message': 'Target account not found'
+        })
+
+    if 'TransactionConflict' in codes:
+        return make_response(409, {
+            'error': 'Conflict',
+            'message': 'Account is being updated by another transfer, please retry'
+        })
+
+    return make_response(500, {
+        'error': 'Transfer Failed',
+        'message': 'Error processing transfer'
+    })
+
+def execute_transfer(source_account_id: str, target_account_id: str, amount: Any, note: str,
+                     customer_id: str, idempotency_key: Optional[str],
+                     reservation_id: Optional[str]) -> Dict[str, Any]:
+    """Validar cuentas y fondos y confirmar la transferencia en una transacción"""
+    # Saldos, límites y deltas en centavos; `amount` solo vuelve en la respuesta
+    units = amount_units(amount)
+    # Obtener cuentas por clave primaria del cliente autenticado
+    timestamp = datetime.now().isoformat()
+    with phase('read'):
+        accounts = get_accounts([source_account_id, target_account_id], customer_id, timestamp[:10])
+        load_balance_shards(accounts, [source_account_id])
+    source_account = accounts.get(source_account_id)
+    target_account = accounts.get(target_account_id)
+
+    with phase('validate'):
+        error = (
+            validate_account_access(source_account_id, target_account_id,
+                                    source_account, target_account, account_exists)
+            or validate_funds(source_account['balance'], source_account['dailyTransferUsed'],
+                              source_account['dailyTransferLimit'], units)
         )
-        return True
-    except Exception as e:
-        print(f'Error creating transaction: {str(e)}')
-        return False
+    if error:
+        return make_response(*error)
 
-def lambda_handler(event: Dict[str, Any], context: Any) -> Dict[str, Any]:
-    """Handler para procesar transferencias"""
-    
-    # Manejar preflight OPTIONS request
-    if event.get('httpMethod') == 'OPTIONS':
-        return make_response(200, {'message': 'CORS preflight successful'})
+    # Generar ID de transferencia
+    transfer_id = idempotency_key or str(uuid.uuid4())
+
+    result = {
+        'status': 'COMPLETED',
+        'transferId': transfer_id,
+        'amount': amount,
+        'sourceAccountId': source_account_id,
+        'targetAccountId': target_account_id
+    }
+    with phase('serialize'):
+        result_body = encode_json(result)
+
+    # Débito, crédito, ambas filas del libro mayor e idempotencia en una
+    # sola transacción atómica
+    debit_items = balance_updates(source_account, -units, units, timestamp, transfer_id)[0]
+    credit_items, _, credit_shards = balance_updates(target_account, units, 0, timestamp, transfer_id)
+    pending_shard = credited_shard(credit_shards)
+    transact_items = [
+        debit_items[0],
+        credit_items[0],
+        transaction_put(source_account_id, 'DEBIT', -units,
+                        f"Transfer to {target_account_id[-4:]}", note, transfer_id, customer_id, timestamp),
+        transaction_put(target_account_id, 'CREDIT', units,
+                        f"Transfer from {source_account_id[-4:]}", note, transfer_id, customer_id, timestamp)
+    ]
+    if idempotency_key:
+        transact_items.append(idempotency_complete(idempotency_key, reservation_id, result_body, timestamp))
+
+    # Agregados precalculados que get_transactions usa para los resúmenes
+    transact_items += summary_updates(source_account_id, 1, -units, 0, timestamp)
+    transact_items += summary_updates(target_account_id, 1, 0, units, timestamp, pending_shard)
+    if pending_shard is None:
+        transact_items.append(data_version_update(customer_id, timestamp))
+    # Shards del origen traspasados a su item base para cubrir el débito
+    fold_positions = range(len(transact_items), len(transact_items) + len(debit_items) - 1)
+    transact_items += debit_items[1:]
+    # El contador del límite diario va siempre al final
+    transact_items.append(daily_limit_update(source_account, units, timestamp))
 
     try:
-        # Parsear body
-        body = json.loads(event.get('body', '{}'))
-        
-        source_account_id = body.get('sourceAccountId')
-        target_account_id = body.get('targetAccountId')
-        amount = body.get('amount')
-        note = body.get('note', '')
-        idempotency_key = body.get('idempotencyKey')
-
-        # Validaciones básicas
-        if not all([source_account_id, target_account_id, amount]):
-            return make_response(400, {
-                'error': 'Bad Request',
-                'message': 'Missing required fields: sourceAccountId, targetAccountId, amount'
-            })
+        with phase('write'):
+            dynamodb.transact_write_items(TransactItems=transact_items)
+    except dynamo.ClientError as e:
+        if e.response['Error']['Code'] != 'TransactionCanceledException':
+            raise
+        return transfer_failed_response(cancellation_reasons(e), idempotency_key, customer_id, fold_positions)
 
-        if source_account_id == target_account_id:
-            return make_response(400, {
-                'error': 'Bad Request',
-                'message': 'Source and target accounts cannot be the same'
-            })
+    return make_raw_response(200, result_body, 'application/json')
+
+def process_transfer(body: Dict[str, Any], customer_id: str) -> Dict[str, Any]:
+    """Procesar una transferencia individual"""
+    source_account_id = body.get('sourceAccountId')
+    target_account_id = body.get('targetAccountId')
+    amount = body.get('amount')
+    note = body.get('note', '')
+    idempotency_key = body.get('idempotencyKey')
+
+    with phase('validate'):
+        error = validate_transfer_fields(source_account_id, target_account_id, amount)
+    if error:
+        return make_response(*error)
+
+    if not idempotency_key:
+        return execute_transfer(source_account_id, target_account_id, amount, note,
+                                customer_id, None, None)
+
+    # Reintento de una operación ya completada en este contenedor
+    cache_key = f'{customer_id}#{idempotency_key}'
+    cached_body = completed_cache.get(cache_key)
+    completed_cache.log_stats(cached_body is not None)
+    if cached_body is not None:
+        return make_raw_response(200, cached_body, 'application/json')
+
+    # Reserva IN_PROGRESS: un duplicado concurrente recibe 409 sin repetir el trabajo
+    reservation_id = str(uuid.uuid4())
+    with phase('idempotency'):
+        record = reserve_idempotency(idempotency_key, customer_id, reservation_id)
+    if record is not None:
+        return replay_response(record, customer_id, idempotency_key)
+
+    try:
+        response = execute_transfer(source_account_id, target_account_id, amount, note,
+                                    customer_id, idempotency_key, reservation_id)
+    except Exception:
+        release_idempotency(idempotency_key, reservation_id)
+        raise
+
+    if response['statusCode'] == 200:
+        completed_cache.put(cache_key, response['body'])
+    else:
+        # Las transferencias rechazadas no quedan registradas: se pueden reintentar
+        release_idempotency(idempotency_key, reservation_id)
+    return response
+
+def batch_item_error(index: int, error: Tuple[int, Dict[str, Any]]) -> Dict[str, Any]:
+    """Resultado fallido de un item del lote"""
+    status_code, body = error
+    return {'index': index, 'status': 'FAILED', 'statusCode': status_code, **body}
+
+def batch_item_replay(index: int, record: Dict[str, Any], customer_id: str, operation_id: str) -> Dict[str, Any]:
+    """Resultado de un item del lote cuya clave ya tiene registro de idempotencia (como replay_response)"""
+    replay = replay_response(record, customer_id, operation_id)
+    if replay['statusCode'] == 200:
+        return {'index': index, **json.loads(replay['body'])}
+    return batch_item_error(index, (replay['statusCode'], json.loads(replay['body'])))
+
+def chunk_transfers(transfers: List[Dict[str, Any]],
+                    account_data: Dict[str, Dict[str, Any]]) -> List[List[Dict[str, Any]]]:
+    """Agrupar transferencias en lotes que quepan en una transacción de DynamoDB"""
+    chunks = []
+    current: List[Dict[str, Any]] = []
+    accounts: set = set()
+    size = ITEMS_PER_BATCH_CHUNK
+
+    def transfer_cost(transfer: Dict[str, Any], new_accounts: set) -> int:
+        # Dos filas del mayor, idempotencia opcional y los items por cuenta nueva
+        # (más los traspasos posibles de sus shards)
+        return 2 + (1 if transfer['idempotencyKey'] else 0) + sum(
+            ITEMS_PER_BATCH_ACCOUNT + len(account_data[account_id].get('shards', {}))
+            for account_id in new_accounts
+        )
+
+    for transfer in transfers:
+        new_accounts = {transfer['sourceAccountId'], transfer['targetAccountId']} - accounts
+        cost = transfer_cost(transfer, new_accounts)
+        if current and size + cost > TRANSACT_MAX_ITEMS:
+            chunks.append(current)
+            current, accounts, size = [], set(), ITEMS_PER_BATCH_CHUNK
+            new_accounts = {transfer['sourceAccountId'], transfer['targetAccountId']}
+            cost = transfer_cost(transfer, new_accounts)
+        current.append(transfer)
+        accounts |= new_accounts
+        size += cost
 
-        if amount <= 0:
-            return make_response(400, {
+    if current:
+        chunks.append(current)
+    return chunks
+
+def commit_chunk(chunk: List[Dict[str, Any]], accounts: Dict[str, Dict[str, Any]], customer_id: str,
+                 results: List[Optional[Dict[str, Any]]]) -> None:
+    """Confirmar un lote de transferencias con deltas netos por cuenta"""
+    while chunk:
+        # Delta neto por cuenta y saldo mínimo requerido para que el saldo
+        # nunca sea negativo en el orden del lote, en centavos: sumar floats
+        # deja restos (0.1 + 0.1 + 0.1) que ADD escribiría tal cual
+        deltas: Dict[str, Dict[str, int]] = {}
+        for transfer in chunk:
+            for account_id, delta in ((transfer['sourceAccountId'], -transfer['units']),
+                                      (transfer['targetAccountId'], transfer['units'])):
+                entry = deltas.setdefault(account_id, {'balance': 0, 'lowest': 0, 'dailyUsed': 0,
+                                                       'count': 0, 'debits': 0, 'credits': 0})
+                entry['balance'] += delta
+                entry['lowest'] = min(entry['lowest'], entry['balance'])
+                entry['count'] += 1
+                entry['debits' if delta < 0 else 'credits'] += delta
+            deltas[transfer['sourceAccountId']]['dailyUsed'] += transfer['units']
+
+        base_time = datetime.now()
+        timestamp = base_time.isoformat()
+        transact_items = []
+        balance_changes: Dict[str, Tuple[int, Dict[int, int]]] = {}
+        for account_id, delta in deltas.items():
+            balance_items, base_delta, shard_deltas = balance_updates(
+                accounts[account_id], delta['balance'], -delta['lowest'], timestamp, chunk[0]['transferId'])
+            transact_items += balance_items
+            balance_changes[account_id] = (base_delta, shard_deltas)
+
+        ledger_start = len(transact_items)
+        idempotency_items = {}
+        for offset, transfer in enumerate(chunk):
+            # Timestamps únicos por fila: son la sort key de Transactions
+            row_time = (base_time + timedelta(microseconds=offset)).isoformat()
+            transact_items.append(transaction_put(
+                transfer['sourceAccountId'], 'DEBIT', -transfer['units'],
+                f"Transfer to {transfer['targetAccountId'][-4:]}", transfer['note'],
+                transfer['transferId'], customer_id, row_time))
+            transact_items.append(transaction_put(
+                transfer['targetAccountId'], 'CREDIT', transfer['units'],
+                f"Transfer from {transfer['sourceAccountId'][-4:]}", transfer['note'],
+                transfer['transferId'], customer_id, row_time))
+
+        for transfer in chunk:
+            if transfer['idempotencyKey']:
+                idempotency_items[len(transact_items)] = transfer
+                transact_items.append(idempotency_put(transfer['idempotencyKey'], customer_id,
+                                                      encode_json(transfer['result'])))
+
+        pending_shards = {account_id: credited_shard(shard_deltas)
+                          for account_id, (_, shard_deltas) in balance_changes.items()}
+        for account_id, delta in deltas.items():
+            transact_items += summary_updates(account_id, delta['count'], delta['debits'],
+                                              delta['credits'], timestamp, pending_shards[account_id])
+        if all(shard is None for shard in pending_shards.values()):
+            transact_items.append(data_version_update(customer_id, timestamp))
+
+        limit_start = len(transact_items)
+        transact_items += [
+            daily_limit_update(accounts[account_id], delta['dailyUsed'], timestamp)
+            for account_id, delta in deltas.items() if delta['dailyUsed'] > 0
+        ]
+
+        try:
+            dynamodb.transact_write_items(TransactItems=transact_items)
+        except dynamo.ClientError as e:
+            if e.response['Error']['Code'] != 'TransactionCanceledException':
+                raise
+            reasons = cancellation_reasons(e)
+            codes = [reason.get('Code', 'None') for reason in reasons]
+            print(f'Batch transaction cancelled: {codes}')
+
+            # Si solo fallaron registros de idempotencia, otra invocación ya usó
+            # esas claves: cada una responde lo que dice su registro (resultado
+            # guardado, 409 si es de otro cliente o sigue en curso), como un
+            # reintento de una transferencia individual, y el resto se reintenta
+            duplicates = {position: idempotency_items[position] for position, code in enumerate(codes)
+                          if code == 'ConditionalCheckFailed' and position in idempotency_items}
+            failed_positions = [position for position, code in enumerate(codes) if code != 'None']
+            if duplicates and len(duplicates) == len(failed_positions):
+                stored = check_idempotency_batch([transfer['idempotencyKey']
+                                                  for position, transfer in duplicates.items()
+                                                  if 'Item' not in reasons[position]])
+                for position, transfer in duplicates.items():
+                    key = transfer['idempotencyKey']
+                    record = reasons[position].get('Item') or stored.get(key, {})
+                    results[transfer['index']] = batch_item_replay(transfer['index'], record, customer_id, key)
+                chunk = [transfer for transfer in chunk if transfer not in duplicates.values()]
+                continue
+
+            if any((position < ledger_start or position >= limit_start)
+                   and codes[position] == 'ConditionalCheckFailed'
+                   for position in failed_positions):
+                error = (409, {
+                    'error': 'Conflict',
+                    'message': 'Account balance or daily limit changed during the batch, please retry'
+                })
+            elif 'TransactionConflict' in codes:
+                error = (409, {
+                    'error': 'Conflict',
+                    'message': 'Account is being updated by another transfer, please retry'
+                })
+            else:
+                error = (500, {
+                    'error': 'Transfer Failed',
+                    'message': 'Error processing transfer'
+                })
+            for transfer in chunk:
+                results[transfer['index']] = batch_item_error(transfer['index'], error)
+            return
+
+        # Los lotes siguientes deciden sus traspasos sobre los saldos ya actualizados
+        for account_id, (base_delta, shard_deltas) in balance_changes.items():
+            account = accounts[account_id]
+            if 'shards' in account:
+                account['baseBalance'] += base_delta
+                for shard, amount in shard_deltas.items():
+                    account['shards'][shard] = account['shards'].get(shard, 0) + amount
+
+        for transfer in chunk:
+            results[transfer['index']] = {'index': transfer['index'], **transfer['result']}
+            if transfer['idempotencyKey']:
+                completed_cache.put(f"{customer_id}#{transfer['idempotencyKey']}",
+                                    encode_json(transfer['result']))
+        return
+
+def process_batch(transfers: List[Any], customer_id: str) -> Dict[str, Any]:
+    """Procesar un lote de transferencias en una sola invocación"""
+    if not transfers:
+        return make_response(400, {
+            'error': 'Bad Request',
+            'message': 'transfers must be a non-empty list'
+        })
+
+    if len(transfers) > MAX_BATCH_TRANSFERS:
+        return make_response(400, {
+            'error': 'Bad Request',
+            'message': f'A batch can contain at most {MAX_BATCH_TRANSFERS} transfers'
+        })
+
+    results: List[Optional[Dict[str, Any]]] = [None] * len(transfers)
+    candidates = []
+    seen_keys = set()
+
+    # Validaciones básicas de todos los items antes de leer DynamoDB
+    for index, transfer in enumerate(transfers):
+        if not isinstance(transfer, dict):
+            results[index] = batch_item_error(index, (400, {
                 'error': 'Bad Request',
-                'message': 'Amount must be greater than 0'
-            })
+                'message': 'Each transfer must be a JSON object'
+            }))
+            continue
 
-        # Verificar idempotencia
+        error = validate_transfer_fields(transfer.get('sourceAccountId'),
+                                         transfer.get('targetAccountId'), transfer.get('amount'))
+        if error:
+            results[index] = batch_item_error(index, error)
+            continue
+
+        idempotency_key = transfer.get('idempotencyKey')
+        if idempotency_key and idempotency_key in seen_keys:
+            results[index] = batch_item_error(index, (409, {
+                'error': 'Conflict',
+                'message': 'Duplicate idempotencyKey in batch'
+            }))
+            continue
         if idempotency_key:
-            if check_idempotency(idempotency_key):
-                return make_response(200, {
-                    'status': 'COMPLETED',
-                    'message': 'Transfer already processed',
-                    'transferId': idempotency_key
-                })
+            seen_keys.add(idempotency_key)
 
-        # Obtener customerId del token JWT (sub claim)
-        authorizer_context = event.get('requestContext', {}).get('authorizer', {})
-        customer_id = authorizer_context.get('claims', {}).get('sub')
-        
-        if not customer_id:
-            return make_response(401, {
-                'error': 'Unauthorized',
-                'message': 'Customer ID not found in token'
-            })
-
-        # Obtener cuentas
-        source_account = get_account(source_account_id)
-        target_account = get_account(target_account_id)
-
-        if not source_account:
-            return make_response(404, {
-                'error': 'Not Found',
-                'message': 'Source account not found'
-            })
-
-        if not target_account:
-            return make_response(404, {
-                'error': 'Not Found',
-                'message': 'Target account not found'
-            })
-
-        # Validar que las cuentas pertenezcan al usuario actual
-        if source_account['customerId'] != customer_id:
-            return make_response(403, {
-                'error': 'Forbidden',
-                'message': 'Source account does not belong to current user'
-            })
-
-        if target_account['customerId'] != customer_id:
-            return make_response(403, {
-                'error': 'Forbidden',
-                'message': 'Target account does not belong to current user'
-            })
-
-        # Verificar saldo suficiente
-        if source_account['balance'] < amount:
-            return make_response(400, {
-                'error': 'Insufficient Funds',
-                'message': 'Insufficient balance in source account'
-            })
-
-        # Verificar límite diario
-        remaining_daily_limit = source_account['dailyTransferLimit'] - source_account['dailyTransferUsed']
-        if remaining_daily_limit < amount:
-            return make_response(400, {
-                'error': 'Daily Limit Exceeded',
-                'message': 'Transfer amount exceeds remaining daily limit'
-            })
-
-        # Generar ID de transferencia
-        transfer_id = idempotency_key or str(uuid.uuid4())
-
-        # Procesar transferencia
-        new_source_balance = source_account['balance'] - amount
-        new_target_balance = target_account['balance'] + amount
-        new_daily_used = source_account['dailyTransferUsed'] + amount
-
-        # Actualizar cuentas
-        if not update_account_balance(source_account_id, new_source_balance, new_daily_used):
-            return make_response(500, {
-                'error': 'Transfer Failed',
-                'message': 'Error updating source account'
-            })
-
-        if not update_account_balance(target_account_id, new_target_balance, target_account['dailyTransferUsed']):
-            return make_response(500, {
-                'error': 'Transfer Failed',
-                'message': 'Error updating target account'
-            })
-
-        # Crear transacciones
-        counterparty_name = f"Transfer to {target_account_id[-4:]}"
-        
-        if not create_transaction(source_account_id, 'DEBIT', -amount, counterparty_name, note, transfer_id):
-            return make_response(500, {
-                'error': 'Transfer Failed',
-                'message': 'Error creating debit transaction'
-            })
-
-        if not create_transaction(target_account_id, 'CREDIT', amount, f"Transfer from {source_account_id[-4:]}", note, transfer_id):
-            return make_response(500, {
-                'error': 'Transfer Failed',
-                'message': 'Error creating credit transaction'
-            })
-
-        # Guardar idempotencia
-        result = {
+        candidates.append({
+            'index': index,
+            'sourceAccountId': transfer['sourceAccountId'],
+            'targetAccountId': transfer['targetAccountId'],
+            'amount': transfer['amount'],
+            'units': amount_units(transfer['amount']),
+            'note': transfer.get('note', ''),
+            'idempotencyKey': idempotency_key
+        })
+
+    # Idempotencia: primero el cache del contenedor, luego una lectura por lote
+    cached_bodies: Dict[str, str] = {}
+    for transfer in candidates:
+        if transfer['idempotencyKey']:
+            cached_body = completed_cache.get(f"{customer_id}#{transfer['idempotencyKey']}")
+            if cached_body is not None:
+                cached_bodies[transfer['idempotencyKey']] = cached_body
+    with phase('read'):
+        records = check_idempotency_batch([t['idempotencyKey'] for t in candidates
+                                           if t['idempotencyKey'] and t['idempotencyKey'] not in cached_bodies])
+        account_ids = [account_id for t in candidates
+                       for account_id in (t['sourceAccountId'], t['targetAccountId'])]
+        accounts = get_accounts(account_ids, customer_id, datetime.now().date().isoformat())
+        load_balance_shards(accounts, [t['sourceAccountId'] for t in candidates])
+    existence: Dict[str, bool] = {}
+
+    def exists(account_id: str) -> bool:
+        if account_id not in existence:
+            existence[account_id] = account_exists(account_id)
+        return existence[account_id]
+
+    # Validar saldo y límite diario en orden, proyectando el efecto de las
+    # transferencias aceptadas previamente en el mismo lote (en centavos,
+    # igual que los deltas que escribe commit_chunk)
+    projected = {account_id: dict(account) for account_id, account in accounts.items()}
+    accepted = []
+    for transfer in candidates:
+        index = transfer['index']
+        key = transfer['idempotencyKey']
+        if key in cached_bodies:
+            results[index] = {'index': index, **json.loads(cached_bodies[key])}
+            continue
+        if key in records:
+            results[index] = batch_item_replay(index, records[key], customer_id, key)
+            continue
+
+        source = projected.get(transfer['sourceAccountId'])
+        target = projected.get(transfer['targetAccountId'])
+        error = (
+            validate_account_access(transfer['sourceAccountId'], transfer['targetAccountId'],
+                                    source, target, exists)
+            or validate_funds(source['balance'], source['dailyTransferUsed'],
+                              source['dailyTransferLimit'], transfer['units'])
+        )
+        if error:
+            results[index] = batch_item_error(index, error)
+            continue
+
+        source['balance'] -= transfer['units']
+        source['dailyTransferUsed'] += transfer['units']
+        target['balance'] += transfer['units']
+
+        transfer['transferId'] = transfer['idempotencyKey'] or str(uuid.uuid4())
+        transfer['result'] = {
             'status': 'COMPLETED',
-            'transferId': transfer_id,
-            'amount': amount,
-            'sourceAccountId': source_account_id,
-            'targetAccountId': target_account_id
+            'transferId': transfer['transferId'],
+            'amount': transfer['amount'],
+            'sourceAccountId': transfer['sourceAccountId'],
+            'targetAccountId': transfer['targetAccountId']
         }
+        accepted.append(transfer)
 
-        if idempotency_key:
-            save_idempotency(idempotency_key, result)
+    with phase('write'):
+        for chunk in chunk_transfers(accepted, accounts):
+            # Un error en un lote no deshace los ya confirmados: solo sus
+            # transferencias (las que aún no tienen resultado) quedan FAILED
+            try:
+                commit_chunk(chunk, accounts, customer_id, results)
+            except Exception as e:
+                print(f'Error committing batch chunk: {str(e)}')
+                for transfer in chunk:
+                    if results[transfer['index']] is None:
+                        results[transfer['index']] = batch_item_error(transfer['index'], (500, {
+                            'error': 'Transfer Failed',
+                            'message': 'Error processing transfer'
+                        }))
+
+    completed_count = sum(1 for result in results if result['status'] == 'COMPLETED')
+    with phase('serialize'):
+        return make_response(200, {
+            'results': results,
+            'summary': {
+                'total': len(results),
+                'completed': completed_count,
+                'failed': len(results) - completed_count
+            }
+        })
+
+@instrument('post_transfer')
+def lambda_handler(event: Dict[str, Any], context: Any) -> Dict[str, Any]:
+    """Handler para procesar transferencias (individuales o por lote)"""
+    
+    # Manejar preflight OPTIONS request
+    if event.get('httpMethod') == 'OPTIONS':
+        return preflight_response()
 
-        return make_response(200, result)
+    try:
+        # Parsear body
+        with phase('parse'):
+            body = json.loads(event.get('body', '{}'))
+            customer_id = get_customer_id(event)
+
+        if not customer_id:
+            return unauthorized_response()
+
+        # Modo lote: {"transfers": [{...}, ...]}
+        if 'transfers' in body:
+            if not isinstance(body['transfers'], list):
+                return make_response(400, {
+                    'error': 'Bad Request',
+                    'message': 'transfers must be a non-empty list'
+                })
+            return process_batch(body['transfers'], customer_id)
+
+        return process_transfer(body, customer_id)
 
     except json.JSONDecodeError:
         return make_response(400, {
             'error': 'Bad Request',
             'message': 'Invalid JSON in request body'
         })
+    except dynamo.ClientError as e:
+        print(f'DynamoDB error: {str(e)}')
+        return make_response(500, {
+            'error': 'Database error',
+            'message': 'Error processing transfer'
+        })
     except Exception as e:
         print(f'Unexpected error: {str(e)}')
         return make_response(500, {
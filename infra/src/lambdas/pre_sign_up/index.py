@@ -1,9 +1,13 @@
+from banca_common.metrics import instrument
+
+@instrument("pre_sign_up")
 def lambda_handler(event, context):
     """
     Lambda trigger de Cognito para pre-signup
     Auto-confirma usuarios y verifica email automáticamente
     """
-    print(f"[INFO] Pre-signup trigger ejecutado: {event}")
+    # El evento trae email y nombre del usuario: no se registra completo
+    print(f"[INFO] Pre-signup trigger ejecutado: {event.get('triggerSource')}")
     
     # Auto-confirmar el usuario
     event["response"]["autoConfirmUser"] = True
@@ -0,0 +1,215 @@
+import os
+from collections import defaultdict
+from datetime import datetime
+from typing import Dict, Any, Callable, List, Optional, Tuple
+
+from banca_common.cache import TTLCache
+from banca_common import dynamo
+from banca_common.dynamo import dynamodb
+from banca_common.items import SUMMARY_PREFIX, balance_shard_account_id, balance_shard_number, is_shard_summary
+from banca_common.metrics import instrument, phase
+from banca_common.snapshots import (
+    SNAPSHOT_PART, apply_account, apply_balance_shard, apply_daily_used, apply_ledger_row,
+    apply_summary_day, days_part, dump_document, load_document, month_totals, new_document,
+    set_month, snapshot_key
+)
+
+ACCOUNTS_TABLE = os.environ['ACCOUNTS_TABLE_NAME']
+TRANSACTIONS_TABLE = os.environ['TRANSACTIONS_TABLE_NAME']
+BALANCE_SHARDS_TABLE = os.environ['BALANCE_SHARDS_TABLE_NAME']
+DAILY_LIMITS_TABLE = os.environ['DAILY_LIMITS_TABLE_NAME']
+SNAPSHOTS_TABLE = os.environ['SNAPSHOTS_TABLE_NAME']
+# Movimientos que guarda el snapshot (el dashboard muestra los primeros)
+RECENT_TRANSACTIONS = int(os.environ.get('SNAPSHOT_RECENT_TRANSACTIONS', '20'))
+CACHE_MAX_ENTRIES = int(os.environ.get('CACHE_MAX_ENTRIES', '1024'))
+# Intentos de la escritura condicional por revisión (los streams de cada
+# tabla se procesan en paralelo y pueden tocar el mismo cliente)
+WRITE_ATTEMPTS = 5
+
+# Dueño de cada cuenta: nunca cambia, así que la entrada vale mientras viva el contenedor
+owner_cache = TTLCache('owners', CACHE_MAX_ENTRIES, float('inf'))
+
+Change = Tuple[str, Callable[[Dict[str, Any], Dict[str, Dict[str, Any]]], None]]
+
+def table_name(record: Dict[str, Any]) -> str:
+    """Tabla de origen de un registro (arn:aws:dynamodb:...:table/<nombre>/stream/<label>)"""
+    return record['eventSourceARN'].split('/')[1]
+
+def classify(record: Dict[str, Any]) -> Optional[Tuple[str, Optional[str], Change]]:
+    """
+    (accountId, customerId si el registro lo trae, cambio) de un registro del
+    stream; None para los items que el snapshot no usa.
+
+    El cambio es (parte, función): la función aplica el registro al documento
+    de esa parte del snapshot.
+    """
+    stream = record['dynamodb']
+    keys = stream['Keys']
+    image = stream.get('NewImage')
+    seq = int(stream['SequenceNumber'])
+    table = table_name(record)
+
+    if table == ACCOUNTS_TABLE:
+        account_id = keys['accountId']['S']
+        return account_id, keys['customerId']['S'], (
+            SNAPSHOT_PART, lambda document, days: apply_account(document, seq, account_id, image))
+
+    if table == TRANSACTIONS_TABLE:
+        partition = keys['accountId']['S']
+        if not partition.startswith(SUMMARY_PREFIX):
+            # Las filas de transferencias traen el customerId; las sembradas no
+            owner = (image or stream.get('OldImage', {})).get('customerId', {}).get('S')
+            return partition, owner, (
+                SNAPSHOT_PART, lambda document, days: apply_ledger_row(document, seq, image, RECENT_TRANSACTIONS))
+        bucket = keys['timestamp']['S']
+        # Los buckets de los shards de saldo llegan al snapshot cuando el compactador los pasa a la cuenta
+        if not bucket.startswith('DAY#') or is_shard_summary(partition):
+            return None
+        account_id, day = partition[len(SUMMARY_PREFIX):], bucket[len('DAY#'):]
+        return account_id, None, (
+            days_part(day[:7]), lambda document, days: apply_summary_day(days, seq, account_id, day, image))
+
+    if table == DAILY_LIMITS_TABLE:
+        account_id, day = keys['accountId']['S'], keys['day']['S']
+        return account_id, None, (
+            SNAPSHOT_PART, lambda document, days: apply_daily_used(document, seq, account_id, day, image))
+
+    if table == BALANCE_SHARDS_TABLE:
+        account_id, shard = balance_shard_account_id(keys), balance_shard_number(keys)
+        return account_id, None, (
+            SNAPSHOT_PART, lambda document, days: apply_balance_shard(document, seq, account_id, shard, image))
+    return None
+
+def lookup_owner(account_id: str) -> Optional[str]:
+    """customerId de una cuenta (None si ya no existe)"""
+    owner = owner_cache.get(account_id)
+    if owner is None:
+        # La clave de Accounts es (accountId, customerId): query a la tabla base
+        response = dynamodb.query(
+            TableName=ACCOUNTS_TABLE,
+            KeyConditionExpression='accountId = :accountId',
+            ExpressionAttributeValues={':accountId': {'S': account_id}},
+            ProjectionExpression='customerId',
+            Limit=1
+        )
+        items = response.get('Items', [])
+        if not items:
+            return None
+        owner = items[0]['customerId']['S']
+        owner_cache.put(account_id, owner)
+    return owner
+
+def read_parts(customer_id: str, parts: List[str]) -> Dict[str, Dict[str, Any]]:
+    """Items del snapshot de un cliente (documento principal y meses), lectura consistente"""
+    found = {}
+    request_items = {SNAPSHOTS_TABLE: {
+        'Keys': [snapshot_key(customer_id, part) for part in parts],
+        'ConsistentRead': True
+    }}
+    while request_items:
+        response = dynamodb.batch_get_item(RequestItems=request_items)
+        for item in response.get('Responses', {}).get(SNAPSHOTS_TABLE, []):
+            found[item['part']['S']] = item
+        request_items = response.get('UnprocessedKeys') or None
+    return found
+
+def snapshot_put(customer_id: str, part: str, document: str, current: Optional[Dict[str, Any]],
+                 now: str) -> Dict[str, Any]:
+    """Put condicionado a la revisión leída (o a que el item no exista)"""
+    revision = int(current['revision']['N']) if current else 0
+    put = {
+        'TableName': SNAPSHOTS_TABLE,
+        'Item': {**snapshot_key(customer_id, part), 'document': {'S': document},
+                 'revision': {'N': str(revision + 1)}, 'updatedAt': {'S': now}},
+        'ConditionExpression': 'revision = :revision' if current else 'attribute_not_exists(customerId)'
+    }
+    if current:
+        put['ExpressionAttributeValues'] = {':revision': current['revision']}
+    return put
+
+def project_customer(customer_id: str, changes: List[Change]) -> bool:
+    """
+    Aplicar los cambios de un cliente a su snapshot; False si no cambió nada
+    (registros repetidos). Lee, aplica y escribe con condición sobre la
+    revisión; si otro worker escribió en el medio se vuelve a leer y aplicar.
+    """
+    parts = [SNAPSHOT_PART] + sorted({part for part, _ in changes} - {SNAPSHOT_PART})
+    for attempt in range(WRITE_ATTEMPTS):
+        with phase('read'):
+            current = read_parts(customer_id, parts)
+
+        documents = {part: load_document(current.get(part), new_document if part == SNAPSHOT_PART else dict)
+                     for part in parts}
+        for part, apply in changes:
+            apply(documents[SNAPSHOT_PART], documents[part])
+        # El total de cada mes se recalcula desde sus días: nunca acumula deltas
+        for part in parts[1:]:
+            set_month(documents[SNAPSHOT_PART], part[-7:], month_totals(documents[part]))
+
+        now = datetime.utcnow().isoformat()
+        puts = []
+        for part in parts:
+            document = dump_document(documents[part])
+            if part in current and current[part]['document']['S'] == document:
+                continue
+            puts.append(snapshot_put(customer_id, part, document, current.get(part), now))
+        if not puts:
+            return False
+
+        try:
+            with phase('write'):
+                if len(puts) == 1:
+                    dynamodb.put_item(**puts[0])
+                else:
+                    # Documento principal y meses juntos: el total de un mes nunca
+                    # queda distinto de la suma de sus días
+                    dynamodb.transact_write_items(TransactItems=[{'Put': put} for put in puts])
+            return True
+        except dynamo.ClientError as e:
+            code = e.response['Error']['Code']
+            if code not in ('ConditionalCheckFailedException', 'TransactionCanceledException') \
+                    or attempt == WRITE_ATTEMPTS - 1:
+                raise
+    return False
+
+@instrument('project_snapshots')
+def lambda_handler(event: Dict[str, Any], context: Any) -> Dict[str, Any]:
+    """Worker de los streams de Accounts, Transactions, BalanceShards y DailyLimits (respuesta parcial por lote)"""
+    records = event.get('Records', [])
+    stats = {'records': len(records), 'ignored': 0, 'orphans': 0, 'written': 0, 'unchanged': 0, 'failed': 0}
+
+    classified = []
+    for record in records:
+        change = classify(record)
+        if change is None:
+            stats['ignored'] += 1
+            continue
+        account_id, owner, _ = change
+        if owner:
+            owner_cache.put(account_id, owner)
+        classified.append((record, change))
+
+    by_customer: Dict[str, List[Tuple[Dict[str, Any], Change]]] = defaultdict(list)
+    with phase('read'):
+        for record, (account_id, owner, change) in classified:
+            customer_id = owner or lookup_owner(account_id)
+            if customer_id is None:
+                # Cuenta borrada antes de procesar sus registros: no hay snapshot que actualizar
+                stats['orphans'] += 1
+                continue
+            by_customer[customer_id].append((record, change))
+
+    failures = []
+    for customer_id, entries in by_customer.items():
+        try:
+            written = project_customer(customer_id, [change for _, change in entries])
+            stats['written' if written else 'unchanged'] += 1
+        except Exception as e:
+            # Lambda reintenta el lote desde el menor SequenceNumber informado;
+            # reaplicar los registros ya escritos no cambia el snapshot
+            print(f'[ERROR] Error actualizando el snapshot de {customer_id}: {str(e)}')
+            stats['failed'] += 1
+            failures += [{'itemIdentifier': record['dynamodb']['SequenceNumber']} for record, _ in entries]
+
+    print(f'[INFO] Snapshots: {stats}')
+    return {'batchItemFailures': failures}
@@ -0,0 +1,82 @@
+import json
+import os
+from datetime import datetime
+from typing import Dict, Any
+
+from banca_common import dynamo
+from banca_common.dynamo import dynamodb
+from banca_common.metrics import instrument
+from banca_common.seeding import (
+    ACCOUNT_TEMPLATES, PROVISIONING_COMPLETED, PROVISIONING_PENDING, provision_customer
+)
+
+USERS_TABLE = os.environ['USERS_TABLE_NAME']
+ACCOUNTS_TABLE = os.environ['ACCOUNTS_TABLE_NAME']
+TRANSACTIONS_TABLE = os.environ['TRANSACTIONS_TABLE_NAME']
+# Volumen de datos de ejemplo por usuario nuevo (por defecto, cada plantilla una vez)
+SEED_ACCOUNTS = int(os.environ.get('SEED_ACCOUNTS', str(len(ACCOUNT_TEMPLATES))))
+SEED_TRANSACTIONS_PER_ACCOUNT = (int(os.environ['SEED_TRANSACTIONS_PER_ACCOUNT'])
+                                 if os.environ.get('SEED_TRANSACTIONS_PER_ACCOUNT') else None)
+
+def get_provisioning_status(user_id: str) -> str:
+    """Estado del aprovisionamiento guardado en el usuario ('' si no existe el usuario)"""
+    response = dynamodb.get_item(
+        TableName=USERS_TABLE,
+        Key={'id': {'S': user_id}},
+        ProjectionExpression='provisioningStatus',
+        ConsistentRead=True
+    )
+    if 'Item' not in response:
+        return ''
+    # Usuarios anteriores al aprovisionamiento asíncrono ya tienen sus cuentas
+    return response['Item'].get('provisioningStatus', {}).get('S', PROVISIONING_COMPLETED)
+
+def mark_provisioned(user_id: str, accounts_created: int) -> None:
+    """Marcar el usuario como aprovisionado e invalidar el cache de get_accounts"""
+    try:
+        dynamodb.update_item(
+            TableName=USERS_TABLE,
+            Key={'id': {'S': user_id}},
+            UpdateExpression='SET provisioningStatus = :completed, accountsUpdatedAt = :now '
+                             'ADD dataVersion :one',
+            ConditionExpression='provisioningStatus = :pending',
+            ExpressionAttributeValues={
+                ':completed': {'S': PROVISIONING_COMPLETED},
+                ':pending': {'S': PROVISIONING_PENDING},
+                ':now': {'S': datetime.utcnow().isoformat()},
+                ':one': {'N': '1'}
+            }
+        )
+    except dynamo.ClientError as e:
+        # Una entrega duplicada ya lo marcó
+        if e.response['Error']['Code'] != 'ConditionalCheckFailedException':
+            raise
+    print(f'[INFO] Cuentas aprovisionadas para user_id: {user_id} ({accounts_created} nuevas)')
+
+def process_job(job: Dict[str, Any]) -> None:
+    """Aprovisionar cuentas y libro mayor de un usuario; las entregas repetidas no duplican nada"""
+    user_id = job['userId']
+    status = get_provisioning_status(user_id)
+    if status != PROVISIONING_PENDING:
+        print(f'[INFO] Aprovisionamiento omitido para user_id: {user_id} (estado: {status or "sin usuario"})')
+        return
+
+    provisioned = provision_customer(
+        user_id, job['email'], ACCOUNTS_TABLE, TRANSACTIONS_TABLE,
+        datetime.fromisoformat(job['requestedAt']), SEED_ACCOUNTS, SEED_TRANSACTIONS_PER_ACCOUNT
+    )
+    mark_provisioned(user_id, provisioned['accountsCreated'])
+
+@instrument('provision_accounts')
+def lambda_handler(event: Dict[str, Any], context: Any) -> Dict[str, Any]:
+    """Worker de la cola de aprovisionamiento (SQS con respuesta parcial por lote)"""
+    failures = []
+    for record in event.get('Records', []):
+        try:
+            process_job(json.loads(record['body']))
+        except Exception as e:
+            # Solo los mensajes fallidos vuelven a la cola (y a la DLQ al agotar reintentos)
+            print(f'[ERROR] Error aprovisionando cuentas (messageId {record["messageId"]}): {str(e)}')
+            failures.append({'itemIdentifier': record['messageId']})
+
+    return {'batchItemFailures': failures}
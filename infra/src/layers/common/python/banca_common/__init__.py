@@ -0,0 +1,6 @@
+"""
+Código común de las lambdas de Banca por Internet (Lambda layer).
+
+Los módulos se importan por separado (banca_common.responses, banca_common.dynamo,
+...) para que cada handler cargue solo lo que usa.
+"""
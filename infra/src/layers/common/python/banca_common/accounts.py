@@ -0,0 +1,45 @@
+"""
+Lecturas de las cuentas de un cliente que comparten los handlers de lectura.
+
+Reciben los nombres de las tablas como argumento, como banca_common.balances:
+cada handler los toma de su propio entorno.
+"""
+from typing import Dict, Any, List, Optional
+
+from banca_common.dynamo import BATCH_GET_MAX_KEYS, dynamodb
+from banca_common.items import daily_limit_key
+from banca_common.records import minor_units
+
+# GSI de Accounts con partición customerId
+CUSTOMER_ID_INDEX = 'CustomerIdIndex'
+
+def get_customer_accounts(accounts_table: str, customer_id: str,
+                          projection: Optional[str] = None) -> List[Dict[str, Any]]:
+    """Items de Accounts del cliente desde CustomerIdIndex (solo `projection`, si se indica)"""
+    query_kwargs = {
+        'TableName': accounts_table,
+        'IndexName': CUSTOMER_ID_INDEX,
+        'KeyConditionExpression': 'customerId = :customerId',
+        'ExpressionAttributeValues': {
+            ':customerId': {'S': customer_id}
+        }
+    }
+    if projection:
+        query_kwargs['ProjectionExpression'] = projection
+    return dynamodb.query(**query_kwargs).get('Items', [])
+
+def get_daily_used(daily_limits_table: str, account_ids: List[str], day: str) -> Dict[str, int]:
+    """Leer los contadores del límite diario del día (centavos por cuenta) con batch_get_item"""
+    daily_used = {}
+    for start in range(0, len(account_ids), BATCH_GET_MAX_KEYS):
+        request_items = {daily_limits_table: {
+            'Keys': [daily_limit_key(account_id, day)
+                     for account_id in account_ids[start:start + BATCH_GET_MAX_KEYS]],
+            'ProjectionExpression': 'accountId, used'
+        }}
+        while request_items:
+            response = dynamodb.batch_get_item(RequestItems=request_items)
+            for item in response.get('Responses', {}).get(daily_limits_table, []):
+                daily_used[item['accountId']['S']] = minor_units(item, 'used')
+            request_items = response.get('UnprocessedKeys') or None
+    return daily_used
@@ -0,0 +1,198 @@
+"""
+Archivo en S3 de las filas viejas del libro mayor (gzip NDJSON particionado por mes).
+
+El job archive_transactions mueve las filas anteriores a ARCHIVE_AFTER_DAYS a
+archivos <prefijo><YYYY-MM>/<corrida>-<segmento>.ndjson.gz. Cada archivo es
+una concatenación de miembros gzip, uno por cuenta, con los items de DynamoDB
+tal cual (una línea JSON por fila, las más nuevas primero), y lleva al lado su
+índice por cuenta (<archivo>.index.json): offset, largo, filas y rango de
+timestamps de cada miembro. Una cuenta se lee con un GET por rango de su
+miembro, sin descargar el archivo.
+
+Por cuenta, el bucket ARCHIVED de SUMMARY#<accountId> en Transactions guarda
+`archivedBefore` (las filas anteriores se leen del archivo y la tabla solo
+desde ahí), `segments` (las entradas del índice de esa cuenta) y los totales
+de las filas borradas de la tabla, que la conciliación suma al libro mayor.
+Para que el item no crezca sin límite (400 KB), el job pasa las entradas a un
+manifiesto en S3 (<prefijo>manifests/<accountId>/<corrida>.json, una lista
+JSON que no cambia) cuando `segments` supera ARCHIVE_INLINE_SEGMENTS: el
+bucket guarda en `manifest` la clave del último y en `segments` solo las
+entradas posteriores.
+
+Cliente S3 compartido, creado en el primer uso (igual que banca_common.dynamo).
+"""
+import gzip
+import json
+import os
+import threading
+from heapq import merge
+from typing import Dict, Any, Iterator, List, Optional
+
+from banca_common import metrics
+from banca_common.cache import TTLCache
+from banca_common.items import SUMMARY_ARCHIVED_BUCKET, SUMMARY_PREFIX
+
+CONNECT_TIMEOUT_SECONDS = float(os.environ.get('S3_CONNECT_TIMEOUT_SECONDS', '1'))
+READ_TIMEOUT_SECONDS = float(os.environ.get('S3_READ_TIMEOUT_SECONDS', '5'))
+MAX_ATTEMPTS = int(os.environ.get('S3_MAX_ATTEMPTS', '4'))
+# Miembros descomprimidos que guarda el contenedor (el archivo no cambia)
+MEMBER_CACHE_ENTRIES = int(os.environ.get('ARCHIVE_MEMBER_CACHE_ENTRIES', '64'))
+# Manifiestos de segmentos que guarda el contenedor (tampoco cambian)
+MANIFEST_CACHE_ENTRIES = int(os.environ.get('ARCHIVE_MANIFEST_CACHE_ENTRIES', '256'))
+
+ARCHIVE_SUFFIX = '.ndjson.gz'
+INDEX_SUFFIX = '.index.json'
+
+_client = None
+_client_lock = threading.Lock()
+
+member_cache = TTLCache('archive', MEMBER_CACHE_ENTRIES, float('inf'))
+manifest_cache = TTLCache('manifest', MANIFEST_CACHE_ENTRIES, float('inf'))
+_cache_lock = threading.Lock()
+
+Segment = Dict[str, Any]
+
+def get_client() -> Any:
+    """Obtener el cliente de S3 (uno por contenedor)"""
+    global _client
+    if _client is None:
+        with _client_lock:
+            if _client is None:
+                import boto3
+                from botocore.config import Config
+
+                _client = boto3.client('s3', config=Config(
+                    tcp_keepalive=True,
+                    connect_timeout=CONNECT_TIMEOUT_SECONDS,
+                    read_timeout=READ_TIMEOUT_SECONDS,
+                    retries={'max_attempts': MAX_ATTEMPTS, 'mode': 'standard'}
+                ))
+    return _client
+
+def set_client(client: Any) -> None:
+    """Reemplazar el cliente (stand-in local para benchmarks)"""
+    global _client
+    _client = client
+
+# -- Formato ---------------------------------------------------------------
+
+def archived_key(account_id: str) -> Dict[str, Any]:
+    """Clave del bucket ARCHIVED de una cuenta"""
+    return {'accountId': {'S': f'{SUMMARY_PREFIX}{account_id}'}, 'timestamp': {'S': SUMMARY_ARCHIVED_BUCKET}}
+
+def archive_object_key(prefix: str, month: str, run_id: str, segment: int) -> str:
+    return f'{prefix}{month}/{run_id}-{segment:05d}{ARCHIVE_SUFFIX}'
+
+def index_object_key(key: str) -> str:
+    """Índice por cuenta de un archivo"""
+    return key[:-len(ARCHIVE_SUFFIX)] + INDEX_SUFFIX
+
+def manifest_object_key(prefix: str, account_id: str, run_id: str) -> str:
+    """Manifiesto con los segmentos de una cuenta hasta una corrida"""
+    return f'{prefix}manifests/{account_id}/{run_id}.json'
+
+def encode_member(items: List[Dict[str, Any]]) -> bytes:
+    """Miembro gzip con las filas de una cuenta (ya ordenadas, más nuevas primero)"""
+    return gzip.compress(''.join(json.dumps(item, separators=(',', ':')) + '\n' for item in items).encode())
+
+def segment_entry(key: str, offset: int, length: int, items: List[Dict[str, Any]]) -> Segment:
+    """Entrada del índice de un miembro: filas y rango [first, last] de timestamps"""
+    return {'key': key, 'offset': offset, 'length': length, 'rows': len(items),
+            'first': items[-1]['timestamp']['S'], 'last': items[0]['timestamp']['S']}
+
+def to_attribute(segment: Segment) -> Dict[str, Any]:
+    """Entrada del índice como valor M de DynamoDB (lista `segments` del bucket ARCHIVED)"""
+    return {'M': {
+        name: {'N': str(value)} if isinstance(value, int) else {'S': value}
+        for name, value in segment.items()
+    }}
+
+def archived_before(item: Optional[Dict[str, Any]]) -> Optional[str]:
+    """Límite del archivo de una cuenta (None si no tiene filas archivadas)"""
+    return item['archivedBefore']['S'] if item and 'archivedBefore' in item else None
+
+def manifest_of(item: Optional[Dict[str, Any]]) -> Optional[str]:
+    """Clave del manifiesto de segmentos de una cuenta (None si todos están en el item)"""
+    return item['manifest']['S'] if item and 'manifest' in item else None
+
+def segments_of(bucket: str, item: Optional[Dict[str, Any]]) -> List[Segment]:
+    """Segmentos archivados de una cuenta: los de su manifiesto en `bucket` y los del bucket ARCHIVED"""
+    key = manifest_of(item)
+    segments = list(read_manifest(bucket, key)) if key else []
+    for value in (item or {}).get('segments', {'L': []})['L']:
+        segments.append({name: int(field['N']) if 'N' in field else field['S']
+                         for name, field in value['M'].items()})
+    return segments
+
+# -- Lectura ---------------------------------------------------------------
+
+def read_member(bucket: str, segment: Segment) -> List[Dict[str, Any]]:
+    """Filas de un miembro con un GET por rango (en cache: el archivo no cambia)"""
+    cache_key = f"{segment['key']}@{segment['offset']}"
+    # El feed lee miembros desde varios hilos
+    with _cache_lock:
+        rows = member_cache.get(cache_key)
+    if rows is None:
+        get_object = metrics.time_call('S3.get_object', get_client().get_object)
+        response = get_object(
+            Bucket=bucket, Key=segment['key'],
+            Range=f"bytes={segment['offset']}-{segment['offset'] + segment['length'] - 1}"
+        )
+        data = gzip.decompress(response['Body'].read())
+        rows = [json.loads(line) for line in data.decode().splitlines()]
+        with _cache_lock:
+            member_cache.put(cache_key, rows)
+    return rows
+
+def read_manifest(bucket: str, key: str) -> List[Segment]:
+    """Segmentos de un manifiesto (en cache: cada corrida escribe uno nuevo)"""
+    with _cache_lock:
+        segments = manifest_cache.get(key)
+    if segments is None:
+        get_object = metrics.time_call('S3.get_object', get_client().get_object)
+        segments = json.loads(get_object(Bucket=bucket, Key=key)['Body'].read())
+        with _cache_lock:
+            manifest_cache.put(key, segments)
+    return segments
+
+def _member_rows(bucket: str, segment: Segment, from_date: Optional[str], to_date: Optional[str],
+                 before: str, ascending: bool) -> Iterator[Dict[str, Any]]:
+    rows = read_member(bucket, segment)
+    for item in (reversed(rows) if ascending else rows):
+        timestamp = item['timestamp']['S']
+        if timestamp >= before or (to_date and timestamp > to_date):
+            if ascending:
+                return
+            continue
+        if from_date and timestamp < from_date:
+            if not ascending:
+                return
+            continue
+        yield item
+
+def iter_archived(bucket: str, segments: List[Segment], from_date: Optional[str], to_date: Optional[str],
+                  before: str, ascending: bool = False) -> Iterator[Dict[str, Any]]:
+    """
+    Filas archivadas de una cuenta en [from_date, to_date] y anteriores a
+    `before`, más nuevas primero (o más viejas, con `ascending`). Los
+    miembros se leen a medida que hacen falta: solo se mezclan los que se
+    solapan en el tiempo (un mes archivado en dos corridas).
+    """
+    # Con `ascending` se recorre igual pero con el orden de los timestamps invertido
+    start, end = ('first', 'last') if ascending else ('last', 'first')
+    pending = sorted(
+        (segment for segment in segments
+         if segment['first'] < before
+         and not (from_date and segment['last'] < from_date)
+         and not (to_date and segment['first'] > to_date)),
+        key=lambda segment: segment[start], reverse=not ascending
+    )
+    while pending:
+        group = [pending.pop(0)]
+        edge = group[0][end]
+        while pending and (pending[0][start] <= edge if ascending else pending[0][start] >= edge):
+            group.append(pending.pop(0))
+            edge = max(edge, group[-1][end]) if ascending else min(edge, group[-1][end])
+        yield from merge(*(_member_rows(bucket, segment, from_date, to_date, before, ascending)
+                           for segment in group),
+                         key=lambda item: item['timestamp']['S'], reverse=not ascending)
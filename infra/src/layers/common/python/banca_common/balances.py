@@ -0,0 +1,158 @@
+"""
+Saldos repartidos en shards para cuentas que reciben muchas transferencias.
+
+Con `balanceShards` en el item de Accounts, un crédito suma en uno de los
+contadores <accountId>#<n> de la tabla BalanceShards en lugar de reescribir el
+item de la cuenta, cuyo throughput de escritura es el de un solo item. Cada
+shard es su propia partición: con la cuenta como clave de partición volverían
+a compartir el límite de una. El saldo de la cuenta es `balance` del item más
+la suma de sus shards. Los débitos que no alcanzan con el item base y el
+compactador (compact_balances) pasan shards al item base; un traspaso resta
+del shard exactamente lo que suma a la base, en la misma transacción, así el
+saldo total nunca cambia.
+
+Los agregados de esos créditos (DAY# y TOTAL) van a la partición
+SUMMARY#<accountId>#<n> del shard y el compactador los pasa a los de la
+cuenta; quien necesita los totales exactos suma los TOTAL de los shards.
+"""
+import zlib
+from decimal import Decimal
+from typing import Dict, Any, List
+
+from banca_common import dynamo
+from banca_common.dynamo import BATCH_GET_MAX_KEYS, dynamodb
+from banca_common.items import (
+    SUMMARY_TOTAL_BUCKET, balance_shard_account_id, balance_shard_count, balance_shard_key,
+    balance_shard_number, summary_partition
+)
+
+TRANSACT_GET_MAX_ITEMS = 100
+# Las lecturas transaccionales se cancelan si chocan con un crédito en curso
+READ_ATTEMPTS = 3
+
+def pick_shard(key: str, shards: int) -> int:
+    """Shard de un crédito por hash estable (el reintento de una transferencia cae en el mismo)"""
+    return zlib.crc32(key.encode()) % shards
+
+def shard_credit(table_name: str, account_id: str, shard: int, amount: Any,
+                 timestamp: str) -> Dict[str, Any]:
+    """Update (transacción) que suma un crédito en un shard; sin condición, no toca la cuenta"""
+    return {
+        'Update': {
+            'TableName': table_name,
+            'Key': balance_shard_key(account_id, shard),
+            'UpdateExpression': 'ADD balance :amount SET updatedAt = :updatedAt',
+            'ExpressionAttributeValues': {
+                ':amount': {'N': str(amount)},
+                ':updatedAt': {'S': timestamp}
+            }
+        }
+    }
+
+def shard_fold(table_name: str, account_id: str, shard: int, amount: Decimal) -> Dict[str, Any]:
+    """Update (transacción) que resta del shard lo que se pasa al item base"""
+    # La condición evita restar dos veces lo mismo si dos traspasos leyeron el
+    # mismo shard; los créditos concurrentes solo lo aumentan
+    return {
+        'Update': {
+            'TableName': table_name,
+            'Key': balance_shard_key(account_id, shard),
+            'UpdateExpression': 'ADD balance :negated',
+            'ConditionExpression': 'balance >= :amount',
+            'ExpressionAttributeValues': {
+                ':amount': {'N': str(amount)},
+                ':negated': {'N': str(-amount)}
+            }
+        }
+    }
+
+def pending_summary_keys(account_id: str, shards: int,
+                         bucket: str = SUMMARY_TOTAL_BUCKET) -> List[Dict[str, Any]]:
+    """Claves de Transactions de un bucket de agregados en los `shards` shards de una cuenta"""
+    return [{'accountId': {'S': summary_partition(account_id, shard)}, 'timestamp': {'S': bucket}}
+            for shard in range(shards)]
+
+def read_shards(table_name: str, shard_counts: Dict[str, int]) -> Dict[str, Dict[int, Decimal]]:
+    """Saldo de cada shard (lectura consistente) de las cuentas: accountId -> {shard: saldo}"""
+    keys = [balance_shard_key(account_id, shard)
+            for account_id, count in shard_counts.items() for shard in range(count)]
+    shards: Dict[str, Dict[int, Decimal]] = {account_id: {} for account_id in shard_counts}
+    for start in range(0, len(keys), BATCH_GET_MAX_KEYS):
+        request_items = {table_name: {
+            'Keys': keys[start:start + BATCH_GET_MAX_KEYS],
+            'ProjectionExpression': 'shardId, balance',
+            'ConsistentRead': True
+        }}
+        while request_items:
+            response = dynamodb.batch_get_item(RequestItems=request_items)
+            for item in response.get('Responses', {}).get(table_name, []):
+                shards[balance_shard_account_id(item)][balance_shard_number(item)] = Decimal(item['balance']['N'])
+            request_items = response.get('UnprocessedKeys') or None
+    return shards
+
+def _consolidate(account_item: Dict[str, Any], shard_items: List[Dict[str, Any]]) -> Dict[str, Any]:
+    """Item de la cuenta con el saldo total y el updatedAt del último movimiento"""
+    balance = Decimal(account_item['balance']['N'])
+    updated_at = account_item.get('updatedAt', {'S': ''})['S']
+    for shard_item in shard_items:
+        balance += Decimal(shard_item['balance']['N'])
+        updated_at = max(updated_at, shard_item.get('updatedAt', {'S': ''})['S'])
+    return {**account_item, 'balance': {'N': str(balance)}, 'updatedAt': {'S': updated_at}}
+
+def _read_group(accounts_table: str, shards_table: str, group: List[Dict[str, Any]]) -> List[Dict[str, Any]]:
+    """Leer item base y shards de varias cuentas en una lectura transaccional (un snapshot)"""
+    transact_items = []
+    for item in group:
+        transact_items.append({'Get': {'TableName': accounts_table, 'Key': {
+            'accountId': item['accountId'], 'customerId': item['customerId']}}})
+        transact_items += [{'Get': {'TableName': shards_table,
+                                    'Key': balance_shard_key(item['accountId']['S'], shard)}}
+                           for shard in range(balance_shard_count(item))]
+
+    for attempt in range(READ_ATTEMPTS):
+        try:
+            responses = dynamodb.transact_get_items(TransactItems=transact_items)['Responses']
+            break
+        except dynamo.ClientError as e:
+            if e.response['Error']['Code'] != 'TransactionCanceledException' or attempt == READ_ATTEMPTS - 1:
+                raise
+
+    consolidated = []
+    position = 0
+    for item in group:
+        count = balance_shard_count(item)
+        base = responses[position].get('Item', item)
+        shard_items = [response['Item'] for response in responses[position + 1:position + 1 + count]
+                       if 'Item' in response]
+        consolidated.append(_consolidate(base, shard_items))
+        position += 1 + count
+    return consolidated
+
+def consolidate_balances(items: List[Dict[str, Any]], accounts_table: str,
+                         shards_table: str) -> List[Dict[str, Any]]:
+    """
+    Reemplazar los items de cuentas con saldo repartido por uno con el saldo total.
+
+    Las cuentas sin shards se devuelven tal cual y no generan lecturas. Para las
+    repartidas se leen item base y shards con transact_get_items: así un
+    traspaso concurrente (base + x, shard - x) nunca se ve a medias.
+    """
+    sharded = [item for item in items if balance_shard_count(item)]
+    if not sharded:
+        return items
+
+    groups: List[List[Dict[str, Any]]] = [[]]
+    size = 0
+    for item in sharded:
+        cost = 1 + balance_shard_count(item)
+        if groups[-1] and size + cost > TRANSACT_GET_MAX_ITEMS:
+            groups.append([])
+            size = 0
+        groups[-1].append(item)
+        size += cost
+
+    replaced = {}
+    for group in groups:
+        for item in _read_group(accounts_table, shards_table, group):
+            replaced[item['accountId']['S']] = item
+    return [replaced.get(item['accountId']['S'], item) for item in items]
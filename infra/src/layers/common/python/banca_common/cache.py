@@ -0,0 +1,41 @@
+"""
+Cache en memoria del contenedor, compartido entre invocaciones en caliente.
+"""
+import time
+from collections import OrderedDict
+from typing import Any, Optional
+
+class TTLCache:
+    """Cache LRU acotado con TTL por entrada; vive entre invocaciones en caliente"""
+
+    def __init__(self, name: str, max_size: int, ttl_seconds: float):
+        self.name = name
+        self.max_size = max_size
+        self.ttl_seconds = ttl_seconds
+        self.hits = 0
+        self.misses = 0
+        self._entries: OrderedDict = OrderedDict()
+
+    def get(self, key: str, version: Optional[str] = None) -> Optional[Any]:
+        """Obtener una entrada vigente; si se indica versión, debe coincidir"""
+        entry = self._entries.get(key)
+        if entry is None or entry[0] < time.monotonic() or entry[1] != version:
+            self._entries.pop(key, None)
+            self.misses += 1
+            return None
+        self._entries.move_to_end(key)
+        self.hits += 1
+        return entry[2]
+
+    def put(self, key: str, value: Any, version: Optional[str] = None) -> None:
+        self._entries[key] = (time.monotonic() + self.ttl_seconds, version, value)
+        self._entries.move_to_end(key)
+        while len(self._entries) > self.max_size:
+            self._entries.popitem(last=False)
+
+    def invalidate(self, key: str) -> None:
+        self._entries.pop(key, None)
+
+    def log_stats(self, hit: bool) -> None:
+        print(f'[CACHE] {self.name} {"hit" if hit else "miss"} '
+              f'hits={self.hits} misses={self.misses} size={len(self._entries)}')
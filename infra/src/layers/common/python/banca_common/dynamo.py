@@ -0,0 +1,114 @@
+"""
+Cliente DynamoDB compartido, creado en el primer uso.
+
+boto3/botocore se importan recién al crear el cliente: las invocaciones que no
+tocan DynamoDB (preflight OPTIONS, 401) no pagan ese costo en un cold start.
+Con SDK_INIT_MODE=eager el cliente se crea durante el init del contenedor.
+"""
+import os
+import random
+import threading
+import time
+from typing import Any, Dict, Iterable, List, Tuple
+
+from banca_common import metrics
+
+SDK_INIT_MODE = os.environ.get('SDK_INIT_MODE', 'lazy')
+MAX_POOL_CONNECTIONS = int(os.environ.get('DYNAMODB_MAX_POOL_CONNECTIONS', '20'))
+CONNECT_TIMEOUT_SECONDS = float(os.environ.get('DYNAMODB_CONNECT_TIMEOUT_SECONDS', '1'))
+READ_TIMEOUT_SECONDS = float(os.environ.get('DYNAMODB_READ_TIMEOUT_SECONDS', '3'))
+MAX_ATTEMPTS = int(os.environ.get('DYNAMODB_MAX_ATTEMPTS', '4'))
+
+BATCH_GET_MAX_KEYS = 100
+BATCH_WRITE_MAX_ITEMS = 25
+BATCH_WRITE_MAX_ATTEMPTS = int(os.environ.get('BATCH_WRITE_MAX_ATTEMPTS', '8'))
+BATCH_WRITE_BASE_DELAY_SECONDS = 0.05
+
+_client = None
+_client_lock = threading.Lock()
+
+def client_config() -> Any:
+    """Configuración de botocore: keep-alive, timeouts cortos y reintentos adaptativos"""
+    from botocore.config import Config
+
+    return Config(
+        tcp_keepalive=True,
+        connect_timeout=CONNECT_TIMEOUT_SECONDS,
+        read_timeout=READ_TIMEOUT_SECONDS,
+        max_pool_connections=MAX_POOL_CONNECTIONS,
+        retries={'max_attempts': MAX_ATTEMPTS, 'mode': 'adaptive'}
+    )
+
+def get_client() -> Any:
+    """Obtener el cliente de bajo nivel de DynamoDB (uno por contenedor)"""
+    global _client
+    if _client is None:
+        # Los handlers con fan-out (dashboard) pueden pedir el cliente desde
+        # varios hilos en un cold start: se crea uno solo
+        with _client_lock:
+            if _client is None:
+                import boto3
+
+                _client = boto3.client('dynamodb', config=client_config())
+    return _client
+
+def set_client(client: Any) -> None:
+    """Reemplazar el cliente (stand-in local para benchmarks)"""
+    global _client
+    _client = client
+
+def __getattr__(name: str) -> Any:
+    # `except dynamo.ClientError` solo se evalúa cuando hay una excepción,
+    # así importar el módulo no arrastra botocore.exceptions
+    if name == 'ClientError':
+        from botocore.exceptions import ClientError
+        return ClientError
+    raise AttributeError(f'module {__name__!r} has no attribute {name!r}')
+
+class _LazyClient:
+    """Proxy que difiere la creación del cliente hasta la primera llamada"""
+
+    def __getattr__(self, name: str) -> Any:
+        return getattr(get_client(), name)
+
+class _TimedClient:
+    """Proxy perezoso que además mide cada llamada de las invocaciones muestreadas"""
+
+    def __getattr__(self, name: str) -> Any:
+        return metrics.time_call(f'DynamoDB.{name}', getattr(get_client(), name))
+
+# Los handlers usan `dynamodb.query(...)` como con boto3.client('dynamodb');
+# con METRICS_ENABLED=false el proxy no envuelve nada
+dynamodb = _TimedClient() if metrics.ENABLED else _LazyClient()
+
+def _write_chunk(request_items: Dict[str, List[Dict[str, Any]]]) -> None:
+    """Escribir un lote reintentando UnprocessedItems con backoff exponencial y jitter"""
+    for attempt in range(BATCH_WRITE_MAX_ATTEMPTS):
+        if attempt:
+            time.sleep(random.uniform(0, BATCH_WRITE_BASE_DELAY_SECONDS * 2 ** attempt))
+        request_items = dynamodb.batch_write_item(RequestItems=request_items).get('UnprocessedItems')
+        if not request_items:
+            return
+
+    pending = sum(len(requests) for requests in request_items.values())
+    raise RuntimeError(f'BatchWriteItem left {pending} unprocessed items after {BATCH_WRITE_MAX_ATTEMPTS} attempts')
+
+def batch_put(items: Iterable[Tuple[str, Dict[str, Any]]]) -> int:
+    """Escribir pares (tabla, item) en lotes de 25 con batch_write_item; retorna cuántos escribió"""
+    request_items: Dict[str, List[Dict[str, Any]]] = {}
+    pending = written = 0
+    for table_name, item in items:
+        request_items.setdefault(table_name, []).append({'PutRequest': {'Item': item}})
+        pending += 1
+        if pending == BATCH_WRITE_MAX_ITEMS:
+            _write_chunk(request_items)
+            written += pending
+            request_items, pending = {}, 0
+
+    if pending:
+        _write_chunk(request_items)
+        written += pending
+    return written
+
+if SDK_INIT_MODE == 'eager':
+    get_client()
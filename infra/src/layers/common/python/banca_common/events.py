@@ -0,0 +1,31 @@
+"""
+Extracción de datos de los eventos de API Gateway.
+"""
+from typing import Dict, Any, Optional
+
+def get_customer_id(event: Dict[str, Any]) -> Optional[str]:
+    """Obtener customerId del token JWT (sub claim del authorizer de Cognito)"""
+    request_context = event.get('requestContext') or {}
+    authorizer = request_context.get('authorizer') or {}
+    return (authorizer.get('claims') or {}).get('sub')
+
+def get_correlation_id(event: Dict[str, Any]) -> str:
+    """Obtener el requestId de API Gateway para correlacionar logs y respuestas"""
+    return (event.get('requestContext') or {}).get('requestId', '')
+
+def get_path_parameter(event: Dict[str, Any], name: str) -> Optional[str]:
+    """Obtener un parámetro de la ruta"""
+    return (event.get('pathParameters') or {}).get(name)
+
+def get_query_parameters(event: Dict[str, Any]) -> Dict[str, str]:
+    """Obtener los query parameters (API Gateway envía None si no hay)"""
+    return event.get('queryStringParameters') or {}
+
+def get_header(event: Dict[str, Any], name: str) -> Optional[str]:
+    """Obtener un header sin distinguir mayúsculas (API Gateway respeta las del cliente)"""
+    headers = event.get('headers') or {}
+    value = headers.get(name)
+    if value is None:
+        lowered = name.lower()
+        value = next((value for key, value in headers.items() if key.lower() == lowered), None)
+    return value
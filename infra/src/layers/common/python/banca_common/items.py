@@ -0,0 +1,195 @@
+"""
+Marshalling entre el formato de bajo nivel de DynamoDB y los objetos de la API
+para los items de Account, Transaction y User.
+"""
+import uuid
+from typing import Dict, Any, Optional
+
+# Agregados por cuenta: partición SUMMARY#<accountId> en la tabla Transactions,
+# con un bucket por día (DAY#YYYY-MM-DD) y uno acumulado (TOTAL)
+SUMMARY_PREFIX = 'SUMMARY#'
+SUMMARY_TOTAL_BUCKET = 'TOTAL'
+# Filas movidas al archivo en S3 (banca_common.archive): el bucket ARCHIVED
+# guarda hasta dónde llega el archivo, sus segmentos y los totales de lo borrado
+SUMMARY_ARCHIVED_BUCKET = 'ARCHIVED'
+
+# Claves de los GSIs de filtros de get_transactions (<accountId>#<valor>, orden
+# por timestamp): typeKey en todas las filas del libro mayor y statusKey solo
+# en las que no están COMPLETED, así el índice de estados es disperso y chico
+STATUS_COMPLETED = 'COMPLETED'
+
+DEFAULT_DAILY_TRANSFER_LIMIT = 500.0
+
+# Uso del límite diario: un contador por cuenta y día en la tabla DailyLimits
+# (clave accountId + day, expira por `ttl`); el cambio de día no requiere resetear nada
+DAILY_LIMIT_TTL_SECONDS = 3 * 24 * 60 * 60
+
+# Saldo repartido (opt-in para cuentas que reciben muchas transferencias): los
+# créditos suman en uno de `balanceShards` contadores de la tabla BalanceShards
+# (clave shardId = <accountId>#<n>, una partición por shard) y el saldo es
+# `balance` del item más sus shards. `shardGroup` pone la cuenta en el GSI
+# disperso que recorre el compactador. Los agregados de esos créditos van a
+# buckets propios del shard (partición SUMMARY#<accountId>#<n>) hasta que el
+# compactador los pasa a los de la cuenta
+MAX_BALANCE_SHARDS = 32
+SHARDED_BALANCE_GROUP = 'SHARDED'
+
+def _s(item: Dict[str, Any], name: str, default: str = '') -> str:
+    value = item.get(name)
+    return value['S'] if value is not None else default
+
+def _n(item: Dict[str, Any], name: str, default: float = 0.0) -> float:
+    value = item.get(name)
+    return float(value['N']) if value is not None else default
+
+# -- Unmarshalling ---------------------------------------------------------
+
+def to_transaction(item: Dict[str, Any]) -> Dict[str, Any]:
+    """Convertir un item de Transactions en transacción de la API"""
+    timestamp = item['timestamp']['S']
+    return {
+        'accountId': item['accountId']['S'],
+        'timestamp': timestamp,
+        'createdAt': _s(item, 'createdAt', timestamp),
+        'type': item['type']['S'],
+        'amount': float(item['amount']['N']),
+        'counterparty': item['counterparty']['S'],
+        'transferId': _s(item, 'transferId'),
+        'status': _s(item, 'status', 'COMPLETED'),
+        'note': _s(item, 'note')
+    }
+
+def balance_shard_count(item: Dict[str, Any]) -> int:
+    """Cantidad de shards de saldo de un item de Accounts (0: saldo en el item)"""
+    return min(int(_n(item, 'balanceShards')), MAX_BALANCE_SHARDS)
+
+def balance_shard_account_id(item: Dict[str, Any]) -> str:
+    """accountId de un shard de saldo"""
+    return item['shardId']['S'].rsplit('#', 1)[0]
+
+def balance_shard_number(item: Dict[str, Any]) -> int:
+    """Número de un shard de saldo dentro de su cuenta"""
+    return int(item['shardId']['S'].rsplit('#', 1)[1])
+
+def summary_account_id(partition: str) -> str:
+    """accountId de una partición de agregados (de la cuenta o de uno de sus shards)"""
+    return partition[len(SUMMARY_PREFIX):].split('#', 1)[0]
+
+def is_shard_summary(partition: str) -> bool:
+    """Si la partición de agregados es la de un shard de saldo (pendiente de compactar)"""
+    return '#' in partition[len(SUMMARY_PREFIX):]
+
+# -- Marshalling -----------------------------------------------------------
+
+def filter_key(account_id: str, value: str) -> str:
+    """Partición de los GSIs de filtros (typeKey/statusKey) para una cuenta"""
+    return f'{account_id}#{value}'
+
+def daily_limit_key(account_id: str, day: str) -> Dict[str, Any]:
+    """Clave del contador del límite diario de una cuenta (day en formato YYYY-MM-DD)"""
+    return {'accountId': {'S': account_id}, 'day': {'S': day}}
+
+def summary_partition(account_id: str, shard: Optional[int] = None) -> str:
+    """Partición de agregados de una cuenta o, con `shard`, de uno de sus shards de saldo"""
+    if shard is None:
+        return f'{SUMMARY_PREFIX}{account_id}'
+    return f'{SUMMARY_PREFIX}{account_id}#{shard}'
+
+def balance_shard_key(account_id: str, shard: int) -> Dict[str, Any]:
+    """Clave de un shard de saldo de una cuenta"""
+    return {'shardId': {'S': f'{account_id}#{shard}'}}
+
+def account_item(account_id: str, customer_id: str, customer_email: str, account_type: str,
+                 account_name: str, balance: float, now: str,
+                 opening_balance: Optional[float] = None) -> Dict[str, Any]:
+    """Construir un item de Accounts"""
+    item = {
+        'accountId': {'S': account_id},
+        'customerId': {'S': customer_id},
+        'customerEmail': {'S': customer_email},
+        'accountName': {'S': account_name},
+        'accountType': {'S': account_type},
+        'balance': {'N': str(balance)},
+        'currency': {'S': 'USD'},
+        'dailyTransferLimit': {'N': str(int(DEFAULT_DAILY_TRANSFER_LIMIT))},
+        'status': {'S': 'ACTIVE'},
+        'createdAt': {'S': now},
+        'updatedAt': {'S': now}
+    }
+    if opening_balance is not None:
+        # Saldo no explicado por el libro mayor: balance (más sus shards) debe ser
+        # siempre openingBalance más la suma de las filas COMPLETED de la cuenta
+        item['openingBalance'] = {'N': str(opening_balance)}
+    return item
+
+def transaction_item(account_id: str, timestamp: str, transaction_type: str, amount: float,
+                     counterparty: str, note: str, transfer_id: Optional[str] = None,
+                     status: str = STATUS_COMPLETED, customer_id: Optional[str] = None) -> Dict[str, Any]:
+    """Construir un item de Transactions (fila del libro mayor)"""
+    item = {
+        'accountId': {'S': account_id},
+        'timestamp': {'S': timestamp},
+        'transactionId': {'S': str(uuid.uuid4())},
+        'type': {'S': transaction_type},
+        'amount': {'N': str(amount)},
+        'counterparty': {'S': counterparty},
+        'status': {'S': status},
+        'note': {'S': note or ''},
+        'createdAt': {'S': timestamp},
+        'typeKey': {'S': filter_key(account_id, transaction_type)}
+    }
+    if status != STATUS_COMPLETED:
+        item['statusKey'] = {'S': filter_key(account_id, status)}
+    if transfer_id:
+        # Las filas con transferId forman el GSI disperso TransferIdIndex; el
+        # customerId permite a get_transfer validar el dueño sin otra lectura
+        item['transferId'] = {'S': transfer_id}
+    if customer_id:
+        item['customerId'] = {'S': customer_id}
+    return item
+
+def summary_item(account_id: str, bucket: str, count: int, debits: float, credits: float,
+                 now: str) -> Dict[str, Any]:
+    """Construir un bucket de agregados (DAY#YYYY-MM-DD o TOTAL) de una cuenta"""
+    return {
+        'accountId': {'S': f'{SUMMARY_PREFIX}{account_id}'},
+        'timestamp': {'S': bucket},
+        'transactionCount': {'N': str(count)},
+        'completedCount': {'N': str(count)},
+        'totalDebits': {'N': str(debits)},
+        'totalCredits': {'N': str(credits)},
+        # Versión del libro mayor de la cuenta (ETag de get_transactions)
+        'ledgerVersion': {'N': '1'},
+        'updatedAt': {'S': now}
+    }
+
+def user_item(user_id: str, email: str, given_name: str, family_name: str,
+              environment: str, now: str) -> Dict[str, Any]:
+    """Construir el item de Users con el perfil inicial del cliente"""
+    return {
+        'id': {'S': user_id},
+        'email': {'S': email},
+        'name': {'S': f'{given_name} {family_name}'.strip() or email},
+        'givenName': {'S': given_name},
+        'familyName': {'S': family_name},
+        'createdAt': {'S': now},
+        'updatedAt': {'S': now},
+        'status': {'S': 'ACTIVE'},
+        'customerType': {'S': 'INDIVIDUAL'},
+        'riskProfile': {'S': 'CONSERVATIVE'},
+        'preferences': {
+            'M': {
+                'notifications': {
+                    'M': {
+                        'email': {'BOOL': True},
+                        'sms': {'BOOL': False}
+                    }
+                },
+                'language': {'S': 'es'},
+                'currency': {'S': 'USD'}
+            }
+        },
+        'environment': {'S': environment},
+        # Versión de datos del cliente; invalida los caches de get_profile/get_accounts
+        'dataVersion': {'N': '1'}
+    }
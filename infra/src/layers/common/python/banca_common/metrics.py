@@ -0,0 +1,188 @@
+"""
+Tiempos por fase y por llamada a DynamoDB, emitidos en CloudWatch Embedded Metric Format.
+
+`instrument` envuelve el lambda_handler y, para las invocaciones muestreadas,
+escribe al final una línea JSON con el formato EMF: CloudWatch la convierte en
+métricas (namespace METRICS_NAMESPACE, dimensiones Service y Handler) sin
+llamadas a la API. `phase` mide un tramo del handler (parse, validate, read,
+write, serialize) como context manager o decorador; el proxy de
+banca_common.dynamo registra cada llamada al cliente.
+
+Lambda ejecuta una invocación por contenedor a la vez, así que la invocación
+en curso es global al módulo: los hilos de un fan-out (dashboard, feed)
+registran sus llamadas en ella.
+
+METRICS_ENABLED=false deja los handlers y el cliente sin envolver (costo
+cero); METRICS_SAMPLE_RATE (0..1) emite solo una fracción de las invocaciones.
+"""
+import json
+import os
+import random
+import threading
+import time
+from functools import wraps
+from typing import Any, Callable, Dict, Optional
+
+ENABLED = os.environ.get('METRICS_ENABLED', 'true').lower() == 'true'
+SAMPLE_RATE = float(os.environ.get('METRICS_SAMPLE_RATE', '1'))
+NAMESPACE = os.environ.get('METRICS_NAMESPACE', 'BancaPorInternet')
+SERVICE = os.environ.get('METRICS_SERVICE', 'banca-internet')
+
+_current: Optional['_Invocation'] = None
+_cold_start = True
+
+class _Invocation:
+    """Tiempos acumulados de una invocación muestreada"""
+
+    __slots__ = ('handler', 'sample_rate', 'timings', 'counts', 'lock')
+
+    def __init__(self, handler: str, sample_rate: float):
+        self.handler = handler
+        self.sample_rate = sample_rate
+        self.timings: Dict[str, float] = {}
+        self.counts: Dict[str, int] = {}
+        self.lock = threading.Lock()
+
+    def add(self, name: str, elapsed_ms: float) -> None:
+        with self.lock:
+            self.timings[name] = self.timings.get(name, 0.0) + elapsed_ms
+            self.counts[name] = self.counts.get(name, 0) + 1
+
+class _Phase:
+    """Context manager que suma la duración del bloque a la invocación en curso"""
+
+    __slots__ = ('invocation', 'name', 'start')
+
+    def __init__(self, invocation: _Invocation, name: str):
+        self.invocation = invocation
+        self.name = name
+
+    def __enter__(self) -> '_Phase':
+        self.start = time.perf_counter()
+        return self
+
+    def __exit__(self, *exc_info) -> None:
+        self.invocation.add(self.name, (time.perf_counter() - self.start) * 1000)
+
+class _NoPhase:
+    """Context manager vacío para invocaciones no muestreadas o métricas apagadas"""
+
+    __slots__ = ()
+
+    def __enter__(self) -> '_NoPhase':
+        return self
+
+    def __exit__(self, *exc_info) -> None:
+        pass
+
+_NO_PHASE = _NoPhase()
+
+def phase(name: str) -> Any:
+    """Medir un tramo del handler: `with phase('read'): ...`"""
+    invocation = _current
+    if invocation is None:
+        return _NO_PHASE
+    return _Phase(invocation, f'Phase.{name}')
+
+def timed(name: str) -> Callable[[Callable[..., Any]], Callable[..., Any]]:
+    """Decorador equivalente a `phase` para una función completa"""
+    def decorator(function: Callable[..., Any]) -> Callable[..., Any]:
+        if not ENABLED:
+            return function
+
+        @wraps(function)
+        def wrapper(*args, **kwargs):
+            with phase(name):
+                return function(*args, **kwargs)
+        return wrapper
+    return decorator
+
+def time_call(name: str, method: Any) -> Any:
+    """Envolver un método del cliente de AWS si hay una invocación muestreada en curso"""
+    invocation = _current
+    if invocation is None or not callable(method):
+        return method
+
+    def call(*args, **kwargs):
+        start = time.perf_counter()
+        try:
+            return method(*args, **kwargs)
+        finally:
+            invocation.add(name, (time.perf_counter() - start) * 1000)
+    return call
+
+def emf_document(invocation: _Invocation, duration_ms: float, status_code: Optional[int],
+                 error: bool, cold_start: bool, request_id: Optional[str]) -> Dict[str, Any]:
+    """Documento EMF de una invocación: una métrica por fase y por operación de DynamoDB"""
+    metrics = [{'Name': 'Duration', 'Unit': 'Milliseconds'}, {'Name': 'Errors', 'Unit': 'Count'}]
+    document: Dict[str, Any] = {
+        'Service': SERVICE,
+        'Handler': invocation.handler,
+        'Duration': round(duration_ms, 3),
+        'Errors': 1 if error else 0,
+        'coldStart': cold_start,
+        'sampleRate': invocation.sample_rate
+    }
+    if status_code is not None:
+        document['statusCode'] = status_code
+    if request_id:
+        document['requestId'] = request_id
+
+    calls = 0
+    call_time = 0.0
+    for name, elapsed in invocation.timings.items():
+        metrics.append({'Name': name, 'Unit': 'Milliseconds'})
+        document[name] = round(elapsed, 3)
+        if name.startswith('DynamoDB.'):
+            calls += invocation.counts[name]
+            call_time += elapsed
+            document[f'{name}.calls'] = invocation.counts[name]
+    metrics += [{'Name': 'DynamoDBCalls', 'Unit': 'Count'}, {'Name': 'DynamoDBTime', 'Unit': 'Milliseconds'}]
+    document['DynamoDBCalls'] = calls
+    document['DynamoDBTime'] = round(call_time, 3)
+
+    document['_aws'] = {
+        'Timestamp': int(time.time() * 1000),
+        'CloudWatchMetrics': [{
+            'Namespace': NAMESPACE,
+            'Dimensions': [['Service', 'Handler']],
+            'Metrics': metrics
+        }]
+    }
+    return document
+
+def instrument(handler_name: str, sample_rate: Optional[float] = None) -> Callable[[Callable[..., Any]], Callable[..., Any]]:
+    """Decorador del lambda_handler: mide la invocación y emite una línea EMF si se muestrea"""
+    rate = SAMPLE_RATE if sample_rate is None else sample_rate
+
+    def decorator(handler: Callable[..., Any]) -> Callable[..., Any]:
+        if not ENABLED or rate <= 0:
+            return handler
+
+        @wraps(handler)
+        def wrapper(event: Any, context: Any) -> Any:
+            global _current, _cold_start
+            cold_start, _cold_start = _cold_start, False
+            if rate < 1 and random.random() >= rate:
+                return handler(event, context)
+
+            invocation = _current = _Invocation(handler_name, rate)
+            start = time.perf_counter()
+            response = None
+            error = True
+            try:
+                response = handler(event, context)
+                error = False
+                return response
+            finally:
+                duration_ms = (time.perf_counter() - start) * 1000
+                _current = None
+                status_code = response.get('statusCode') if isinstance(response, dict) else None
+                document = emf_document(
+                    invocation, duration_ms, status_code,
+                    error or (status_code is not None and status_code >= 500),
+                    cold_start, getattr(context, 'aws_request_id', None)
+                )
+                print(json.dumps(document, separators=(',', ':')))
+        return wrapper
+    return decorator
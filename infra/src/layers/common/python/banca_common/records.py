@@ -0,0 +1,200 @@
+"""
+Registros compactos (__slots__) para las rutas de lectura de la API.
+
+Cada registro se construye en una sola pasada desde el formato de bajo nivel
+de DynamoDB y se serializa a JSON con un f-string, sin pasar por un dict
+intermedio ni por JSONEncoder. Los montos se emiten como número JSON con dos
+decimales; los saldos se guardan como enteros en unidades menores (centavos)
+y el monto de una transacción se guarda como viene y se convierte a centavos
+solo si se lee (`amount`): una página de la API solo lo serializa.
+"""
+from decimal import Decimal, ROUND_HALF_UP
+from json.encoder import encode_basestring
+from typing import Dict, Any, Iterable, List
+
+from banca_common.items import DEFAULT_DAILY_TRANSFER_LIMIT
+from banca_common.responses import RawJSON, encode_json
+
+MINOR_UNITS_PER_UNIT = 100
+_CENT = Decimal('0.01')
+
+# -- Montos ----------------------------------------------------------------
+
+def to_minor_units(value: str) -> int:
+    """Convertir un número de DynamoDB ('-75.5', '5000') a centavos sin pasar por float"""
+    dot = value.find('.')
+    if dot < 0 or len(value) - dot <= 3:
+        # Hasta dos decimales: float(value) * 100 queda a menos de medio centavo
+        # del valor exacto, así que round() es exacto y más barato que Decimal
+        return round(float(value) * MINOR_UNITS_PER_UNIT)
+    # Más de dos decimales: redondeo exacto con Decimal
+    return int(Decimal(value).quantize(_CENT, rounding=ROUND_HALF_UP) * MINOR_UNITS_PER_UNIT)
+
+def minor_units(item: Dict[str, Any], name: str, default: int = 0) -> int:
+    """Leer un atributo N de un item como centavos"""
+    value = item.get(name)
+    return to_minor_units(value['N']) if value is not None else default
+
+def format_minor(units: int) -> str:
+    """Centavos como número JSON con dos decimales (-7550 -> '-75.50')"""
+    sign = '-' if units < 0 else ''
+    whole, cents = divmod(abs(units), MINOR_UNITS_PER_UNIT)
+    return f'{sign}{whole}.{cents:02d}'
+
+def format_amount(value: str) -> str:
+    """Número de DynamoDB como monto JSON con dos decimales; si ya los tiene pasa tal cual"""
+    if value[-3:-2] == '.':
+        return value
+    return format_minor(to_minor_units(value))
+
+def money(units: int) -> RawJSON:
+    """Monto listo para insertar en encode_object"""
+    return RawJSON(format_minor(units))
+
+def _s(item: Dict[str, Any], name: str, default: str = '') -> str:
+    value = item.get(name)
+    return value['S'] if value is not None else default
+
+# -- Registros -------------------------------------------------------------
+
+class Account:
+    """
+    Cuenta de la API (tabla Accounts). El uso del límite del día no está en el
+    item: sale del contador de DailyLimits y lo pasa quien lo leyó.
+    """
+    __slots__ = ('account_id', 'customer_id', 'balance', 'currency', 'account_type', 'account_name',
+                 'daily_transfer_used', 'daily_transfer_limit', 'status', 'created_at', 'updated_at')
+
+    @classmethod
+    def from_item(cls, item: Dict[str, Any], daily_transfer_used: int = 0) -> 'Account':
+        account = cls.__new__(cls)
+        account.account_id = item['accountId']['S']
+        account.customer_id = item['customerId']['S']
+        account.balance = to_minor_units(item['balance']['N'])
+        account.currency = _s(item, 'currency', 'USD')
+        account.account_type = _s(item, 'accountType')
+        account.account_name = _s(item, 'accountName')
+        account.daily_transfer_used = daily_transfer_used
+        account.daily_transfer_limit = minor_units(
+            item, 'dailyTransferLimit', int(DEFAULT_DAILY_TRANSFER_LIMIT * MINOR_UNITS_PER_UNIT)
+        )
+        account.status = _s(item, 'status', 'ACTIVE')
+        account.created_at = _s(item, 'createdAt')
+        account.updated_at = _s(item, 'updatedAt')
+        return account
+
+    def to_json(self) -> str:
+        return (
+            f'{{"accountId":{encode_basestring(self.account_id)},'
+            f'"customerId":{encode_basestring(self.customer_id)},'
+            f'"balance":{format_minor(self.balance)},'
+            f'"currency":{encode_basestring(self.currency)},'
+            f'"accountType":{encode_basestring(self.account_type)},'
+            f'"accountName":{encode_basestring(self.account_name)},'
+            f'"dailyTransferUsed":{format_minor(self.daily_transfer_used)},'
+            f'"dailyTransferLimit":{format_minor(self.daily_transfer_limit)},'
+            f'"status":{encode_basestring(self.status)},'
+            f'"createdAt":{encode_basestring(self.created_at)},'
+            f'"updatedAt":{encode_basestring(self.updated_at)}}}'
+        )
+
+class Transaction:
+    """Transacción de la API (fila del libro mayor en Transactions)"""
+    __slots__ = ('account_id', 'timestamp', 'created_at', 'type', 'raw_amount', 'counterparty',
+                 'transfer_id', 'status', 'note')
+
+    @classmethod
+    def from_item(cls, item: Dict[str, Any]) -> 'Transaction':
+        # Ruta caliente de las páginas: los opcionales se leen en línea, sin _s
+        transaction = cls.__new__(cls)
+        get = item.get
+        transaction.account_id = item['accountId']['S']
+        transaction.timestamp = timestamp = item['timestamp']['S']
+        value = get('createdAt')
+        transaction.created_at = value['S'] if value is not None else timestamp
+        transaction.type = item['type']['S']
+        transaction.raw_amount = item['amount']['N']
+        transaction.counterparty = item['counterparty']['S']
+        value = get('transferId')
+        transaction.transfer_id = value['S'] if value is not None else ''
+        value = get('status')
+        transaction.status = value['S'] if value is not None else 'COMPLETED'
+        value = get('note')
+        transaction.note = value['S'] if value is not None else ''
+        return transaction
+
+    @property
+    def amount(self) -> int:
+        """Monto en centavos"""
+        return to_minor_units(self.raw_amount)
+
+    def to_json(self) -> str:
+        return (
+            f'{{"accountId":{encode_basestring(self.account_id)},'
+            f'"timestamp":{encode_basestring(self.timestamp)},'
+            f'"createdAt":{encode_basestring(self.created_at)},'
+            f'"type":{encode_basestring(self.type)},'
+            f'"amount":{format_amount(self.raw_amount)},'
+            f'"counterparty":{encode_basestring(self.counterparty)},'
+            f'"transferId":{encode_basestring(self.transfer_id)},'
+            f'"status":{encode_basestring(self.status)},'
+            f'"note":{encode_basestring(self.note)}}}'
+        )
+
+    def to_row(self) -> List[str]:
+        """Fila CSV en el orden de EXPORT_FIELDS de get_transactions"""
+        return [self.account_id, self.timestamp, self.type, format_amount(self.raw_amount),
+                self.counterparty, self.transfer_id, self.status, self.note]
+
+class UserProfile:
+    """Perfil de la API (tabla Users)"""
+    __slots__ = ('id', 'email', 'name', 'given_name', 'family_name', 'created_at', 'updated_at',
+                 'status', 'customer_type', 'risk_profile', 'preferences')
+
+    @classmethod
+    def from_item(cls, item: Dict[str, Any]) -> 'UserProfile':
+        profile = cls.__new__(cls)
+        profile.id = item['id']['S']
+        profile.email = item['email']['S']
+        profile.name = _s(item, 'name')
+        profile.given_name = _s(item, 'givenName')
+        profile.family_name = _s(item, 'familyName')
+        profile.created_at = created_at = item['createdAt']['S']
+        profile.updated_at = _s(item, 'updatedAt', created_at)
+        profile.status = _s(item, 'status', 'ACTIVE')
+        profile.customer_type = _s(item, 'customerType', 'INDIVIDUAL')
+        profile.risk_profile = _s(item, 'riskProfile', 'CONSERVATIVE')
+        profile.preferences = None
+
+        preferences = item.get('preferences')
+        if preferences is not None:
+            preferences = preferences['M']
+            notifications = preferences.get('notifications', {}).get('M', {})
+            profile.preferences = {
+                'notifications': {
+                    'email': notifications.get('email', {}).get('BOOL', True),
+                    'sms': notifications.get('sms', {}).get('BOOL', False)
+                },
+                'language': _s(preferences, 'language', 'es'),
+                'currency': _s(preferences, 'currency', 'USD')
+            }
+        return profile
+
+    def to_json(self) -> str:
+        return (
+            f'{{"id":{encode_basestring(self.id)},'
+            f'"email":{encode_basestring(self.email)},'
+            f'"name":{encode_basestring(self.name)},'
+            f'"givenName":{encode_basestring(self.given_name)},'
+            f'"familyName":{encode_basestring(self.family_name)},'
+            f'"createdAt":{encode_basestring(self.created_at)},'
+            f'"updatedAt":{encode_basestring(self.updated_at)},'
+            f'"status":{encode_basestring(self.status)},'
+            f'"customerType":{encode_basestring(self.customer_type)},'
+            f'"riskProfile":{encode_basestring(self.risk_profile)},'
+            f'"preferences":{encode_json(self.preferences or {})}}}'
+        )
+
+def encode_records(records: Iterable[Any]) -> RawJSON:
+    """Serializar una lista de registros como arreglo JSON"""
+    return RawJSON('[' + ','.join([record.to_json() for record in records]) + ']')
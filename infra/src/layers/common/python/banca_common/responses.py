@@ -0,0 +1,143 @@
+"""
+Construcción de respuestas HTTP para API Gateway (integración proxy).
+"""
+import base64
+import gzip
+import hashlib
+import json
+import os
+from typing import Dict, Any, Optional
+
+# Cuerpos más chicos no compensan el costo de comprimir (ni el base64)
+GZIP_MIN_BYTES = int(os.environ.get('GZIP_MIN_BYTES', '1024'))
+GZIP_LEVEL = int(os.environ.get('GZIP_LEVEL', '5'))
+
+CORS_HEADERS = {
+    'Access-Control-Allow-Origin': '*',
+    'Access-Control-Allow-Headers': 'Content-Type,Authorization,X-Amz-Date,X-Api-Key,X-Amz-Security-Token,X-Requested-With,X-Environment,If-None-Match',
+    'Access-Control-Allow-Methods': 'OPTIONS,GET,POST,PUT,DELETE',
+    'Access-Control-Max-Age': '86400'
+}
+
+# Headers construidos una sola vez por contenedor; se comparten entre
+# respuestas, por lo que no deben modificarse
+JSON_HEADERS = {**CORS_HEADERS, 'Content-Type': 'application/json'}
+
+# json.dumps con argumentos no estándar crea un JSONEncoder en cada llamada;
+# el encoder precreado evita esa asignación por respuesta
+encode_json = json.JSONEncoder(ensure_ascii=False, separators=(',', ':')).encode
+
+class RawJSON(str):
+    """Fragmento JSON ya serializado; encode_object lo inserta tal cual"""
+    __slots__ = ()
+
+def encode_object(fields: Dict[str, Any]) -> str:
+    """Serializar un objeto JSON insertando los valores RawJSON sin volver a codificarlos"""
+    return '{' + ','.join([
+        f'{encode_json(name)}:{value if isinstance(value, RawJSON) else encode_json(value)}'
+        for name, value in fields.items()
+    ]) + '}'
+
+def make_response(status_code: int, body: Dict[str, Any]) -> Dict[str, Any]:
+    """Crear respuesta HTTP JSON con headers CORS"""
+    return {
+        'statusCode': status_code,
+        'headers': JSON_HEADERS,
+        'body': encode_json(body)
+    }
+
+def make_json_response(status_code: int, body: Dict[str, Any],
+                       extra_headers: Optional[Dict[str, str]] = None) -> Dict[str, Any]:
+    """Como make_response, para cuerpos que incluyen fragmentos RawJSON (registros)"""
+    return {
+        'statusCode': status_code,
+        'headers': {**JSON_HEADERS, **extra_headers} if extra_headers else JSON_HEADERS,
+        'body': encode_object(body)
+    }
+
+def make_raw_response(status_code: int, body: str, content_type: str,
+                      extra_headers: Optional[Dict[str, str]] = None) -> Dict[str, Any]:
+    """Crear respuesta HTTP con cuerpo ya serializado (CSV, NDJSON, ...)"""
+    headers = {**CORS_HEADERS, 'Content-Type': content_type}
+    if extra_headers:
+        headers.update(extra_headers)
+
+    return {
+        'statusCode': status_code,
+        'headers': headers,
+        'body': body
+    }
+
+def preflight_response() -> Dict[str, Any]:
+    """Respuesta para preflight OPTIONS"""
+    return make_response(200, {'message': 'CORS preflight successful'})
+
+def unauthorized_response() -> Dict[str, Any]:
+    """Respuesta cuando el token no trae el sub del cliente"""
+    return make_response(401, {
+        'error': 'Unauthorized',
+        'message': 'Customer ID not found in token'
+    })
+
+def make_etag(*versions: str) -> str:
+    """ETag débil y opaco a partir de las versiones que determinan el contenido"""
+    # Débil: el correlationId del cuerpo cambia en cada respuesta
+    digest = hashlib.blake2b('\x1f'.join(versions).encode(), digest_size=12).hexdigest()
+    return f'W/"{digest}"'
+
+def etag_headers(etag: str) -> Dict[str, str]:
+    """Headers de una respuesta con ETag: el navegador la revalida con If-None-Match"""
+    return {
+        'ETag': etag,
+        'Cache-Control': 'private, no-cache',
+        'Access-Control-Expose-Headers': 'ETag'
+    }
+
+def etag_matches(if_none_match: Optional[str], etag: str) -> bool:
+    """Comparación débil de If-None-Match (lista separada por comas o *)"""
+    if not if_none_match:
+        return False
+    opaque = etag[2:] if etag.startswith('W/') else etag
+    for candidate in if_none_match.split(','):
+        candidate = candidate.strip()
+        if candidate == '*' or (candidate[2:] if candidate.startswith('W/') else candidate) == opaque:
+            return True
+    return False
+
+def not_modified_response(etag: str) -> Dict[str, Any]:
+    """304 sin cuerpo: el cliente reutiliza la representación que ya tiene"""
+    return {
+        'statusCode': 304,
+        'headers': {**CORS_HEADERS, **etag_headers(etag)},
+        'body': ''
+    }
+
+def accepts_gzip(accept_encoding: Optional[str]) -> bool:
+    """Si Accept-Encoding admite gzip (se respeta q=0)"""
+    for coding in (accept_encoding or '').lower().split(','):
+        name, _, params = coding.partition(';')
+        if name.strip() in ('gzip', '*'):
+            quality = params.strip()
+            if not quality.startswith('q='):
+                return True
+            try:
+                return float(quality[2:]) > 0
+            except ValueError:
+                return False
+    return False
+
+def compress_response(response: Dict[str, Any], accept_encoding: Optional[str]) -> Dict[str, Any]:
+    """Comprimir con gzip los cuerpos grandes si el cliente lo acepta"""
+    if response['statusCode'] != 200 or response.get('isBase64Encoded') or not accepts_gzip(accept_encoding):
+        return response
+    body = response['body'].encode()
+    if len(body) < GZIP_MIN_BYTES:
+        return response
+
+    # API Gateway decodifica el base64 (binaryMediaTypes) y entrega los bytes gzip
+    return {
+        **response,
+        'headers': {**response['headers'], 'Content-Encoding': 'gzip', 'Vary': 'Accept-Encoding'},
+        'body': base64.b64encode(gzip.compress(body, compresslevel=GZIP_LEVEL, mtime=0)).decode(),
+        'isBase64Encoded': True
+    }
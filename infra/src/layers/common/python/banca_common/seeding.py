@@ -0,0 +1,183 @@
+"""
+Datos de ejemplo para clientes nuevos, compartidos por seed_data y el
+aprovisionamiento asíncrono de cuentas (provision_accounts).
+
+Genera N cuentas × M transacciones con sus agregados y los escribe con
+batch_write_item en lotes de 25 en lugar de un put_item por fila.
+"""
+import uuid
+from datetime import datetime, timedelta
+from typing import Dict, Any, Iterator, List, Optional, Set, Tuple
+
+from banca_common import dynamo
+from banca_common.dynamo import batch_put, dynamodb
+from banca_common.items import SUMMARY_TOTAL_BUCKET, account_item, summary_item, transaction_item
+
+# (tipo, nombre, saldo inicial); las cuentas adicionales repiten el ciclo
+ACCOUNT_TEMPLATES = [
+    ('CHECKING', 'Cuenta Corriente Principal', 5000.00),
+    ('SAVINGS', 'Cuenta de Ahorros', 2500.00)
+]
+
+# Movimientos por tipo de cuenta: (tipo, monto, contraparte, nota, días atrás)
+TRANSACTION_TEMPLATES = {
+    'CHECKING': [
+        ('CREDIT', 5000.00, 'Depósito Inicial', 'Depósito inicial de bienvenida', 30),
+        ('DEBIT', -150.00, 'Supermercado', 'Compra de víveres', 25),
+        ('DEBIT', -75.50, 'Gasolinera', 'Combustible', 20),
+        ('DEBIT', -300.00, 'Transferencia a Ahorros', 'Transferencia mensual a ahorros', 15),
+        ('CREDIT', 2500.00, 'Nómina', 'Pago de nómina mensual', 10),
+        ('DEBIT', -45.00, 'Netflix', 'Suscripción mensual', 5)
+    ],
+    'SAVINGS': [
+        ('CREDIT', 2500.00, 'Apertura de Cuenta', 'Apertura de cuenta de ahorros', 28),
+        ('CREDIT', 300.00, 'Transferencia desde Corriente', 'Transferencia mensual desde corriente', 15),
+        ('CREDIT', 200.00, 'Intereses', 'Intereses ganados', 7)
+    ]
+}
+
+# Al repetir las plantillas cada vuelta se corre un mes hacia atrás,
+# así el timestamp (sort key) no se repite dentro de una cuenta
+CYCLE_DAYS = 31
+
+# Estado del aprovisionamiento en el item de Users (provisioningStatus)
+PROVISIONING_PENDING = 'PENDING'
+PROVISIONING_COMPLETED = 'COMPLETED'
+
+# Espacio de nombres de los accountId derivados del user_id
+PROVISIONING_NAMESPACE = uuid.UUID('6f1c1a52-3f0e-4a55-9a57-2d4b8e0b7c31')
+
+def _sample_items(customer_id: str, customer_email: str, account_ids: List[str],
+                  transactions_per_account: Optional[int], now: datetime,
+                  accounts_table: str, transactions_table: str,
+                  counts: Dict[str, int],
+                  skipped: Set[str] = frozenset()) -> Iterator[Tuple[str, Dict[str, Any]]]:
+    """
+    Generar los pares (tabla, item) de cuentas, transacciones y agregados;
+    las cuentas de `skipped` no generan nada (conservan su posición en las plantillas)
+    """
+    now_iso = now.isoformat()
+    buckets: Dict[Tuple[str, str], List[float]] = {}
+
+    for index, account_id in enumerate(account_ids):
+        if account_id in skipped:
+            continue
+        account_type, account_name, balance = ACCOUNT_TEMPLATES[index % len(ACCOUNT_TEMPLATES)]
+        if index >= len(ACCOUNT_TEMPLATES):
+            account_name = f'{account_name} {index // len(ACCOUNT_TEMPLATES) + 1}'
+        templates = TRANSACTION_TEMPLATES[account_type]
+        count = len(templates) if transactions_per_account is None else transactions_per_account
+        ledger = []
+        for position in range(count):
+            cycle, slot = divmod(position, len(templates))
+            tx_type, amount, counterparty, note, days_ago = templates[slot]
+            timestamp = now - timedelta(days=days_ago + cycle * CYCLE_DAYS)
+            ledger.append(transaction_item(
+                account_id, timestamp.isoformat(), tx_type, amount, counterparty, note
+            ))
+
+            for bucket in (f'DAY#{timestamp.date().isoformat()}', SUMMARY_TOTAL_BUCKET):
+                totals = buckets.setdefault((account_id, bucket), [0, 0.0, 0.0])
+                totals[0] += 1
+                totals[1 if amount < 0 else 2] += amount
+
+        # El saldo de la plantilla no sale de sumar los movimientos: la diferencia
+        # queda como saldo de apertura para la conciliación (reconcile_ledger)
+        net = sum(float(item['amount']['N']) for item in ledger)
+        yield accounts_table, account_item(
+            account_id, customer_id, customer_email, account_type, account_name, balance, now_iso,
+            opening_balance=round(balance - net, 2)
+        )
+        for item in ledger:
+            yield transactions_table, item
+        counts['transactions'] += len(ledger)
+
+    for (account_id, bucket), (count, debits, credits) in buckets.items():
+        yield transactions_table, summary_item(account_id, bucket, count, debits, credits, now_iso)
+
+def seed_customer(customer_id: str, customer_email: str, accounts_table: str, transactions_table: str,
+                  account_count: int = len(ACCOUNT_TEMPLATES),
+                  transactions_per_account: Optional[int] = None) -> Dict[str, Any]:
+    """
+    Crear cuentas, transacciones y agregados de ejemplo para un cliente.
+    Sin transactions_per_account cada cuenta recibe sus plantillas una vez.
+    """
+    account_ids = [str(uuid.uuid4()) for _ in range(account_count)]
+    counts = {'transactions': 0}
+    items_written = batch_put(_sample_items(
+        customer_id, customer_email, account_ids, transactions_per_account,
+        datetime.utcnow(), accounts_table, transactions_table, counts
+    ))
+    return {
+        'accountIds': account_ids,
+        'accountsCreated': len(account_ids),
+        'transactionsCreated': counts['transactions'],
+        'itemsWritten': items_written
+    }
+
+def provisioning_account_ids(user_id: str, account_count: int) -> List[str]:
+    """accountIds deterministas por usuario: un reintento escribe las mismas claves"""
+    return [str(uuid.uuid5(PROVISIONING_NAMESPACE, f'{user_id}#{index}')) for index in range(account_count)]
+
+def _existing_accounts(user_id: str, account_ids: List[str], accounts_table: str) -> Set[str]:
+    """Cuentas del usuario que ya existen (lectura consistente por clave primaria)"""
+    request = {accounts_table: {
+        'Keys': [{'accountId': {'S': account_id}, 'customerId': {'S': user_id}} for account_id in account_ids],
+        'ProjectionExpression': 'accountId',
+        'ConsistentRead': True
+    }}
+    existing = set()
+    while request:
+        response = dynamodb.batch_get_item(RequestItems=request)
+        existing.update(item['accountId']['S'] for item in response.get('Responses', {}).get(accounts_table, []))
+        request = response.get('UnprocessedKeys')
+    return existing
+
+def provision_customer(user_id: str, customer_email: str, accounts_table: str, transactions_table: str,
+                       requested_at: datetime, account_count: int = len(ACCOUNT_TEMPLATES),
+                       transactions_per_account: Optional[int] = None) -> Dict[str, Any]:
+    """
+    Crear las cuentas y el libro mayor iniciales de un usuario; idempotente por user_id.
+
+    Las claves y los timestamps se derivan del user_id y de requested_at, así
+    un reintento reescribe exactamente las mismas filas. Las cuentas se crean
+    al final y solo si no existen: nunca se pisa un saldo ya en uso. Una
+    cuenta creada ya tiene su libro mayor y sus agregados completos (se
+    escriben antes), y desde ese momento las transferencias los actualizan:
+    el reintento la saltea entera en lugar de reescribir SUMMARY DAY#/TOTAL.
+    """
+    account_ids = provisioning_account_ids(user_id, account_count)
+    existing = _existing_accounts(user_id, account_ids, accounts_table)
+    counts = {'transactions': 0}
+    accounts = []
+
+    def ledger_items() -> Iterator[Tuple[str, Dict[str, Any]]]:
+        for table_name, item in _sample_items(user_id, customer_email, account_ids, transactions_per_account,
+                                              requested_at, accounts_table, transactions_table, counts,
+                                              existing):
+            if table_name == accounts_table:
+                accounts.append(item)
+            else:
+                yield table_name, item
+
+    items_written = batch_put(ledger_items())
+
+    created = 0
+    for item in accounts:
+        try:
+            dynamodb.put_item(
+                TableName=accounts_table,
+                Item=item,
+                ConditionExpression='attribute_not_exists(accountId)'
+            )
+            created += 1
+        except dynamo.ClientError as e:
+            if e.response['Error']['Code'] != 'ConditionalCheckFailedException':
+                raise
+
+    return {
+        'accountIds': account_ids,
+        'accountsCreated': created,
+        'transactionsCreated': counts['transactions'],
+        'itemsWritten': items_written + created
+    }
@@ -0,0 +1,193 @@
+"""
+Snapshots por cliente (modelo de lectura) mantenidos desde los streams de DynamoDB.
+
+El worker project_snapshots consume los cambios de Accounts, Transactions,
+BalanceShards (shards de saldo) y DailyLimits (contadores del límite diario) y
+mantiene en la tabla Snapshots un documento JSON por cliente con sus cuentas,
+los últimos movimientos y los totales por mes; el dashboard lo lee con un solo
+acceso por clave. Los días de cada mes van en un item aparte (DAYS#YYYY-MM)
+para que el documento principal no crezca con la historia.
+
+Los streams entregan "al menos una vez" y sin orden entre tablas ni entre
+shards, así que cada entrada guarda el SequenceNumber del último cambio
+aplicado a su item de origen y se reemplaza solo por uno mayor; las imágenes
+son absolutas (nunca deltas). Aplicar el mismo registro dos veces, o dos
+registros en cualquier orden, deja el mismo documento.
+"""
+import json
+from decimal import Decimal
+from typing import Dict, Any, List, Optional
+
+from banca_common.records import Account, Transaction, minor_units, money
+from banca_common.responses import RawJSON, encode_object
+
+# Items de la tabla Snapshots (partición customerId, orden part)
+SNAPSHOT_PART = 'SNAPSHOT'
+DAYS_PART_PREFIX = 'DAYS#'
+# Meses con totales en el documento principal (los items DAYS# conservan el resto)
+KEPT_MONTHS = 24
+
+# Atributos de Accounts que el documento guarda de cada cuenta
+ACCOUNT_FIELDS = ('accountId', 'customerId', 'balance', 'currency', 'accountType', 'accountName',
+                  'dailyTransferLimit', 'status', 'createdAt', 'updatedAt')
+
+Document = Dict[str, Any]
+
+def snapshot_key(customer_id: str, part: str = SNAPSHOT_PART) -> Dict[str, Any]:
+    """Clave de un item de Snapshots (el documento principal o un mes de días)"""
+    return {'customerId': {'S': customer_id}, 'part': {'S': part}}
+
+def days_part(month: str) -> str:
+    """Item con los agregados diarios de un mes (YYYY-MM)"""
+    return f'{DAYS_PART_PREFIX}{month}'
+
+def new_document() -> Document:
+    """Documento principal vacío"""
+    return {'accounts': {}, 'shards': {}, 'dailyUsed': {}, 'recent': [], 'months': {}}
+
+def load_document(item: Optional[Dict[str, Any]], default: Any) -> Document:
+    """Documento guardado en un item de Snapshots (o `default` si aún no existe)"""
+    return json.loads(item['document']['S']) if item else default()
+
+def dump_document(document: Document) -> str:
+    return json.dumps(document, separators=(',', ':'))
+
+def _newer(entry: Optional[Dict[str, Any]], seq: int) -> bool:
+    return entry is None or seq > entry['seq']
+
+def month_offset(month: str, delta: int) -> str:
+    """Mes YYYY-MM desplazado `delta` meses"""
+    year, number = divmod(int(month[:4]) * 12 + int(month[5:7]) - 1 + delta, 12)
+    return f'{year:04d}-{number + 1:02d}'
+
+# -- Aplicar cambios -------------------------------------------------------
+
+def apply_account(document: Document, seq: int, account_id: str,
+                  image: Optional[Dict[str, Any]]) -> None:
+    """Alta, cambio o baja (image None, queda como lápida) de una cuenta"""
+    entry = document['accounts'].get(account_id)
+    if _newer(entry, seq):
+        item = {name: image[name] for name in ACCOUNT_FIELDS if name in image} if image else None
+        document['accounts'][account_id] = {'seq': seq, 'item': item}
+
+def apply_balance_shard(document: Document, seq: int, account_id: str, shard: int,
+                        image: Optional[Dict[str, Any]]) -> None:
+    """Saldo de un shard (banca_common.balances); los shards no se borran"""
+    if image is None:
+        return
+    shards = document['shards'].setdefault(account_id, {})
+    if _newer(shards.get(str(shard)), seq):
+        shards[str(shard)] = {'seq': seq, 'balance': image['balance']['N'],
+                              'updatedAt': image.get('updatedAt', {'S': ''})['S']}
+
+def apply_daily_used(document: Document, seq: int, account_id: str, day: str,
+                     image: Optional[Dict[str, Any]]) -> None:
+    """Contador del límite diario: se guarda solo el del día más reciente de cada cuenta"""
+    # La baja es el TTL de un día ya pasado
+    if image is None:
+        return
+    entry = document['dailyUsed'].get(account_id)
+    if entry is None or day > entry['day'] or (day == entry['day'] and seq > entry['seq']):
+        document['dailyUsed'][account_id] = {'seq': seq, 'day': day, 'used': minor_units(image, 'used')}
+
+def apply_ledger_row(document: Document, seq: int, image: Optional[Dict[str, Any]], keep: int) -> None:
+    """Fila del libro mayor en los últimos `keep` movimientos del cliente"""
+    # Las filas no se borran del historial (una baja es un archivado)
+    if image is None:
+        return
+    account_id, timestamp = image['accountId']['S'], image['timestamp']['S']
+    recent = document['recent']
+    for position, entry in enumerate(recent):
+        if entry['accountId'] == account_id and entry['timestamp'] == timestamp:
+            if seq > entry['seq']:
+                recent[position] = dict(entry, seq=seq, json=Transaction.from_item(image).to_json())
+            return
+
+    # Guardado ya serializado: el dashboard lo inserta tal cual en la respuesta
+    recent.append({'seq': seq, 'accountId': account_id, 'timestamp': timestamp,
+                   'json': Transaction.from_item(image).to_json()})
+    recent.sort(key=lambda entry: (entry['timestamp'], entry['accountId']), reverse=True)
+    del recent[keep:]
+
+def bucket_totals(bucket: Dict[str, Any]) -> List[int]:
+    """[transacciones, débitos, créditos] (montos en centavos) de un bucket DAY# de SUMMARY#"""
+    count = bucket.get('transactionCount')
+    return [int(count['N']) if count else 0, minor_units(bucket, 'totalDebits'),
+            minor_units(bucket, 'totalCredits')]
+
+def apply_summary_day(days: Document, seq: int, account_id: str, day: str,
+                      image: Optional[Dict[str, Any]]) -> None:
+    """Agregado diario de una cuenta en el item DAYS# de su mes"""
+    if image is None:
+        return
+    account_days = days.setdefault(account_id, {})
+    entry = account_days.get(day)
+    if entry is None or seq > entry[0]:
+        account_days[day] = [seq] + bucket_totals(image)
+
+def month_totals(days: Document) -> List[int]:
+    """Totales del mes sumando los días de todas las cuentas"""
+    totals = [0, 0, 0]
+    for account_days in days.values():
+        for entry in account_days.values():
+            for position in range(3):
+                totals[position] += entry[position + 1]
+    return totals
+
+def set_month(document: Document, month: str, totals: List[int]) -> None:
+    """Actualizar el total de un mes y descartar los que exceden KEPT_MONTHS"""
+    months = document['months']
+    months[month] = totals
+    for old in sorted(months)[:-KEPT_MONTHS]:
+        del months[old]
+
+# -- Lecturas --------------------------------------------------------------
+
+def accounts_updated_at(document: Document) -> str:
+    """Última escritura reflejada en las cuentas (items base y shards)"""
+    latest = max((entry['item'].get('updatedAt', {'S': ''})['S']
+                  for entry in document['accounts'].values() if entry['item']), default='')
+    for shards in document['shards'].values():
+        latest = max([latest] + [shard['updatedAt'] for shard in shards.values()])
+    return latest
+
+def snapshot_accounts(document: Document, today: str) -> List[Account]:
+    """Cuentas con el saldo total (base más shards) y el uso del límite de hoy"""
+    accounts = []
+    for account_id, entry in document['accounts'].items():
+        item = entry['item']
+        if item is None:
+            continue
+        shards = document['shards'].get(account_id)
+        if shards:
+            balance = Decimal(item['balance']['N']) + sum(Decimal(shard['balance']) for shard in shards.values())
+            updated_at = max([item.get('updatedAt', {'S': ''})['S']] + [shard['updatedAt'] for shard in shards.values()])
+            item = dict(item, balance={'N': str(balance)}, updatedAt={'S': updated_at})
+        used = document['dailyUsed'].get(account_id)
+        accounts.append(Account.from_item(item, used['used'] if used and used['day'] == today else 0))
+    accounts.sort(key=lambda account: (account.created_at, account.account_id))
+    return accounts
+
+def snapshot_recent(document: Document, limit: int) -> RawJSON:
+    """Últimos movimientos del cliente, ya serializados"""
+    return RawJSON('[' + ','.join(entry['json'] for entry in document['recent'][:limit]) + ']')
+
+def encode_monthly_totals(months: Dict[str, List[int]], first_month: str) -> RawJSON:
+    """Totales por mes desde `first_month`, el más reciente primero"""
+    return RawJSON('[' + ','.join(
+        encode_object({
+            'month': month,
+            'transactionCount': count,
+            'totalDebits': money(debits),
+            'totalCredits': money(credits),
+            'netAmount': money(credits - abs(debits))
+        })
+        for month, (count, debits, credits) in sorted(months.items(), reverse=True)
+        if month >= first_month
+    ) + ']')
+
+def add_bucket(months: Dict[str, List[int]], day: str, bucket: Dict[str, Any]) -> None:
+    """Sumar un bucket DAY# leído de Transactions al total de su mes"""
+    totals = months.setdefault(day[:7], [0, 0, 0])
+    for position, value in enumerate(bucket_totals(bucket)):
+        totals[position] += value
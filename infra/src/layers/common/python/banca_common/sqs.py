@@ -0,0 +1,47 @@
+"""
+Cliente SQS compartido, creado en el primer uso (igual que banca_common.dynamo).
+
+Lo usan los productores de trabajos asíncronos (post_confirmation) para no
+hacer el trabajo pesado dentro del flujo de autenticación.
+"""
+import json
+import os
+import threading
+from typing import Dict, Any
+
+from banca_common import metrics
+
+CONNECT_TIMEOUT_SECONDS = float(os.environ.get('SQS_CONNECT_TIMEOUT_SECONDS', '1'))
+READ_TIMEOUT_SECONDS = float(os.environ.get('SQS_READ_TIMEOUT_SECONDS', '3'))
+MAX_ATTEMPTS = int(os.environ.get('SQS_MAX_ATTEMPTS', '4'))
+
+_client = None
+_client_lock = threading.Lock()
+
+def get_client() -> Any:
+    """Obtener el cliente de SQS (uno por contenedor)"""
+    global _client
+    if _client is None:
+        with _client_lock:
+            if _client is None:
+                import boto3
+                from botocore.config import Config
+
+                _client = boto3.client('sqs', config=Config(
+                    tcp_keepalive=True,
+                    connect_timeout=CONNECT_TIMEOUT_SECONDS,
+                    read_timeout=READ_TIMEOUT_SECONDS,
+                    retries={'max_attempts': MAX_ATTEMPTS, 'mode': 'standard'}
+                ))
+    return _client
+
+def set_client(client: Any) -> None:
+    """Reemplazar el cliente (stand-in local para benchmarks)"""
+    global _client
+    _client = client
+
+def send_job(queue_url: str, job: Dict[str, Any]) -> str:
+    """Encolar un trabajo serializado como JSON; retorna el MessageId"""
+    send_message = metrics.time_call('SQS.send_message', get_client().send_message)
+    response = send_message(QueueUrl=queue_url, MessageBody=json.dumps(job))
+    return response['MessageId']